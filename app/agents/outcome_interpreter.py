@@ -2,6 +2,7 @@
 from app.models.outcome import CourseOutcome
 from app.core.llm_safe import SafeLLM
 from app.core.generation_safety import UNIVERSAL_SYSTEM_PREFIX
+from app.core.pipeline_config import OUTCOME_INTERPRETATION_CONFIG
 
 
 class OutcomeInterpreterAgent:
@@ -36,4 +37,6 @@ STRICT OUTPUT FORMAT:
 Return ONLY a valid JSON object.
 """
 
-        return await self.llm.generate_json(system_prompt, user_prompt)
+        return await self.llm.generate_json(
+            system_prompt, user_prompt, config=OUTCOME_INTERPRETATION_CONFIG
+        )
@@ -1,8 +1,12 @@
 import hashlib
 import re
+from functools import lru_cache
 from app.core.llm_safe import SafeLLM
-from app.core.bloom_rules import is_verb_allowed, check_forbidden_topics, get_bloom_verbs
+from app.core.metrics import CACHE_LOOKUPS, QUESTIONS
+from app.core.pipeline_config import QUESTION_BATCH_CONFIG
+from app.core.bloom_rules import FORBIDDEN_TOPIC_RULES, is_verb_allowed, check_forbidden_topics, get_bloom_verbs
 from app.core.generation_safety import UNIVERSAL_SYSTEM_PREFIX, BLOOM_ALLOWED_VERBS, FORBIDDEN_TOPICS
+from app.core.text_rules import INFLECTIONS, TermMatcher
 
 # Local subject guard to block obvious cross-subject drift before returning results
 FORBIDDEN_KEYWORDS = [
@@ -11,12 +15,25 @@ FORBIDDEN_KEYWORDS = [
     "computer networks", "tcp", "ip",
     "physics", "quantum", "semiconductor",
 ]
+_FORBIDDEN_KEYWORDS = TermMatcher(FORBIDDEN_KEYWORDS)
+
+# Bloom compliance cues for _compute_bloom_score
+_APPLY_VERBS = TermMatcher(
+    ["apply", "solve", "demonstrate", "illustrate", "use", "compute", "determine", "evaluate"], INFLECTIONS
+)
+_SAFE_PREFIXES = TermMatcher(["using", "given", "consider", "with reference", "based on", "for the following"], ())
+_REMEMBER_STARTERS = TermMatcher(["define", "what is", "state", "list", "identify"], ())
 
 
 def subject_guard(question_text: str) -> bool:
     """Return False if question text leaks into forbidden subjects."""
-    text = question_text.lower()
-    return not any(word in text for word in FORBIDDEN_KEYWORDS)
+    return _FORBIDDEN_KEYWORDS.find(question_text) is None
+
+
+@lru_cache(maxsize=256)
+def _batch_rules(forbidden_terms: tuple[str, ...]) -> TermMatcher:
+    """Subject guard and a paper's forbidden terms in one matcher (compiled once per list)."""
+    return TermMatcher({"subject_guard": FORBIDDEN_KEYWORDS, "forbidden": forbidden_terms})
 
 
 class QuestionGeneratorAgent:
@@ -69,21 +86,13 @@ class QuestionGeneratorAgent:
         STEP 2: Score-based validation instead of hard rejection.
         Returns score 0.0-1.0 indicating Bloom level compliance.
         """
-        text = question_text.lower()
-        
-        apply_verbs = ["apply", "solve", "demonstrate", "illustrate", "use", "compute", "determine", "evaluate"]
-        safe_prefixes = ["using", "given", "consider", "with reference", "based on", "for the following"]
-        
         if bloom_level == "Apply":
-            has_verb = any(verb in text for verb in apply_verbs)
-            has_prefix = any(text.startswith(prefix) for prefix in safe_prefixes)
-            if has_verb or has_prefix:
+            if _SAFE_PREFIXES.starts(question_text) or _APPLY_VERBS.find(question_text):
                 return 0.9
             return 0.3
         
         elif bloom_level == "Remember":
-            remember_starters = ["define", "what is", "state", "list", "identify"]
-            if any(text.startswith(starter) for starter in remember_starters):
+            if _REMEMBER_STARTERS.starts(question_text):
                 return 0.9
             return 0.5
         
@@ -118,6 +127,35 @@ Questions containing these terms will be marked as INVALID.
 """
         return ""
 
+    def _score_batch_questions(self, questions: list[dict], bloom_level: str, forbidden_topics: list) -> list:
+        """
+        Score batch questions in place, with one scan of all their texts;
+        None in place of those that leak a forbidden subject.
+        """
+        rules = _batch_rules(tuple((forbidden_topics + list(FORBIDDEN_TOPICS))[:20]))
+        scored = []
+        for q, hits in zip(questions, rules.rules_many([q["question"] for q in questions])):
+            # Local guard: drop questions that leak forbidden subjects
+            if "subject_guard" in hits:
+                scored.append(None)
+                continue
+
+            # Check forbidden terms
+            if "forbidden" in hits:
+                q["quality_score"] = 20.0
+                q["quality_note"] = "Contains forbidden terms"
+            else:
+                # Score based on Bloom compliance
+                bloom_score = self._compute_bloom_score(q["question"], bloom_level)
+                q["quality_score"] = bloom_score * 100
+                q["quality_note"] = "Good" if bloom_score >= 0.7 else "Low Bloom compliance"
+            scored.append(q)
+        return scored
+
+    def _score_batch_question(self, q: dict, bloom_level: str, forbidden_topics: list) -> dict | None:
+        """Score one batch question in place; None if it leaks a forbidden subject."""
+        return self._score_batch_questions([q], bloom_level, forbidden_topics)[0]
+
     async def generate_section_batch(
         self,
         outcome_spec: dict,
@@ -128,10 +166,20 @@ Questions containing these terms will be marked as INVALID.
         subject: str | None = None,
         topics: list | None = None,
         avoid_questions: list[str] | None = None,
+        use_cache: bool = True,
+        on_question=None,
     ) -> dict:
         """
         STEP 1: Generate multiple questions in ONE LLM call.
         Much faster and more consistent than single-question generation.
+
+        Pass use_cache=False for top-up calls: the cache key ignores
+        avoid_questions, so a cached batch would repeat rejected questions.
+
+        on_question(q) receives each scored question as soon as its object
+        closes in the streamed response, so downstream checks need not wait
+        for the whole batch. The returned questions include those too; a
+        cache hit streams nothing.
         
         Returns:
         {
@@ -156,9 +204,12 @@ Questions containing these terms will be marked as INVALID.
             f"{grounded_subject}_{section_name}_{marks}_{bloom_level}_{difficulty}_{count}".encode()
         ).hexdigest()
         
-        if cache_key in self._cache:
+        if use_cache and cache_key in self._cache:
+            CACHE_LOOKUPS.inc(cache="question_batch", result="hit")
             cached = self._cache[cache_key]
             return {**cached, "cache_hit": True}
+        if use_cache:
+            CACHE_LOOKUPS.inc(cache="question_batch", result="miss")
         
         # Build forbidden section
         forbidden_section = self._build_forbidden_section(grounded_subject, forbidden_topics)
@@ -276,9 +327,20 @@ Return JSON with this EXACT structure:
 }}
 """
         
+        # STEP 2 (streamed): score each question as soon as its object closes
+        streamed = {}
+
+        def on_item(q):
+            if isinstance(q, dict) and isinstance(q.get("question"), str):
+                scored = streamed[q["question"]] = self._score_batch_question(q, bloom_level, forbidden_topics)
+                if scored is not None and on_question is not None:
+                    on_question(scored)
+
         try:
             # STEP 5: Generate with timeout handling
-            result = await self.llm.generate_json(system_prompt, user_prompt)
+            result = await self.llm.generate_json(
+                system_prompt, user_prompt, config=QUESTION_BATCH_CONFIG, on_item=on_item
+            )
             
             if not result or "questions" not in result:
                 return {
@@ -291,35 +353,18 @@ Return JSON with this EXACT structure:
             
             questions = result["questions"]
             
-            # STEP 2: Score and filter questions (don't hard reject)
+            # STEP 2: Score and filter questions (don't hard reject); those
+            # not scored while streaming are scored together
+            questions = [q for q in questions if "question" in q]
+            unscored = [q for q in questions if q["question"] not in streamed]
+            rescored = iter(self._score_batch_questions(unscored, bloom_level, forbidden_topics))
             scored_questions = []
             for q in questions:
-                if "question" not in q:
-                    continue
-                
-                q_text = q["question"]
-
-                # Local guard: drop questions that leak forbidden subjects
-                if not subject_guard(q_text):
-                    continue
-                
-                # Check forbidden terms
-                has_forbidden = any(
-                    term.lower() in q_text.lower() 
-                    for term in (forbidden_topics + list(FORBIDDEN_TOPICS))[:20]
-                )
-                
-                if has_forbidden:
-                    q["quality_score"] = 20.0
-                    q["quality_note"] = "Contains forbidden terms"
-                else:
-                    # Score based on Bloom compliance
-                    bloom_score = self._compute_bloom_score(q_text, bloom_level)
-                    q["quality_score"] = bloom_score * 100
-                    q["quality_note"] = "Good" if bloom_score >= 0.7 else "Low Bloom compliance"
-                
+                scored = streamed[q["question"]] if q["question"] in streamed else next(rescored)
+
                 # Accept all questions (score them, don't reject)
-                scored_questions.append(q)
+                if scored is not None:
+                    scored_questions.append(scored)
             
             # Cache the result
             cache_result = {
@@ -682,7 +727,6 @@ Set bloom_level={bloom_level} and difficulty={difficulty}.
         result = await self.llm.generate_json(system_prompt, user_prompt)
         
         # FIX 4: POST-GENERATION VALIDATION (MANDATORY - BLOOM VERB GATE)
-        print("VALIDATION STARTED")
         if result and "question" in result:
             question_text = result["question"].lower()
 
@@ -690,16 +734,16 @@ Set bloom_level={bloom_level} and difficulty={difficulty}.
             if not subject_guard(question_text):
                 result["validation_error"] = "Subject guard rejected: forbidden keywords"
                 result["is_valid"] = False
-                print("VALIDATION RESULT:", False)
+                QUESTIONS.inc(outcome="rejected", reason="subject_guard")
                 return result
 
             # VALIDATION 1: Check forbidden terms (DBMS filter)
-            for term in FORBIDDEN_TOPICS:
-                if term.lower() in question_text:
-                    result["validation_error"] = f"Contains forbidden term: {term}"
-                    result["is_valid"] = False
-                    print("VALIDATION RESULT:", False)
-                    return result
+            term = FORBIDDEN_TOPIC_RULES.find(question_text)
+            if term:
+                result["validation_error"] = f"Contains forbidden term: {term}"
+                result["is_valid"] = False
+                QUESTIONS.inc(outcome="rejected", reason="forbidden_term")
+                return result
 
             # VALIDATION 2: Bloom verb enforcement (Apply uses semantic contains + safe prefixes)
             invalid_starters_by_bloom = {
@@ -714,7 +758,7 @@ Set bloom_level={bloom_level} and difficulty={difficulty}.
                     if question_text.startswith(starter):
                         result["validation_error"] = f"Invalid starter '{starter}' for {bloom_level} level"
                         result["is_valid"] = False
-                        print("VALIDATION RESULT:", False)
+                        QUESTIONS.inc(outcome="rejected", reason="invalid_starter")
                         return result
 
             apply_verbs = [
@@ -734,7 +778,7 @@ Set bloom_level={bloom_level} and difficulty={difficulty}.
                         "Apply-level question must include an apply verb or a safe academic lead-in"
                     )
                     result["is_valid"] = False
-                    print("VALIDATION RESULT:", False)
+                    QUESTIONS.inc(outcome="rejected", reason="missing_apply_verb")
                     return result
 
             if allowed_verbs and bloom_level != "Apply":
@@ -746,10 +790,10 @@ Set bloom_level={bloom_level} and difficulty={difficulty}.
                 if not starts_with_allowed_verb:
                     result["validation_error"] = f"Must start with {bloom_level} verb: {', '.join(allowed_verbs[:5])}"
                     result["is_valid"] = False
-                    print("VALIDATION RESULT:", False)
+                    QUESTIONS.inc(outcome="rejected", reason="missing_bloom_verb")
                     return result
 
             result["is_valid"] = True
-            print("VALIDATION RESULT:", True)
+            QUESTIONS.inc(outcome="accepted", reason="valid")
         
         return result
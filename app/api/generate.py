@@ -1,14 +1,21 @@
 
+import logging
+
 from fastapi import APIRouter, HTTPException
-from app.api.schemas import GenerateQuestionRequest, GenerateQuestionResponse
+from app.api.schemas import GenerateQuestionRequest, GenerateQuestionResponse, QuestionSchema
 from app.models.outcome import CourseOutcome
 from app.core.pipeline import QuestionPipeline
-from app.core.duplicate_checker import similarity
+from app.core import dedup_index, semantic_index
+from app.core.config import settings
 from app.core.quality_scorer import score_question
 from app.core.difficulty_calibrator import expected_difficulty
 # from google.genai.errors import ClientError  # Unused import causing module error
 from app.db.session import SessionLocal
-from app.db.models import CourseOutcome, Question, AuditLogDB
+from app.db.models import CourseOutcome, AuditLogDB
+from app.db.bulk import find_question, question_row, insert_questions
+from app.core.metrics import GENERATIONS_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/generate", tags=["Question Generation"])
 
@@ -16,10 +23,10 @@ pipeline = QuestionPipeline()
 
 
 @router.post("", response_model=None)
+@GENERATIONS_IN_FLIGHT.track_inprogress(endpoint="question")
 async def generate_question(req: GenerateQuestionRequest):
-    pipeline = QuestionPipeline()
-    llm_response = ""
-    
+    db = None
+
     try:
         # Handle list of bloom levels (e.g. from multi-select)
         bloom_val = req.bloom_level
@@ -33,47 +40,72 @@ async def generate_question(req: GenerateQuestionRequest):
             keywords=req.keywords
         )
 
-        llm_response, question = await pipeline.run(
+        result = await pipeline.run(
             course_outcome=co,
             marks=req.marks,
             difficulty=req.difficulty
         )
 
+        if result["status"] != "ACCEPTED":
+            return {
+                "status": "error",
+                "message": "LLM output could not be processed",
+                "raw_response": (result.get("raw_response") or "")[:500],
+                "error": result.get("error") or result.get("reason"),
+            }
+
+        question = QuestionSchema(**result["question"])
+
         # -- LOGIC FOR DUPLICATES, PERSISTENCE, ETC --
         db = SessionLocal()
         
-        # Check for duplicates before persisting
-        DUPLICATE_THRESHOLD = 0.85
-        
-        existing_questions = (
-            db.query(Question)
-            .filter(
-                Question.bloom_level == question.bloom_level,
-                Question.difficulty == question.difficulty
-            )
-            .all()
+        # Append code if present
+        q_text = question.question
+        if question.code:
+            q_text += f"\n\nCode:\n{question.code}"
+
+        # Exact duplicate (same canonical text for the same kind of slot):
+        # one lookup on the uq_questions_content index
+        existing = find_question(db, q_text, question.marks, question.bloom_level, question.difficulty)
+        if existing is not None:
+            return {
+                "status": "REJECTED",
+                "reason": "Duplicate question detected",
+                "similarity": 1.0,
+                "duplicate_of": existing.id,
+            }
+
+        # Check for near-duplicates before persisting: index candidates only,
+        # after catching up with questions other processes inserted
+        dedup_index.sync(db)
+        duplicate = dedup_index.get_question_index().find(
+            question.question,
+            settings.DUPLICATE_THRESHOLD,
+            bloom_level=question.bloom_level,
+            difficulty=question.difficulty,
         )
+        if duplicate is not None:
+            return {
+                "status": "REJECTED",
+                "reason": "Duplicate question detected",
+                "similarity": round(duplicate[1], 2)
+            }
 
-        for existing in existing_questions:
-            sim = similarity(existing.question_text, question.question)
-            if sim >= DUPLICATE_THRESHOLD:
-                db.close()
+        # Paraphrases of bank questions (once the bank's vectors are loaded)
+        bank = semantic_index.get_bank_index()
+        if bank.loaded:
+            semantic_index.sync(db)
+            (paraphrase,) = bank.duplicates(bank.encode([question.question]), settings.SEMANTIC_DUPLICATE_THRESHOLD)
+            if paraphrase is not None:
                 return {
                     "status": "REJECTED",
-                    "reason": "Duplicate question detected",
-                    "similarity": round(sim, 2)
+                    "reason": "Paraphrase of an existing question",
+                    "similarity": round(paraphrase[1], 2)
                 }
 
-        outcome = CourseOutcome(
-            code=req.code,
-            topic=req.topic,
-            bloom_level=req.bloom_level,
-            keywords=req.keywords
-        )
-        db.add(outcome)
-
-        db.commit()
-        db.refresh(outcome)
+        # One transaction for outcome, question and audit log (was a commit each)
+        db.add(co)
+        db.flush()  # outcome id for the question row
 
         # Calculate quality score
         quality = score_question(
@@ -81,40 +113,31 @@ async def generate_question(req: GenerateQuestionRequest):
             question.bloom_level
         )
 
-        # Append code if present
-        q_text = question.question
-        if question.code:
-            q_text += f"\n\nCode:\n{question.code}"
-
-        db_question = Question(
-            outcome_id=outcome.id,
-            question_text=q_text,
-            bloom_level=question.bloom_level,
-            difficulty=question.difficulty,
-            marks=question.marks,
-            quality_score=quality
-        )
-
         # Drift detection
         expected = expected_difficulty(
-            db_question.bloom_level,
-            db_question.marks,
-            db_question.quality_score,
+            question.bloom_level,
+            question.marks,
+            quality,
         )
-        if expected != db_question.difficulty:
+        if expected != question.difficulty:
             drift = {
-                "declared": db_question.difficulty,
+                "declared": question.difficulty,
                 "expected": expected,
             }
         else:
             drift = None
 
-        db_question.difficulty_drift = drift
-
-        db.add(db_question)
-
-        db.commit()
-        db.refresh(db_question)
+        (question_id,) = insert_questions(db, [question_row(
+            {
+                "text": q_text,
+                "bloom_level": question.bloom_level,
+                "difficulty": question.difficulty,
+                "marks": question.marks,
+                "quality_score": quality,
+            },
+            outcome_id=co.id,
+            difficulty_drift=drift,
+        )])
 
         # Audit Log
         audit_payload = {
@@ -124,14 +147,15 @@ async def generate_question(req: GenerateQuestionRequest):
         }
 
         audit = AuditLogDB(
-            question_id=db_question.id,
+            question_id=question_id,
             verdict="Pass",
             audit_payload=audit_payload
         )
         db.add(audit)
 
         db.commit()
-        db.close()
+        dedup_index.index_question(question_id, q_text, question.bloom_level, question.difficulty)
+        semantic_index.index_questions([question_id], [q_text])
 
         # Success Return
         return {
@@ -141,7 +165,7 @@ async def generate_question(req: GenerateQuestionRequest):
         }
 
     except Exception as e:
-        print("🔥 GENERATE PIPELINE ERROR:", repr(e))
+        logger.exception(f"Generate pipeline error: {e!r}")
         
         raw_resp = ""
         if hasattr(e, 'raw_response'):
@@ -158,4 +182,8 @@ async def generate_question(req: GenerateQuestionRequest):
             "error": str(e)
         }
 
+    finally:
+        if db is not None:
+            db.close()
+
 
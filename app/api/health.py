@@ -1,6 +1,11 @@
-
 from fastapi import APIRouter
 
+from app.core.llm_cache import get_llm_cache
+from app.core.llm_client import get_scheduler_snapshot
+from app.core.llm_hedging import get_hedge_budget
+from app.core.pipeline_config import STAGE_CONFIGS
+from app.core.stage_latency import effective_timeout, get_latency_tracker, timeout_bounds
+
 router = APIRouter(prefix="/health", tags=["Health"])
 
 @router.get("")
@@ -9,3 +14,46 @@ def health_check():
         "status": "ok",
         "service": "outcome-qb-ai"
     }
+
+
+@router.get("/llm-cache")
+def llm_cache_stats():
+    """Hit/miss/eviction counters for the persistent LLM response cache."""
+    return get_llm_cache().stats()
+
+
+@router.get("/llm-scheduler")
+def llm_scheduler_state():
+    """Current adaptive concurrency limit, queue depths and rate-limit counters."""
+    return get_scheduler_snapshot() or {"status": "idle"}
+
+
+@router.get("/llm-hedging")
+def llm_hedging_state():
+    """Hedge budget usage and the per-stage latencies hedge delays are derived from."""
+    return {
+        "budget": get_hedge_budget().snapshot(),
+        "stage_latency": get_latency_tracker().snapshot(),
+    }
+
+
+@router.get("/llm-timeouts")
+def llm_timeouts():
+    """Configured vs. effective (learned) timeout per stage, with latency histograms."""
+    tracker = get_latency_tracker()
+    stages = {}
+    for cfg in STAGE_CONFIGS:
+        floor, ceiling = timeout_bounds(cfg)
+        stages[cfg.stage_name] = {
+            "configured": cfg.timeout,
+            "effective": round(effective_timeout(cfg), 2),
+            "floor": floor,
+            "ceiling": ceiling,
+        }
+    for stage in tracker.stages():
+        stages.setdefault(stage, {})
+    latency = tracker.snapshot()
+    for stage, entry in stages.items():
+        entry["latency"] = latency.get(stage)
+        entry["histogram"] = tracker.histogram(stage)
+    return stages
@@ -0,0 +1,42 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.api.papers import question_agent
+from app.core import pipeline
+from app.core.llm_client import get_scheduler_snapshot
+from app.core.metrics import REGISTRY, CallbackGauge
+
+router = APIRouter(tags=["Metrics"])
+
+
+def _cache_entries():
+    return [
+        (("question_batch",), len(question_agent._cache)),
+        (("pipeline",), len(pipeline.CACHE)),
+    ]
+
+
+def _scheduler_state():
+    snapshot = get_scheduler_snapshot()
+    if snapshot is None:
+        return []
+    return [
+        (("concurrency_limit",), snapshot["concurrency_limit"]),
+        (("active",), snapshot["active"]),
+        *((("queued_" + lane,), depth) for lane, depth in snapshot["queued"].items()),
+    ]
+
+
+REGISTRY.register(CallbackGauge(
+    "qb_cache_entries", "Entries currently held by in-memory caches.", ["cache"], _cache_entries
+))
+REGISTRY.register(CallbackGauge(
+    "qb_llm_scheduler", "LLM scheduler state (adaptive limit, active calls, queue depth per lane).",
+    ["field"], _scheduler_state,
+))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """All metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
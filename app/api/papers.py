@@ -1,9 +1,11 @@
+import math
 import random
 import time
 import re
 import unicodedata
 from typing import Optional
-from fastapi import APIRouter, Depends, Response, HTTPException
+from fastapi import APIRouter, Depends, Header, Response, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
@@ -15,16 +17,256 @@ from concurrent.futures import ThreadPoolExecutor
 import asyncio
 import logging
 
-from app.db.session import get_db
+from app.db.session import SessionLocal, get_db
 from app.db.models import QuestionPaper, PaperSection, PaperQuestion, Question
+from app.db.bulk import find_question, question_row, insert_questions, save_paper_questions
 from app.pipeline.run_pipeline import run_pipeline
 from app.core.subject_analyzer import SubjectAnalyzer
 from app.api.schemas import PaperMetadata
 from app.core.context_aware_regenerator import ContextAwareRegenerator
 from app.core.analytics import calculate_syllabus_coverage, calculate_bloom_distribution
+from app.core.llm_scheduler import BULK, INTERACTIVE, set_llm_request_context
+from app.core.quality_scorer import score_question
+from app.core.text_rules import matcher
+from app.core import topic_tagger
+from app.core.config import settings
+from app.core.metrics import GENERATIONS_IN_FLIGHT, QUESTIONS, TEMPLATE_FALLBACKS
+from app.core.generation_jobs import get_generation_jobs, report_progress, sse_message
+from app.core import dedup_index, generation_runs, job_queue, semantic_index
+from app.core.dedup_index import NearDuplicateIndex
+from app.core.semantic_index import SemanticIndex
+from app.agents.question_generator import QuestionGeneratorAgent
 
 logger = logging.getLogger(__name__)
 regenerator = ContextAwareRegenerator()
+question_agent = QuestionGeneratorAgent()
+
+def _is_duplicate(question_text: str, seen: NearDuplicateIndex) -> bool:
+    """Near-duplicate (similarity() >= DUPLICATE_THRESHOLD) of a question already in the paper."""
+    return seen.find(question_text, settings.DUPLICATE_THRESHOLD) is not None
+
+
+def _paper_vectors() -> SemanticIndex:
+    """In-memory index of one paper's accepted questions, in the bank's encoding."""
+    return SemanticIndex(dim=semantic_index.get_bank_index().dim, capacity=64)
+
+
+def _paraphrases(texts: list[str], seen_vectors: SemanticIndex):
+    """
+    Encode a batch of candidate questions and score it, in one matrix
+    multiply each, against the bank and the paper's accepted questions.
+    Returns (vectors, per-text (id, cosine) match or None).
+    """
+    bank = semantic_index.get_bank_index()
+    vectors = bank.encode(texts)
+    return vectors, bank.duplicates(vectors, settings.SEMANTIC_DUPLICATE_THRESHOLD, others=[seen_vectors])
+
+
+def _duplicate_in_paper(db: Session, paper_id: int, question_text: str, exclude_id: int) -> Optional[int]:
+    """Id of another question of the paper that `question_text` nearly duplicates (bank index lookup)."""
+    # Catch up with questions other processes inserted first
+    dedup_index.sync(db)
+    matches = dedup_index.get_question_index().matches(question_text, settings.DUPLICATE_THRESHOLD)
+    if not matches:
+        return None
+    paper_question_ids = {
+        question_id
+        for (question_id,) in db.query(PaperQuestion.question_id).filter(
+            PaperQuestion.section_id.in_(
+                db.query(PaperSection.id).filter(PaperSection.paper_id == paper_id)
+            )
+        )
+    }
+    paper_question_ids.discard(exclude_id)
+    return next((question_id for question_id, _ in matches if question_id in paper_question_ids), None)
+
+
+def _to_question_data(question: dict, section, section_bloom: str) -> dict:
+    """Map an LLM question object onto the shape persisted by generate_question_paper."""
+    text = question["question"].strip()
+    bloom = question.get("bloom_level") or section_bloom
+    quality = question.get("quality_score")
+    if quality is None:
+        quality = score_question(text, bloom)
+
+    return {
+        "text": text,
+        "bloom_level": bloom,
+        "difficulty": question.get("difficulty") or "Medium",
+        "marks": section.marks_per_question,
+        "quality_score": quality,
+    }
+
+
+def _fallback_question(section, section_topics, section_bloom) -> dict:
+    """Template question used when the LLM could not fill a slot."""
+    if section.marks_per_question <= 2:
+        q_text = f"Define any key concept from {', '.join(section_topics[:2])}"
+    elif section.marks_per_question <= 13:
+        q_text = f"Apply {random.choice(section_topics) if section_topics else 'the concepts'} to a realistic problem"
+    else:
+        q_text = f"Analyze and synthesize knowledge of {', '.join(section_topics[:3])}"
+
+    return {
+        "text": q_text,
+        "bloom_level": section_bloom,
+        "difficulty": "Medium",
+        "marks": section.marks_per_question,
+        "quality_score": 75.0,
+    }
+
+
+def _validate_batch_question(question: dict, forbidden_topics: list[str]) -> str | None:
+    """Return a rejection reason for a batch question, or None if it is usable."""
+    text = question.get("question")
+    if not isinstance(text, str) or len(text.split()) < 5:
+        return "too_short"
+
+    # Compiled once per paper's list, shared by all of its sections
+    topic = matcher(forbidden_topics).find(text)
+    if topic:
+        return f"forbidden_topic:{topic}"
+
+    return None
+
+
+async def generate_section_batched(
+    section,
+    section_bloom,
+    paper,
+    used_questions_global,
+    batch_size: int,
+    max_topups: int,
+    needed: Optional[int] = None,
+    on_accept=None,
+    seen: Optional[NearDuplicateIndex] = None,
+    seen_vectors: Optional[SemanticIndex] = None,
+):
+    """
+    Fill a section with batched LLM calls (one call per chunk of `batch_size`).
+
+    Every returned question is validated and de-duplicated individually,
+    as soon as its object closes in the streamed response. When a call
+    comes back short (status "partial", or questions were rejected),
+    follow-up calls request only the shortfall, up to `max_topups` extra
+    calls. `needed` defaults to the whole section; `on_accept(question_data)`
+    is called for each accepted question as it is accepted, so while the
+    call is still running. `seen` indexes the paper's questions so far
+    (built from used_questions_global if not given), `seen_vectors` holds
+    their vectors for paraphrase checks (see semantic_index): a batch that
+    was not streamed (cache hit) is scored against the bank and the paper
+    in one go. Returns (accepted question_data list, llm_calls).
+    """
+    if needed is None:
+        needed = section.number_of_questions
+    if seen is None:
+        seen = NearDuplicateIndex.of(used_questions_global)
+    if seen_vectors is None:
+        seen_vectors = _paper_vectors()
+    accepted = []
+    llm_calls = 0
+    calls = 0
+    max_calls = math.ceil(needed / batch_size) + max_topups
+    forbidden_topics = paper.forbidden_topics or []
+
+    outcome_spec = {
+        "subject": paper.subject,
+        "domain": paper.domain,
+        "core_topics": paper.core_topics or [],
+        "forbidden_topics": forbidden_topics,
+        "normalized_bloom": section_bloom,
+    }
+
+    def consider(question, vector, paraphrase: bool) -> bool:
+        """Validate and de-duplicate one returned question; accept it (True) if usable."""
+        reason = _validate_batch_question(question, forbidden_topics)
+        if reason:
+            logger.info(f"Rejected batch question in {section.name}: {reason}")
+            QUESTIONS.inc(outcome="rejected", reason=reason.split(":")[0])
+            return False
+
+        if _is_duplicate(question["question"], seen):
+            logger.info(f"Rejected batch question in {section.name}: duplicate")
+            QUESTIONS.inc(outcome="rejected", reason="duplicate")
+            return False
+
+        if paraphrase:
+            logger.info(f"Rejected batch question in {section.name}: paraphrase")
+            QUESTIONS.inc(outcome="rejected", reason="paraphrase")
+            return False
+
+        QUESTIONS.inc(outcome="accepted", reason="batch")
+        used_questions_global.add(question["question"])
+        seen.add(None, question["question"])
+        seen_vectors.append(vector)
+        question_data = _to_question_data(question, section, section_bloom)
+        accepted.append(question_data)
+        if on_accept is not None:
+            on_accept(question_data)
+        else:
+            report_progress("question_accepted", section=section.name, order=len(accepted), source="batch")
+        return True
+
+    # Questions checked while their response was still streaming
+    streamed = set()
+
+    def on_question(question):
+        if len(accepted) >= needed or question["question"] in streamed:
+            return
+        streamed.add(question["question"])
+        # Scored on its own against the bank and the paper, whose vectors
+        # include the batch's questions accepted so far
+        vectors, (paraphrase,) = _paraphrases([question["question"]], seen_vectors)
+        consider(question, vectors, paraphrase is not None)
+
+    while len(accepted) < needed and calls < max_calls:
+        count = min(batch_size, needed - len(accepted))
+        result = await question_agent.generate_section_batch(
+            outcome_spec=outcome_spec,
+            marks=section.marks_per_question,
+            difficulty="Medium",
+            section_name=section.name,
+            count=count,
+            subject=paper.subject,
+            topics=paper.core_topics,
+            avoid_questions=list(used_questions_global),
+            # Only the first call may reuse a cached batch (see generate_section_batch)
+            use_cache=calls == 0,
+            on_question=on_question,
+        )
+        calls += 1
+        if not result.get("cache_hit"):
+            llm_calls += 1
+
+        if result["status"] == "failed":
+            logger.warning(
+                f"Batch call failed for paper {paper.id} section {section.name}: {result.get('error')}"
+            )
+            continue
+
+        # Those not streamed (cache hits): the whole batch against the bank
+        # and the paper at once; within the batch, against the questions
+        # accepted before each one
+        questions = [question for question in result["questions"] if question.get("question") not in streamed]
+        if not questions:
+            continue
+        texts = [question.get("question") if isinstance(question.get("question"), str) else "" for question in questions]
+        vectors, paraphrases = _paraphrases(texts, seen_vectors)
+        within = vectors @ vectors.T
+        accepted_rows = []
+
+        for row, question in enumerate(questions):
+            if len(accepted) >= needed:
+                break
+
+            paraphrase = paraphrases[row] is not None or any(
+                within[row, earlier] >= settings.SEMANTIC_DUPLICATE_THRESHOLD for earlier in accepted_rows
+            )
+            if consider(question, vectors[row:row + 1], paraphrase):
+                accepted_rows.append(row)
+
+    return accepted, llm_calls
+
 
 # Helper async function for section-wise question generation
 async def generate_section_questions(
@@ -35,17 +277,70 @@ async def generate_section_questions(
     paper,
     used_questions_global,
     max_retries_per_question=1,
+    batch_size=0,
+    max_topups=0,
+    question_slots=None,
+    duplicate_retries=1,
+    checkpoint=None,
+    seen=None,
+    seen_vectors=None,
 ):
-    """Generate all questions for a single section (can run in parallel with other sections)."""
-    section_questions = []
-    order = 1
+    """
+    Generate all questions for a single section (can run in parallel with other sections).
+
+    With batch_size > 0, Part B/C questions come from batched LLM calls
+    (see generate_section_batched); otherwise one pipeline call per question.
+
+    Per-question calls of a section are fanned out concurrently; every LLM
+    call holds a slot of `question_slots`, a semaphore shared by all sections
+    of the paper (None = one call at a time). Part A templates never take a
+    slot, so the whole budget goes to Part B/C. Each question keeps its slot
+    position as question_order regardless of completion order. Duplicates
+    are only visible once a sibling call has finished, so a slot whose answer
+    turns out to be a duplicate gets up to `duplicate_retries` extra calls.
+
+    With a `checkpoint` (generation_runs.SectionCheckpoints), its restored
+    questions fill their slots up front, only the other slots are
+    generated, and every newly accepted question is checkpointed at once.
+
+    Duplicates are near-duplicates and paraphrases: questions of the
+    paper are kept in `seen`, a NearDuplicateIndex, and `seen_vectors`, a
+    SemanticIndex, both shared by its sections (built from
+    used_questions_global if not given). Paraphrases of bank questions
+    are rejected as well, exact repeats included: LLM questions are never
+    linked to an existing bank row, while a template question already in
+    the bank for the same kind of slot is (see app.db.bulk).
+    """
+    if question_slots is None:
+        question_slots = asyncio.Semaphore(1)
+    if seen is None:
+        seen = NearDuplicateIndex.of(used_questions_global)
+    if seen_vectors is None:
+        seen_vectors = _paper_vectors()
+        if used_questions_global:
+            seen_vectors.append(semantic_index.get_bank_index().encode(list(used_questions_global)))
+
+    slots = [None] * section.number_of_questions
     used_concepts = set()
-    section_log = []
     llm_calls = 0
-    
-    for q_idx in range(section.number_of_questions):
-        # Part A: Use templates (no LLM)
-        if section.marks_per_question <= 2 and section_topics:
+
+    if checkpoint is not None:
+        for order, question_data in checkpoint.restored.items():
+            slots[order - 1] = question_data
+            used_questions_global.add(question_data["text"])
+            seen.add(None, question_data["text"])
+            seen_vectors.append(semantic_index.get_bank_index().encode([question_data["text"]]))
+    open_slots = [q_idx for q_idx, question_data in enumerate(slots) if question_data is None]
+
+    def accept(q_idx, question_data, source):
+        slots[q_idx] = question_data
+        if checkpoint is not None:
+            checkpoint.save(q_idx + 1, question_data, source)
+        report_progress("question_accepted", section=section.name, order=q_idx + 1, source=source)
+
+    # Part A: Use templates (no LLM)
+    if section.marks_per_question <= 2 and section_topics:
+        for q_idx in open_slots:
             available_topics = [t for t in section_topics if t not in used_concepts]
             if not available_topics:
                 used_concepts.clear()
@@ -62,94 +357,121 @@ async def generate_section_questions(
             ]
             question_text = random.choice(part_a_templates)
 
-            question_data = {
+            accept(q_idx, {
                 "text": question_text,
                 "bloom_level": "Remember",
                 "difficulty": "Easy",
                 "marks": section.marks_per_question,
                 "quality_score": 100.0,
-            }
-            section_questions.append((question_data, order))
-            order += 1
-            continue
+            }, "template")
 
-        # Part B/C: Use LLM pipeline
-        accepted = False
-        attempts = 0
-        
-        while attempts < max_retries_per_question and not accepted:
-            try:
-                llm_calls += 1
-                result = await run_pipeline(
-                    marks=section.marks_per_question,
-                    syllabus=paper.syllabus,
-                    section_name=section.name,
-                    avoid_questions=list(used_questions_global),
-                    subject=paper.subject,
-                    domain=paper.domain,
-                    core_topics=paper.core_topics,
-                    forbidden_topics=paper.forbidden_topics,
-                )
+    # Part B/C (batched): accepted batch questions fill the open slots in order
+    elif batch_size > 0 and open_slots:
+        unfilled = iter(open_slots)
+        async with question_slots:
+            _, llm_calls = await generate_section_batched(
+                section=section,
+                section_bloom=section_bloom,
+                paper=paper,
+                used_questions_global=used_questions_global,
+                batch_size=batch_size,
+                max_topups=max_topups,
+                needed=len(open_slots),
+                on_accept=lambda question_data: accept(next(unfilled), question_data, "batch"),
+                seen=seen,
+                seen_vectors=seen_vectors,
+            )
+
+    # Part B/C: Use LLM pipeline, one concurrent task per question
+    elif batch_size <= 0:
+        async def fill_slot(q_idx):
+            nonlocal llm_calls
+            attempts = 0
+            max_attempts = max_retries_per_question
+            duplicates = 0
+
+            while attempts < max_attempts:
                 attempts += 1
+                try:
+                    async with question_slots:
+                        llm_calls += 1
+                        result = await run_pipeline(
+                            marks=section.marks_per_question,
+                            syllabus=paper.syllabus,
+                            section_name=section.name,
+                            avoid_questions=list(used_questions_global),
+                            subject=paper.subject,
+                            domain=paper.domain,
+                            core_topics=paper.core_topics,
+                            forbidden_topics=paper.forbidden_topics,
+                        )
+                except Exception:
+                    await asyncio.sleep(0.1)
+                    continue
 
                 if result["status"] == "ACCEPTED" and "question" in result:
                     question_text = result["question"]["question"]
-                    question_normalized = question_text.lower().strip()
-                    
-                    # Check duplicates
-                    is_duplicate = any(
-                        question_normalized == existing.lower().strip()
-                        for existing in used_questions_global
-                    )
-                    
-                    if is_duplicate:
-                        await asyncio.sleep(0.1)  # Micro delay
+
+                    # Check and claim without awaiting in between, so two
+                    # concurrent slots can never both accept the same text
+                    vectors, (paraphrase,) = _paraphrases([question_text], seen_vectors)
+                    if _is_duplicate(question_text, seen) or paraphrase is not None:
+                        QUESTIONS.inc(outcome="rejected", reason="duplicate")
+                        if duplicates < duplicate_retries:
+                            duplicates += 1
+                            max_attempts += 1
                         continue
 
-                    # Accept this question
+                    QUESTIONS.inc(outcome="accepted", reason="pipeline")
                     used_questions_global.add(question_text)
-                    section_questions.append((result["question"], order))
-                    order += 1
-                    accepted = True
-                    break
+                    seen.add(None, question_text)
+                    seen_vectors.append(vectors)
+                    accept(q_idx, _to_question_data(result["question"], section, section_bloom), "pipeline")
+                    return
+
+                QUESTIONS.inc(outcome="rejected", reason=result.get("reason") or "unknown")
+                if result.get("reason") == "rate_limited":
+                    logger.warning(
+                        f"Provider rate limit hit for paper {paper.id} section {section.name}; "
+                        f"question {q_idx + 1} will use a template if retries are exhausted"
+                    )
 
                 await asyncio.sleep(0.1)  # Micro delay between retries
 
-            except Exception:
-                attempts += 1
-                await asyncio.sleep(0.1)
-
-        # Fallback if LLM fails
-        if not accepted:
-            if section.marks_per_question <= 2:
-                q_text = f"Define any key concept from {', '.join(section_topics[:2])}"
-            elif section.marks_per_question <= 13:
-                q_text = f"Apply {random.choice(section_topics) if section_topics else 'the concepts'} to a realistic problem"
-            else:
-                q_text = f"Analyze and synthesize knowledge of {', '.join(section_topics[:3])}"
-            
-            question_data = {
-                "text": q_text,
-                "bloom_level": section_bloom,
-                "difficulty": "Medium",
-                "marks": section.marks_per_question,
-                "quality_score": 75.0,
-            }
-            section_questions.append((question_data, order))
-            order += 1
+        await asyncio.gather(*[fill_slot(q_idx) for q_idx in open_slots])
+
+    # Fallback for every slot the LLM could not fill; order follows the slot
+    fallbacks = sum(1 for question_data in slots if question_data is None)
+    if fallbacks:
+        TEMPLATE_FALLBACKS.inc(fallbacks, mode="batched" if batch_size > 0 else "per_question")
+    for q_idx, question_data in enumerate(slots):
+        if question_data is None:
+            report_progress("fallback_used", section=section.name, order=q_idx + 1)
+    report_progress(
+        "section_completed",
+        section=section.name,
+        questions=len(slots),
+        template_fallbacks=fallbacks,
+        llm_calls=llm_calls,
+    )
+    section_questions = [
+        (question_data or _fallback_question(section, section_topics, section_bloom), q_idx + 1)
+        for q_idx, question_data in enumerate(slots)
+    ]
 
     return {
         "section_id": section.id,
         "section_name": section.name,
         "questions": section_questions,
         "llm_calls": llm_calls,
+        "template_fallbacks": fallbacks,
     }
 
 router = APIRouter(prefix="/papers", tags=["Question Papers"])
 
 
-def update_analytics_for_paper(db: Session, paper_id: int):
-    """Helper to recalculate and save analytics for a paper"""
+def update_analytics_for_paper(db: Session, paper_id: int, commit: bool = True):
+    """Helper to recalculate and save analytics for a paper (commit=False leaves the commit to the caller)"""
     paper = db.query(QuestionPaper).get(paper_id)
     if not paper:
         return
@@ -172,7 +494,8 @@ def update_analytics_for_paper(db: Session, paper_id: int):
         "coverage_percent": coverage,
         "bloom_distribution": distribution
     }
-    db.commit()
+    if commit:
+        db.commit()
 
 
 class PaperCreate(BaseModel):
@@ -429,11 +752,32 @@ def get_paper_grounding(
     }
 
 
+async def _run_generation_job(paper_id: int) -> dict:
+    # Own session: the request's session closes once the 202 has been sent
+    db = SessionLocal()
+    try:
+        return await generate_question_paper(paper_id=paper_id, db=db)
+    finally:
+        db.close()
+
+
 @router.post("/{paper_id}/generate")
+@GENERATIONS_IN_FLIGHT.track_inprogress(endpoint="paper")
 async def generate_question_paper(
     paper_id: int,
     db: Session = Depends(get_db),
+    background: bool = False,
 ):
+    """
+    Generate every section of the paper. With background=true the run
+    becomes a job (see app/core/generation_jobs.py): the response is a 202
+    with the job id, and progress is read from /papers/{id}/jobs/{job_id}
+    and its /events stream. With GENERATION_JOB_BACKEND=queue the job is
+    only queued here and a worker process runs it (app/worker.py).
+    """
+    # Bulk lane: interactive replace/regenerate calls are scheduled ahead of us
+    set_llm_request_context(BULK, paper_id=paper_id)
+
     paper = db.query(QuestionPaper).get(paper_id)
     if not paper:
         return {"error": "Paper not found"}
@@ -452,6 +796,22 @@ async def generate_question_paper(
             detail="Syllabus is required for question generation. Please add topics/concepts (minimum 10 characters)."
         )
 
+    if background:
+        if settings.GENERATION_JOB_BACKEND == "queue":
+            job = job_queue.enqueue(db, paper_id)
+        else:
+            job = get_generation_jobs().start(paper_id, lambda: _run_generation_job(paper_id))
+        return JSONResponse(
+            status_code=202,
+            content={
+                "job_id": job.id,
+                "paper_id": paper_id,
+                "status": job.status,
+                "status_url": f"/papers/{paper_id}/jobs/{job.id}",
+                "events_url": f"/papers/{paper_id}/jobs/{job.id}/events",
+            },
+        )
+
     # ============================================================================
     # 🧠 STEP 1: SUBJECT GROUNDING (MANDATORY - Single Source of Truth)
     # ============================================================================
@@ -474,6 +834,9 @@ async def generate_question_paper(
         
         db.commit()
         db.refresh(paper)
+        grounded_now = True
+    else:
+        grounded_now = False
 
     # ============================================================================
     # 📝 STEP 1b: SYLLABUS NORMALIZATION (PREPROCESSING)
@@ -492,6 +855,13 @@ async def generate_question_paper(
         db.commit()
         db.refresh(paper)
 
+    report_progress(
+        "grounding",
+        subject=paper.subject,
+        core_topics=len(paper.core_topics or []),
+        reused=not grounded_now,
+    )
+
     # ============================================================================
     # 🧠 STEP 2: QUESTION GENERATION (with grounded subject context)
     # ============================================================================
@@ -505,6 +875,24 @@ async def generate_question_paper(
     if not sections:
         return {"error": "No sections configured for this paper"}
 
+    # Resume the last unfinished run: its checkpointed questions are kept
+    try:
+        checkpoints = generation_runs.open_run(db, paper_id)
+    except generation_runs.RunInProgress:
+        raise HTTPException(status_code=409, detail="This paper is already being generated. Try again when it finishes.")
+    run_id = checkpoints.run.id
+    checkpoints.start_heartbeat()
+    section_checkpoints = {section.id: checkpoints.section(section) for section in sections}
+    restored = sum(len(checkpoint.restored) for checkpoint in section_checkpoints.values())
+
+    report_progress(
+        "generation_started",
+        sections=[section.name for section in sections],
+        total_questions=sum(section.number_of_questions for section in sections) - restored,
+        run_id=run_id,
+        restored_questions=restored,
+    )
+
     # Use normalized topics from paper.core_topics (NOT raw syllabus)
     # This prevents formatting noise from affecting question generation
     all_topics = paper.core_topics or []
@@ -530,12 +918,19 @@ async def generate_question_paper(
         
         return topics, bloom
 
-    # Cache accepted questions to avoid duplicates
+    # Cache accepted questions to avoid duplicates (texts for the prompts,
+    # and their near-duplicate index)
     used_questions = set()
+    seen = NearDuplicateIndex()
+    seen_vectors = _paper_vectors()
+
+    # LLM calls in flight for this paper, shared across all sections
+    question_slots = asyncio.Semaphore(settings.PAPER_QUESTION_CONCURRENCY)
 
     # PARALLEL GENERATION: Generate all sections concurrently
     generated_sections = {}
     generated_log = []
+    total_llm_calls = 0
     
     try:
         # Create async tasks for each section
@@ -554,14 +949,20 @@ async def generate_question_paper(
                 paper=paper,
                 used_questions_global=used_questions,
                 max_retries_per_question=1,
+                batch_size=settings.PAPER_BATCH_SIZE,
+                max_topups=settings.PAPER_BATCH_TOPUPS,
+                question_slots=question_slots,
+                checkpoint=section_checkpoints[section.id],
+                seen=seen,
+                seen_vectors=seen_vectors,
             )
             section_tasks.append(task)
         
         # Run all sections in PARALLEL
         results = await asyncio.gather(*section_tasks, return_exceptions=False)
+        await checkpoints.flush()
         
         # Process results
-        total_llm_calls = 0
         for result in results:
             if isinstance(result, dict) and "section_id" in result:
                 section_id = result["section_id"]
@@ -571,34 +972,32 @@ async def generate_question_paper(
                     "section": result["section_name"],
                     "status": "completed",
                     "questions_generated": len(result["questions"]),
+                    "template_fallbacks": result["template_fallbacks"],
+                    "llm_calls": result["llm_calls"],
                 })
 
-        # ATOMIC SAVE: Only save if ALL sections succeeded
-        for section_id, questions in generated_sections.items():
-            for question_data, order in questions:
-                # Create question in DB
-                question = Question(
-                    outcome_id=None,
-                    question_text=question_data["text"],
-                    bloom_level=question_data["bloom_level"],
-                    difficulty=question_data["difficulty"],
-                    marks=question_data["marks"],
-                    quality_score=question_data["quality_score"],
-                )
-                db.add(question)
-                db.flush()  # Get ID without committing
-                db.refresh(question)
-
-                # Link to paper section
-                pq = PaperQuestion(
-                    section_id=section_id,
-                    question_id=question.id,
-                    question_order=order,
-                )
-                db.add(pq)
-
-        # Commit all at once
+        # ATOMIC SAVE: Only save if ALL sections succeeded (two bulk INSERTs)
+        entries = [
+            (section_id, order, question_data)
+            for section_id, questions in generated_sections.items()
+            for question_data, order in questions
+        ]
+        # Syllabus topics of every question, tagged locally in one batch
+        for (_, _, question_data), topics in zip(entries, topic_tagger.tag_questions(
+            paper.core_topics, [question_data["text"] for _, _, question_data in entries]
+        )):
+            question_data["topics_used"] = topics
+        question_ids = save_paper_questions(db, entries)
+
+        # Commit all at once, the run's completion included
+        generation_runs.complete_run(checkpoints.run, total_llm_calls)
         db.commit()
+        for question_id, (_, _, question_data) in zip(question_ids, entries):
+            dedup_index.index_question(
+                question_id, question_data["text"], question_data["bloom_level"], question_data["difficulty"]
+            )
+        semantic_index.index_questions(question_ids, [question_data["text"] for _, _, question_data in entries])
+        report_progress("persisted", questions=sum(len(questions) for questions in generated_sections.values()))
         
         # Update Analytics
         try:
@@ -606,28 +1005,35 @@ async def generate_question_paper(
         except Exception as e:
             logger.error(f"Failed to update analytics: {e}")
 
-        # STEP 5: Add warning if relaxed mode was used
         response = {
             "paper_id": paper_id,
             "progress": generated_log,
             "status": "SUCCESS",
             "total_llm_calls": total_llm_calls,
+            "run_id": run_id,
+            "restored_questions": restored,
             "bloom_policy": {
                 "Part A (≤2 marks)": "Remember",
                 "Part B (10-15 marks)": "Apply",
                 "Part C (>15 marks)": "Analyze",
             },
         }
-        
-        if relaxed_mode:
-            response["warning"] = "Some questions were generated using relaxed constraints for coverage (hackathon mode)"
-        
+
         return response
 
     except Exception as e:
-        # PARTIAL SUCCESS: Save what we have instead of failing completely
+        # Nothing is saved to the paper: the accepted questions are in the
+        # run's checkpoints, and the next generate resumes from them
         db.rollback()
+        await checkpoints.flush()
         error_msg = str(e)
+        logger.error(f"Generation failed for paper {paper_id}: {error_msg}")
+        report_progress("generation_error", error=error_msg)
+        try:
+            generation_runs.fail_run(db, checkpoints.run, error_msg, total_llm_calls)
+        except Exception:
+            db.rollback()
+            logger.exception(f"Could not record the failure of generation run {run_id}")
         
         # Extract section that failed
         failed_section = None
@@ -639,34 +1045,6 @@ async def generate_question_paper(
                 failed_section = log_entry.get("section")
                 break
         
-        # Save whatever sections we have
-        try:
-            for section_id, questions in generated_sections.items():
-                for question_data, order in questions:
-                    question = Question(
-                        outcome_id=None,
-                        question_text=question_data["text"],
-                        bloom_level=question_data["bloom_level"],
-                        difficulty=question_data["difficulty"],
-                        marks=question_data["marks"],
-                        quality_score=question_data["quality_score"],
-                    )
-                    db.add(question)
-                    db.flush()
-                    db.refresh(question)
-
-                    pq = PaperQuestion(
-                        section_id=section_id,
-                        question_id=question.id,
-                        question_order=order,
-                    )
-                    db.add(pq)
-            db.commit()
-        except Exception as save_error:
-            db.rollback()
-            # If even saving fails, return gracefully with status
-            pass
-        
         # RETURN SUCCESS with warnings (not error)
         warnings = []
         if failed_section:
@@ -678,6 +1056,10 @@ async def generate_question_paper(
             "progress": generated_log,
             "warnings": warnings,
             "total_llm_calls": total_llm_calls,
+            "run_id": run_id,
+            "resumable": True,
+            "failure_reason": error_msg,
+            "checkpointed_questions": restored + checkpoints.saved,
             "bloom_policy": {
                 "Part A (≤2 marks)": "Remember",
                 "Part B (10-15 marks)": "Apply",
@@ -685,6 +1067,52 @@ async def generate_question_paper(
             },
         }
 
+    except BaseException:
+        # Cancelled (worker drain, lost lease, shutdown): release the run
+        # now, so the re-queued job resumes it instead of waiting for it to go stale
+        db.rollback()
+        checkpoints.release("Generation cancelled")
+        raise
+
+    finally:
+        checkpoints.stop_heartbeat()
+
+
+def _get_job(paper_id: int, job_id: str, db: Session):
+    # In-process jobs first, then the queue (jobs run by worker processes)
+    job = get_generation_jobs().get(job_id) or job_queue.QueuedJob.load(db, job_id)
+    if job is None or job.paper_id != paper_id:
+        raise HTTPException(status_code=404, detail="Generation job not found")
+    return job
+
+
+@router.get("/{paper_id}/jobs/{job_id}")
+def get_generation_job(paper_id: int, job_id: str, db: Session = Depends(get_db)):
+    return _get_job(paper_id, job_id, db).snapshot()
+
+
+@router.get("/{paper_id}/jobs/{job_id}/events")
+async def stream_generation_job(
+    paper_id: int,
+    job_id: str,
+    last_event_id: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    """Server-Sent Events: the job's progress events, from Last-Event-ID on, until it finishes."""
+    job = _get_job(paper_id, job_id, db)
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def events():
+        async for event in job.follow(after, heartbeat=settings.GENERATION_SSE_HEARTBEAT):
+            yield sse_message(event)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No proxy buffering: every event should reach the browser as it happens
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.get("/{paper_id}")
 def get_question_paper(
@@ -786,6 +1214,7 @@ def archive_paper(
 
 
 @router.post("/{paper_id}/questions/{question_id}/regenerate")
+@GENERATIONS_IN_FLIGHT.track_inprogress(endpoint="regenerate_question")
 async def regenerate_question(
     paper_id: int,
     question_id: int,
@@ -800,6 +1229,7 @@ async def regenerate_question(
     - Hard blocks generic fallbacks (FIX 3)
     - Applies local subject guard before returning
     """
+    set_llm_request_context(INTERACTIVE, paper_id=paper_id)
     
     # Get the paper question link
     paper_question = (
@@ -844,26 +1274,51 @@ async def regenerate_question(
             "error": result.get("error", "No valid alternative found for this syllabus")
         }
     
-    # Update the existing question
     new_question_text = result["question"]
-    original_question.question_text = new_question_text
-    
-    # Update topics if available in result (ContextAwareRegenerator might need update to return this)
-    # For now, just keeping text updated.
-    
+    same_text = find_question(
+        db, new_question_text, original_question.marks, original_question.bloom_level, original_question.difficulty
+    )
+    duplicate_id = same_text.id if same_text is not None and same_text.id != question_id else None
+    if duplicate_id is None:
+        duplicate_id = _duplicate_in_paper(db, paper_id, new_question_text, exclude_id=question_id)
+    if duplicate_id is not None:
+        logger.warning(f"Regenerated question {question_id} duplicates question {duplicate_id} of paper {paper_id}")
+        return {"error": "No valid alternative found for this syllabus"}
+
+    # Store the regenerated question as a new bank entry and point the slot
+    # at it: the original may be linked from other papers, finalized ones too
+    (new_question_id,) = insert_questions(db, [question_row(
+        {
+            "text": new_question_text,
+            "bloom_level": original_question.bloom_level,
+            "difficulty": original_question.difficulty,
+            "marks": original_question.marks,
+            "quality_score": score_question(new_question_text, original_question.bloom_level),
+        },
+        topics_used=topic_tagger.tagger(paper.core_topics).tag(new_question_text),
+    )])
+    paper_question.question_id = new_question_id
+    db.flush()
+    # Update analytics as the question content (and so its topics) changed
+    update_analytics_for_paper(db, paper_id, commit=False)
     db.commit()
+    dedup_index.index_question(
+        new_question_id, new_question_text, original_question.bloom_level, original_question.difficulty
+    )
+    semantic_index.index_questions([new_question_id], [new_question_text])
     
-    # Update analytics as the question content changed (potentially affecting topic coverage?)
-    # For text-only changes, topic might stay same, but best to re-run if we had topic extraction.
-    # Since we don't extract topics from regen yet, this might be a no-op for coverage, 
-    # but good for consistency.
-    update_analytics_for_paper(db, paper_id)
-    
-    db.refresh(original_question)
-    
-    logger.info(f"Successfully regenerated question {question_id}")
+    logger.info(f"Successfully regenerated question {question_id} as {new_question_id}")
     
     return {
+        "success": True,
+        "old_question_id": question_id,
+        "new_question": {
+            "id": new_question_id,
+            "text": new_question_text,
+            "bloom": original_question.bloom_level,
+            "difficulty": original_question.difficulty,
+            "marks": original_question.marks,
+        },
         "bloom": original_question.bloom_level,
         "difficulty": original_question.difficulty,
         "marks": original_question.marks,
@@ -938,6 +1393,7 @@ def get_question_alternatives(
 
 
 @router.post("/{paper_id}/questions/{question_id}/replace")
+@GENERATIONS_IN_FLIGHT.track_inprogress(endpoint="replace_question")
 async def replace_question(
     paper_id: int,
     question_id: int,
@@ -953,6 +1409,7 @@ async def replace_question(
     FIX 2: Uses replacement prompt template with non-negotiable subject block
     FIX 3: Returns error if no valid alternative found (no fallbacks)
     """
+    set_llm_request_context(INTERACTIVE, paper_id=paper_id)
     
     ctx = payload.replaceContext
 
@@ -1029,12 +1486,30 @@ async def replace_question(
             logger.warning(f"Regeneration failed for replace question {question_id}")
             raise HTTPException(status_code=422, detail="No valid alternative question found for the given syllabus and constraints.")
         
-        # Update the existing question with regenerated content
+        # Store the regenerated question as a new bank entry (bulk path) and
+        # point the slot at it; the original stays as it was for other papers
         new_question_text = result["question"]
-        original_question.question_text = new_question_text
+        if _duplicate_in_paper(db, paper_id, new_question_text, exclude_id=question_id) is not None:
+            logger.warning(f"Regenerated replacement for question {question_id} duplicates another question of paper {paper_id}")
+            raise HTTPException(status_code=422, detail="No valid alternative question found for the given syllabus and constraints.")
+        (new_question_id,) = insert_questions(db, [question_row(
+            {
+                "text": new_question_text,
+                "bloom_level": original_question.bloom_level,
+                "difficulty": original_question.difficulty,
+                "marks": original_question.marks,
+                "quality_score": score_question(new_question_text, original_question.bloom_level),
+            },
+            topics_used=topic_tagger.tagger(paper.core_topics).tag(new_question_text),
+        )])
+        paper_question.question_id = new_question_id
+        db.flush()
+        update_analytics_for_paper(db, paper_id, commit=False)
         db.commit()
-        update_analytics_for_paper(db, paper_id)
-        db.refresh(original_question)
+        dedup_index.index_question(
+            new_question_id, new_question_text, original_question.bloom_level, original_question.difficulty
+        )
+        semantic_index.index_questions([new_question_id], [new_question_text])
         
         logger.info(f"Successfully regenerated question {question_id} for replace")
         
@@ -1043,8 +1518,8 @@ async def replace_question(
             "mode": "regenerate",
             "old_question_id": question_id,
             "new_question": {
-                "id": original_question.id,
-                "text": original_question.question_text,
+                "id": new_question_id,
+                "text": new_question_text,
                 "bloom": original_question.bloom_level,
                 "difficulty": original_question.difficulty,
                 "marks": original_question.marks,
@@ -1074,15 +1549,24 @@ async def replace_question(
         raise HTTPException(status_code=422, detail="No valid alternative question found for the given syllabus and constraints.")
 
     # Topic guard: candidate must have topics and be subset of syllabus
-    candidate_topics = set(replacement_question.topics_used or [])
+    # (questions stored before tagging are tagged against this paper's topics)
+    candidate_topics = set(
+        replacement_question.topics_used
+        or topic_tagger.tagger(paper.core_topics).tag(replacement_question.question_text)
+    )
     if not candidate_topics or not candidate_topics.issubset(paper_topics):
         raise HTTPException(status_code=422, detail="No valid alternative question found for the given syllabus and constraints.")
+
+    # Must not nearly duplicate another question of the paper
+    if _duplicate_in_paper(db, paper_id, replacement_question.question_text, exclude_id=question_id) is not None:
+        raise HTTPException(status_code=422, detail="No valid alternative question found for the given syllabus and constraints.")
     
     # Update the link to point to the replacement
     old_question_id = paper_question.question_id
     paper_question.question_id = replacement_id
+    db.flush()
+    update_analytics_for_paper(db, paper_id, commit=False)
     db.commit()
-    update_analytics_for_paper(db, paper_id)
     
     logger.info(f"Successfully replaced question {question_id} with {replacement_id}")
     
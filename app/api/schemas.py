@@ -34,6 +34,24 @@ class QuestionSchema(BaseModel):
     rationale: Optional[str] = ""
 
 
+class BatchQuestionSchema(BaseModel):
+    question: str
+    bloom_level: str
+    difficulty: str
+    marks: int
+
+
+class QuestionBatchSchema(BaseModel):
+    questions: List[BatchQuestionSchema]
+
+
+class SubjectGroundingSchema(BaseModel):
+    subject: str
+    domain: str
+    core_topics: List[str]
+    forbidden_topics: List[str]
+
+
 class GenerateQuestionResponse(BaseModel):
     status: str
     attempts: int = 1
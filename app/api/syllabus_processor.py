@@ -97,7 +97,7 @@ async def process_syllabus(
         logger.info(f"Processing syllabus for paper {request.paper_id}")
         
         # Call LLM to structure syllabus (single call, no retries)
-        structured = structurer.structure_syllabus(request.raw_text)
+        structured = await structurer.structure_syllabus(request.raw_text)
         
         # Convert to response format
         units = [
@@ -6,6 +6,10 @@ Questions must start with allowed verbs or they are rejected.
 """
 
 from app.core.generation_safety import BLOOM_ALLOWED_VERBS, FORBIDDEN_TOPICS
+from app.core.text_rules import TermMatcher
+
+# Compiled once: checked for every generated question
+FORBIDDEN_TOPIC_RULES = TermMatcher(FORBIDDEN_TOPICS)
 
 
 def is_verb_allowed(bloom_level: str, question_text: str) -> bool:
@@ -50,17 +54,8 @@ def check_forbidden_topics(question_text: str) -> bool:
         True if question is SAFE (no forbidden topics)
         False if question contains forbidden topics (REJECT)
     """
-    if not isinstance(question_text, str):
-        return True
-
-    question_lower = question_text.lower()
-
-    # Check each forbidden topic
-    for forbidden in FORBIDDEN_TOPICS:
-        if forbidden in question_lower:
-            return False  # UNSAFE - contains forbidden topic
-
-    return True  # SAFE
+    # One compiled, word-boundary scan for all forbidden topics
+    return FORBIDDEN_TOPIC_RULES.find(question_text) is None
 
 
 def get_bloom_verbs(bloom_level: str) -> list[str]:
@@ -8,5 +8,91 @@ class Settings:
     LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")
     LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
 
-settings = Settings()
+    # Shared provider connection pool (one per process)
+    LLM_MAX_IN_FLIGHT: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+
+    # Provider rate limits and adaptive concurrency (see app/core/llm_scheduler.py)
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+    LLM_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", "100000"))
+    LLM_TARGET_LATENCY: float = float(os.getenv("LLM_TARGET_LATENCY", "8"))
+    LLM_RATE_LIMIT_RETRIES: int = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "2"))
+    # Hedged requests may add at most this fraction of extra provider calls
+    LLM_HEDGE_BUDGET: float = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+
+    # Adaptive stage timeouts: rolling latency percentile x margin (see app/core/stage_latency.py)
+    LLM_ADAPTIVE_TIMEOUTS: bool = os.getenv("LLM_ADAPTIVE_TIMEOUTS", "true").lower() in ("1", "true", "yes")
+    LLM_TIMEOUT_PERCENTILE: float = float(os.getenv("LLM_TIMEOUT_PERCENTILE", "99"))
+    LLM_TIMEOUT_MARGIN: float = float(os.getenv("LLM_TIMEOUT_MARGIN", "1.5"))
+
+    # Persistent LLM response cache (per-stage opt-in via PipelineConfig.cache_ttl)
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3")
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+    # Provider-side JSON output for stages with an output schema (see app/core/structured_output.py):
+    # auto (detect per model) | json_schema | json_object | off
+    LLM_STRUCTURED_OUTPUT: str = os.getenv("LLM_STRUCTURED_OUTPUT", "auto")
 
+    # Local LLM simulator (LLM_PROVIDER=simulator, see app/core/llm_simulator.py)
+    LLM_SIM_LATENCY: str = os.getenv("LLM_SIM_LATENCY", "lognormal:1.0:0.4")
+    LLM_SIM_ERROR_RATE: float = float(os.getenv("LLM_SIM_ERROR_RATE", "0"))
+    LLM_SIM_RATE_LIMIT_RATE: float = float(os.getenv("LLM_SIM_RATE_LIMIT_RATE", "0"))
+    LLM_SIM_RETRY_AFTER: float = float(os.getenv("LLM_SIM_RETRY_AFTER", "1"))
+    LLM_SIM_MALFORMED_RATE: float = float(os.getenv("LLM_SIM_MALFORMED_RATE", "0"))
+    LLM_SIM_SEED: int = int(os.getenv("LLM_SIM_SEED", "0"))
+    # Best response_format the simulated model accepts: json_schema | json_object | none
+    LLM_SIM_STRUCTURED_OUTPUT: str = os.getenv("LLM_SIM_STRUCTURED_OUTPUT", "json_schema")
+    # generate | replay (simulator) or record (real provider, captures transcripts)
+    LLM_SIM_MODE: str = os.getenv("LLM_SIM_MODE", "generate")
+    LLM_SIM_TRANSCRIPTS: str = os.getenv("LLM_SIM_TRANSCRIPTS", ".cache/llm_transcripts.jsonl")
+
+    # Paper generation: questions per batched LLM call (0 = one call per question)
+    PAPER_BATCH_SIZE: int = int(os.getenv("PAPER_BATCH_SIZE", "5"))
+    # Extra batch calls allowed per section to top up rejected/missing questions
+    PAPER_BATCH_TOPUPS: int = int(os.getenv("PAPER_BATCH_TOPUPS", "2"))
+    # Max LLM calls in flight per paper, shared by all of its sections
+    PAPER_QUESTION_CONCURRENCY: int = int(os.getenv("PAPER_QUESTION_CONCURRENCY", "4"))
+    # Background generation jobs (see app/core/generation_jobs.py): seconds a
+    # finished job stays queryable, and keep-alive interval of its event stream
+    GENERATION_JOB_TTL: float = float(os.getenv("GENERATION_JOB_TTL", "3600"))
+    GENERATION_SSE_HEARTBEAT: float = float(os.getenv("GENERATION_SSE_HEARTBEAT", "15"))
+    # Where background jobs run: "memory" (tasks in the API process) or
+    # "queue" (generation_jobs table, run by python -m app.worker processes)
+    GENERATION_JOB_BACKEND: str = os.getenv("GENERATION_JOB_BACKEND", "memory")
+    # Queue jobs (see app/core/job_queue.py): lease seconds a worker renews
+    # while it runs a job, attempts per job, and the retry backoff (doubling
+    # from GENERATION_JOB_RETRY_BACKOFF up to GENERATION_JOB_RETRY_BACKOFF_MAX)
+    GENERATION_JOB_LEASE: float = float(os.getenv("GENERATION_JOB_LEASE", "60"))
+    GENERATION_JOB_MAX_ATTEMPTS: int = int(os.getenv("GENERATION_JOB_MAX_ATTEMPTS", "3"))
+    GENERATION_JOB_RETRY_BACKOFF: float = float(os.getenv("GENERATION_JOB_RETRY_BACKOFF", "30"))
+    GENERATION_JOB_RETRY_BACKOFF_MAX: float = float(os.getenv("GENERATION_JOB_RETRY_BACKOFF_MAX", "600"))
+    # Seconds between the API's reads of a queued job's new events (SSE)
+    GENERATION_JOB_EVENTS_POLL: float = float(os.getenv("GENERATION_JOB_EVENTS_POLL", "1"))
+    # Workers: jobs run at once per process, seconds between queue polls,
+    # and seconds running jobs get to finish on shutdown before re-queueing
+    GENERATION_WORKER_CONCURRENCY: int = int(os.getenv("GENERATION_WORKER_CONCURRENCY", "2"))
+    GENERATION_WORKER_POLL_INTERVAL: float = float(os.getenv("GENERATION_WORKER_POLL_INTERVAL", "2"))
+    GENERATION_WORKER_SHUTDOWN_GRACE: float = float(os.getenv("GENERATION_WORKER_SHUTDOWN_GRACE", "30"))
+    # Seconds between heartbeats of a running generation run, and seconds
+    # without one after which the run counts as abandoned (its process
+    # died) and the next generate takes it over
+    GENERATION_RUN_HEARTBEAT: float = float(os.getenv("GENERATION_RUN_HEARTBEAT", "20"))
+    GENERATION_RUN_STALE_AFTER: float = float(os.getenv("GENERATION_RUN_STALE_AFTER", "90"))
+
+    # Near-duplicate detection (see app/core/dedup_index.py): similarity() at
+    # or above which a question counts as a duplicate, and the index snapshot
+    DUPLICATE_THRESHOLD: float = float(os.getenv("DUPLICATE_THRESHOLD", "0.85"))
+    DEDUP_INDEX_PATH: str = os.getenv("DEDUP_INDEX_PATH", ".cache/question_index.json")
+    # Paraphrases (see app/core/semantic_index.py): cosine of hashed TF-IDF
+    # vectors at or above which a question counts as a duplicate, vector
+    # size, and the directory of the bank's memory-mapped matrix
+    SEMANTIC_DUPLICATE_THRESHOLD: float = float(os.getenv("SEMANTIC_DUPLICATE_THRESHOLD", "0.75"))
+    SEMANTIC_DIM: int = int(os.getenv("SEMANTIC_DIM", "1024"))
+    SEMANTIC_INDEX_DIR: str = os.getenv("SEMANTIC_INDEX_DIR", ".cache/semantic_index")
+
+    # Seconds between event-loop lag samples (0 disables the monitor)
+    EVENT_LOOP_LAG_INTERVAL: float = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.1"))
+
+settings = Settings()
@@ -6,6 +6,7 @@ FIX 1-3: Regenerate questions while preserving subject, syllabus, and part conte
 import logging
 from typing import Optional
 from app.agents.question_generator import QuestionGeneratorAgent
+from app.core.text_rules import TermMatcher, matcher
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +21,7 @@ SUBJECT_FORBIDDEN = {
     "operating systems": ["dbms", "sql", "supply and demand"],
     "networks": ["dbms", "python basics", "economics"],
 }
+_SUBJECT_FORBIDDEN_RULES = {subject: TermMatcher(keywords) for subject, keywords in SUBJECT_FORBIDDEN.items()}
 
 
 def subject_guard(text: str, subject: Optional[str]) -> bool:
@@ -31,16 +33,11 @@ def subject_guard(text: str, subject: Optional[str]) -> bool:
     if not subject:
         return True
     
-    subject_lower = subject.lower()
-    forbidden_list = SUBJECT_FORBIDDEN.get(subject_lower, [])
-    
-    if not forbidden_list:
+    rules = _SUBJECT_FORBIDDEN_RULES.get(subject.lower())
+    if rules is None:
         return True
     
-    text_lower = text.lower()
-    has_forbidden = any(keyword in text_lower for keyword in forbidden_list)
-    
-    return not has_forbidden
+    return rules.find(text) is None
 
 
 class ContextAwareRegenerator:
@@ -209,13 +206,13 @@ Output JSON ONLY (no markdown, no explanation):
                 }
             
             # Check for forbidden topics
-            for topic in forbidden_topics:
-                if topic.lower() in new_question.lower():
-                    logger.warning(f"Contains forbidden topic: {topic}")
-                    return {
-                        "success": False,
-                        "error": "No valid alternative found for this syllabus"
-                    }
+            topic = matcher(forbidden_topics).find(new_question)
+            if topic:
+                logger.warning(f"Contains forbidden topic: {topic}")
+                return {
+                    "success": False,
+                    "error": "No valid alternative found for this syllabus"
+                }
             
             logger.info(f"Successfully regenerated question for {subject}")
             
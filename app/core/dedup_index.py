@@ -0,0 +1,304 @@
+"""
+Near-duplicate index for question text (MinHash + LSH).
+
+Duplicate checks used to compare a new question with every stored one
+using difflib (duplicate_checker.similarity), which grows linearly with
+the bank. This index keeps a MinHash signature of each question's
+character shingles and buckets it by LSH bands, so a lookup only touches
+the questions sharing at least one band with the new text; the exact
+similarity() check then runs on those candidates alone.
+
+Signatures use one-permutation hashing: each shingle is hashed once with
+crc32 (stable across processes, unlike hash()) and kept only if it is the
+smallest in its bin; empty bins borrow from the next filled one. With the
+default 64 bins and 16 bands of 4 rows, a pair with shingle Jaccard 0.5
+is a candidate ~64% of the time, 0.7 ~98%, and duplicates at
+similarity() >= 0.85 are well above that.
+
+The index is maintained incrementally (add() after every insert),
+persisted to a JSON snapshot at shutdown and reloaded at startup, where
+sync() catches up with the questions other processes inserted since.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core import duplicate_checker
+
+logger = logging.getLogger(__name__)
+
+_MAX_HASH = 0xFFFFFFFF
+_BIN_SEED = 0x9E3779B9
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, punctuation stripped, whitespace collapsed."""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def shingles(text: str, size: int = 5) -> set[str]:
+    normalized = normalize(text)
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def signature(text: str, num_perm: int = 64, shingle_size: int = 5) -> list[int]:
+    """One-permutation MinHash signature of `text` (num_perm bins)."""
+    bins = [_MAX_HASH] * num_perm
+    for shingle in shingles(text, shingle_size):
+        data = shingle.encode("utf-8")
+        value = zlib.crc32(data)
+        b = zlib.crc32(data, _BIN_SEED) % num_perm
+        if value < bins[b]:
+            bins[b] = value
+
+    # Densify: an empty bin takes the next filled bin's value (rotating),
+    # offset by the distance so borrowed values differ from the originals
+    filled = [b for b, value in enumerate(bins) if value != _MAX_HASH]
+    if not filled or len(filled) == num_perm:
+        return bins
+    result = list(bins)
+    for b in range(num_perm):
+        if bins[b] == _MAX_HASH:
+            step = 1
+            while bins[(b + step) % num_perm] == _MAX_HASH:
+                step += 1
+            result[b] = (bins[(b + step) % num_perm] + step * _BIN_SEED) & _MAX_HASH
+    return result
+
+
+class NearDuplicateIndex:
+    """In-memory MinHash LSH index of question texts. Safe to share across threads."""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_id = 0
+        # doc_id -> (text, tags, signature)
+        self._docs: dict[int, tuple[str, dict, list[int]]] = {}
+        # one dict per band: band key -> doc ids
+        self._buckets: list[dict[tuple, set[int]]] = [{} for _ in range(bands)]
+        self._next_local_id = -1
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._docs
+
+    def _band_keys(self, sig: list[int]) -> list[tuple]:
+        rows = self.rows
+        return [tuple(sig[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def add(self, doc_id: Optional[int], text: str, **tags) -> int:
+        """
+        Index `text` under `doc_id` (re-adding an id replaces it). Without
+        an id (in-memory sets, e.g. one paper's questions) a local negative
+        id is assigned. Returns the id.
+        """
+        sig = signature(text, self.num_perm, self.shingle_size)
+        with self._lock:
+            if doc_id is None:
+                doc_id = self._next_local_id
+                self._next_local_id -= 1
+            elif doc_id in self._docs:
+                self._discard(doc_id)
+            self._docs[doc_id] = (text, tags, sig)
+            for buckets, key in zip(self._buckets, self._band_keys(sig)):
+                buckets.setdefault(key, set()).add(doc_id)
+            self.max_id = max(self.max_id, doc_id)
+        return doc_id
+
+    def _discard(self, doc_id: int) -> None:
+        _, _, sig = self._docs.pop(doc_id)
+        for buckets, key in zip(self._buckets, self._band_keys(sig)):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del buckets[key]
+
+    def remove(self, doc_id: int) -> None:
+        with self._lock:
+            if doc_id in self._docs:
+                self._discard(doc_id)
+
+    def _candidates(self, sig: list[int], tags: dict) -> list[tuple[int, str]]:
+        """(id, text) sharing an LSH band with `sig` and matching `tags`, most bands in common first."""
+        hits: Counter = Counter()
+        with self._lock:
+            for buckets, key in zip(self._buckets, self._band_keys(sig)):
+                bucket = buckets.get(key)
+                if bucket:
+                    hits.update(bucket)
+            entries = [(doc_id, self._docs[doc_id]) for doc_id, _ in hits.most_common()]
+
+        return [
+            (doc_id, text)
+            for doc_id, (text, doc_tags, _) in entries
+            if all(doc_tags.get(name) == value for name, value in tags.items())
+        ]
+
+    def candidates(self, text: str, **tags) -> list[int]:
+        """Ids sharing at least one LSH band with `text` (and matching every given tag)."""
+        sig = signature(text, self.num_perm, self.shingle_size)
+        return [doc_id for doc_id, _ in self._candidates(sig, tags)]
+
+    def _scored(self, text: str, threshold: float, tags: dict):
+        """Yield (id, similarity()) of candidates at or above `threshold`, likeliest first."""
+        # similarity(existing, text): the new text is the matcher's second
+        # sequence, whose lookup table difflib builds once for all candidates
+        matcher = SequenceMatcher(None, b=duplicate_checker.normalize(text))
+        for doc_id, existing in self._candidates(signature(text, self.num_perm, self.shingle_size), tags):
+            matcher.set_seq1(duplicate_checker.normalize(existing))
+            # Cheap upper bounds first
+            if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+                continue
+            score = matcher.ratio()
+            if score >= threshold:
+                yield doc_id, score
+
+    def matches(self, text: str, threshold: float, **tags) -> list[tuple[int, float]]:
+        """(id, similarity) of indexed texts with similarity() >= threshold, best first."""
+        return sorted(self._scored(text, threshold, tags), key=lambda match: match[1], reverse=True)
+
+    def find(self, text: str, threshold: float, **tags) -> Optional[tuple[int, float]]:
+        """An (id, similarity) at or above `threshold` (the first found), or None."""
+        return next(self._scored(text, threshold, tags), None)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _params(self) -> list[int]:
+        return [self.num_perm, self.bands, self.shingle_size]
+
+    def save(self, path: str) -> None:
+        """Write a snapshot atomically (temp file + rename)."""
+        with self._lock:
+            snapshot = {
+                "params": self._params(),
+                "max_id": self.max_id,
+                "docs": [
+                    [doc_id, text, tags, sig]
+                    for doc_id, (text, tags, sig) in self._docs.items()
+                    if doc_id > 0
+                ],
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        """Replace the contents with a snapshot; False if missing, unreadable or built with other parameters."""
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Ignoring unreadable near-duplicate index snapshot {path}: {exc}")
+            return False
+
+        if snapshot.get("params") != self._params():
+            logger.info(f"Near-duplicate index snapshot {path} was built with other parameters; rebuilding")
+            return False
+
+        with self._lock:
+            self._docs.clear()
+            self._buckets = [{} for _ in range(self.bands)]
+            for doc_id, text, tags, sig in snapshot["docs"]:
+                self._docs[doc_id] = (text, tags, sig)
+                for buckets, key in zip(self._buckets, self._band_keys(sig)):
+                    buckets.setdefault(key, set()).add(doc_id)
+            self.max_id = snapshot.get("max_id", 0)
+        return True
+
+    @classmethod
+    def of(cls, texts: Iterable[str]) -> "NearDuplicateIndex":
+        """An index of `texts` under local ids (for a one-off in-memory set)."""
+        index = cls()
+        for text in texts:
+            index.add(None, text)
+        return index
+
+
+# ---------------------------------------------------------------------------
+# Process-wide index of the question bank
+# ---------------------------------------------------------------------------
+
+_question_index: Optional[NearDuplicateIndex] = None
+
+
+def get_question_index() -> NearDuplicateIndex:
+    global _question_index
+    if _question_index is None:
+        _question_index = NearDuplicateIndex()
+    return _question_index
+
+
+def index_question(question_id: int, text: str, bloom_level: str, difficulty: str) -> None:
+    """Add a newly inserted question (call after its commit)."""
+    get_question_index().add(question_id, text, bloom_level=bloom_level, difficulty=difficulty)
+
+
+def sync(db: Session, batch_size: int = 1000) -> int:
+    """Index the questions inserted since the last sync (ids above max_id); returns how many."""
+    from app.db.models import Question
+
+    index = get_question_index()
+    added = 0
+    while True:
+        rows = (
+            db.query(Question.id, Question.question_text, Question.bloom_level, Question.difficulty)
+            .filter(Question.id > index.max_id)
+            .order_by(Question.id)
+            .limit(batch_size)
+            .all()
+        )
+        for question_id, text, bloom_level, difficulty in rows:
+            index.add(question_id, text or "", bloom_level=bloom_level, difficulty=difficulty)
+        added += len(rows)
+        if len(rows) < batch_size:
+            return added
+
+
+def load(db: Session, path: Optional[str] = None) -> NearDuplicateIndex:
+    """Startup: restore the snapshot (if any), then catch up with the database."""
+    path = path or settings.DEDUP_INDEX_PATH
+    index = get_question_index()
+    restored = index.load(path)
+    added = sync(db)
+    logger.info(
+        f"Near-duplicate index ready: {len(index)} questions "
+        f"({'snapshot + ' if restored else ''}{added} indexed from the database)"
+    )
+    return index
+
+
+def save(path: Optional[str] = None) -> None:
+    path = path or settings.DEDUP_INDEX_PATH
+    try:
+        get_question_index().save(path)
+    except OSError as exc:
+        logger.warning(f"Could not save near-duplicate index to {path}: {exc}")
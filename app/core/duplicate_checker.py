@@ -1,3 +1,6 @@
+import hashlib
+import re
+import unicodedata
 from difflib import SequenceMatcher
 
 def normalize(text: str) -> str:
@@ -15,3 +18,16 @@ def similarity(a: str, b: str) -> float:
         normalize(a),
         normalize(b)
     ).ratio()
+
+
+_NOT_WORD_CHARS = re.compile(r"[\W_]+")
+
+
+def canonical_text(text: str) -> str:
+    """Unicode-normalised (NFKC), casefolded, with punctuation and whitespace removed."""
+    return _NOT_WORD_CHARS.sub("", unicodedata.normalize("NFKC", text).casefold())
+
+
+def content_hash(text: str) -> str:
+    """sha256 of canonical_text(): equal for questions that differ only in case, punctuation or spacing."""
+    return hashlib.sha256(canonical_text(text).encode("utf-8")).hexdigest()
@@ -0,0 +1,224 @@
+"""
+Background paper generation jobs and their progress events.
+
+POST /papers/{id}/generate?background=true runs generate_question_paper
+as an asyncio task and answers with a job id straight away, so no proxy
+timeout can cut a long run short. While it runs, the pipeline reports
+what happens through report_progress(): grounding done, question n/N
+accepted, fallback used, section completed, persisted. Each job keeps its
+events in order:
+
+- GET /papers/{id}/jobs/{job_id} returns the status and latest progress;
+- GET /papers/{id}/jobs/{job_id}/events streams the events as
+  Server-Sent Events, replaying from Last-Event-ID on reconnect, and ends
+  after the job's final "completed" or "failed" event.
+
+A job fails when the pipeline raises or its result is not a saved paper
+(result_error): a rejected request ({"error": ...}) or a generation that
+stopped part way (DRAFT, resumable from its checkpoints).
+
+Jobs live in this process's memory and are forgotten GENERATION_JOB_TTL
+seconds after they finish. A paper has at most one job running at a time;
+starting another returns the running one. GENERATION_JOB_BACKEND=queue
+runs them in worker processes instead (app/core/job_queue.py).
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from contextvars import ContextVar, Token
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import GENERATION_JOBS
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("succeeded", "failed")
+
+# Events that fill one question slot; they carry the running n/N count
+QUESTION_EVENTS = ("question_accepted", "fallback_used")
+
+
+def result_error(result) -> Optional[str]:
+    """Why a generate_question_paper result is a failed generation, or None if the paper was saved."""
+    if not isinstance(result, dict):
+        return None
+    if result.get("error"):
+        return result["error"]
+    if result.get("resumable") or result.get("status", "SUCCESS") != "SUCCESS":
+        return result.get("failure_reason") or f"Generation ended as {result.get('status')}"
+    return None
+
+
+class GenerationJob:
+    def __init__(self, paper_id: int):
+        self.id = uuid.uuid4().hex
+        self.paper_id = paper_id
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.events: list[dict] = []
+        self.total_questions: Optional[int] = None
+        self.done_questions = 0
+        self.task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def emit(self, kind: str, **data) -> dict:
+        if kind == "generation_started":
+            self.total_questions = data.get("total_questions")
+        if kind in QUESTION_EVENTS:
+            self.done_questions += 1
+            data.update(done=self.done_questions, total=self.total_questions)
+        event = {"id": len(self.events) + 1, "event": kind, "time": time.time(), "data": data}
+        self.events.append(event)
+        # Wake every follower, then arm a fresh event for the next wait
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+        return event
+
+    def finish(self, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        GENERATION_JOBS.inc(outcome=status)
+        if status == "succeeded":
+            result = result or {}
+            self.emit("completed", status=result.get("status"), total_llm_calls=result.get("total_llm_calls"))
+        else:
+            self.emit("failed", error=error)
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "paper_id": self.paper_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": {"questions_done": self.done_questions, "questions_total": self.total_questions},
+            "last_event": self.events[-1] if self.events else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+    async def follow(self, after: int = 0, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[dict]]:
+        """
+        Yield the events after id `after`, then new ones as they arrive,
+        until the job has finished. Yields None every `heartbeat` seconds
+        without an event (so a stream can send a keep-alive).
+        """
+        while True:
+            while after < len(self.events):
+                after += 1
+                yield self.events[after - 1]
+            if self.finished:
+                return
+            wakeup = self._wakeup
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+
+# Job the current task is running, if any (read by report_progress): a
+# GenerationJob, or any other sink with emit(kind, **data)
+_current_job: ContextVar[Optional[GenerationJob]] = ContextVar("generation_job", default=None)
+
+
+def bind_progress(sink) -> Token:
+    """Send report_progress() events of the current task (and its children) to sink."""
+    return _current_job.set(sink)
+
+
+def report_progress(kind: str, **data) -> None:
+    """Record a progress event on the job running this code; a no-op outside jobs."""
+    job = _current_job.get()
+    if job is not None:
+        job.emit(kind, **data)
+
+
+class GenerationJobs:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._jobs: dict[str, GenerationJob] = {}
+
+    def get(self, job_id: str) -> Optional[GenerationJob]:
+        return self._jobs.get(job_id)
+
+    def running_for(self, paper_id: int) -> Optional[GenerationJob]:
+        return next(
+            (job for job in self._jobs.values() if job.paper_id == paper_id and not job.finished), None
+        )
+
+    def start(self, paper_id: int, run: Callable[[], Awaitable[dict]]) -> GenerationJob:
+        """Run `run` in the background as paper_id's job (or return the one already running)."""
+        self._prune()
+        running = self.running_for(paper_id)
+        if running is not None:
+            return running
+
+        job = GenerationJob(paper_id)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, run))
+        return job
+
+    async def _run(self, job: GenerationJob, run: Callable[[], Awaitable[dict]]) -> None:
+        _current_job.set(job)
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            result = await run()
+        except asyncio.CancelledError:
+            job.finish("failed", error="Cancelled (server shutting down)")
+            raise
+        except Exception as exc:
+            logger.exception(f"Generation job {job.id} for paper {job.paper_id} failed")
+            job.finish("failed", error=str(exc) or type(exc).__name__)
+            return
+
+        error = result_error(result)
+        if error:
+            job.finish("failed", result=result, error=error)
+        else:
+            job.finish("succeeded", result=result)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    async def shutdown(self) -> None:
+        """Cancel running jobs (their followers see a "failed" event)."""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_jobs: Optional[GenerationJobs] = None
+
+
+def get_generation_jobs() -> GenerationJobs:
+    global _jobs
+    if _jobs is None:
+        _jobs = GenerationJobs(ttl=settings.GENERATION_JOB_TTL)
+    return _jobs
+
+
+def sse_message(event: Optional[dict]) -> str:
+    """One Server-Sent Events message (None = keep-alive comment)."""
+    if event is None:
+        return ": keep-alive\n\n"
+    payload = {**event["data"], "time": event["time"]}
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(payload, default=str)}\n\n"
@@ -0,0 +1,213 @@
+"""
+Checkpointed paper generation runs.
+
+generate_question_paper records its work in a generation_runs row. Every
+question it accepts (template, batch or pipeline) is saved to
+generation_checkpoints, with its section and order, as soon as it has
+been validated, so a crash, timeout or restart half way through loses
+nothing that was already paid for.
+
+The next /papers/{id}/generate resumes the paper's latest unfinished run:
+checkpointed slots are restored and only the missing ones are generated.
+A run completes together with the final save of its questions; after
+that, generating the paper again starts a new run. Template fallbacks are
+never checkpointed, so a resume gives those slots another LLM attempt.
+
+Checkpoints are written in worker threads, on their own short sessions,
+so they neither block the event loop nor expire or roll back the
+generation's session. A paper has one running run at a time: open_run
+claims it under a row lock, and a generate that finds the run held by
+another one gets RunInProgress. While it runs, a heartbeat touches the
+run's updated_at every GENERATION_RUN_HEARTBEAT seconds; a run without
+one for GENERATION_RUN_STALE_AFTER seconds (its process died) is taken
+over. A cancelled generation (worker drain, lost lease, shutdown)
+releases its run at once, so the re-queued job can resume it.
+
+Checkpoints whose section has since been removed, shrunk or given another
+marks value are ignored.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import GenerationCheckpoint, GenerationRun
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class RunInProgress(Exception):
+    """Raised when another generation of the paper holds its run."""
+    pass
+
+
+class SectionCheckpoints:
+    """A run's checkpoints for one section: restored slots, and the writer for new ones."""
+
+    def __init__(self, run: "RunCheckpoints", section):
+        self._run = run
+        self.section = section
+        # question_order -> question_data
+        self.restored: dict[int, dict] = {
+            order: question
+            for order, question in run.restored.get(section.id, {}).items()
+            if order <= section.number_of_questions and question.get("marks") == section.marks_per_question
+        }
+
+    def save(self, order: int, question_data: dict, source: str) -> None:
+        self._run.save(self.section.id, order, question_data, source)
+
+
+class RunCheckpoints:
+    def __init__(self, run: GenerationRun, restored: dict[int, dict[int, dict]], session_factory=None):
+        self.run = run
+        self.run_id = run.id
+        # The claim this generation holds (a takeover bumps attempts)
+        self.attempt = run.attempts
+        # section_id -> question_order -> question_data
+        self.restored = restored
+        self.session_factory = session_factory or SessionLocal
+        self.saved = 0
+        self._writes: set[asyncio.Task] = set()
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def section(self, section) -> SectionCheckpoints:
+        return SectionCheckpoints(self, section)
+
+    def save(self, section_id: int, order: int, question_data: dict, source: str) -> None:
+        """Checkpoint a question in a worker thread; flush() waits for the pending writes."""
+        task = asyncio.ensure_future(asyncio.to_thread(self._write, section_id, order, question_data, source))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def flush(self) -> None:
+        if self._writes:
+            await asyncio.gather(*self._writes)
+
+    def _write(self, section_id: int, order: int, question_data: dict, source: str) -> None:
+        # Own short session: sections save concurrently, and a commit or
+        # rollback here must not touch the generation's session
+        db = self.session_factory()
+        try:
+            db.add(GenerationCheckpoint(
+                run_id=self.run_id,
+                section_id=section_id,
+                question_order=order,
+                source=source,
+                question=question_data,
+            ))
+            db.commit()
+            self.saved += 1
+        except SQLAlchemyError as exc:
+            # The run goes on: this question is just not resumable
+            db.rollback()
+            logger.warning(f"Could not checkpoint run {self.run_id} section {section_id} slot {order}: {exc}")
+        finally:
+            db.close()
+
+    def start_heartbeat(self) -> None:
+        """Keep the run's claim fresh until stop_heartbeat()."""
+        self._heartbeat = asyncio.ensure_future(self._beat())
+
+    def stop_heartbeat(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.GENERATION_RUN_HEARTBEAT)
+            await asyncio.to_thread(self._update, {"updated_at": datetime.utcnow()})
+
+    def release(self, error: str) -> None:
+        """Give up the run (cancelled generation): the next generate resumes it at once."""
+        self._update({"status": "failed", "error": error, "updated_at": datetime.utcnow()})
+
+    def _update(self, values: dict) -> None:
+        # Only while the run is still this generation's claim
+        db = self.session_factory()
+        try:
+            db.query(GenerationRun).filter(
+                GenerationRun.id == self.run_id,
+                GenerationRun.status == "running",
+                GenerationRun.attempts == self.attempt,
+            ).update(values, synchronize_session=False)
+            db.commit()
+        except SQLAlchemyError as exc:
+            db.rollback()
+            logger.warning(f"Could not update generation run {self.run_id}: {exc}")
+        finally:
+            db.close()
+
+
+def _latest_run(db: Session, paper_id: int) -> Optional[GenerationRun]:
+    # Row lock and fresh values: a concurrent generate of the paper waits
+    # here until this one has claimed the run, then sees it running
+    return (
+        db.query(GenerationRun)
+        .filter(GenerationRun.paper_id == paper_id)
+        .order_by(GenerationRun.id.desc())
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+
+
+def open_run(db: Session, paper_id: int, session_factory=None) -> RunCheckpoints:
+    """
+    Claim the paper's latest unfinished run (with its checkpoints), or start
+    a new one. Raises RunInProgress while another generation holds the run.
+    """
+    run = _latest_run(db, paper_id)
+    restored: dict[int, dict[int, dict]] = {}
+    now = datetime.utcnow()
+
+    if run is not None and run.status == "running":
+        stale_after = timedelta(seconds=settings.GENERATION_RUN_STALE_AFTER)
+        if run.updated_at is not None and run.updated_at > now - stale_after:
+            db.rollback()
+            raise RunInProgress(f"Generation run {run.id} of paper {paper_id} is already running")
+        logger.warning(f"Generation run {run.id} of paper {paper_id} stalled since {run.updated_at}; taking it over")
+
+    if run is not None and run.status != "completed":
+        run.attempts += 1
+        run.status = "running"
+        run.error = None
+        run.updated_at = now
+        checkpoints = db.query(GenerationCheckpoint).filter(GenerationCheckpoint.run_id == run.id).all()
+        for checkpoint in checkpoints:
+            restored.setdefault(checkpoint.section_id, {})[checkpoint.question_order] = checkpoint.question
+        logger.info(f"Resuming generation run {run.id} of paper {paper_id} ({len(checkpoints)} questions checkpointed)")
+    else:
+        run = GenerationRun(paper_id=paper_id, status="running", attempts=1, llm_calls=0, updated_at=now)
+        db.add(run)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # The paper's first run, started by a concurrent generate (uq_generation_runs_running_paper)
+        db.rollback()
+        raise RunInProgress(f"Paper {paper_id} is already being generated")
+    return RunCheckpoints(run, restored, session_factory)
+
+
+def complete_run(run: GenerationRun, llm_calls: int) -> None:
+    """Mark the run completed (committed with the caller's save of its questions)."""
+    run.status = "completed"
+    run.llm_calls = (run.llm_calls or 0) + llm_calls
+    run.finished_at = run.updated_at = datetime.utcnow()
+
+
+def fail_run(db: Session, run: GenerationRun, error: str, llm_calls: int = 0) -> None:
+    """Leave the run resumable after a failure."""
+    run.status = "failed"
+    run.error = error
+    run.llm_calls = (run.llm_calls or 0) + llm_calls
+    run.updated_at = datetime.utcnow()
+    db.commit()
@@ -99,5 +99,6 @@ This is a multi-domain system. Adapt strictly to the specified subject."""
 # ============================================================================
 # DUPLICATE PREVENTION
 # ============================================================================
-# Threshold for considering questions as duplicates (cosine similarity)
+# Threshold for considering questions as duplicates (difflib similarity, as
+# settings.DUPLICATE_THRESHOLD; paraphrases use a cosine, SEMANTIC_DUPLICATE_THRESHOLD)
 DUPLICATE_THRESHOLD = 0.85
@@ -0,0 +1,424 @@
+"""
+Durable paper generation job queue, shared by the API and worker processes.
+
+With GENERATION_JOB_BACKEND=queue, POST /papers/{id}/generate?background=true
+only inserts a generation_jobs row. Worker processes (python -m app.worker,
+see app/worker.py) claim queued rows with SELECT ... FOR UPDATE SKIP LOCKED,
+so any number of them, on any number of hosts, share the queue without ever
+handing the same job out twice.
+
+- A claimed job carries a lease of GENERATION_JOB_LEASE seconds that its
+  worker keeps renewing. When a lease runs out (the worker died), the next
+  worker to poll reclaims the job.
+- A failed attempt goes back in the queue after GENERATION_JOB_RETRY_BACKOFF
+  seconds, doubling per attempt up to GENERATION_JOB_RETRY_BACKOFF_MAX, for
+  at most GENERATION_JOB_MAX_ATTEMPTS attempts. A generation that stops
+  part way (a DRAFT, resumable result) counts as a failed attempt too, and
+  its retry resumes from the run's checkpoints. Requests the pipeline
+  rejects outright (paper missing, finalized, no syllabus) fail at once.
+- A worker that shuts down puts its unfinished jobs back in the queue
+  without counting the attempt.
+- A job whose paper's generation run is still held (a 409: the run of a
+  previous attempt that lost its lease, or another generation of the paper)
+  waits GENERATION_RUN_STALE_AFTER seconds, by which time the run has been
+  released or gone stale, without counting the attempt.
+
+Progress events land in generation_job_events, numbered per job. QueuedJob
+gives the API the same snapshot()/follow() view as an in-process
+GenerationJob, so the status and SSE endpoints serve both backends.
+
+Times are naive UTC (datetime.utcnow, as elsewhere in the models); lease
+expiry compares worker clocks, so keep hosts NTP-synced.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.generation_jobs import FINISHED, QUESTION_EVENTS, result_error
+from app.core.metrics import GENERATION_JOBS
+from app.db.models import GenerationJobEvent, GenerationJobRecord
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = ("queued", "running")
+
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    return value.replace(tzinfo=timezone.utc).timestamp() if value else None
+
+
+def _jsonable(value):
+    # Results can carry values json can't encode; store them as strings
+    return json.loads(json.dumps(value, default=str))
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before retrying a job that has failed `attempts` times."""
+    delay = settings.GENERATION_JOB_RETRY_BACKOFF * 2 ** max(attempts - 1, 0)
+    return min(delay, settings.GENERATION_JOB_RETRY_BACKOFF_MAX)
+
+
+def add_event(db: Session, job: GenerationJobRecord, kind: str, **data) -> GenerationJobEvent:
+    """Append an event to the job (committed with the caller's transaction)."""
+    job.last_event_id = (job.last_event_id or 0) + 1
+    event = GenerationJobEvent(
+        job_id=job.id, seq=job.last_event_id, kind=kind, data=_jsonable(data), created_at=datetime.utcnow()
+    )
+    db.add(event)
+    return event
+
+
+def _active_job(db: Session, paper_id: int) -> Optional[GenerationJobRecord]:
+    return (
+        db.query(GenerationJobRecord)
+        .filter(GenerationJobRecord.paper_id == paper_id, GenerationJobRecord.status.in_(ACTIVE))
+        .first()
+    )
+
+
+def _owned(db: Session, job_id: str, worker_id: str) -> Optional[GenerationJobRecord]:
+    # Row lock and fresh values: a reclaim by another worker may race with us
+    job = (
+        db.query(GenerationJobRecord)
+        .filter(GenerationJobRecord.id == job_id)
+        .with_for_update()
+        .populate_existing()
+        .first()
+    )
+    if job is None or job.status != "running" or job.worker_id != worker_id:
+        logger.warning(f"Worker {worker_id} no longer holds job {job_id}; leaving it alone")
+        return None
+    return job
+
+
+def _finish(db: Session, job: GenerationJobRecord, status: str, result=None, error: Optional[str] = None) -> None:
+    job.status = status
+    job.result = _jsonable(result) if result is not None else None
+    job.error = error
+    job.finished_at = datetime.utcnow()
+    job.worker_id = None
+    job.lease_expires_at = None
+    GENERATION_JOBS.inc(outcome=status)
+    if status == "succeeded":
+        result = result or {}
+        add_event(db, job, "completed", status=result.get("status"), total_llm_calls=result.get("total_llm_calls"))
+    else:
+        add_event(db, job, "failed", error=error)
+
+
+def enqueue(db: Session, paper_id: int) -> GenerationJobRecord:
+    """Queue a generation job for the paper (or return its queued/running one)."""
+    active = _active_job(db, paper_id)
+    if active is not None:
+        return active
+
+    now = datetime.utcnow()
+    job = GenerationJobRecord(
+        id=uuid.uuid4().hex,
+        paper_id=paper_id,
+        status="queued",
+        attempts=0,
+        max_attempts=settings.GENERATION_JOB_MAX_ATTEMPTS,
+        run_after=now,
+        questions_done=0,
+        last_event_id=0,
+        created_at=now,
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another API process queued this paper first (uq_generation_jobs_active_paper)
+        db.rollback()
+        return _active_job(db, paper_id)
+    return job
+
+
+def claim(db: Session, worker_id: str, limit: int, lease: Optional[float] = None) -> list[GenerationJobRecord]:
+    """
+    Lease up to `limit` due jobs to this worker: queued ones whose
+    run_after has passed, and running ones whose lease has expired. Rows
+    another worker is claiming at the same moment are skipped, not waited on.
+    """
+    lease = lease or settings.GENERATION_JOB_LEASE
+    now = datetime.utcnow()
+    candidates = (
+        db.query(GenerationJobRecord)
+        .filter(or_(
+            and_(GenerationJobRecord.status == "queued", GenerationJobRecord.run_after <= now),
+            and_(GenerationJobRecord.status == "running", GenerationJobRecord.lease_expires_at < now),
+        ))
+        .order_by(GenerationJobRecord.run_after)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    claimed = []
+    for job in candidates:
+        if job.status == "running":
+            logger.warning(f"Lease of job {job.id} held by {job.worker_id} expired; reclaiming it")
+            if job.attempts >= job.max_attempts:
+                _finish(db, job, "failed", error="Worker lost on the last attempt (lease expired)")
+                continue
+            add_event(db, job, "lease_expired", worker_id=job.worker_id, attempt=job.attempts)
+        job.status = "running"
+        job.worker_id = worker_id
+        job.attempts += 1
+        job.lease_expires_at = now + timedelta(seconds=lease)
+        job.started_at = now
+        job.questions_total = None
+        job.questions_done = 0
+        claimed.append(job)
+    db.commit()
+    return claimed
+
+
+def renew_leases(db: Session, worker_id: str, job_ids: list[str], lease: Optional[float] = None) -> set[str]:
+    """Extend this worker's leases on job_ids; returns the ids it no longer holds."""
+    if not job_ids:
+        return set()
+    lease = lease or settings.GENERATION_JOB_LEASE
+    held = (
+        db.query(GenerationJobRecord)
+        .filter(
+            GenerationJobRecord.id.in_(job_ids),
+            GenerationJobRecord.worker_id == worker_id,
+            GenerationJobRecord.status == "running",
+        )
+        .all()
+    )
+    until = datetime.utcnow() + timedelta(seconds=lease)
+    for job in held:
+        job.lease_expires_at = until
+    db.commit()
+    return set(job_ids) - {job.id for job in held}
+
+
+def _retry_or_fail(db: Session, job: GenerationJobRecord, error: str, retry: bool, result=None) -> None:
+    if retry and job.attempts < job.max_attempts:
+        delay = retry_delay(job.attempts)
+        job.status = "queued"
+        job.error = error
+        job.worker_id = None
+        job.lease_expires_at = None
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        add_event(db, job, "retrying", attempt=job.attempts, error=error, retry_in=delay)
+        GENERATION_JOBS.inc(outcome="retried")
+        logger.warning(f"Job {job.id} attempt {job.attempts} failed ({error}); retrying in {delay:.0f}s")
+    else:
+        _finish(db, job, "failed", result=result, error=error)
+
+
+def complete(db: Session, job_id: str, worker_id: str, result) -> None:
+    """
+    Record the pipeline's result. {"error": ...} results fail without
+    retry; a DRAFT, resumable result is a failed attempt and is retried.
+    """
+    job = _owned(db, job_id, worker_id)
+    if job is None:
+        return
+    error = result_error(result)
+    if error is None:
+        _finish(db, job, "succeeded", result=result)
+    else:
+        _retry_or_fail(db, job, error, retry=bool(result.get("resumable")), result=result)
+    db.commit()
+
+
+def fail(db: Session, job_id: str, worker_id: str, error: str, retry: bool = True) -> None:
+    """Record a failed attempt: back in the queue after a backoff, or failed for good."""
+    job = _owned(db, job_id, worker_id)
+    if job is None:
+        return
+    _retry_or_fail(db, job, error, retry)
+    db.commit()
+
+
+def _requeue(db: Session, job: GenerationJobRecord, delay: float = 0) -> None:
+    # Back in the queue, attempt not counted
+    job.status = "queued"
+    job.attempts = max(job.attempts - 1, 0)
+    job.worker_id = None
+    job.lease_expires_at = None
+    job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def release(db: Session, job_id: str, worker_id: str) -> None:
+    """Put a job this worker is giving up (shutdown) back in the queue, attempt not counted."""
+    job = _owned(db, job_id, worker_id)
+    if job is None:
+        return
+    _requeue(db, job)
+    add_event(db, job, "requeued", reason="worker shutting down")
+    GENERATION_JOBS.inc(outcome="requeued")
+    db.commit()
+
+
+def postpone(db: Session, job_id: str, worker_id: str, reason: str, delay: float) -> None:
+    """
+    Retry a job whose paper's generation run is still held (a previous
+    attempt's, until it is released or goes stale) in `delay` seconds,
+    attempt not counted.
+    """
+    job = _owned(db, job_id, worker_id)
+    if job is None:
+        return
+    _requeue(db, job, delay)
+    add_event(db, job, "postponed", reason=reason, retry_in=delay)
+    GENERATION_JOBS.inc(outcome="postponed")
+    logger.info(f"Job {job.id} postponed for {delay:.0f}s ({reason})")
+    db.commit()
+
+
+def purge_finished(db: Session, older_than: float) -> int:
+    """Delete jobs (and their events) that finished more than `older_than` seconds ago."""
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    ids = [
+        row.id for row in db.query(GenerationJobRecord.id).filter(
+            GenerationJobRecord.status.in_(FINISHED), GenerationJobRecord.finished_at < cutoff
+        )
+    ]
+    if ids:
+        db.query(GenerationJobEvent).filter(GenerationJobEvent.job_id.in_(ids)).delete(synchronize_session=False)
+        db.query(GenerationJobRecord).filter(GenerationJobRecord.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    return len(ids)
+
+
+class JobProgress:
+    """
+    report_progress() sink for a job run by a worker: each event is written
+    to generation_job_events straight away, on its own short session, so
+    API processes can stream it.
+    """
+
+    def __init__(self, job_id: str, session_factory=None):
+        self.job_id = job_id
+        self.session_factory = session_factory or SessionLocal
+        self.total_questions: Optional[int] = None
+        self.done_questions = 0
+
+    def emit(self, kind: str, **data) -> None:
+        if kind == "generation_started":
+            self.total_questions = data.get("total_questions")
+        if kind in QUESTION_EVENTS:
+            self.done_questions += 1
+            data.update(done=self.done_questions, total=self.total_questions)
+
+        db = self.session_factory()
+        try:
+            job = (
+                db.query(GenerationJobRecord)
+                .filter(GenerationJobRecord.id == self.job_id)
+                .with_for_update()
+                .first()
+            )
+            if job is None:
+                return
+            job.questions_total = self.total_questions
+            job.questions_done = self.done_questions
+            add_event(db, job, kind, **data)
+            db.commit()
+        except Exception:
+            # Progress is best effort: a lost event must not fail the generation
+            logger.exception(f"Could not record {kind} event for job {self.job_id}")
+            db.rollback()
+        finally:
+            db.close()
+
+
+def _event_dict(event: GenerationJobEvent) -> dict:
+    return {"id": event.seq, "event": event.kind, "time": _epoch(event.created_at), "data": event.data or {}}
+
+
+class QueuedJob:
+    """Read-only view of a queued job for the status and SSE endpoints."""
+
+    def __init__(self, record: GenerationJobRecord, last_event: Optional[GenerationJobEvent]):
+        self.id = record.id
+        self.paper_id = record.paper_id
+        self.status = record.status
+        self._record = record
+        self._last_event = last_event
+
+    @classmethod
+    def load(cls, db: Session, job_id: str) -> Optional["QueuedJob"]:
+        record = db.query(GenerationJobRecord).filter(GenerationJobRecord.id == job_id).first()
+        if record is None:
+            return None
+        last_event = (
+            db.query(GenerationJobEvent)
+            .filter(GenerationJobEvent.job_id == job_id, GenerationJobEvent.seq == record.last_event_id)
+            .first()
+        )
+        return cls(record, last_event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def snapshot(self) -> dict:
+        record = self._record
+        return {
+            "job_id": record.id,
+            "paper_id": record.paper_id,
+            "status": record.status,
+            "created_at": _epoch(record.created_at),
+            "started_at": _epoch(record.started_at),
+            "finished_at": _epoch(record.finished_at),
+            "progress": {"questions_done": record.questions_done, "questions_total": record.questions_total},
+            "last_event": _event_dict(self._last_event) if self._last_event else None,
+            "result": record.result,
+            "error": record.error,
+            "attempts": record.attempts,
+            "worker_id": record.worker_id,
+        }
+
+    async def follow(self, after: int = 0, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[dict]]:
+        """
+        Same contract as GenerationJob.follow, by polling the events table
+        every GENERATION_JOB_EVENTS_POLL seconds (each poll on a fresh session).
+        """
+        poll = settings.GENERATION_JOB_EVENTS_POLL
+        idle = 0.0
+        while True:
+            # Blocking DB reads, off the event loop
+            status, events = await asyncio.to_thread(self._poll, after)
+            for event in events:
+                after = event["id"]
+                idle = 0.0
+                yield event
+            if status is None or status in FINISHED:
+                return
+
+            await asyncio.sleep(poll)
+            idle += poll
+            if heartbeat and idle >= heartbeat:
+                idle = 0.0
+                yield None
+
+    def _poll(self, after: int) -> tuple[Optional[str], list[dict]]:
+        """(job status, events after id `after`), read on a fresh session."""
+        db = SessionLocal()
+        try:
+            # Status first: once it reads finished, this poll sees every event
+            status = db.query(GenerationJobRecord.status).filter(GenerationJobRecord.id == self.id).scalar()
+            events = [
+                _event_dict(event) for event in db.query(GenerationJobEvent)
+                .filter(GenerationJobEvent.job_id == self.id, GenerationJobEvent.seq > after)
+                .order_by(GenerationJobEvent.seq)
+            ]
+        finally:
+            db.close()
+        return status, events
@@ -0,0 +1,246 @@
+"""
+Tolerant JSON parser for LLM responses.
+
+repair_json() parses in a single pass what json.loads rejects but a
+reader can still make sense of, instead of paying for a full retry:
+
+- prose or markdown fences around the JSON, and several JSON blobs in one
+  response (objects are merged, list values concatenated; arrays are
+  concatenated);
+- trailing commas, missing commas between elements, unquoted keys,
+  Python-style True/False/None;
+- smart quotes used as string delimiters, raw newlines/tabs inside strings,
+  unescaped double quotes inside strings (a quote only closes the string
+  when what follows looks like JSON structure), invalid escapes;
+- unbalanced or mismatched brackets;
+- truncated output: open containers are closed, an array keeps only its
+  complete elements and an object drops a key whose value was cut off.
+
+Raises ValueError when nothing usable is found, so callers can fall back
+to a retry.
+"""
+
+import re
+from typing import Any
+
+_OPEN_QUOTES = {'"': '"', "“": "”", "”": "”", "„": "”"}
+_STRING_SPECIALS = re.compile(r'["\\“”]')
+_NUMBER = re.compile(r"-?(?:\d+)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_BARE_KEY = re.compile(r"[A-Za-z_][\w\-]*")
+# A quoted key coming up: a string that closes before a colon
+_KEY_AHEAD = re.compile(r'["“”][^"“”\n]{0,200}["“”]\s*:')
+_LITERALS = {
+    "true": True, "false": False, "null": None,
+    "True": True, "False": False, "None": None,
+}
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_WHITESPACE = " \t\r\n"
+_VALUE_START = '{["-0123456789tfnTFN“”„'
+
+
+class _Invalid(Exception):
+    """Not JSON at this position (e.g. a brace inside prose)."""
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.n = len(text)
+
+    def _skip(self, i: int) -> int:
+        while i < self.n and self.text[i] in _WHITESPACE:
+            i += 1
+        return i
+
+    def value(self, i: int) -> tuple[Any, int, bool]:
+        """Parse a value at i; returns (value, end index, complete)."""
+        i = self._skip(i)
+        if i >= self.n:
+            return None, i, False
+        c = self.text[i]
+        if c == "{":
+            return self.obj(i + 1)
+        if c == "[":
+            return self.arr(i + 1)
+        if c in _OPEN_QUOTES:
+            return self.string(i)
+        if c == "-" or c.isdigit():
+            match = _NUMBER.match(self.text, i)
+            if not match:
+                raise _Invalid(i)
+            end = match.end()
+            number = match.group()
+            value = float(number) if any(ch in number for ch in ".eE") else int(number)
+            # A number that runs into the end of the text may have been cut short
+            return value, end, end < self.n
+        for word, literal in _LITERALS.items():
+            if self.text.startswith(word, i):
+                return literal, i + len(word), True
+            if self.n - i < len(word) and word.startswith(self.text[i:]):
+                return None, self.n, False
+        raise _Invalid(i)
+
+    def _closes_string(self, i: int) -> bool:
+        """Is the quote at i - 1 the end of the string? Decided by what follows it."""
+        j = self._skip(i)
+        if j >= self.n or self.text[j] in "}]:":
+            return True
+        if self.text[j] in _OPEN_QUOTES:
+            # Missing comma before the next key
+            return _KEY_AHEAD.match(self.text, j) is not None
+        if self.text[j] != ",":
+            return False
+        k = self._skip(j + 1)
+        return k >= self.n or self.text[k] in _VALUE_START or self.text[k] in "}]" or self.text[k] in _OPEN_QUOTES
+
+    def string(self, i: int) -> tuple[str, int, bool]:
+        closer = _OPEN_QUOTES[self.text[i]]
+        i += 1
+        parts = []
+        while True:
+            match = _STRING_SPECIALS.search(self.text, i)
+            if match is None:
+                parts.append(self.text[i:])
+                return "".join(parts), self.n, False
+            j = match.start()
+            parts.append(self.text[i:j])
+            c = self.text[j]
+            if c == "\\":
+                if j + 1 >= self.n:
+                    return "".join(parts), self.n, False
+                esc = self.text[j + 1]
+                if esc == "u":
+                    digits = self.text[j + 2:j + 6]
+                    if len(digits) == 4 and all(ch in "0123456789abcdefABCDEF" for ch in digits):
+                        parts.append(chr(int(digits, 16)))
+                        i = j + 6
+                        continue
+                    if len(digits) < 4 and j + 2 + len(digits) >= self.n:
+                        return "".join(parts), self.n, False
+                parts.append(_ESCAPES.get(esc, "\\" + esc))
+                i = j + 2
+            elif (c == closer or c == '"') and self._closes_string(j + 1):
+                return "".join(parts), j + 1, True
+            else:
+                # Quote inside the text ("the "ACID" properties"), or a smart
+                # quote inside a plain string: keep it
+                parts.append(c)
+                i = j + 1
+
+    def key(self, i: int) -> tuple[str, int, bool]:
+        c = self.text[i]
+        if c in _OPEN_QUOTES:
+            return self.string(i)
+        match = _BARE_KEY.match(self.text, i)
+        if not match:
+            raise _Invalid(i)
+        return match.group(), match.end(), match.end() < self.n
+
+    def obj(self, i: int) -> tuple[dict, int, bool]:
+        result: dict = {}
+        while True:
+            i = self._skip(i)
+            if i >= self.n:
+                return result, i, False
+            c = self.text[i]
+            if c == "}":
+                return result, i + 1, True
+            if c == "]":
+                # Mismatched closer: end the object, let the parent array consume it
+                return result, i, True
+            if c == ",":
+                i += 1
+                continue
+
+            key, i, complete = self.key(i)
+            i = self._skip(i)
+            if not complete or i >= self.n:
+                return result, self.n, False
+            if self.text[i] != ":":
+                raise _Invalid(i)
+
+            value, i, complete = self.value(i + 1)
+            if not complete:
+                # Keep a cut-off container (it kept its complete parts), drop a cut-off scalar
+                if isinstance(value, (dict, list)):
+                    result[key] = value
+                return result, i, False
+            result[key] = value
+
+    def arr(self, i: int) -> tuple[list, int, bool]:
+        result: list = []
+        while True:
+            i = self._skip(i)
+            if i >= self.n:
+                return result, i, False
+            c = self.text[i]
+            if c == "]":
+                return result, i + 1, True
+            if c == "}":
+                return result, i, True
+            if c == ",":
+                i += 1
+                continue
+
+            value, i, complete = self.value(i)
+            if not complete:
+                # Salvage the complete elements only
+                return result, i, False
+            result.append(value)
+
+
+def _has_content(value: Any) -> bool:
+    if isinstance(value, dict):
+        return any(_has_content(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_content(v) for v in value)
+    return True
+
+
+def parse_json_blobs(text: str) -> list[Any]:
+    """Every JSON object/array found in text, in order (see module docstring)."""
+    parser = _Parser(text)
+    blobs = []
+    i = 0
+    while True:
+        starts = [p for p in (text.find("{", i), text.find("[", i)) if p != -1]
+        if not starts:
+            break
+        start = min(starts)
+        try:
+            value, end, complete = parser.value(start)
+        except _Invalid:
+            i = start + 1
+            continue
+        if not complete:
+            if _has_content(value):
+                blobs.append(value)
+            break
+        blobs.append(value)
+        i = end
+    return blobs
+
+
+def _merge(blobs: list[Any]) -> Any:
+    first = blobs[0]
+    if all(isinstance(blob, list) for blob in blobs):
+        return [item for blob in blobs for item in blob]
+    if all(isinstance(blob, dict) for blob in blobs):
+        merged = dict(first)
+        for blob in blobs[1:]:
+            for key, value in blob.items():
+                if key not in merged:
+                    merged[key] = value
+                elif isinstance(merged[key], list) and isinstance(value, list):
+                    merged[key] = merged[key] + value
+        return merged
+    return first
+
+
+def repair_json(text: str) -> Any:
+    if not text or not text.strip():
+        raise ValueError("Empty LLM response")
+    blobs = parse_json_blobs(text)
+    if not blobs:
+        raise ValueError("No JSON object or array found in LLM response")
+    return _merge(blobs)
@@ -0,0 +1,165 @@
+"""
+Incremental JSON parser for streamed LLM responses.
+
+Text is fed chunk by chunk as the provider streams it. The parser tracks
+just enough state (container stack, string/escape flags, key position) to
+answer two questions cheaply at any point:
+
+- partial(): the best-effort value of the response so far. The text is cut
+  at the last safe point (after a complete value, or after "key":) and
+  the open containers are closed, so {"topics": ["A", "B  parses as
+  {"topics": ["A"]} and {"question":  as {"question": null}.
+- take_items(): elements of the response's item array (the root array,
+  or the first array directly inside the root object, e.g. "questions")
+  that have closed since the last call.
+
+Leading prose / markdown fences before the first { or [ are skipped, and
+the parser reports done once the root value has closed.
+"""
+
+import json
+from typing import Any, Optional
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class IncrementalJSONParser:
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._root = -1
+        self._stack: list[str] = []
+        self._expect_key = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._string_is_key = False
+        self._item_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._items: list[Any] = []
+        # Last safe point: (end index into text, suffix that closes it)
+        self._safe: Optional[tuple[int, str]] = None
+        self._reported_safe: Optional[tuple[int, str]] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> None:
+        if self.done or not chunk:
+            return
+        self.text += chunk
+        self._scan()
+
+    def partial(self) -> Optional[Any]:
+        """Value parsed up to the last safe point, or None if nothing new since the last call."""
+        if self._safe is None or self._safe == self._reported_safe:
+            return None
+        self._reported_safe = self._safe
+        end, suffix = self._safe
+        try:
+            return json.loads(self.text[self._root:end] + suffix, strict=False)
+        except ValueError:
+            return None
+
+    def take_items(self) -> list[Any]:
+        """Item-array elements completed since the last call."""
+        items, self._items = self._items, []
+        return items
+
+    # ------------------------------------------------------------------
+
+    def _closers(self) -> str:
+        return "".join(reversed(self._stack))
+
+    def _mark_safe(self, end: int, prefix: str = "") -> None:
+        self._safe = (end, prefix + self._closers())
+
+    def _emit_item(self, end: int) -> None:
+        raw = self.text[self._item_start:end].strip()
+        self._item_start = None
+        try:
+            self._items.append(json.loads(raw, strict=False))
+        except ValueError:
+            pass
+
+    def _at_item_depth(self) -> bool:
+        return self._item_depth is not None and len(self._stack) == self._item_depth
+
+    def _scan(self) -> None:
+        text = self.text
+        i = self._pos
+
+        if self._root < 0:
+            starts = [p for p in (text.find("{", i), text.find("[", i)) if p != -1]
+            if not starts:
+                self._pos = len(text)
+                return
+            i = self._root = min(starts)
+
+        while i < len(text):
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if not self._string_is_key:
+                        self._mark_safe(i + 1)
+                        if self._at_item_depth() and self._item_start == self._string_start:
+                            self._emit_item(i + 1)
+                i += 1
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = bool(self._stack) and self._stack[-1] == "}" and self._expect_key
+                if self._at_item_depth() and self._item_start is None:
+                    self._item_start = i
+
+            elif c in _CLOSERS:
+                if self._at_item_depth() and self._item_start is None:
+                    self._item_start = i
+                if (
+                    c == "["
+                    and self._item_depth is None
+                    and (not self._stack or self._stack == ["}"])
+                ):
+                    self._item_depth = len(self._stack) + 1
+                self._stack.append(_CLOSERS[c])
+                self._expect_key = c == "{"
+                self._mark_safe(i + 1)
+
+            elif c in "}]":
+                if self._at_item_depth() and self._item_start is not None:
+                    # Scalar element ended by the closing bracket
+                    self._emit_item(i)
+                self._stack.pop()
+                self._expect_key = False
+                self._mark_safe(i + 1)
+                if self._at_item_depth() and self._item_start is not None:
+                    self._emit_item(i + 1)
+                if not self._stack:
+                    self.done = True
+                    self._pos = i + 1
+                    return
+
+            elif c == ",":
+                if self._at_item_depth() and self._item_start is not None:
+                    self._emit_item(i)
+                self._mark_safe(i)
+                self._expect_key = self._stack[-1] == "}"
+
+            elif c == ":":
+                self._expect_key = False
+                self._mark_safe(i + 1, prefix="null")
+
+            elif not c.isspace():
+                # Number / literal: complete once a delimiter arrives
+                if self._at_item_depth() and self._item_start is None:
+                    self._item_start = i
+
+            i += 1
+
+        self._pos = i
@@ -1,30 +1,44 @@
 import json
-import re
+from typing import Any
 
-def safe_llm_json_parse(raw: str):
+from app.core.json_repair import repair_json
+
+
+def _strip_fences(raw: str) -> str:
+    return raw.strip().replace("```json", "").replace("```", "").strip()
+
+
+def parse_llm_json(raw: str) -> tuple[Any, bool]:
+    """
+    Parse an LLM response as JSON. Returns (parsed, repaired).
+
+    Well-formed JSON (raw newlines inside strings allowed), optionally
+    wrapped in markdown fences or prose, is parsed by json.loads.
+    Anything else goes through the tolerant parser in json_repair.py and
+    is reported as repaired. Raises ValueError when neither finds JSON.
+    """
     if not raw or not raw.strip():
         raise ValueError("Empty LLM response")
 
-    raw = raw.strip()
+    text = _strip_fences(raw)
+    try:
+        return json.loads(text, strict=False), False
+    except ValueError:
+        pass
 
-    # Remove any leftover markdown
-    raw = raw.replace("```json", "").replace("```", "")
+    # Prose around a single value: slice it out
+    starts = [p for p in (text.find("{"), text.find("[")) if p != -1]
+    if starts:
+        start = min(starts)
+        end = text.rfind("}" if text[start] == "{" else "]") + 1
+        if end > start:
+            try:
+                return json.loads(text[start:end], strict=False), False
+            except ValueError:
+                pass
 
-    # Extract only the JSON object (prefer objects over arrays for consistency)
-    start = raw.find("{")
-    end = raw.rfind("}") + 1
-    
-    # Fallback to array if no object found
-    if start == -1 or end == -1:
-        start = raw.find("[")
-        end = raw.rfind("]") + 1
-    
-    if start == -1 or end == -1:
-        raise ValueError("No JSON object or array found in LLM response")
+    return repair_json(text), True
 
-    raw = raw[start:end]
 
-    # Escape illegal newlines inside JSON strings
-    raw = re.sub(r'(?<!\\)\n', '\\\\n', raw)
-
-    return json.loads(raw)
+def safe_llm_json_parse(raw: str):
+    return parse_llm_json(raw)[0]
@@ -0,0 +1,175 @@
+"""
+Persistent, content-addressed cache for LLM responses.
+
+Responses are keyed on a hash of (model, temperature, system prompt,
+user prompt, stage) and stored in a local SQLite file, so byte-identical
+prompts (e.g. re-grounding the same syllabus) are served without a
+provider call, even after a restart.
+
+Entries expire after a per-stage TTL and the store is capped at a maximum
+number of entries, evicting the least recently used first.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """SQLite-backed LRU cache with TTL. Safe to share across threads."""
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, temperature: float, system_prompt: str, user_prompt: str, stage: str) -> str:
+        payload = json.dumps(
+            [model, temperature, system_prompt, user_prompt, stage],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def put(self, key: str, stage: str, response: str, ttl: int) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO llm_responses
+                    (key, stage, response, created_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (key, stage, response, now, now + ttl, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the least recently used beyond max_entries."""
+        expired = self._conn.execute(
+            "DELETE FROM llm_responses WHERE expires_at <= ?", (now,)
+        ).rowcount
+
+        count = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        overflow = max(count - self.max_entries, 0)
+        if overflow:
+            self._conn.execute(
+                """
+                DELETE FROM llm_responses WHERE key IN (
+                    SELECT key FROM llm_responses ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+
+        self.evictions += expired + overflow
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+            by_stage = dict(
+                self._conn.execute(
+                    "SELECT stage, COUNT(*) FROM llm_responses GROUP BY stage"
+                ).fetchall()
+            )
+
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "entries_by_stage": by_stage,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+    # Async wrappers: keep disk I/O off the event loop
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, stage: str, response: str, ttl: int) -> None:
+        await asyncio.to_thread(self.put, key, stage, response, ttl)
+
+
+_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide response cache (created on first use)."""
+    global _cache
+    if _cache is None:
+        _cache = LLMResponseCache(
+            settings.LLM_CACHE_PATH,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        )
+        logger.info(f"LLM response cache opened at {settings.LLM_CACHE_PATH}")
+    return _cache
@@ -1,56 +1,344 @@
+import asyncio
 import json
+import logging
 import os
 import time
+from contextvars import ContextVar
+from typing import Optional
+
+import httpx
+
 from app.core.config import settings
+from app.core.llm_scheduler import LLMScheduler, estimate_tokens
+from app.core.metrics import LLM_PROVIDER_CALLS, LLM_PROVIDER_LATENCY, LLM_STRUCTURED_CALLS, LLM_TOKENS
+from app.core.structured_output import (
+    OutputSchema,
+    downgrade,
+    is_unsupported_error,
+    strip_json_boilerplate,
+    structured_mode,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LLMRateLimitError(Exception):
+    """Raised when the provider keeps answering 429 after scheduler back-off."""
+    pass
+
+
+# Process-wide provider client: one keep-alive connection pool and one
+# scheduler shared by every LLMClient. Both are bound to the event loop
+# they were created on, so they are rebuilt if the loop changes
+# (e.g. separate asyncio.run() calls in scripts and tests).
+_shared = {"loop": None, "client": None, "scheduler": None}
+# Close tasks of replaced clients, referenced until they finish
+_closing: set = set()
+
+# Pipeline stage the current provider call belongs to (set by SafeLLM),
+# used to label token usage
+llm_stage: ContextVar[str] = ContextVar("llm_stage", default="unknown")
+
+# Shape of the answer the current call expects (set by SafeLLM from
+# PipelineConfig.output_schema), requested as provider-side structured output
+llm_output_schema: ContextVar[Optional[OutputSchema]] = ContextVar("llm_output_schema", default=None)
+
+# Characters per chunk when streaming the mock payload
+MOCK_STREAM_CHUNK = 8
+
+
+def _build_scheduler() -> LLMScheduler:
+    return LLMScheduler(
+        requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+        max_concurrency=settings.LLM_MAX_IN_FLIGHT,
+        target_latency=settings.LLM_TARGET_LATENCY,
+    )
+
+
+async def _close_quietly(client):
+    try:
+        await client.close()
+    except Exception as exc:
+        # The old loop may already be closed; its sockets go with it
+        logger.debug("Closing a replaced LLM client failed: %s", exc)
+
+
+def _retire_shared_client(loop) -> None:
+    """Close the client of a previous loop before it is replaced."""
+    client, old_loop = _shared["client"], _shared["loop"]
+    if client is None:
+        return
+    if old_loop is not None and old_loop is not loop and old_loop.is_running():
+        # Still serving another thread: close it there
+        asyncio.run_coroutine_threadsafe(_close_quietly(client), old_loop)
+        return
+    task = loop.create_task(_close_quietly(client))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+def get_shared_client():
+    """Return (async provider client, scheduler) for the running loop."""
+    loop = asyncio.get_running_loop()
+    if _shared["loop"] is not loop or _shared["client"] is None:
+        _retire_shared_client(loop)
+        if settings.LLM_PROVIDER == "simulator":
+            from app.core.llm_simulator import LLMSimulator, SimulatorConfig
+
+            _shared["client"] = LLMSimulator(SimulatorConfig.from_settings())
+        else:
+            from groq import AsyncGroq
+
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+                ),
+            )
+            # SDK retries are disabled so 429s reach the scheduler's AIMD logic
+            client = AsyncGroq(
+                api_key=settings.LLM_API_KEY, http_client=http_client, max_retries=0
+            )
+            if settings.LLM_SIM_MODE == "record":
+                from app.core.llm_simulator import RecordingProvider
+
+                # Capture real transcripts for the simulator's replay mode
+                client = RecordingProvider(client, settings.LLM_SIM_TRANSCRIPTS)
+            _shared["client"] = client
+        _shared["scheduler"] = _build_scheduler()
+        _shared["loop"] = loop
+
+    return _shared["client"], _shared["scheduler"]
+
+
+def get_scheduler_snapshot() -> dict | None:
+    scheduler = _shared["scheduler"]
+    return scheduler.snapshot() if scheduler is not None else None
+
+
+async def close_shared_client():
+    """Close the shared connection pool (called on application shutdown)."""
+    client = _shared["client"]
+    if client is not None and _shared["loop"] is asyncio.get_running_loop():
+        await client.close()
+    _shared.update(loop=None, client=None, scheduler=None)
+
+
+def _rate_limit_info(exc: Exception) -> tuple[bool, float | None]:
+    """Return (is_429, retry_after_seconds) for a provider exception."""
+    if getattr(exc, "status_code", None) != 429:
+        return False, None
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return True, float(retry_after) if retry_after is not None else None
+    except ValueError:
+        return True, None
+
+
+def _mock_response() -> str:
+    # Deterministic mock payload for offline tests and CI
+    mock_question = {
+        "question": "Mock question based on provided syllabus and constraints.",
+        "code": "MOCK-001",
+        "bloom_level": "Apply",
+        "difficulty": "Medium",
+        "marks": 10,
+        "rationale": "This is a mock response used when LLM access is disabled.",
+    }
+    return json.dumps(mock_question)
+
+
+def _record_tokens(usage, system_prompt: str, user_prompt: str, completion: str) -> int:
+    """Count a call's tokens against the current stage; returns the total."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    if prompt_tokens is None or completion_tokens is None:
+        prompt_tokens = estimate_tokens(system_prompt, user_prompt, completion_tokens=0)
+        completion_tokens = estimate_tokens(completion, completion_tokens=0)
+    stage = llm_stage.get()
+    LLM_TOKENS.inc(prompt_tokens, stage=stage, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, stage=stage, kind="completion")
+    return getattr(usage, "total_tokens", None) or prompt_tokens + completion_tokens
 
 
 class LLMClient:
     def __init__(self):
         self.mock_mode = os.getenv("LLM_MOCK", "false").lower() in ("1", "true", "yes")
+        simulated = settings.LLM_PROVIDER == "simulator"
         # If no API key is provided, fall back to mock mode for local testing
-        if not settings.LLM_API_KEY:
+        # (the local simulator needs no key)
+        if not settings.LLM_API_KEY and not simulated:
             self.mock_mode = True
 
-        if not self.mock_mode:
+        self.model = settings.LLM_MODEL
+        self.temperature = 0.3
+
+        if not self.mock_mode and not simulated:
             try:
-                from groq import Groq
+                import groq  # noqa: F401
             except ImportError as exc:
                 raise ImportError(
                     "groq package is required for real LLM calls. Install via pip or enable LLM_MOCK=1 for offline tests."
                 ) from exc
 
-            self.client = Groq(api_key=settings.LLM_API_KEY)
-            self.model = settings.LLM_MODEL
+    async def _create(self, client, system_prompt: str, user_prompt: str, stream: bool = False):
+        """
+        chat.completions.create, with structured output when the call has an
+        output schema. A model that rejects the requested mode is moved down
+        to the next one (see structured_output.py) and the call re-sent.
+        """
+        schema = llm_output_schema.get()
+        while True:
+            kwargs = {}
+            mode = structured_mode(self.model) if schema is not None else "none"
+            if mode != "none":
+                kwargs["response_format"] = schema.response_format(mode)
+            if stream:
+                kwargs["stream"] = True
+            # The schema already says "JSON only"; the prompt need not
+            system = strip_json_boilerplate(system_prompt) if mode == "json_schema" else system_prompt
+            try:
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": user_prompt},
+                    ],
+                    temperature=self.temperature,
+                    **kwargs,
+                )
+            except Exception as exc:
+                if mode == "none" or not is_unsupported_error(exc):
+                    raise
+                downgrade(self.model, mode)
+                continue
+            if schema is not None:
+                LLM_STRUCTURED_CALLS.inc(mode=mode)
+            return response
 
     async def generate(self, system_prompt: str, user_prompt: str) -> str:
         if self.mock_mode:
-            # Deterministic mock payload for offline tests and CI
-            mock_question = {
-                "question": "Mock question based on provided syllabus and constraints.",
-                "code": "MOCK-001",
-                "bloom_level": "Apply",
-                "difficulty": "Medium",
-                "marks": 10,
-                "rationale": "This is a mock response used when LLM access is disabled.",
-            }
-            return json.dumps(mock_question)
-
-        print("LLM CALL STARTED")
-        start = time.time()
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.3
+            return _mock_response()
+
+        client, scheduler = get_shared_client()
+        estimated = estimate_tokens(system_prompt, user_prompt)
+
+        for attempt in range(settings.LLM_RATE_LIMIT_RETRIES + 1):
+            # Awaiting here (instead of blocking) keeps the event loop free and lets
+            # asyncio.wait_for() cancel the request mid-flight.
+            ticket = await scheduler.acquire(estimated)
+            logger.debug("LLM call started")
+            start = time.time()
+            rate_limited, retry_after, used_tokens = False, None, None
+
+            try:
+                response = await self._create(client, system_prompt, user_prompt)
+                usage = getattr(response, "usage", None)
+                used_tokens = getattr(usage, "total_tokens", None)
+            except Exception as exc:
+                rate_limited, retry_after = _rate_limit_info(exc)
+                if not rate_limited:
+                    LLM_PROVIDER_CALLS.inc(mode="complete", outcome="error")
+                    raise
+                LLM_PROVIDER_CALLS.inc(mode="complete", outcome="rate_limited")
+                logger.warning(f"LLM rate limited (attempt {attempt + 1})")
+                continue
+            finally:
+                scheduler.release(
+                    ticket,
+                    latency=time.time() - start,
+                    rate_limited=rate_limited,
+                    retry_after=retry_after,
+                    actual_tokens=used_tokens,
+                )
+
+            latency = time.time() - start
+            LLM_PROVIDER_CALLS.inc(mode="complete", outcome="ok")
+            LLM_PROVIDER_LATENCY.observe(latency, mode="complete")
+            result = response.choices[0].message.content
+            _record_tokens(getattr(response, "usage", None), system_prompt, user_prompt, result or "")
+            logger.debug("LLM call finished in %.2fs: %s", latency, (result or "")[:500])
+
+            return result
+
+        raise LLMRateLimitError(
+            f"Provider rate limit persisted after {settings.LLM_RATE_LIMIT_RETRIES + 1} attempts"
         )
-        
-        end = time.time()
-        result = response.choices[0].message.content
-        print("LLM CALL FINISHED in", round(end - start, 2), "seconds")
-        print("RAW RESPONSE:", result[:500])
 
-        return result
+    async def generate_stream(self, system_prompt: str, user_prompt: str):
+        """
+        Yield the response text chunk by chunk as the provider streams it.
+
+        The scheduler slot is held until the stream ends. Closing the
+        generator early (aclose(), or cancelling the consumer) stops the
+        provider stream, so a drifting response stops costing tokens.
+        """
+        if self.mock_mode:
+            # Stream the mock generate() payload in small chunks
+            payload = await self.generate(system_prompt, user_prompt)
+            for i in range(0, len(payload), MOCK_STREAM_CHUNK):
+                await asyncio.sleep(0)
+                yield payload[i:i + MOCK_STREAM_CHUNK]
+            return
+
+        client, scheduler = get_shared_client()
+        estimated = estimate_tokens(system_prompt, user_prompt)
+
+        for attempt in range(settings.LLM_RATE_LIMIT_RETRIES + 1):
+            ticket = await scheduler.acquire(estimated)
+            logger.debug("LLM stream started")
+            start = time.time()
+            rate_limited, retry_after = False, None
+            stream = None
+            # Closed early (drift abort / cancellation) unless set otherwise
+            outcome = "closed"
+            received, usage = [], None
+
+            try:
+                try:
+                    stream = await self._create(client, system_prompt, user_prompt, stream=True)
+                except Exception as exc:
+                    rate_limited, retry_after = _rate_limit_info(exc)
+                    outcome = "rate_limited" if rate_limited else "error"
+                    if not rate_limited:
+                        raise
+                    logger.warning(f"LLM rate limited (attempt {attempt + 1})")
+                    continue
+
+                try:
+                    async for chunk in stream:
+                        # Groq reports usage on the final chunk
+                        usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            received.append(delta)
+                            yield delta
+                except Exception:
+                    outcome = "error"
+                    raise
+
+                outcome = "ok"
+                LLM_PROVIDER_LATENCY.observe(time.time() - start, mode="stream")
+                logger.debug(f"LLM stream finished in {time.time() - start:.2f}s")
+                return
+            finally:
+                LLM_PROVIDER_CALLS.inc(mode="stream", outcome=outcome)
+                if stream is not None:
+                    await stream.close()
+                    # A stream closed early is billed for what was generated so far
+                    _record_tokens(usage, system_prompt, user_prompt, "".join(received))
+                scheduler.release(
+                    ticket,
+                    latency=time.time() - start,
+                    rate_limited=rate_limited,
+                    retry_after=retry_after,
+                )
+
+        raise LLMRateLimitError(
+            f"Provider rate limit persisted after {settings.LLM_RATE_LIMIT_RETRIES + 1} attempts"
+        )
@@ -0,0 +1,66 @@
+"""
+Hedge budget for hedged LLM requests.
+
+A stage with PipelineConfig.hedge_percentile set launches a duplicate
+provider call once its first call has run longer than that percentile of
+the stage's recent latencies (see stage_latency.py), and keeps whichever
+call returns valid JSON first (see SafeLLM).
+
+Hedges are paid for out of a budget that earns `ratio` credit per primary
+call, so hedging can add at most that fraction of extra provider calls.
+"""
+
+import time
+from typing import Optional
+
+from app.core.config import settings
+
+
+class HedgeBudget:
+    """Allows at most `ratio` hedges per primary call (credit capped at `burst`)."""
+
+    def __init__(self, ratio: float, burst: float = 2.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.credit = 0.0
+        self.primaries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+        self._started = time.time()
+
+    def record_primary(self) -> None:
+        self.primaries += 1
+        self.credit = min(self.burst, self.credit + self.ratio)
+
+    def try_acquire(self) -> bool:
+        if self.credit < 1.0:
+            self.denied += 1
+            return False
+        self.credit -= 1.0
+        self.hedges += 1
+        return True
+
+    def record_win(self) -> None:
+        self.hedge_wins += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "budget_ratio": self.ratio,
+            "credit": round(self.credit, 2),
+            "primary_calls": self.primaries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "denied": self.denied,
+            "since": self._started,
+        }
+
+
+_budget: Optional[HedgeBudget] = None
+
+
+def get_hedge_budget() -> HedgeBudget:
+    global _budget
+    if _budget is None:
+        _budget = HedgeBudget(settings.LLM_HEDGE_BUDGET)
+    return _budget
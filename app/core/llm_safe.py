@@ -1,11 +1,75 @@
-from app.core.llm_client import LLMClient
-from app.core.json_utils import safe_llm_json_parse
+from app.core.llm_client import LLMClient, LLMRateLimitError, llm_output_schema, llm_stage
+from app.core.llm_cache import get_llm_cache
+from app.core.config import settings
+from app.core.json_utils import parse_llm_json
+from app.core.json_stream import IncrementalJSONParser
+from app.core.llm_hedging import get_hedge_budget
+from app.core.stage_latency import effective_timeout, get_latency_tracker
+from app.core.metrics import (
+    CACHE_LOOKUPS,
+    LLM_JSON_PARSE_FAILURES,
+    LLM_JSON_REPAIRS,
+    LLM_STAGE_CALLS,
+    LLM_STAGE_LATENCY,
+    LLM_STAGE_RETRIES,
+    LLM_STAGE_SECONDS,
+    LLM_STAGE_TIMEOUTS,
+)
 from app.core.pipeline_config import PipelineConfig, PipelineStageError
 import asyncio
+import copy
+import hashlib
 import logging
+import time
+from contextlib import aclosing
+from typing import Any, Callable, Optional
 
 logger = logging.getLogger(__name__)
 
+
+class _Flight:
+    """A shared in-flight generate_json call and the number of callers awaiting it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+# Identical (prompt, config) calls already in flight await the same task
+# instead of issuing duplicate provider calls.
+_in_flight: dict[str, _Flight] = {}
+
+JSON_FIX_SYSTEM_PROMPT = (
+    "You repair malformed JSON. Reply with only the corrected JSON: "
+    "no explanation, no markdown, no changes to the content."
+)
+# Past this size a fix call costs about as much as regenerating the response
+JSON_FIX_MAX_CHARS = 12000
+
+
+async def fix_json_call(llm: LLMClient, broken: str, stage: str) -> tuple[str, Any]:
+    """
+    Ask the model to correct JSON that neither json.loads nor the tolerant
+    parser could read. Only the broken output is sent, not the original
+    prompt. Returns (fixed text, parsed); raises ValueError if there is no
+    JSON to fix (plain prose), the output is too long to be worth it, or
+    the fix does not parse either.
+    """
+    if "{" not in broken and "[" not in broken:
+        raise ValueError("No JSON in response to fix")
+    if len(broken) > JSON_FIX_MAX_CHARS:
+        raise ValueError(f"Response too long for a JSON fix call ({len(broken)} chars)")
+
+    stage_token = llm_stage.set(f"{stage}:json_fix")
+    try:
+        fixed = await llm.generate(JSON_FIX_SYSTEM_PROMPT, broken)
+    finally:
+        llm_stage.reset(stage_token)
+    parsed, _ = parse_llm_json(fixed)
+    LLM_JSON_REPAIRS.inc(stage=stage, method="fix_call")
+    return fixed, parsed
+
+
 class SafeLLM:
     def __init__(self, default_config: PipelineConfig = None):
         self.llm = LLMClient()
@@ -14,57 +78,315 @@ class SafeLLM:
             stage_name="default", max_retries=1, timeout=15  # Reduced from 30s
         )
 
-    async def generate_json(self, system_prompt, user_prompt, config: PipelineConfig = None):
+    def _parse_response(self, response: str, cfg: PipelineConfig):
+        parsed, repaired = parse_llm_json(response)
+        if repaired:
+            LLM_JSON_REPAIRS.inc(stage=cfg.stage_name, method="local")
+        return self._accept(parsed, cfg)
+
+    def _accept(self, parsed, cfg: PipelineConfig):
+        # FAIL FAST: Check for task drift (e.g. LLM generating questions when asking for topics)
+        self._check_fail_fast(parsed, cfg)
+
+        # SAFETY PATCH: Wrap list responses into dict
+        if isinstance(parsed, list):
+            logger.info(f"Wrapping list response for stage {cfg.stage_name}")
+            parsed = {"topics": parsed}
+
+        return parsed
+
+    def _check_fail_fast(self, parsed, cfg: PipelineConfig, partial: bool = False):
+        for check in cfg.fail_fast_checks:
+            if not check(parsed):
+                when = " on partial response" if partial else ""
+                raise PipelineStageError(f"Fail-fast check failed for stage {cfg.stage_name}{when}")
+
+    async def _stream_response(
+        self, system_prompt, user_prompt, cfg: PipelineConfig, on_item: Optional[Callable[[Any], None]]
+    ) -> str:
+        """
+        Consume a streamed response, running the fail-fast checks on each
+        partial object (cfg.stream) and passing completed item-array
+        elements to on_item. Returns the full response text.
+        """
+        parser = IncrementalJSONParser()
+        async with aclosing(self.llm.generate_stream(system_prompt, user_prompt)) as chunks:
+            async for chunk in chunks:
+                parser.feed(chunk)
+
+                if on_item is not None:
+                    for item in parser.take_items():
+                        on_item(item)
+
+                if cfg.stream:
+                    partial = parser.partial()
+                    if partial is not None:
+                        try:
+                            self._check_fail_fast(partial, cfg, partial=True)
+                        except PipelineStageError:
+                            logger.warning(
+                                f"Aborting stream for stage {cfg.stage_name} after {len(parser.text)} chars"
+                            )
+                            raise
+
+                if parser.done:
+                    # Anything after the root value is prose we would discard anyway
+                    break
+
+        return parser.text
+
+    async def _call_and_parse(self, system_prompt, user_prompt, cfg: PipelineConfig, on_item):
+        """One provider call, parsed. Records the latency of successful calls."""
+        start = time.monotonic()
+        if cfg.stream or on_item is not None:
+            response = await self._stream_response(system_prompt, user_prompt, cfg, on_item)
+        else:
+            response = await self.llm.generate(system_prompt, user_prompt)
+
+        try:
+            parsed = self._parse_response(response, cfg)
+        except ValueError as e:
+            if not cfg.json_fix_call or not response.strip():
+                raise
+            logger.warning(f"Unparseable JSON for stage {cfg.stage_name}, trying a fix call: {e}")
+            try:
+                response, parsed = await fix_json_call(self.llm, response, cfg.stage_name)
+            except ValueError as fix_error:
+                logger.warning(f"JSON fix call failed for stage {cfg.stage_name}: {fix_error}")
+                raise e
+            parsed = self._accept(parsed, cfg)
+
+        latency = time.monotonic() - start
+        get_latency_tracker().record(cfg.stage_name, latency)
+        LLM_STAGE_LATENCY.observe(latency, stage=cfg.stage_name)
+        return response, parsed
+
+    async def _hedged_call(self, system_prompt, user_prompt, cfg: PipelineConfig, on_item, timeout: float):
+        """
+        _call_and_parse, plus a duplicate call if the first one is slower
+        than cfg.hedge_percentile of the stage's recent latencies (half the
+        timeout until enough samples exist) and the hedge budget allows it.
+        The first call to return valid JSON wins; the other is cancelled.
+        """
+        if cfg.hedge_percentile is None:
+            return await self._call_and_parse(system_prompt, user_prompt, cfg, on_item)
+
+        budget = get_hedge_budget()
+        budget.record_primary()
+        delay = get_latency_tracker().percentile(cfg.stage_name, cfg.hedge_percentile)
+        if delay is None:
+            delay = timeout / 2
+
+        primary = asyncio.ensure_future(self._call_and_parse(system_prompt, user_prompt, cfg, on_item))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not budget.try_acquire():
+                return await primary
+
+            logger.info(f"Hedging slow call for stage {cfg.stage_name} after {delay:.2f}s")
+            # on_item already receives the primary's items; the hedge stays silent
+            hedge = asyncio.ensure_future(self._call_and_parse(system_prompt, user_prompt, cfg, None))
+            tasks.append(hedge)
+
+            pending = set(tasks)
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in (t for t in tasks if t in done):
+                    if task.exception() is None:
+                        if task is hedge:
+                            budget.record_win()
+                        return task.result()
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _flight_key(self, system_prompt: str, user_prompt: str, cfg: PipelineConfig) -> str:
+        identity = repr((
+            self.llm.model,
+            self.llm.temperature,
+            self.llm.mock_mode,
+            cfg.stage_name,
+            cfg.max_retries,
+            cfg.timeout,
+            cfg.relax_json_validation,
+            cfg.cache_ttl,
+            cfg.stream,
+            cfg.hedge_percentile,
+            cfg.json_fix_call,
+            cfg.output_schema.name if cfg.output_schema else None,
+            tuple(id(check) for check in cfg.fail_fast_checks),
+            system_prompt,
+            user_prompt,
+        ))
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    async def generate_json(
+        self,
+        system_prompt,
+        user_prompt,
+        config: PipelineConfig = None,
+        on_item: Optional[Callable[[Any], None]] = None,
+    ):
         """
         Generate JSON with stage-specific configuration.
+
+        Concurrent identical calls are coalesced: they share one provider call
+        and each receive their own copy of the result (or its exception).
+        Cancelling one caller does not cancel the shared call; it is only
+        cancelled once every caller awaiting it has gone.
+
+        With on_item, the response is streamed and each element of its item
+        array (e.g. every object in "questions") is passed to on_item as soon
+        as it closes. Elements of an attempt that is later retried are
+        delivered too, and cache hits deliver none, so on_item is a head
+        start for downstream work, not a replacement for the return value.
+        Such calls are never coalesced.
         """
         cfg = config or self.default_config
-        last_error = None
-
-        logger.info(f"Starting LLM stage: {cfg.stage_name} (Retries: {cfg.max_retries}, Timeout: {cfg.timeout}s)")
 
         # Enforce fresh context
         if cfg.system_prompt_prefix:
             system_prompt = cfg.system_prompt_prefix + "\n" + system_prompt
 
+        if on_item is not None:
+            result = await self._generate_json(system_prompt, user_prompt, cfg, on_item)
+            return copy.deepcopy(result)
+
+        key = self._flight_key(system_prompt, user_prompt, cfg)
+        flight = _in_flight.get(key)
+
+        if flight is None or flight.task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._generate_json(system_prompt, user_prompt, cfg))
+            flight = _Flight(task)
+            _in_flight[key] = flight
+            task.add_done_callback(lambda t: _finish_flight(key, flight))
+        else:
+            logger.info(f"Coalescing duplicate in-flight call for stage {cfg.stage_name}")
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Last caller gone: stop the shared call and let new callers start afresh
+                if _in_flight.get(key) is flight:
+                    del _in_flight[key]
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+        return copy.deepcopy(result)
+
+    async def _generate_json(self, system_prompt, user_prompt, cfg: PipelineConfig, on_item=None):
+        # Provider calls made below (hedges and fix calls included) count their
+        # tokens against this stage and request its output schema
+        stage_token = llm_stage.set(cfg.stage_name)
+        schema_token = llm_output_schema.set(cfg.output_schema)
+        started = time.perf_counter()
+        try:
+            return await self._run_stage(system_prompt, user_prompt, cfg, on_item)
+        finally:
+            LLM_STAGE_SECONDS.inc(time.perf_counter() - started, stage=cfg.stage_name)
+            llm_output_schema.reset(schema_token)
+            llm_stage.reset(stage_token)
+
+    async def _run_stage(self, system_prompt, user_prompt, cfg: PipelineConfig, on_item=None):
+        last_error = None
+
+        logger.info(f"Starting LLM stage: {cfg.stage_name} (Retries: {cfg.max_retries}, Timeout: {cfg.timeout}s)")
+
+        # PERSISTENT CACHE: Serve byte-identical prompts without a provider call
+        cache = None
+        cache_key = None
+        if cfg.cache_ttl and settings.LLM_CACHE_ENABLED and not self.llm.mock_mode:
+            cache = get_llm_cache()
+            cache_key = cache.make_key(
+                self.llm.model, self.llm.temperature, system_prompt, user_prompt, cfg.stage_name
+            )
+            try:
+                cached = await cache.aget(cache_key)
+            except Exception as e:
+                # The cache is an optimisation: a locked or broken store is a miss
+                logger.warning(f"LLM cache read failed for stage {cfg.stage_name}: {e}")
+                cached = None
+            if cached is not None:
+                try:
+                    parsed = self._parse_response(cached, cfg)
+                    logger.info(f"Stage {cfg.stage_name} served from cache")
+                    CACHE_LOOKUPS.inc(cache="llm_response", result="hit")
+                    return parsed
+                except Exception as e:
+                    logger.warning(f"Ignoring unusable cache entry for stage {cfg.stage_name}: {e}")
+            CACHE_LOOKUPS.inc(cache="llm_response", result="miss")
+
         for attempt in range(cfg.max_retries + 1):
+            # Learned from recent latencies of this stage (see stage_latency.py)
+            timeout = effective_timeout(cfg)
+            if attempt > 0:
+                LLM_STAGE_RETRIES.inc(stage=cfg.stage_name)
             try:
-                # Apply hard timeout
-                response = await asyncio.wait_for(
-                    self.llm.generate(system_prompt, user_prompt),
-                    timeout=cfg.timeout
+                # Apply hard timeout (covers the hedge as well)
+                response, parsed = await asyncio.wait_for(
+                    self._hedged_call(system_prompt, user_prompt, cfg, on_item, timeout),
+                    timeout=timeout
                 )
 
-                parsed = safe_llm_json_parse(response)
-                
-                # FAIL FAST: Check for task drift (e.g. LLM generating questions when asking for topics)
-                for check in cfg.fail_fast_checks:
-                    if not check(parsed):
-                        raise PipelineStageError(f"Fail-fast check failed for stage {cfg.stage_name}")
-
-                # SAFETY PATCH: Wrap list responses into dict
-                if isinstance(parsed, list):
-                    logger.info(f"Wrapping list response for stage {cfg.stage_name}")
-                    parsed = {"topics": parsed}
+                LLM_STAGE_CALLS.inc(stage=cfg.stage_name, outcome="success")
+                if cache is not None:
+                    try:
+                        await cache.aput(cache_key, cfg.stage_name, response, cfg.cache_ttl)
+                    except Exception as e:
+                        # Keep the answer: only the cache entry is lost
+                        logger.warning(f"LLM cache write failed for stage {cfg.stage_name}: {e}")
 
                 return parsed
 
             except asyncio.TimeoutError:
-                logger.warning(f"Stage {cfg.stage_name} timed out (Attempt {attempt+1}/{cfg.max_retries+1})")
+                # Censored sample: the call took at least this long
+                get_latency_tracker().record(cfg.stage_name, timeout, timed_out=True)
+                LLM_STAGE_CALLS.inc(stage=cfg.stage_name, outcome="timeout")
+                LLM_STAGE_TIMEOUTS.inc(stage=cfg.stage_name)
+                logger.warning(f"Stage {cfg.stage_name} timed out after {timeout:.1f}s (Attempt {attempt+1}/{cfg.max_retries+1})")
                 if attempt == cfg.max_retries:
-                    raise asyncio.TimeoutError(f"Stage {cfg.stage_name} failed after {cfg.timeout}s timeout")
-            
+                    raise asyncio.TimeoutError(f"Stage {cfg.stage_name} failed after {timeout:.1f}s timeout")
+
+            except LLMRateLimitError:
+                # LLMClient already backed off and retried; a JSON retry would not help
+                logger.error(f"Stage {cfg.stage_name} rate limited by provider")
+                LLM_STAGE_CALLS.inc(stage=cfg.stage_name, outcome="rate_limited")
+                raise
+
             except PipelineStageError as e:
                 # Fatal error, do not retry
                 logger.error(f"Stage {cfg.stage_name} fatal error: {str(e)}")
+                LLM_STAGE_CALLS.inc(stage=cfg.stage_name, outcome="fail_fast")
                 raise e
 
             except Exception as e:
                 logger.warning(f"Stage {cfg.stage_name} error: {str(e)}")
                 last_error = e
+                # parse_llm_json / json raise ValueError; anything else is a provider error
+                if isinstance(e, ValueError):
+                    LLM_STAGE_CALLS.inc(stage=cfg.stage_name, outcome="parse_error")
+                    LLM_JSON_PARSE_FAILURES.inc(stage=cfg.stage_name)
+                else:
+                    LLM_STAGE_CALLS.inc(stage=cfg.stage_name, outcome="error")
                 # Only retry if we have retries left
                 if attempt < cfg.max_retries:
                      user_prompt += "\n\nError: Invalid JSON. Retry."
 
         raise ValueError(f"Stage {cfg.stage_name} failed: {last_error}")
 
+
+def _finish_flight(key: str, flight: _Flight) -> None:
+    if _in_flight.get(key) is flight:
+        del _in_flight[key]
+    # Mark the exception as retrieved; every waiter has already received it
+    if not flight.task.cancelled():
+        flight.task.exception()
@@ -0,0 +1,261 @@
+"""
+Provider-aware scheduler for outbound LLM calls.
+
+Every provider call made by LLMClient first acquires a slot here:
+
+- Token buckets keep us under the provider's requests-per-minute and
+  tokens-per-minute limits (tokens are estimated up front and corrected
+  with the real usage once the response arrives).
+- Priority lanes: interactive calls (replace / regenerate a single
+  question) are always dispatched before bulk paper generation.
+- Per-paper fair sharing: within a lane, waiting calls are served
+  round-robin across papers, so one large paper cannot monopolise the
+  provider.
+- AIMD concurrency: the in-flight limit grows by ~1 per window of fast,
+  successful calls and is halved on a 429 (and trimmed when latency
+  exceeds the target).
+
+The lane and paper of a call are taken from a context variable set by the
+API endpoint, so they flow through agents and asyncio.gather() without
+threading extra arguments through every call site.
+"""
+
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    lane: str = INTERACTIVE
+    paper_id: Optional[int] = None
+
+
+_request_context: contextvars.ContextVar[RequestContext] = contextvars.ContextVar(
+    "llm_request_context", default=RequestContext()
+)
+
+
+def set_llm_request_context(lane: str, paper_id: Optional[int] = None) -> contextvars.Token:
+    """
+    Tag LLM calls made from the current task (and tasks it spawns) with a
+    lane and paper. Each HTTP request runs in its own context, so endpoints
+    can call this once at the top without resetting it.
+    """
+    if lane not in LANES:
+        raise ValueError(f"Unknown LLM lane: {lane}")
+    return _request_context.set(RequestContext(lane=lane, paper_id=paper_id))
+
+
+@contextmanager
+def llm_request_context(lane: str, paper_id: Optional[int] = None):
+    token = set_llm_request_context(lane, paper_id)
+    try:
+        yield
+    finally:
+        _request_context.reset(token)
+
+
+def current_request_context() -> RequestContext:
+    return _request_context.get()
+
+
+def estimate_tokens(*texts: str, completion_tokens: int = 512) -> int:
+    """Rough token estimate (~4 characters per token) plus expected completion."""
+    return sum(len(t or "") for t in texts) // 4 + completion_tokens
+
+
+class TokenBucket:
+    """Continuous-refill token bucket. A negative level records debt to repay."""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.level -= amount
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "context")
+
+    def __init__(self, future: asyncio.Future, tokens: int, context: RequestContext):
+        self.future = future
+        self.tokens = tokens
+        self.context = context
+
+
+class Ticket:
+    """A granted scheduler slot; pass back to release()."""
+
+    __slots__ = ("tokens", "context", "granted_at")
+
+    def __init__(self, tokens: int, context: RequestContext):
+        self.tokens = tokens
+        self.context = context
+        self.granted_at = time.monotonic()
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        target_latency: float = 8.0,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute / 60.0, max(requests_per_minute / 6.0, 1))
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.target_latency = target_latency
+        self.limit = float(max_concurrency)
+        self.active = 0
+
+        # lane -> paper_id -> FIFO of waiters (round-robin over papers)
+        self._queues: dict[str, OrderedDict] = {lane: OrderedDict() for lane in LANES}
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+
+        self.granted = 0
+        self.rate_limited = 0
+
+    # ------------------------------------------------------------------
+    # Acquire / release
+    # ------------------------------------------------------------------
+
+    async def acquire(self, estimated_tokens: int) -> Ticket:
+        context = current_request_context()
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(future, estimated_tokens, context)
+
+        lane = self._queues[context.lane]
+        lane.setdefault(context.paper_id, deque()).append(waiter)
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as the caller went away: hand it back
+                self.active -= 1
+                self._dispatch()
+            raise
+
+        return Ticket(estimated_tokens, context)
+
+    def release(
+        self,
+        ticket: Ticket,
+        latency: float,
+        rate_limited: bool = False,
+        retry_after: Optional[float] = None,
+        actual_tokens: Optional[int] = None,
+    ) -> None:
+        self.active -= 1
+
+        if actual_tokens is not None and actual_tokens != ticket.tokens:
+            # Settle the estimate against real usage (may leave the bucket in debt)
+            self.token_bucket.consume(actual_tokens - ticket.tokens)
+
+        if rate_limited:
+            self.rate_limited += 1
+            self.limit = max(self.min_concurrency, self.limit / 2)
+            pause = retry_after if retry_after is not None else 1.0
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        elif latency > self.target_latency:
+            self.limit = max(self.min_concurrency, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+
+        self._dispatch()
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    def _next_waiter(self, pop: bool) -> Optional[_Waiter]:
+        for lane in LANES:
+            queues = self._queues[lane]
+            while queues:
+                paper_id, waiters = next(iter(queues.items()))
+                while waiters and waiters[0].future.cancelled():
+                    waiters.popleft()
+                if not waiters:
+                    del queues[paper_id]
+                    continue
+                if not pop:
+                    return waiters[0]
+                waiter = waiters.popleft()
+                # Rotate this paper to the back of its lane
+                del queues[paper_id]
+                if waiters:
+                    queues[paper_id] = waiters
+                return waiter
+        return None
+
+    def _dispatch(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self.active < int(self.limit):
+            waiter = self._next_waiter(pop=False)
+            if waiter is None:
+                return
+
+            delay = max(
+                self._paused_until - time.monotonic(),
+                self.request_bucket.wait_time(1),
+                self.token_bucket.wait_time(waiter.tokens),
+            )
+            if delay > 0:
+                loop = asyncio.get_running_loop()
+                self._wakeup = loop.call_later(delay, self._dispatch)
+                return
+
+            self._next_waiter(pop=True)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(min(waiter.tokens, self.token_bucket.capacity))
+            self.active += 1
+            self.granted += 1
+            waiter.future.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "active": self.active,
+            "queued": {
+                lane: sum(len(w) for w in self._queues[lane].values()) for lane in LANES
+            },
+            "request_tokens_available": round(self.request_bucket.level, 2),
+            "llm_tokens_available": round(self.token_bucket.level),
+            "paused_for": round(max(self._paused_until - time.monotonic(), 0.0), 2),
+            "granted": self.granted,
+            "rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,451 @@
+"""
+Deterministic local LLM provider for offline load, latency and retry testing.
+
+LLM_PROVIDER=simulator makes LLMClient talk to LLMSimulator instead of the
+real SDK client. It implements the one SDK call LLMClient uses,
+chat.completions.create(model, messages, temperature, stream=...), so the
+scheduler, timeouts, hedging, streaming and retries all run for real.
+
+- Latency is drawn from a configurable distribution (LLM_SIM_LATENCY), and
+  streamed responses spread it across their chunks.
+- LLM_SIM_ERROR_RATE / LLM_SIM_RATE_LIMIT_RATE inject 500s and 429s (with a
+  retry-after header); LLM_SIM_MALFORMED_RATE corrupts the JSON body.
+- response_format is honoured like a provider with structured output up to
+  LLM_SIM_STRUCTURED_OUTPUT: constrained responses are never corrupted, and
+  a mode beyond it is rejected with a 400.
+- Responses are prompt-aware: topics for extraction prompts, exactly N
+  questions for batch prompts, audit JSON for the auditor, and so on.
+- LLM_SIM_MODE=replay serves transcripts captured with LLM_SIM_MODE=record
+  (which wraps the real provider and appends each exchange to
+  LLM_SIM_TRANSCRIPTS as JSON lines).
+
+Every random choice comes from an RNG seeded with (LLM_SIM_SEED, prompt,
+how many times this prompt has been seen), so a run is reproducible no
+matter how concurrent calls interleave.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_CHARS = 16
+
+
+class SimulatedProviderError(Exception):
+    """Shaped like the SDK's API errors: status_code and response.headers."""
+
+    def __init__(self, status_code: int, retry_after: Optional[float] = None, message: Optional[str] = None):
+        super().__init__(message or f"Simulated provider error {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+# ----------------------------------------------------------------------
+# Latency distributions
+# ----------------------------------------------------------------------
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Build a latency sampler (seconds) from a spec string:
+    "fixed:0.5", "uniform:0.2:1.5", "exponential:0.8" (mean),
+    "lognormal:1.2:0.5" (median, sigma), "normal:1.0:0.2" (mean, stddev).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(":") if v]
+
+    if kind == "fixed":
+        (value,) = values
+        return lambda rng: value
+    if kind == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "exponential":
+        (mean,) = values
+        return lambda rng: rng.expovariate(1 / mean)
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    if kind == "normal":
+        mean, stddev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stddev))
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+@dataclass
+class SimulatorConfig:
+    latency: str = "lognormal:1.0:0.4"
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    malformed_rate: float = 0.0
+    structured_output: str = "json_schema"  # json_schema | json_object | none
+    seed: int = 0
+    mode: str = "generate"  # generate | replay ("record" wraps the real provider instead)
+    transcripts: Optional[str] = None
+
+    @classmethod
+    def from_settings(cls) -> "SimulatorConfig":
+        return cls(
+            latency=settings.LLM_SIM_LATENCY,
+            error_rate=settings.LLM_SIM_ERROR_RATE,
+            rate_limit_rate=settings.LLM_SIM_RATE_LIMIT_RATE,
+            retry_after=settings.LLM_SIM_RETRY_AFTER,
+            malformed_rate=settings.LLM_SIM_MALFORMED_RATE,
+            structured_output=settings.LLM_SIM_STRUCTURED_OUTPUT,
+            seed=settings.LLM_SIM_SEED,
+            mode=settings.LLM_SIM_MODE,
+            transcripts=settings.LLM_SIM_TRANSCRIPTS,
+        )
+
+
+def transcript_key(system_prompt: str, user_prompt: str) -> str:
+    return hashlib.sha256(f"{system_prompt}\x00{user_prompt}".encode("utf-8")).hexdigest()
+
+
+def load_transcripts(path: str) -> dict[str, list[str]]:
+    """key -> recorded responses, in recording order."""
+    transcripts: dict[str, list[str]] = {}
+    if not path or not os.path.exists(path):
+        return transcripts
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                entry = json.loads(line)
+                transcripts.setdefault(entry["key"], []).append(entry["response"])
+    return transcripts
+
+
+# ----------------------------------------------------------------------
+# Prompt-aware responses
+# ----------------------------------------------------------------------
+
+_FALLBACK_TOPICS = ["Graphs", "Trees", "Sorting Algorithms", "Hashing", "Recursion", "Dynamic Programming"]
+
+
+def _split_topics(text: str) -> list[str]:
+    # Some prompts carry escaped newlines; unit headings and marks are noise
+    text = text.replace("\\n", "\n")
+    text = re.sub(r"(?i)\bunit\s+[ivx\d]+\b|\b\d+\b", ",", text)
+    parts = re.split(r"[,;\n–:]+|\s-\s", text)
+    topics = [p.strip(" .-") for p in parts]
+    topics = [t for t in topics if t and 1 <= len(t.split()) <= 6]
+    return list(dict.fromkeys(topics))[:10]
+
+
+def _prompt_topics(user_prompt: str) -> list[str]:
+    """Topics named in the prompt: the raw syllabus, a syllabus-topics list or a "Topic:" line."""
+    syllabus = re.search(r"<<<(.+?)>>>", user_prompt, re.DOTALL) or re.search(
+        r"Syllabus:\s*\n(.+?)\n\s*\n", user_prompt, re.DOTALL
+    )
+    if syllabus and _split_topics(syllabus.group(1)):
+        return _split_topics(syllabus.group(1))
+
+    listed = re.search(r"Syllabus topics[^\n]*\n((?:[ \t]*-[ \t]+[^\n]+\n?)+)", user_prompt)
+    if listed:
+        return [line.strip()[1:].strip() for line in listed.group(1).splitlines() if line.strip()][:10]
+
+    topic_line = re.search(r"Topic:\s*(.+?)(?:\\n|\n|$)", user_prompt)
+    if topic_line and _split_topics(topic_line.group(1)):
+        return _split_topics(topic_line.group(1))
+
+    return _FALLBACK_TOPICS
+
+
+def _question_text(rng: random.Random, topic: str, bloom: str, marks: int) -> str:
+    case = rng.randrange(1000, 9999)
+    if marks <= 2:
+        return f"Define {topic} and state one of its key properties (case {case})."
+    if bloom == "Analyze":
+        return (
+            f"Analyze the trade-offs involved in applying {topic} to a large real-world system, "
+            f"comparing at least two approaches in detail (case {case})."
+        )
+    return (
+        f"Apply {topic} to solve the following problem step by step, showing all intermediate "
+        f"working for scenario {case}."
+    )
+
+
+def simulate_response(system_prompt: str, user_prompt: str, rng: random.Random) -> dict:
+    """JSON object an obedient model would return for one of this repo's prompts."""
+    topics = _prompt_topics(user_prompt)
+    marks_match = re.search(r"(?:Marks per question|Marks):\s*(\d+)", user_prompt) or re.search(
+        r"\((\d+) marks\)", user_prompt
+    )
+    marks = int(marks_match.group(1)) if marks_match else 13
+    bloom_match = re.search(r"Bloom(?: level)?:\s*(\w+)", user_prompt)
+    bloom = bloom_match.group(1) if bloom_match else "Apply"
+
+    batch = re.search(r"Generate EXACTLY (\d+) questions", user_prompt)
+    if batch:
+        return {
+            "questions": [
+                {
+                    "question": _question_text(rng, rng.choice(topics), bloom, marks),
+                    "bloom_level": bloom,
+                    "difficulty": "Medium",
+                    "marks": marks,
+                }
+                for _ in range(int(batch.group(1)))
+            ]
+        }
+
+    if "final_verdict" in user_prompt:
+        aligned = rng.random() > 0.1
+        return {
+            "concept_alignment": aligned,
+            "cognitive_alignment": aligned,
+            "difficulty_match": True,
+            "scenario_present": rng.random() > 0.3,
+            "issues": [] if aligned else ["Concept drifts from the outcome"],
+            "final_verdict": "ACCEPT" if aligned else "REJECT",
+        }
+
+    if "PRIMARY ACADEMIC SUBJECT" in user_prompt:
+        return {
+            "subject": f"{topics[0]} and Related Concepts",
+            "domain": "Computer Science",
+            "core_topics": topics[:8],
+            "forbidden_topics": ["Database Systems", "Operating Systems"],
+        }
+
+    if "unit_title" in user_prompt:
+        half = max(1, len(topics) // 2)
+        return {
+            "units": [
+                {"unit_title": "Unit 1", "topics": topics[:half]},
+                {"unit_title": "Unit 2", "topics": topics[half:] or topics[:1]},
+            ]
+        }
+
+    if "normalized_bloom" in user_prompt:
+        return {
+            "normalized_bloom": bloom,
+            "refined_topic": topics[0],
+            "allowed_concepts": topics[:5],
+            "forbidden_concepts": ["Database Systems"],
+            "cognitive_intent": f"Students {bloom.lower()} {topics[0]} to unfamiliar problems.",
+        }
+
+    if '"topics"' in user_prompt:
+        return {"topics": topics}
+
+    return {
+        "question": _question_text(rng, rng.choice(topics), bloom, marks),
+        "bloom_level": bloom,
+        "difficulty": "Medium",
+        "marks": marks,
+    }
+
+
+def corrupt_json(text: str, rng: random.Random) -> str:
+    """Typical model formatting failures."""
+    kind = rng.choice(["truncate", "prose", "trailing_comma", "fence_only"])
+    if kind == "truncate":
+        return text[: max(1, int(len(text) * rng.uniform(0.3, 0.9)))]
+    if kind == "prose":
+        return f"Sure! Here is the JSON you asked for:\n{text}\nLet me know if you need anything else."
+    if kind == "trailing_comma":
+        return text[:-1] + ",}" if text.endswith("}") else text + ","
+    return "```json\n" + text[: len(text) // 2]
+
+
+# ----------------------------------------------------------------------
+# Provider
+# ----------------------------------------------------------------------
+
+def _usage(system_prompt: str, user_prompt: str, text: str) -> SimpleNamespace:
+    prompt_tokens = (len(system_prompt) + len(user_prompt)) // 4
+    completion_tokens = len(text) // 4
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+    )
+
+
+class _SimulatedStream:
+    def __init__(self, chunks: list[str], delays: list[float], usage=None):
+        self._chunks = chunks
+        self._delays = delays
+        self._usage = usage
+        self._index = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed or self._index >= len(self._chunks):
+            raise StopAsyncIteration
+        await asyncio.sleep(self._delays[self._index])
+        chunk = self._chunks[self._index]
+        self._index += 1
+        delta = SimpleNamespace(content=chunk)
+        if self._index == len(self._chunks):
+            # Like Groq, usage arrives on the final chunk
+            return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], x_groq=SimpleNamespace(usage=self._usage))
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    async def close(self):
+        self.closed = True
+
+
+class LLMSimulator:
+    """Drop-in for the SDK client: exposes chat.completions.create()."""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self._latency = parse_latency(self.config.latency)
+        self._seen: dict[str, int] = {}
+        self.transcripts = load_transcripts(self.config.transcripts) if self.config.mode == "replay" else {}
+        self.stats = {"calls": 0, "errors": 0, "rate_limited": 0, "malformed": 0, "replayed": 0, "rejected_format": 0}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _rng(self, key: str) -> tuple[random.Random, int]:
+        occurrence = self._seen.get(key, 0)
+        self._seen[key] = occurrence + 1
+        digest = hashlib.sha256(f"{self.config.seed}:{key}:{occurrence}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big")), occurrence
+
+    def _supports(self, response_format: dict) -> bool:
+        supported = {
+            "json_schema": ("json_schema", "json_object"),
+            "json_object": ("json_object",),
+        }.get(self.config.structured_output, ())
+        return response_format.get("type") in supported
+
+    def _respond(self, system_prompt: str, user_prompt: str, key: str, occurrence: int, rng, constrained: bool) -> str:
+        recorded = self.transcripts.get(key)
+        if recorded:
+            self.stats["replayed"] += 1
+            return recorded[occurrence % len(recorded)]
+
+        text = json.dumps(simulate_response(system_prompt, user_prompt, rng))
+        # Constrained decoding cannot emit malformed JSON (the draw keeps runs comparable)
+        if rng.random() < self.config.malformed_rate and not constrained:
+            self.stats["malformed"] += 1
+            text = corrupt_json(text, rng)
+        return text
+
+    async def create(
+        self,
+        model: str,
+        messages: list[dict],
+        temperature: float = 0.0,
+        stream: bool = False,
+        response_format: Optional[dict] = None,
+        **kwargs,
+    ):
+        if response_format is not None and not self._supports(response_format):
+            # Rejected before generation, like a provider validating the request
+            self.stats["rejected_format"] += 1
+            raise SimulatedProviderError(
+                400, message=f"response_format {response_format.get('type')} is not supported by this model"
+            )
+
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_prompt = next((m["content"] for m in messages if m["role"] == "user"), "")
+        key = transcript_key(system_prompt, user_prompt)
+        rng, occurrence = self._rng(key)
+        self.stats["calls"] += 1
+
+        latency = self._latency(rng)
+        roll = rng.random()
+        if roll < self.config.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            await asyncio.sleep(min(latency, 0.05))
+            raise SimulatedProviderError(429, retry_after=self.config.retry_after)
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.stats["errors"] += 1
+            await asyncio.sleep(latency / 2)
+            raise SimulatedProviderError(500)
+
+        text = self._respond(system_prompt, user_prompt, key, occurrence, rng, constrained=response_format is not None)
+
+        if stream:
+            chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+            # ~20% of the latency is time to first token, the rest is spread evenly
+            first = latency * 0.2
+            rest = (latency - first) / max(len(chunks) - 1, 1)
+            return _SimulatedStream(
+                chunks, [first] + [rest] * (len(chunks) - 1), _usage(system_prompt, user_prompt, text)
+            )
+
+        await asyncio.sleep(latency)
+        message = SimpleNamespace(content=text)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message)], usage=_usage(system_prompt, user_prompt, text)
+        )
+
+    async def close(self):
+        pass
+
+
+class RecordingProvider:
+    """Wraps a real SDK client and appends every exchange to a transcript file."""
+
+    def __init__(self, client, path: str):
+        self._client = client
+        self.path = path
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _append(self, messages: list[dict], response: str) -> None:
+        system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_prompt = next((m["content"] for m in messages if m["role"] == "user"), "")
+        entry = {
+            "key": transcript_key(system_prompt, user_prompt),
+            "system": system_prompt,
+            "user": user_prompt,
+            "response": response,
+        }
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry) + "\n")
+
+    async def create(self, messages: list[dict], stream: bool = False, **kwargs):
+        response = await self._client.chat.completions.create(messages=messages, stream=stream, **kwargs)
+        if not stream:
+            self._append(messages, response.choices[0].message.content)
+            return response
+        return _RecordingStream(response, lambda text: self._append(messages, text))
+
+    async def close(self):
+        await self._client.close()
+
+
+class _RecordingStream:
+    def __init__(self, stream, on_complete: Callable[[str], None]):
+        self._stream = stream
+        self._on_complete = on_complete
+        self._parts: list[str] = []
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            # Only complete streams are worth replaying
+            self._on_complete("".join(self._parts))
+            raise
+        if chunk.choices and chunk.choices[0].delta.content:
+            self._parts.append(chunk.choices[0].delta.content)
+        return chunk
+
+    async def close(self):
+        await self._stream.close()
@@ -0,0 +1,89 @@
+"""
+Event-loop lag monitor.
+
+A background task sleeps for a fixed interval and measures how late it
+wakes up; the overshoot is time the loop spent running something else
+without yielding (sync work on the loop, PDF rendering, parsing a large
+response, ...). Each sample is observed in EVENT_LOOP_LAG.
+
+Requests are attributed too: the record_loop_lag middleware registers a
+holder while the request is in flight, the monitor raises each holder to
+the worst lag it sees, and the middleware observes that worst lag in
+REQUEST_LOOP_LAG labelled by route (same labels as the DB-time metric).
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import EVENT_LOOP_LAG, REQUEST_LOOP_LAG, route_label
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        # id(holder) -> one-item list [worst lag seconds] per in-flight request
+        self._holders: dict[int, list] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.interval > 0 and not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def track(self) -> list:
+        holder = [0.0]
+        self._holders[id(holder)] = holder
+        return holder
+
+    def untrack(self, holder: list) -> None:
+        self._holders.pop(id(holder), None)
+
+    def sample(self, lag: float) -> None:
+        EVENT_LOOP_LAG.observe(lag)
+        for holder in self._holders.values():
+            if lag > holder[0]:
+                holder[0] = lag
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.sample(max(0.0, time.perf_counter() - expected))
+
+
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor(settings.EVENT_LOOP_LAG_INTERVAL)
+    return _monitor
+
+
+async def record_loop_lag(request, call_next):
+    """HTTP middleware: observe the worst loop lag seen while each request ran."""
+    monitor = get_loop_monitor()
+    if not monitor.running:
+        return await call_next(request)
+    holder = monitor.track()
+    try:
+        response = await call_next(request)
+    finally:
+        monitor.untrack(holder)
+    REQUEST_LOOP_LAG.observe(holder[0], endpoint=route_label(request))
+    return response
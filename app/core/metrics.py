@@ -0,0 +1,349 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small registry of counters, gauges and histograms with labels, rendered
+by the /metrics route (app/api/metrics.py). Kept dependency-free: values
+live in plain dicts and every update happens on the event loop or in the
+request threadpool, where a lost increment under a race is acceptable.
+
+Metric definitions for the generation pipeline are at the bottom of this
+module so call sites only import the metric they update.
+"""
+
+import functools
+import inspect
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+from app.core.stage_latency import LATENCY_BUCKETS
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> dict:
+        """Copy of every labelled value, keyed by the tuple of label values."""
+        return dict(self._values)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class _InProgress:
+    """Context manager / decorator that holds a gauge up while work runs."""
+
+    def __init__(self, gauge: "Gauge", labels: dict):
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self):
+        self.gauge.inc(**self.labels)
+
+    def __exit__(self, *exc):
+        self.gauge.dec(**self.labels)
+
+    def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with self:
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def track_inprogress(self, **labels) -> _InProgress:
+        return _InProgress(self, labels)
+
+
+class CallbackGauge(_Metric):
+    """Gauge read at scrape time: callback returns [(label values tuple, value), ...]."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames, callback: Callable[[], list]):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self.callback()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state["counts"][i] += 1
+        state["sum"] += value
+        state["count"] += 1
+
+    def value(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state["count"] if state else 0
+
+    def snapshot(self) -> dict:
+        return {key: {"count": state["count"], "sum": state["sum"]} for key, state in self._values.items()}
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, state in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, state["counts"]):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, inf)} {state['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name, documentation, labelnames=()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ----------------------------------------------------------------------
+# Database time per request
+# ----------------------------------------------------------------------
+
+# Mutable holder for the current request's DB seconds. Set by the HTTP
+# middleware; the holder object (not the variable) is shared with the
+# threadpool and tasks the request spawns, so their queries add to it.
+_db_timer: ContextVar[Optional[list]] = ContextVar("db_timer", default=None)
+
+
+@contextmanager
+def measure_db_time():
+    """Collect DB time of queries run inside the block; yields a one-item list [seconds]."""
+    holder = [0.0]
+    token = _db_timer.set(holder)
+    try:
+        yield holder
+    finally:
+        _db_timer.reset(token)
+
+
+def instrument_engine(engine) -> None:
+    """Attach cursor-execute listeners that add query time to the current request."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        holder = _db_timer.get()
+        if holder is not None:
+            holder[0] += time.perf_counter() - started
+
+
+def route_label(request) -> str:
+    """Endpoint label for per-request metrics: method and route template."""
+    route = request.scope.get("route")
+    return f"{request.method} {route.path}" if route is not None else "unmatched"
+
+
+async def record_db_time(request, call_next):
+    """HTTP middleware: observe each request's DB time, labelled by route template."""
+    with measure_db_time() as db_seconds:
+        response = await call_next(request)
+    DB_TIME.observe(db_seconds[0], endpoint=route_label(request))
+    return response
+
+
+# ----------------------------------------------------------------------
+# Generation pipeline metrics
+# ----------------------------------------------------------------------
+
+LLM_STAGE_CALLS = counter(
+    "qb_llm_stage_calls_total",
+    "SafeLLM stage attempts by outcome (success, timeout, parse_error, fail_fast, rate_limited, error).",
+    ["stage", "outcome"],
+)
+LLM_STAGE_LATENCY = histogram(
+    "qb_llm_stage_latency_seconds",
+    "Latency of successful SafeLLM stage attempts.",
+    ["stage"],
+)
+LLM_STAGE_SECONDS = counter(
+    "qb_llm_stage_seconds_total",
+    "Wall time spent in SafeLLM stages, all attempts and cache lookups included.",
+    ["stage"],
+)
+LLM_TOKENS = counter(
+    "qb_llm_tokens_total",
+    "Provider tokens by stage and kind (prompt, completion); estimated when the provider reports none.",
+    ["stage", "kind"],
+)
+LLM_STAGE_TIMEOUTS = counter("qb_llm_stage_timeouts_total", "SafeLLM stage attempts that timed out.", ["stage"])
+LLM_STAGE_RETRIES = counter("qb_llm_stage_retries_total", "SafeLLM stage retry attempts.", ["stage"])
+LLM_JSON_PARSE_FAILURES = counter(
+    "qb_llm_json_parse_failures_total", "LLM responses that could not be parsed as JSON.", ["stage"]
+)
+LLM_JSON_REPAIRS = counter(
+    "qb_llm_json_repairs_total",
+    "Malformed LLM responses recovered without a retry (method: local, fix_call).",
+    ["stage", "method"],
+)
+LLM_STRUCTURED_CALLS = counter(
+    "qb_llm_structured_output_total",
+    "Provider calls with an output schema, by response_format mode (json_schema, json_object, none).",
+    ["mode"],
+)
+LLM_PROVIDER_CALLS = counter(
+    "qb_llm_provider_calls_total",
+    "Provider requests made by LLMClient (mode: complete, stream; outcome: ok, rate_limited, error).",
+    ["mode", "outcome"],
+)
+LLM_PROVIDER_LATENCY = histogram(
+    "qb_llm_provider_latency_seconds", "Provider request latency as seen by LLMClient.", ["mode"]
+)
+CACHE_LOOKUPS = counter(
+    "qb_cache_lookups_total", "Cache lookups by cache and result (hit, miss).", ["cache", "result"]
+)
+TEMPLATE_FALLBACKS = counter(
+    "qb_template_fallbacks_total",
+    "Paper question slots filled from a template because the LLM could not fill them.",
+    ["mode"],
+)
+QUESTIONS = counter(
+    "qb_questions_total", "Generated questions accepted or rejected, by reason.", ["outcome", "reason"]
+)
+DB_TIME = histogram(
+    "qb_db_time_seconds",
+    "Database time spent per HTTP request.",
+    ["endpoint"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+EVENT_LOOP_LAG = histogram(
+    "qb_event_loop_lag_seconds",
+    "How late the event-loop lag monitor woke up, per sample.",
+    buckets=LOOP_LAG_BUCKETS,
+)
+REQUEST_LOOP_LAG = histogram(
+    "qb_request_loop_lag_seconds",
+    "Worst event-loop lag observed while an HTTP request was in flight.",
+    ["endpoint"],
+    buckets=LOOP_LAG_BUCKETS,
+)
+GENERATIONS_IN_FLIGHT = gauge(
+    "qb_generations_in_flight", "Question/paper generation requests currently running.", ["endpoint"]
+)
+GENERATION_JOBS = counter(
+    "qb_generation_jobs_total",
+    "Background paper generation jobs by outcome (succeeded, failed; queue jobs also retried, requeued, postponed).",
+    ["outcome"],
+)
@@ -1,6 +1,9 @@
 import time
-from app.core.llm_client import LLMClient
-from app.core.json_utils import safe_llm_json_parse
+from app.core.llm_client import LLMClient, LLMRateLimitError, llm_output_schema, llm_stage
+from app.core.json_utils import parse_llm_json
+from app.core.llm_safe import fix_json_call
+from app.core.pipeline_config import QUESTION_OUTPUT
+from app.core.metrics import LLM_JSON_REPAIRS, LLM_STAGE_RETRIES, LLM_STAGE_SECONDS
 from app.api.schemas import QuestionSchema
 
 class PipelineError(Exception):
@@ -13,6 +16,10 @@ class PipelineError(Exception):
 CACHE = {}
 
 
+# Stage label for this pipeline's calls in the LLM metrics
+STAGE_NAME = "question_pipeline"
+
+
 class QuestionPipeline:
     def __init__(self, max_retries: int = 2):
         self.llm = LLMClient()
@@ -21,15 +28,46 @@ class QuestionPipeline:
     async def _generate_and_parse(self, system_prompt: str, user_prompt: str):
         """Run the LLM with basic self-healing retries for JSON formatting."""
 
+        stage_token = llm_stage.set(STAGE_NAME)
+        schema_token = llm_output_schema.set(QUESTION_OUTPUT)
+        started = time.perf_counter()
+        try:
+            return await self._generate_with_retries(system_prompt, user_prompt)
+        finally:
+            LLM_STAGE_SECONDS.inc(time.perf_counter() - started, stage=STAGE_NAME)
+            llm_output_schema.reset(schema_token)
+            llm_stage.reset(stage_token)
+
+    def _parse(self, raw_response: str):
+        parsed, repaired = parse_llm_json(raw_response)
+        if repaired:
+            LLM_JSON_REPAIRS.inc(stage=STAGE_NAME, method="local")
+        return parsed
+
+    async def _generate_with_retries(self, system_prompt: str, user_prompt: str):
         prompt = user_prompt
         last_error = None
         last_raw_response = ""
 
         for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                LLM_STAGE_RETRIES.inc(stage=STAGE_NAME)
             try:
                 raw_response = await self.llm.generate(system_prompt, prompt)
-                parsed = safe_llm_json_parse(raw_response)
+                try:
+                    parsed = self._parse(raw_response)
+                except ValueError as parse_error:
+                    if not raw_response.strip():
+                        raise
+                    # Cheaper than a retry: only the broken output is sent back
+                    try:
+                        raw_response, parsed = await fix_json_call(self.llm, raw_response, STAGE_NAME)
+                    except ValueError:
+                        raise parse_error
                 return raw_response, parsed, attempt + 1
+            except LLMRateLimitError as exc:
+                # Provider throttling is not a formatting problem: don't re-prompt
+                raise PipelineError("Provider rate limit", "", exc)
             except Exception as exc:
                 last_error = exc
                 last_raw_response = locals().get("raw_response", "")
@@ -74,9 +112,10 @@ class QuestionPipeline:
                 system_prompt, user_prompt
             )
         except PipelineError as err:
+            rate_limited = isinstance(err.original_error, LLMRateLimitError)
             return {
                 "status": "REJECTED",
-                "reason": "invalid_json",
+                "reason": "rate_limited" if rate_limited else "invalid_json",
                 "error": str(err.original_error or err),
                 "raw_response": err.raw_response,
                 "attempts": self.max_retries + 1,
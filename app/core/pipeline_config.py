@@ -1,6 +1,9 @@
 from dataclasses import dataclass, field
 from typing import Optional, Any, Callable
 
+from app.api.schemas import QuestionBatchSchema, QuestionSchema, SubjectGroundingSchema
+from app.core.structured_output import OutputSchema
+
 @dataclass
 class PipelineConfig:
     """Configuration for a specific pipeline stage."""
@@ -11,18 +14,44 @@ class PipelineConfig:
     fail_fast_checks: list[Callable[[Any], bool]] = field(default_factory=list)
     # If true, list responses are accepted even if JSON object was requested
     relax_json_validation: bool = False 
+    # Persistent response cache TTL in seconds (None = stage is not cached)
+    cache_ttl: Optional[int] = None
+    # Stream the response and run fail_fast_checks on every partial object.
+    # Only for checks that reject drift (they must hold for any prefix of a
+    # valid response, e.g. "no question key" - not "has a subject key").
+    stream: bool = False
+    # Hedge a call still running after this percentile of the stage's recent
+    # latencies with a duplicate call (None = never hedge; see llm_hedging.py)
+    hedge_percentile: Optional[float] = None
+    # Bounds for the adaptive timeout learned from observed latencies
+    # (None = half / double `timeout`, which is also the cold-start value)
+    min_timeout: Optional[float] = None
+    max_timeout: Optional[float] = None
+    # When even the tolerant parser fails, send only the broken output back
+    # with a short "fix this JSON" prompt before spending a full retry
+    json_fix_call: bool = True
+    # Expected shape of the answer, requested as provider-side structured
+    # output where the model supports it (see structured_output.py)
+    output_schema: Optional[OutputSchema] = None
 
 class PipelineStageError(Exception):
     """Raised when a pipeline stage fails its specific constraints."""
     pass
 
+# --- Output Schemas ---
+
+QUESTION_OUTPUT = OutputSchema.from_model("question", QuestionSchema)
+QUESTION_BATCH_OUTPUT = OutputSchema.from_model("question_batch", QuestionBatchSchema)
+SUBJECT_GROUNDING_OUTPUT = OutputSchema.from_model("subject_grounding", SubjectGroundingSchema)
+
 # --- Stage Configurations ---
 
 TOPIC_EXTRACTION_CONFIG = PipelineConfig(
     stage_name="topic_extraction",
     max_retries=0,  # No retries - use fallback if fails
     timeout=5,      # Fast timeout: 5 seconds max
-    relax_json_validation=True # Accept "Good Enough" lists
+    relax_json_validation=True, # Accept "Good Enough" lists
+    stream=True     # Drift checks abort within the first few tokens
 )
 
 SECTION_GENERATION_CONFIG = PipelineConfig(
@@ -36,5 +65,53 @@ QUESTION_GENERATION_CONFIG = PipelineConfig(
     stage_name="question_generation",
     max_retries=1, # Only 1 retry for speed
     timeout=12,    # Reduced from 20
-    relax_json_validation=False # Strict schema for final output
+    relax_json_validation=False, # Strict schema for final output
+    hedge_percentile=95,  # p99 is a few slow calls: race a duplicate instead of retrying
+    output_schema=QUESTION_OUTPUT,
+)
+
+QUESTION_BATCH_CONFIG = PipelineConfig(
+    stage_name="question_batch",
+    max_retries=1,
+    timeout=15,
+    output_schema=QUESTION_BATCH_OUTPUT,
+)
+
+# Stages re-run on byte-identical syllabi: cached across restarts
+
+SUBJECT_GROUNDING_CONFIG = PipelineConfig(
+    stage_name="subject_grounding",
+    max_retries=1,
+    timeout=15,
+    # Never cache a grounding without a subject
+    fail_fast_checks=[lambda parsed: isinstance(parsed, dict) and "subject" in parsed],
+    cache_ttl=7 * 24 * 3600,
+    output_schema=SUBJECT_GROUNDING_OUTPUT,
+)
+
+OUTCOME_INTERPRETATION_CONFIG = PipelineConfig(
+    stage_name="outcome_interpretation",
+    max_retries=1,
+    timeout=15,
+    cache_ttl=7 * 24 * 3600,
 )
+
+SYLLABUS_STRUCTURING_CONFIG = PipelineConfig(
+    stage_name="syllabus_structuring",
+    max_retries=0,  # Single call, no retries
+    timeout=30,
+    fail_fast_checks=[lambda parsed: isinstance(parsed, dict) and "units" in parsed],
+    cache_ttl=7 * 24 * 3600,
+)
+
+
+# Stages whose effective timeouts are reported by /health/llm-timeouts
+STAGE_CONFIGS = [
+    TOPIC_EXTRACTION_CONFIG,
+    SECTION_GENERATION_CONFIG,
+    QUESTION_GENERATION_CONFIG,
+    QUESTION_BATCH_CONFIG,
+    SUBJECT_GROUNDING_CONFIG,
+    OUTCOME_INTERPRETATION_CONFIG,
+    SYLLABUS_STRUCTURING_CONFIG,
+]
@@ -1,3 +1,5 @@
+from app.core.text_rules import INFLECTIONS, TermMatcher
+
 BLOOM_VERBS = {
     "Apply": ["apply", "demonstrate", "use", "solve", "implement"],
     "Analyze": ["analyze", "compare", "differentiate", "examine", "justify"],
@@ -11,14 +13,24 @@ VAGUE_TERMS = [
     "write a note",
 ]
 
+INTENT_CUES = ["how", "why", "based on", "given", "using"]
 
-def score_question(question: str, bloom_level: str) -> int:
-    q_lower = question.lower()
+# Every list in one matcher: a question is scanned once for all of them
+_RULES = TermMatcher(
+    {
+        **{f"verb:{level}": verbs for level, verbs in BLOOM_VERBS.items()},
+        "intent": INTENT_CUES,
+        "vague": VAGUE_TERMS,
+    },
+    INFLECTIONS,
+)
+
+
+def _score(question: str, bloom_level: str, hits: set) -> int:
     score = 0
 
     # 1. Bloom verb presence (30)
-    verbs = BLOOM_VERBS.get(bloom_level, [])
-    if any(v in q_lower for v in verbs):
+    if f"verb:{bloom_level}" in hits:
         score += 30
 
     # 2. Length heuristic (25)
@@ -29,11 +41,23 @@ def score_question(question: str, bloom_level: str) -> int:
         score += 15
 
     # 3. Structural intent cues (25)
-    if any(x in q_lower for x in ["how", "why", "based on", "given", "using"]):
+    if "intent" in hits:
         score += 25
 
     # 4. Vague wording penalty (-20)
-    if any(v in q_lower for v in VAGUE_TERMS):
+    if "vague" in hits:
         score -= 20
 
     return max(score, 0)
+
+
+def score_question(question: str, bloom_level: str) -> int:
+    return _score(question, bloom_level, _RULES.rules(question))
+
+
+def score_questions(questions: list[str], bloom_level: str) -> list[int]:
+    """score_question() of each question, from one scan of the whole batch."""
+    return [
+        _score(question, bloom_level, hits)
+        for question, hits in zip(questions, _RULES.rules_many(questions))
+    ]
@@ -0,0 +1,362 @@
+"""
+Vectorised paraphrase detection for question text.
+
+similarity() and the MinHash index (app/core/dedup_index.py) compare
+characters, so a question that says the same thing in another order
+("Using a weighted graph, describe how shortest paths are found by
+Dijkstra's algorithm" vs "Explain how Dijkstra's algorithm finds the
+shortest paths in a weighted graph") slips through. This module embeds
+questions locally, without a model:
+
+- words are lowercased, stop words dropped and suffixes stripped; each
+  stem (and, at a quarter weight, each pair of stems) is TF-IDF weighted
+  and feature-hashed with a sign into SEMANTIC_DIM dimensions;
+- vectors are L2-normalised, so cosine similarity is a dot product;
+- the bank's vectors are saved as a float32 .npy matrix in
+  SEMANTIC_INDEX_DIR and memory-mapped read-only at startup, so the OS
+  pages it in and out and a restart does not re-encode the bank;
+  questions added since sit in an in-memory tail until the next save
+  (at shutdown);
+- a whole batch of new questions is scored against the bank, and against
+  an in-memory index of the paper's own questions, with a matrix
+  multiply per block instead of a loop per pair.
+
+Document frequencies keep counting as questions are added, but stored
+vectors keep the weights they were encoded with; delete the directory to
+re-encode the bank with current weights.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Document frequencies are counted per hashed feature in a larger space
+# than the vectors, so IDF is not blurred by the projection's collisions
+_DF_SPACE = 1 << 20
+_PAIR_WEIGHT = 0.25
+_WORD = re.compile(r"\w+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by each every for from how in into is it its of on or "
+    "that the their this to using use what when which why with your".split()
+)
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ed", "es", "s", "ly")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def features(text: str) -> list[tuple[int, float]]:
+    """(feature hash, weight) for the stems of `text` and, at a lower weight, adjacent stem pairs."""
+    stems = [_stem(word) for word in _WORD.findall(text.lower()) if word not in _STOP_WORDS]
+    hashed = [(zlib.crc32(stem.encode("utf-8")), 1.0) for stem in stems]
+    hashed += [
+        (zlib.crc32(f"{first} {second}".encode("utf-8")), _PAIR_WEIGHT)
+        for first, second in zip(stems, stems[1:])
+    ]
+    return hashed
+
+
+class SemanticIndex:
+    """
+    Question vectors with their ids. With a `path` (a directory), save()
+    writes them there as a float32 .npy matrix and open() maps that file
+    read-only; questions added since stay in an in-memory tail until the
+    next save. Without a path everything is in memory (e.g. the questions
+    of one paper, stored with the bank's encoding via append()). Safe to
+    share across threads.
+    """
+
+    def __init__(self, dim: int = 1024, path: Optional[str] = None, capacity: int = 1024):
+        self.dim = dim
+        self.path = path
+        self.documents = 0
+        self.max_id = 0
+        self.loaded = False
+        # Document frequency per hashed feature; allocated by the first add()
+        self._df: Optional[np.ndarray] = None
+        # Saved matrix (memory-mapped) and the rows added since
+        self._mapped = np.zeros((0, dim), dtype=np.float32)
+        self._mapped_ids = np.zeros(0, dtype=np.int64)
+        self._tail = np.zeros((capacity, dim), dtype=np.float32)
+        self._tail_ids = np.zeros(capacity, dtype=np.int64)
+        self._tail_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return len(self._mapped_ids) + self._tail_count
+
+    # ------------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------------
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """L2-normalised TF-IDF hashed vectors, one row per text."""
+        # The document frequencies must not change under us (add, sync)
+        with self._lock:
+            return self._encode(texts)
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        documents = max(self.documents, 1)
+        for row, text in enumerate(texts):
+            for value, weight in features(text):
+                if self._df is not None:
+                    weight *= math.log((1 + documents) / (1 + self._df[value % _DF_SPACE])) + 1.0
+                sign = 1.0 if value & 0x80000000 else -1.0
+                vectors[row, value % self.dim] += sign * weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _count_documents(self, texts: Iterable[str]) -> None:
+        if self._df is None:
+            self._df = np.zeros(_DF_SPACE, dtype=np.int32)
+        for text in texts:
+            for value in {value % _DF_SPACE for value, _ in features(text)}:
+                self._df[value] += 1
+            self.documents += 1
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def append(self, vectors: np.ndarray, ids: Optional[list[int]] = None) -> None:
+        """
+        Store already encoded vectors (e.g. the bank's encoding of a
+        paper's questions); without ids they are numbered in order.
+        """
+        with self._lock:
+            if ids is None:
+                ids = list(range(self.count + 1, self.count + len(vectors) + 1))
+            self._append(ids, vectors)
+
+    def _append(self, ids: list[int], vectors: np.ndarray) -> None:
+        if not len(ids):
+            return
+        needed = self._tail_count + len(ids)
+        if needed > len(self._tail_ids):
+            capacity = len(self._tail_ids)
+            while capacity < needed:
+                capacity *= 2
+            self._tail = np.resize(self._tail, (capacity, self.dim))
+            self._tail_ids = np.resize(self._tail_ids, capacity)
+        self._tail[self._tail_count:needed] = vectors
+        self._tail_ids[self._tail_count:needed] = ids
+        self._tail_count = needed
+        self.max_id = max(self.max_id, *ids)
+
+    def add(self, ids: list[int], texts: list[str], count_documents: bool = True) -> None:
+        """
+        Encode and append questions. Their document frequencies are
+        counted first, so they count towards their own weights, unless
+        already counted (count_documents=False).
+        """
+        if not texts:
+            return
+        with self._lock:
+            if count_documents:
+                self._count_documents(texts)
+            self._append(ids, self._encode(texts))
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def save(self) -> None:
+        """
+        Write the whole matrix, ids and document frequencies to `path` and
+        map the new matrix. Files are written aside and renamed, meta.json
+        last, so other processes mapping the old files are unaffected.
+        """
+        if self.path is None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            count = self.count
+            tmp = self._file("vectors.tmp.npy")
+            vectors = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(count, self.dim))
+            vectors[:len(self._mapped_ids)] = self._mapped
+            vectors[len(self._mapped_ids):] = self._tail[:self._tail_count]
+            vectors.flush()
+            del vectors
+            ids = np.concatenate([self._mapped_ids, self._tail_ids[:self._tail_count]])
+            np.save(self._file("ids.tmp.npy"), ids)
+            if self._df is not None:
+                np.save(self._file("df.tmp.npy"), self._df)
+            for name in ("vectors", "ids", "df"):
+                if os.path.exists(self._file(f"{name}.tmp.npy")):
+                    os.replace(self._file(f"{name}.tmp.npy"), self._file(f"{name}.npy"))
+            meta = {"dim": self.dim, "count": count, "documents": self.documents, "max_id": self.max_id}
+            with open(self._file("meta.tmp.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(self._file("meta.tmp.json"), self._file("meta.json"))
+
+            self._mapped = np.load(self._file("vectors.npy"), mmap_mode="r")
+            self._mapped_ids = ids
+            self._tail_count = 0
+
+    def open(self) -> bool:
+        """Map a saved index from `path`; False if there is none (or it is unusable)."""
+        try:
+            with open(self._file("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            vectors = np.load(self._file("vectors.npy"), mmap_mode="r")
+            ids = np.load(self._file("ids.npy"))
+            df = np.load(self._file("df.npy")) if meta["documents"] else None
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning(f"Ignoring unreadable semantic index in {self.path}: {exc}")
+            return False
+
+        if meta["dim"] != self.dim or vectors.shape != (meta["count"], self.dim) or len(ids) != meta["count"]:
+            logger.info(f"Semantic index in {self.path} does not match (dim {self.dim}); rebuilding")
+            return False
+
+        with self._lock:
+            self.documents = meta["documents"]
+            self.max_id = meta["max_id"]
+            self._df = df
+            self._mapped, self._mapped_ids = vectors, ids
+            self._tail_count = 0
+        return True
+
+    # ------------------------------------------------------------------
+    # Scoring
+    # ------------------------------------------------------------------
+
+    def best_matches(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """For each row of `vectors`: (id, cosine) of its closest indexed question."""
+        with self._lock:
+            best_ids = np.zeros(len(vectors), dtype=np.int64)
+            best_scores = np.full(len(vectors), -1.0, dtype=np.float32)
+            for matrix, ids in ((self._mapped, self._mapped_ids), (self._tail[:self._tail_count], self._tail_ids)):
+                if len(matrix) == 0:
+                    continue
+                scores = vectors @ matrix.T
+                best = scores.argmax(axis=1)
+                top = scores[np.arange(len(vectors)), best]
+                better = top > best_scores
+                best_ids[better] = ids[best[better]]
+                best_scores[better] = top[better]
+            return best_ids, best_scores
+
+    def duplicates(
+        self, vectors: np.ndarray, threshold: float, others: Iterable["SemanticIndex"] = ()
+    ) -> list[Optional[tuple[int, float]]]:
+        """
+        Score a batch of encoded questions against this index and `others`
+        (a matrix multiply per stored block). Returns, per row, the (id, cosine) of
+        its best match at or above `threshold`, or None.
+        """
+        result: list[Optional[tuple[int, float]]] = [None] * len(vectors)
+        for index in (self, *others):
+            ids, scores = index.best_matches(vectors)
+            for row, (doc_id, score) in enumerate(zip(ids, scores)):
+                if score >= threshold and (result[row] is None or score > result[row][1]):
+                    result[row] = (int(doc_id), float(score))
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Process-wide index of the question bank
+# ---------------------------------------------------------------------------
+
+_bank_index: Optional[SemanticIndex] = None
+
+
+def get_bank_index() -> SemanticIndex:
+    """
+    The bank's index. Until load() has run (API or worker startup) it is
+    empty and not maintained, since it would only hold part of the bank.
+    """
+    global _bank_index
+    if _bank_index is None:
+        _bank_index = SemanticIndex(dim=settings.SEMANTIC_DIM, path=settings.SEMANTIC_INDEX_DIR)
+    return _bank_index
+
+
+def index_questions(ids: list[int], texts: list[str]) -> None:
+    """Add newly inserted questions (call after their commit)."""
+    index = get_bank_index()
+    if index.loaded:
+        index.add(ids, texts)
+
+
+def sync(db: Session, batch_size: int = 1000, count_documents: bool = True) -> int:
+    """Encode the questions inserted since the last sync (ids above max_id); returns how many."""
+    from app.db.models import Question
+
+    index = get_bank_index()
+    added = 0
+    while True:
+        rows = (
+            db.query(Question.id, Question.question_text)
+            .filter(Question.id > index.max_id)
+            .order_by(Question.id)
+            .limit(batch_size)
+            .all()
+        )
+        index.add(
+            [question_id for question_id, _ in rows],
+            [text or "" for _, text in rows],
+            count_documents=count_documents,
+        )
+        added += len(rows)
+        if len(rows) < batch_size:
+            return added
+
+
+def load(db: Session, persist: bool = True) -> SemanticIndex:
+    """
+    Startup: map the saved matrix (if any), then encode the questions
+    added since. persist=False (generation workers) keeps the index in
+    memory, encoded from the database, and leaves the files to the API.
+    """
+    global _bank_index
+    _bank_index = SemanticIndex(dim=settings.SEMANTIC_DIM, path=settings.SEMANTIC_INDEX_DIR if persist else None)
+    index = _bank_index
+    restored = persist and index.open()
+    if not restored:
+        # Whole bank: count document frequencies first so the first
+        # questions are weighted like the last ones
+        from app.db.models import Question
+
+        index._count_documents(text or "" for (text,) in db.query(Question.question_text).yield_per(1000))
+        added = sync(db, count_documents=False)
+    else:
+        added = sync(db)
+    index.loaded = True
+    if not restored:
+        index.save()
+    logger.info(
+        f"Semantic index ready: {index.count} questions "
+        f"({'mapped + ' if restored else ''}{added} encoded, dim {index.dim})"
+    )
+    return index
+
+
+def save() -> None:
+    index = get_bank_index()
+    if not index.loaded:
+        return
+    try:
+        index.save()
+    except OSError as exc:
+        logger.warning(f"Could not save semantic index to {index.path}: {exc}")
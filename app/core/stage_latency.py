@@ -0,0 +1,126 @@
+"""
+In-process latency tracking per LLM pipeline stage.
+
+Every SafeLLM call records how long it took (timed-out calls are recorded
+at the timeout they hit, so a too-tight timeout shows up as a pile of
+samples at the limit instead of disappearing). From these samples:
+
+- a rolling window gives percentiles for hedge delays (llm_hedging.py)
+  and adaptive timeouts (effective_timeout below);
+- cumulative histograms are kept for monitoring (/health/llm-timeouts).
+
+Adaptive timeout = rolling percentile x margin, clamped to the stage's
+floor and ceiling. Until a stage has min_samples, its configured timeout
+is used as is.
+"""
+
+from bisect import bisect_left
+from collections import deque
+from typing import Optional
+
+from app.core.config import settings
+
+# Histogram bucket upper bounds in seconds (plus an implicit +Inf bucket)
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 12.0, 16.0, 24.0, 32.0, 60.0)
+
+
+class _StageStats:
+    __slots__ = ("window", "bucket_counts", "count", "total", "timeouts")
+
+    def __init__(self, window: int):
+        self.window = deque(maxlen=window)
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.timeouts = 0
+
+
+class StageLatencyTracker:
+    """Rolling window and cumulative histogram of call latencies (seconds) per stage."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._stages: dict[str, _StageStats] = {}
+
+    def record(self, stage: str, latency: float, timed_out: bool = False) -> None:
+        stats = self._stages.get(stage)
+        if stats is None:
+            stats = self._stages[stage] = _StageStats(self.window)
+        stats.window.append(latency)
+        stats.bucket_counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        stats.count += 1
+        stats.total += latency
+        if timed_out:
+            stats.timeouts += 1
+
+    def samples(self, stage: str) -> int:
+        stats = self._stages.get(stage)
+        return len(stats.window) if stats else 0
+
+    def percentile(self, stage: str, percentile: float) -> Optional[float]:
+        """Nearest-rank percentile of the rolling window, or None until min_samples."""
+        stats = self._stages.get(stage)
+        if stats is None or len(stats.window) < self.min_samples:
+            return None
+        ordered = sorted(stats.window)
+        rank = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def histogram(self, stage: str) -> Optional[dict]:
+        """Cumulative (Prometheus-style) bucket counts since startup."""
+        stats = self._stages.get(stage)
+        if stats is None:
+            return None
+        buckets, running = {}, 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), stats.bucket_counts):
+            running += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = running
+        return {
+            "buckets": buckets,
+            "count": stats.count,
+            "sum": round(stats.total, 3),
+            "timeouts": stats.timeouts,
+        }
+
+    def stages(self) -> list[str]:
+        return list(self._stages)
+
+    def snapshot(self) -> dict:
+        return {
+            stage: {
+                "samples": self.samples(stage),
+                "p50": self.percentile(stage, 50),
+                "p95": self.percentile(stage, 95),
+                "p99": self.percentile(stage, 99),
+            }
+            for stage in self._stages
+        }
+
+
+_tracker: Optional[StageLatencyTracker] = None
+
+
+def get_latency_tracker() -> StageLatencyTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = StageLatencyTracker()
+    return _tracker
+
+
+def timeout_bounds(cfg) -> tuple[float, float]:
+    """(floor, ceiling) for a stage: explicit config values, else half / double its timeout."""
+    floor = cfg.min_timeout if cfg.min_timeout is not None else cfg.timeout / 2
+    ceiling = cfg.max_timeout if cfg.max_timeout is not None else cfg.timeout * 2
+    return floor, ceiling
+
+
+def effective_timeout(cfg) -> float:
+    """Timeout to apply to the next call of this stage."""
+    if not settings.LLM_ADAPTIVE_TIMEOUTS:
+        return cfg.timeout
+    observed = get_latency_tracker().percentile(cfg.stage_name, settings.LLM_TIMEOUT_PERCENTILE)
+    if observed is None:
+        return cfg.timeout
+    floor, ceiling = timeout_bounds(cfg)
+    return min(ceiling, max(floor, observed * settings.LLM_TIMEOUT_MARGIN))
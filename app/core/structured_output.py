@@ -0,0 +1,95 @@
+"""
+Provider-side structured output (JSON mode / JSON schema) for LLMClient.
+
+A stage that knows the shape of its answer attaches an OutputSchema
+(PipelineConfig.output_schema, or llm_output_schema directly). LLMClient
+then asks the provider for constrained output, so the response parses by
+construction, and in json_schema mode drops the "return ONLY valid JSON"
+boilerplate from the system prompt.
+
+Support is detected per (provider, model) at run time, from the most to
+the least capable mode:
+
+- json_schema: response_format={"type": "json_schema", ...}
+- json_object: response_format={"type": "json_object"} (valid JSON, any shape)
+- none: the plain prompt, as before
+
+A provider answering 400 to a response_format it does not support moves
+the model down one mode for the rest of the process, and the call is sent
+again straight away. LLM_STRUCTURED_OUTPUT pins a mode ("off" = none).
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MODES = ["json_schema", "json_object", "none"]
+
+# (provider, model) -> best mode not yet rejected
+_capabilities: dict[tuple[str, str], str] = {}
+
+# Formatting instructions that constrained output makes redundant
+_PHRASE = (
+    r"(?:you must )?return only (?:a )?valid json(?: object)?"
+    r"|no markdown(?:, no [a-z ]+)*"
+    r"|no leading or trailing text"
+    r"|if unsure, return \{\}"
+    r"|escape \\n as \S+?"
+)
+_BOILERPLATE_LINE = re.compile(
+    rf"^[ \t]*(?:-[ \t]*)?(?:(?:{_PHRASE})[.!]?[ \t]*)+$\n?", re.IGNORECASE | re.MULTILINE
+)
+
+
+@dataclass(frozen=True)
+class OutputSchema:
+    name: str
+    schema: dict
+
+    @classmethod
+    def from_model(cls, name: str, model: type[BaseModel]) -> "OutputSchema":
+        return cls(name, model.model_json_schema())
+
+    def response_format(self, mode: str) -> dict:
+        if mode == "json_schema":
+            return {"type": "json_schema", "json_schema": {"name": self.name, "schema": self.schema}}
+        return {"type": "json_object"}
+
+
+def structured_mode(model: str) -> str:
+    """Mode to request for this model: the configured one, or the best not yet rejected."""
+    configured = settings.LLM_STRUCTURED_OUTPUT
+    if configured == "off":
+        return "none"
+    if configured != "auto":
+        return configured
+    return _capabilities.get((settings.LLM_PROVIDER, model), MODES[0])
+
+
+def downgrade(model: str, mode: str) -> str:
+    """Record that the provider rejected mode for this model; returns the next mode to try."""
+    fallback = MODES[min(MODES.index(mode) + 1, len(MODES) - 1)]
+    _capabilities[(settings.LLM_PROVIDER, model)] = fallback
+    logger.warning(f"Provider does not support {mode} output for {model}; using {fallback}")
+    return fallback
+
+
+def is_unsupported_error(exc: Exception) -> bool:
+    """A 400 about response_format itself (not a generation that failed validation)."""
+    if getattr(exc, "status_code", None) != 400:
+        return False
+    text = str(exc).lower()
+    mentions_format = any(word in text for word in ("response_format", "response format", "json_schema", "json mode"))
+    return mentions_format and "support" in text
+
+
+def strip_json_boilerplate(system_prompt: str) -> str:
+    trimmed = _BOILERPLATE_LINE.sub("", system_prompt)
+    trimmed = re.sub(r"\n{3,}", "\n\n", trimmed).strip()
+    return trimmed or "Respond in JSON."
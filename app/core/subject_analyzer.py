@@ -7,6 +7,7 @@ THIS IS THE SINGLE SOURCE OF TRUTH FOR SUBJECT GROUNDING.
 
 from app.core.llm_safe import SafeLLM
 from app.core.generation_safety import UNIVERSAL_SYSTEM_PREFIX
+from app.core.pipeline_config import SUBJECT_GROUNDING_CONFIG
 
 
 class SubjectAnalyzer:
@@ -121,7 +122,11 @@ Now analyze the given course.
 """
 
         try:
-            result = await self.llm.generate_json(system_prompt, user_prompt)
+            result = await self.llm.generate_json(
+                system_prompt,
+                user_prompt,
+                config=SUBJECT_GROUNDING_CONFIG
+            )
         except Exception:
             # Fall back to safe defaults when JSON parsing fails so the pipeline can continue.
             result = {
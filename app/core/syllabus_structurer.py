@@ -8,17 +8,19 @@ import json
 import logging
 from typing import Optional
 
-from app.core.llm_client import LLMClient
-from app.core.json_utils import safe_llm_json_parse
+from app.core.llm_safe import SafeLLM
+from app.core.pipeline_config import SYLLABUS_STRUCTURING_CONFIG, PipelineStageError
 
 logger = logging.getLogger(__name__)
 
+STRUCTURING_SYSTEM_PROMPT = "You organize syllabus text into JSON. Return ONLY valid JSON."
+
 
 class SyllabusStructurer:
     """Service to structure raw syllabus text using LLM."""
     
     def __init__(self):
-        self.llm = LLMClient()
+        self.llm = SafeLLM()
     
     @staticmethod
     def create_structuring_prompt(raw_syllabus_text: str) -> str:
@@ -67,7 +69,7 @@ Output format (JSON only, no additional text):
 IMPORTANT: Return ONLY valid JSON. No markdown, no code blocks, no explanation."""
         return prompt
     
-    def structure_syllabus(self, raw_syllabus_text: str) -> dict:
+    async def structure_syllabus(self, raw_syllabus_text: str) -> dict:
         """
         Structure raw syllabus text using LLM in one call.
         
@@ -96,13 +98,13 @@ IMPORTANT: Return ONLY valid JSON. No markdown, no code blocks, no explanation."
         logger.debug(f"Raw text length: {len(raw_syllabus_text)} characters")
         
         try:
-            # Single LLM call - no retries as per requirement
-            response = self.llm.generate(prompt)
-            
-            logger.debug(f"LLM Response: {response[:200]}...")
-            
-            # Parse JSON response
-            structured = safe_llm_json_parse(response)
+            # Single LLM call - no retries as per requirement.
+            # Identical syllabi are served from the persistent response cache.
+            structured = await self.llm.generate_json(
+                STRUCTURING_SYSTEM_PROMPT,
+                prompt,
+                config=SYLLABUS_STRUCTURING_CONFIG
+            )
             
             # Validate structure
             self._validate_structure(structured)
@@ -115,10 +117,9 @@ IMPORTANT: Return ONLY valid JSON. No markdown, no code blocks, no explanation."
             
             return structured
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse LLM JSON response: {str(e)}")
-            logger.error(f"Response was: {response[:500]}")
-            raise ValueError(f"LLM returned invalid JSON: {str(e)}")
+        except PipelineStageError as e:
+            logger.error(f"LLM response is not a structured syllabus: {str(e)}")
+            raise ValueError(f"LLM returned invalid structure: {str(e)}")
         
         except Exception as e:
             logger.error(f"Error during syllabus structuring: {str(e)}")
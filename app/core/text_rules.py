@@ -0,0 +1,185 @@
+"""
+Compiled term matching for the text validators.
+
+Subject guards, forbidden-topic checks and the quality/Bloom scorers all
+look for lists of words in question text. Each list used to be scanned
+term by term with `word in text.lower()`, which costs one pass per term
+and matches inside words ("ip" in "relationship", "use" in "because").
+
+A TermMatcher compiles a list of terms (or several named lists) once into
+a single regex, the terms factored into a prefix trie so the engine
+skips to their first characters and branches on one character at a time. Terms are whole words or phrases
+(any whitespace between the words of a phrase, case-insensitive),
+optionally followed by an inflection suffix. Every term starting at each
+word is reported, so overlapping terms from different lists ("briefly
+explain" / "explain") are all found in one pass, and rules_many() scans a
+whole batch of questions at once.
+
+matcher() caches compiled lists, so a paper's forbidden topics are
+compiled once for all of its sections and regenerations.
+"""
+
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Iterable, Mapping, Optional, Union
+
+# Suffixes a term may carry and still match
+PLURAL = ("s", "es")
+INFLECTIONS = ("s", "es", "d", "ed", "ing")
+
+_SPACES = re.compile(r"\s+")
+# Joins a batch of texts for one scan; never part of a match
+_SEPARATOR = "\x00"
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _key(term: str) -> str:
+    return _SPACES.sub(" ", term.strip()).lower()
+
+
+def _trie_pattern(keys: Iterable[str]) -> str:
+    """
+    Regex alternation of `keys` factored by common prefix, so the engine
+    branches on one character at a time instead of trying every term.
+    Longer terms come first where one term is a prefix of another.
+    """
+    trie: dict = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        end = "" in node
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + build(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if end:
+            # A term ends here; the longer ones are tried first
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class TermMatcher:
+    """
+    Word-boundary matcher for a list of terms, or for named rules
+    ({rule: terms}) whose hits are reported by rule name.
+    """
+
+    def __init__(
+        self,
+        terms: Union[Iterable[str], Mapping[str, Iterable[str]]],
+        suffixes: Iterable[str] = PLURAL,
+    ):
+        rules = terms if isinstance(terms, Mapping) else {None: terms}
+        # key -> (term as given, names of the rules listing it)
+        self._terms: dict[str, tuple[str, set]] = {}
+        for rule, rule_terms in rules.items():
+            for term in rule_terms:
+                if term and term.strip():
+                    self._terms.setdefault(_key(term), (term, set()))[1].add(rule)
+
+        self._regex = None
+        if self._terms:
+            suffix = "|".join(re.escape(s) for s in sorted(set(suffixes), key=len, reverse=True))
+            ending = rf"(?:{suffix})?(?!\w)" if suffix else r"(?!\w)"
+            # Starts with the trie's first characters, which lets the engine
+            # skip ahead to them; the word boundary before a match is checked
+            # after each match. Matched against lowercased text: IGNORECASE is slower
+            self._regex = re.compile(rf"({_trie_pattern(self._terms)}){ending}")
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _matches(self, text: str) -> list:
+        """Matches of every term starting a word of lowercased `text`, in order."""
+        matches = []
+        if self._regex is None:
+            return matches
+        search = self._regex.search
+        match = search(text)
+        while match is not None:
+            start = match.start()
+            if not start or not _is_word_char(text[start - 1]):
+                matches.append(match)
+            # From the next character, so a term inside this match is found too
+            match = search(text, start + 1)
+        return matches
+
+    def _entry(self, match) -> tuple[str, set]:
+        """(term, rules) of a match."""
+        entry = self._terms.get(match.group(1))
+        return entry if entry is not None else self._terms[_SPACES.sub(" ", match.group(1))]
+
+    def find(self, text: str) -> Optional[str]:
+        """The first term in `text` (as given to the matcher), or None."""
+        if self._regex is None or not isinstance(text, str):
+            return None
+        text = text.lower()
+        search = self._regex.search
+        match = search(text)
+        while match is not None:
+            start = match.start()
+            if not start or not _is_word_char(text[start - 1]):
+                return self._entry(match)[0]
+            match = search(text, start + 1)
+        return None
+
+    def terms(self, text: str) -> list[str]:
+        """Distinct terms in `text`, in order of appearance."""
+        if not isinstance(text, str):
+            return []
+        return list(dict.fromkeys(self._entry(match)[0] for match in self._matches(text.lower())))
+
+    def rules(self, text: str) -> set:
+        """Names of the rules with a term in `text`."""
+        found = set()
+        if isinstance(text, str):
+            for match in self._matches(text.lower()):
+                found.update(self._entry(match)[1])
+        return found
+
+    def rules_many(self, texts: Iterable[str]) -> list[set]:
+        """rules() of each text of a batch, from one scan of the batch joined together."""
+        texts = [text.lower() if isinstance(text, str) else "" for text in texts]
+        starts, offset = [], 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(_SEPARATOR)
+
+        found: list[set] = [set() for _ in texts]
+        for match in self._matches(_SEPARATOR.join(texts)):
+            found[bisect_right(starts, match.start()) - 1].update(self._entry(match)[1])
+        return found
+
+    def starts(self, text: str) -> Optional[str]:
+        """The term `text` starts with (after leading whitespace), or None."""
+        if self._regex is None or not isinstance(text, str):
+            return None
+        text = text.lower()
+        match = self._regex.match(text, len(text) - len(text.lstrip()))
+        return self._entry(match)[0] if match else None
+
+
+@lru_cache(maxsize=512)
+def _cached_matcher(terms: tuple[str, ...], suffixes: tuple[str, ...]) -> TermMatcher:
+    return TermMatcher(terms, suffixes)
+
+
+def matcher(terms: Optional[Iterable[str]], suffixes: Iterable[str] = PLURAL) -> TermMatcher:
+    """
+    A compiled TermMatcher for `terms`, shared by every call with the same
+    list (e.g. one paper's forbidden topics across all of its sections).
+    """
+    return _cached_matcher(tuple(terms or ()), tuple(suffixes))
@@ -0,0 +1,119 @@
+"""
+Local syllabus-topic tagging for questions (no LLM).
+
+Question.topics_used feeds syllabus coverage (app/core/analytics.py) and
+the replace-from-bank topic guard, so every stored question should list
+the paper's core topics it covers. A TopicTagger is compiled once per
+topic list and tags questions in two steps:
+
+1. the topics' names (and the parts of "Depth First Search (DFS)" in and
+   out of the parentheses) go into one TermMatcher (app/core/text_rules),
+   so the whole batch is scanned once for every topic phrase;
+2. topics not named verbatim are matched on their words: both sides are
+   lowercased, stop words dropped and lemmatised ("paths" -> "path",
+   "trees" -> "tree"), a word also counts when it is a close spelling
+   (difflib ratio >= fuzzy, e.g. "colouring"/"coloring"), and the topic
+   is tagged when at least `overlap` of its words are in the question.
+"""
+
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from app.core.text_rules import TermMatcher
+
+_WORD = re.compile(r"\w+")
+_PARENTHESISED = re.compile(r"\(([^)]*)\)")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from how in into is it its of on or the their this to "
+    "using use what when which why with basic basics concept concepts fundamental fundamentals "
+    "introduction overview".split()
+)
+
+
+def lemma(word: str) -> str:
+    """Crude English lemma: plural and verb endings stripped."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("sses", "shes", "ches", "xes", "zes")):
+        return word[:-2]
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def lemmas(text: str) -> list[str]:
+    return [lemma(word) for word in _WORD.findall(text.lower()) if word not in _STOP_WORDS]
+
+
+@lru_cache(maxsize=65536)
+def _close(a: str, b: str, threshold: float) -> bool:
+    matcher = SequenceMatcher(None, a, b)
+    return matcher.real_quick_ratio() >= threshold and matcher.ratio() >= threshold
+
+
+def _variants(topic: str) -> list[str]:
+    """The topic's name, without its parenthesised part, and that part."""
+    variants = [topic]
+    inner = _PARENTHESISED.findall(topic)
+    if inner:
+        variants.append(_PARENTHESISED.sub(" ", topic))
+        variants.extend(inner)
+    return variants
+
+
+class TopicTagger:
+    """Tags question text with the topics of one syllabus (compiled once, reused for every question)."""
+
+    def __init__(self, topics: Iterable[str], fuzzy: float = 0.85, overlap: float = 0.6):
+        self.topics = list(dict.fromkeys(topic.strip() for topic in topics if topic and topic.strip()))
+        self.fuzzy = fuzzy
+        self.overlap = overlap
+        self._phrases = TermMatcher({topic: _variants(topic) for topic in self.topics})
+        self._lemmas = {topic: frozenset(lemmas(topic)) for topic in self.topics}
+
+    def _has(self, word: str, words: set[str]) -> bool:
+        if word in words:
+            return True
+        # Close spellings: only words of about the same length can reach the ratio
+        return any(
+            abs(len(other) - len(word)) <= 2 and _close(word, other, self.fuzzy)
+            for other in words if other[:1] == word[:1]
+        )
+
+    def tag_many(self, texts: list[str]) -> list[list[str]]:
+        """Topics of each text, in syllabus order."""
+        tagged = []
+        for text, found in zip(texts, self._phrases.rules_many(texts)):
+            words = set(lemmas(text)) if isinstance(text, str) else set()
+            for topic in self.topics:
+                wanted = self._lemmas[topic]
+                if topic in found or not wanted:
+                    continue
+                if sum(self._has(word, words) for word in wanted) >= self.overlap * len(wanted):
+                    found.add(topic)
+            tagged.append([topic for topic in self.topics if topic in found])
+        return tagged
+
+    def tag(self, text: str) -> list[str]:
+        return self.tag_many([text])[0]
+
+
+@lru_cache(maxsize=256)
+def _cached_tagger(topics: tuple[str, ...]) -> TopicTagger:
+    return TopicTagger(topics)
+
+
+def tagger(topics: Optional[Iterable[str]]) -> TopicTagger:
+    """The compiled TopicTagger of a topic list (e.g. a paper's core_topics), shared by every call."""
+    return _cached_tagger(tuple(topics or ()))
+
+
+def tag_questions(topics: Optional[Iterable[str]], texts: list[str]) -> list[list[str]]:
+    """topics_used for each of `texts` against `topics`."""
+    return tagger(topics).tag_many(texts)
@@ -0,0 +1,155 @@
+"""
+One-off data backfills for columns added after questions were stored.
+
+    python -m app.db.backfill content-hash      # questions.content_hash
+    python -m app.db.backfill topics            # questions.topics_used
+
+Each job walks its table in id order, one batch per transaction, and only
+touches rows that still need the value, so it can be stopped and re-run
+at any time.
+"""
+
+import argparse
+import logging
+import sys
+from types import SimpleNamespace
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.analytics import calculate_syllabus_coverage
+from app.core.duplicate_checker import content_hash
+from app.core.topic_tagger import tag_questions
+from app.db.models import PaperQuestion, PaperSection, Question, QuestionPaper
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_content_hashes(db: Session, batch_size: int = 500) -> dict:
+    """
+    Set content_hash on questions stored before the column existed.
+
+    content_hash is unique together with marks, bloom_level and difficulty
+    (uq_questions_content), so when several stored questions share all
+    four only the lowest id gets the hash; the others keep NULL and are
+    counted as duplicates (they stay linked to their papers).
+    Returns {"hashed": n, "duplicates": n}.
+    """
+    counts = {"hashed": 0, "duplicates": 0}
+    last_id = 0
+    while True:
+        rows = (
+            db.query(Question.id, Question.question_text, Question.marks, Question.bloom_level, Question.difficulty)
+            .filter(Question.content_hash.is_(None), Question.id > last_id)
+            .order_by(Question.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return counts
+        last_id = rows[-1][0]
+
+        # First id per (hash, marks, bloom_level, difficulty) within the batch
+        owners: dict[tuple, int] = {}
+        for question_id, text, *slot in rows:
+            owners.setdefault((content_hash(text or ""), *slot), question_id)
+        taken = set(
+            db.query(Question.content_hash, Question.marks, Question.bloom_level, Question.difficulty)
+            .filter(Question.content_hash.in_({key[0] for key in owners}))
+            .all()
+        )
+        updates = [
+            {"id": question_id, "content_hash": key[0]}
+            for key, question_id in owners.items()
+            if key not in taken
+        ]
+        if updates:
+            db.execute(update(Question), updates)
+        db.commit()
+
+        counts["hashed"] += len(updates)
+        counts["duplicates"] += len(rows) - len(updates)
+        logger.info(f"Hashed questions up to id {last_id}: {counts['hashed']} hashed, {counts['duplicates']} duplicates")
+
+
+def backfill_topics(db: Session, batch_size: int = 50) -> dict:
+    """
+    Tag stored questions with the core topics of the papers they are in
+    (app/core/topic_tagger.py). Topics are added to topics_used, never
+    removed, so a question in several papers collects the topics of each.
+    Each paper's coverage_percent is recalculated with the new tags.
+    Walks the papers in id order; returns {"papers": n, "tagged": n}, the
+    questions whose topics_used changed.
+    """
+    counts = {"papers": 0, "tagged": 0}
+    last_id = 0
+    while True:
+        papers = (
+            db.query(QuestionPaper.id, QuestionPaper.core_topics, QuestionPaper.analytics)
+            .filter(QuestionPaper.id > last_id)
+            .order_by(QuestionPaper.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not papers:
+            return counts
+        last_id = papers[-1][0]
+
+        for paper_id, core_topics, analytics in papers:
+            if not core_topics:
+                continue
+            rows = (
+                db.query(Question.id, Question.question_text, Question.topics_used)
+                .join(PaperQuestion, PaperQuestion.question_id == Question.id)
+                .join(PaperSection, PaperSection.id == PaperQuestion.section_id)
+                .filter(PaperSection.paper_id == paper_id)
+                .all()
+            )
+            updates, tagged = [], []
+            for (question_id, _, topics_used), topics in zip(
+                rows, tag_questions(core_topics, [text or "" for _, text, _ in rows])
+            ):
+                merged = list(dict.fromkeys([*(topics_used or []), *topics]))
+                tagged.append(SimpleNamespace(topics_used=merged))
+                if merged != list(topics_used or []):
+                    updates.append({"id": question_id, "topics_used": merged})
+            if updates:
+                db.execute(update(Question), updates)
+                db.execute(
+                    update(QuestionPaper)
+                    .where(QuestionPaper.id == paper_id)
+                    .values(analytics={
+                        **(analytics or {}),
+                        "coverage_percent": calculate_syllabus_coverage(core_topics, tagged),
+                    })
+                )
+            db.commit()
+            counts["papers"] += 1
+            counts["tagged"] += len(updates)
+        logger.info(f"Tagged papers up to id {last_id}: {counts['tagged']} questions in {counts['papers']} papers")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("job", choices=["content-hash", "topics"])
+    parser.add_argument("--batch-size", type=int, help="questions (content-hash) or papers (topics) per batch")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.job == "content-hash":
+            counts = backfill_content_hashes(db, args.batch_size or 500)
+            print(f"{counts['hashed']} questions hashed, {counts['duplicates']} exact duplicates left unhashed")
+        else:
+            counts = backfill_topics(db, args.batch_size or 50)
+            print(f"{counts['tagged']} questions tagged in {counts['papers']} papers")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,4 +8,8 @@ from app.db.models import (
     QuestionPaper,
     PaperSection,
     PaperQuestion,
+    GenerationJobRecord,
+    GenerationJobEvent,
+    GenerationRun,
+    GenerationCheckpoint,
 )
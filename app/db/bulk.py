@@ -0,0 +1,118 @@
+"""
+Bulk writes for generated questions and their paper links.
+
+Adding Question objects one at a time costs an INSERT plus a flush and a
+refresh per question before its PaperQuestion can be linked. These
+helpers send Core INSERTs instead: all questions in one INSERT ...
+RETURNING id (SQLAlchemy batches the rows into multi-row VALUES), then all
+links in one more statement. Nothing is committed here; callers commit
+once, together with whatever else belongs to the same change.
+
+Question INSERTs are upserts on (content_hash, marks, bloom_level,
+difficulty), unique in uq_questions_content: a question whose canonical
+text is already in the bank with the same marks, Bloom level and
+difficulty resolves to the existing row's id (by index, in the same
+statement) instead of adding a copy; an untagged existing row takes the
+new row's topics_used. The same text for another kind of slot is a new
+row, so a paper never shows another slot's marks.
+
+Paper generation rejects LLM questions that repeat or paraphrase a bank
+question (see semantic_index), so in practice the reuse applies to
+template questions, to papers generated concurrently, and to processes
+running without the bank's vectors loaded.
+"""
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.duplicate_checker import content_hash
+from app.db.models import PaperQuestion, Question
+
+
+def question_row(question_data: dict, outcome_id: int | None = None, **columns) -> dict:
+    """Question column values for a generated question_data dict (text, bloom_level, ...)."""
+    return {
+        "outcome_id": outcome_id,
+        "question_text": question_data["text"],
+        "bloom_level": question_data["bloom_level"],
+        "difficulty": question_data["difficulty"],
+        "marks": question_data["marks"],
+        "quality_score": question_data.get("quality_score"),
+        "content_hash": content_hash(question_data["text"]),
+        "topics_used": question_data.get("topics_used") or [],
+        **columns,
+    }
+
+
+# Columns that identify a bank question (uq_questions_content)
+CONTENT_KEY = ("content_hash", "marks", "bloom_level", "difficulty")
+
+
+def content_key(row: dict) -> tuple:
+    """The uq_questions_content values of a Question row dict."""
+    row_hash = row.get("content_hash") or content_hash(row["question_text"])
+    return (row_hash, row["marks"], row["bloom_level"], row["difficulty"])
+
+
+def find_question(db: Session, text: str, marks: int, bloom_level: str, difficulty: str) -> Question | None:
+    """The bank question with this canonical text for the same kind of slot, if any (uq_questions_content lookup)."""
+    return db.query(Question).filter(
+        Question.content_hash == content_hash(text),
+        Question.marks == marks,
+        Question.bloom_level == bloom_level,
+        Question.difficulty == difficulty,
+    ).first()
+
+
+def insert_questions(db: Session, rows: list[dict]) -> list[int]:
+    """
+    Upsert Question rows in one statement; returns their ids in the order
+    of `rows`. Rows whose content_hash, marks, bloom_level and difficulty
+    are already in the bank (or earlier in `rows`) get the id of that
+    question and insert nothing.
+    """
+    if not rows:
+        return []
+    # One row per key: a multi-row upsert may not touch the same row twice
+    unique: dict[tuple, dict] = {}
+    for row in rows:
+        key = content_key(row)
+        unique.setdefault(key, {**row, "content_hash": key[0]})
+
+    statement = pg_insert(Question)
+    statement = statement.on_conflict_do_update(
+        index_elements=[getattr(Question, column) for column in CONTENT_KEY],
+        # An update that changes nothing but untagged topics, so RETURNING
+        # also yields the existing row's id
+        set_={
+            "content_hash": statement.excluded.content_hash,
+            "topics_used": case(
+                (func.cardinality(Question.topics_used) > 0, Question.topics_used),
+                else_=statement.excluded.topics_used,
+            ),
+        },
+    ).returning(Question.id, sort_by_parameter_order=True)
+    ids = dict(zip(unique, db.execute(statement, list(unique.values())).scalars()))
+    return [ids[content_key(row)] for row in rows]
+
+
+def insert_paper_questions(db: Session, links: list[dict]) -> None:
+    """Insert PaperQuestion rows (section_id, question_id, question_order) in one statement."""
+    if links:
+        db.execute(insert(PaperQuestion), links)
+
+
+def save_paper_questions(db: Session, entries: list[tuple[int, int, dict]]) -> list[int]:
+    """
+    Store generated questions and link them to their sections: two
+    statements whatever the count. `entries` holds (section_id,
+    question_order, question_data); returns the question ids (those of
+    existing bank questions for exact duplicates).
+    """
+    question_ids = insert_questions(db, [question_row(data) for _, _, data in entries])
+    insert_paper_questions(db, [
+        {"section_id": section_id, "question_id": question_id, "question_order": order}
+        for (section_id, order, _), question_id in zip(entries, question_ids)
+    ])
+    return question_ids
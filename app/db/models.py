@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Text, ARRAY, ForeignKey, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Text, ARRAY, ForeignKey, JSON, DateTime, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy import TIMESTAMP
@@ -38,8 +38,18 @@ class Question(Base):
     # Analytics Support
     topics_used = Column(ARRAY(String), default=[])
 
+    # sha256 of the canonical text (duplicate_checker.content_hash), so an
+    # exact duplicate is found by index instead of by scanning
+    content_hash = Column(String(64), nullable=True)
+
     outcome = relationship("CourseOutcome")
 
+    __table_args__ = (
+        # One bank row per text and slot constraints: the same text for
+        # other marks, Bloom level or difficulty is another question
+        Index("uq_questions_content", "content_hash", "marks", "bloom_level", "difficulty", unique=True),
+    )
+
 
 class AuditLogDB(Base):
     __tablename__ = "audit_logs"
@@ -124,3 +134,118 @@ class PaperQuestion(Base):
 
     section = relationship("PaperSection", back_populates="questions")
     question = relationship("Question")
+
+
+class GenerationJobRecord(Base):
+    """A queued paper generation job (see app/core/job_queue.py)."""
+
+    __tablename__ = "generation_jobs"
+
+    id = Column(String(32), primary_key=True)
+    paper_id = Column(Integer, ForeignKey("question_papers.id"), nullable=False)
+
+    status = Column(String(20), nullable=False, default="queued")
+    # queued | running | succeeded | failed
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Lease of the worker running the job (renewed by its heartbeats)
+    worker_id = Column(String(255), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    questions_total = Column(Integer, nullable=True)
+    questions_done = Column(Integer, nullable=False, default=0)
+    last_event_id = Column(Integer, nullable=False, default=0)
+
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # What workers poll for
+        Index("idx_generation_jobs_status_run_after", "status", "run_after"),
+        # At most one queued or running job per paper
+        Index(
+            "uq_generation_jobs_active_paper",
+            "paper_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+
+class GenerationJobEvent(Base):
+    __tablename__ = "generation_job_events"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(32), ForeignKey("generation_jobs.id", ondelete="CASCADE"), nullable=False)
+
+    # Per-job event number (the SSE event id)
+    seq = Column(Integer, nullable=False)
+    kind = Column(String(40), nullable=False)
+    data = Column(JSON, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("uq_generation_job_events_job_seq", "job_id", "seq", unique=True),)
+
+
+class GenerationRun(Base):
+    """One generate_question_paper run of a paper, resumed until it completes (see app/core/generation_runs.py)."""
+
+    __tablename__ = "generation_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    paper_id = Column(Integer, ForeignKey("question_papers.id"), nullable=False, index=True)
+
+    status = Column(String(20), nullable=False, default="running")
+    # running | failed | completed
+
+    attempts = Column(Integer, nullable=False, default=1)
+    llm_calls = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    checkpoints = relationship("GenerationCheckpoint", back_populates="run", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # At most one running run per paper
+        Index(
+            "uq_generation_runs_running_paper",
+            "paper_id",
+            unique=True,
+            postgresql_where=text("status = 'running'"),
+            sqlite_where=text("status = 'running'"),
+        ),
+    )
+
+
+class GenerationCheckpoint(Base):
+    """A question accepted during a run, saved as soon as it was validated."""
+
+    __tablename__ = "generation_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("generation_runs.id", ondelete="CASCADE"), nullable=False)
+    section_id = Column(Integer, ForeignKey("paper_sections.id", ondelete="CASCADE"), nullable=False)
+    question_order = Column(Integer, nullable=False)
+
+    source = Column(String(20), nullable=False)  # template | batch | pipeline
+    question = Column(JSON, nullable=False)  # text, bloom_level, difficulty, marks, quality_score
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    run = relationship("GenerationRun", back_populates="checkpoints")
+
+    __table_args__ = (
+        Index("uq_generation_checkpoints_slot", "run_id", "section_id", "question_order", unique=True),
+    )
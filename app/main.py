@@ -1,6 +1,9 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.db import base  # noqa
+from app.db.session import SessionLocal, engine
 from app.api.health import router as health_router
 from app.api.generate import router as generate_router
 from app.api.questions import router as questions_router
@@ -10,6 +13,12 @@ from app.api.export_pdf import router as export_pdf_router
 from app.api.papers import router as papers_router
 from app.api.dashboard import router as dashboard_router
 from app.api.syllabus import router as syllabus_router
+from app.api.metrics import router as metrics_router
+from app.core import dedup_index, semantic_index
+from app.core.generation_jobs import get_generation_jobs
+from app.core.llm_client import close_shared_client
+from app.core.loop_monitor import get_loop_monitor, record_loop_lag
+from app.core.metrics import instrument_engine, record_db_time
 
 
 app = FastAPI(
@@ -38,3 +47,37 @@ app.include_router(export_pdf_router)
 app.include_router(papers_router)
 app.include_router(dashboard_router)
 app.include_router(syllabus_router)
+app.include_router(metrics_router)
+
+instrument_engine(engine)
+
+app.middleware("http")(record_db_time)
+app.middleware("http")(record_loop_lag)
+
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    get_loop_monitor().start()
+
+
+def _load_dedup_index():
+    db = SessionLocal()
+    try:
+        dedup_index.load(db)
+        semantic_index.load(db)
+    finally:
+        db.close()
+
+
+@app.on_event("startup")
+async def load_dedup_index():
+    await asyncio.to_thread(_load_dedup_index)
+
+
+@app.on_event("shutdown")
+async def shutdown_llm_pool():
+    await get_loop_monitor().stop()
+    await get_generation_jobs().shutdown()
+    await close_shared_client()
+    await asyncio.to_thread(dedup_index.save)
+    await asyncio.to_thread(semantic_index.save)
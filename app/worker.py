@@ -0,0 +1,222 @@
+"""
+Paper generation worker: runs queued generation jobs outside the API.
+
+    python -m app.worker                  # GENERATION_WORKER_CONCURRENCY jobs at a time
+    python -m app.worker --concurrency 4 --worker-id gen-1
+
+Start as many as the LLM budget allows, on any host that reaches the
+database; they share the generation_jobs queue (see app/core/job_queue.py).
+Each worker claims at most `concurrency` jobs, renews their leases every
+third of GENERATION_JOB_LEASE, and runs generate_question_paper for each
+with its progress events written to the database.
+
+On SIGTERM/SIGINT the worker stops claiming, gives running jobs
+GENERATION_WORKER_SHUTDOWN_GRACE seconds to finish, then cancels the rest
+and puts them back in the queue for another worker.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.papers import generate_question_paper
+from app.core import job_queue, semantic_index
+from app.core.config import settings
+from app.core.generation_jobs import bind_progress
+from app.core.llm_client import close_shared_client
+from app.db.session import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+RunJob = Callable[[int, Session], Awaitable[dict]]
+
+
+async def run_generation(paper_id: int, db: Session) -> dict:
+    return await generate_question_paper(paper_id=paper_id, db=db)
+
+
+class GenerationWorker:
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        lease: Optional[float] = None,
+        shutdown_grace: Optional[float] = None,
+        session_factory=None,
+        run: RunJob = run_generation,
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency or settings.GENERATION_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval if poll_interval is not None else settings.GENERATION_WORKER_POLL_INTERVAL
+        self.lease = lease or settings.GENERATION_JOB_LEASE
+        self.shutdown_grace = (
+            shutdown_grace if shutdown_grace is not None else settings.GENERATION_WORKER_SHUTDOWN_GRACE
+        )
+        self.session_factory = session_factory or SessionLocal
+        self.run_job = run
+        self.tasks: dict[str, asyncio.Task] = {}
+        # Jobs whose lease another worker took over: cancelled, not released
+        self._lost: set[str] = set()
+        self._stopping = False
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def stop(self) -> None:
+        """Stop claiming; run() then drains the running jobs and returns."""
+        if not self._stopping:
+            logger.info(f"Worker {self.worker_id} stopping ({len(self.tasks)} jobs running)")
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        self._wakeup = asyncio.Event()
+        logger.info(f"Worker {self.worker_id} started (concurrency {self.concurrency})")
+        heartbeat = asyncio.create_task(self._heartbeat())
+        next_purge = 0.0
+        try:
+            while not self._stopping:
+                if time.monotonic() >= next_purge:
+                    self._with_session(job_queue.purge_finished, settings.GENERATION_JOB_TTL)
+                    next_purge = time.monotonic() + 600
+                self._claim()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            await self._drain()
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    def _with_session(self, operation, *args):
+        db = self.session_factory()
+        try:
+            return operation(db, *args)
+        finally:
+            db.close()
+
+    def _claim(self) -> None:
+        free = self.concurrency - len(self.tasks)
+        if free <= 0:
+            return
+        db = self.session_factory()
+        try:
+            jobs = [(job.id, job.paper_id, job.attempts) for job in job_queue.claim(db, self.worker_id, free, self.lease)]
+        except Exception:
+            # Database unreachable: keep polling, running jobs carry on
+            logger.exception("Could not claim generation jobs")
+            return
+        finally:
+            db.close()
+        for job_id, paper_id, attempt in jobs:
+            logger.info(f"Worker {self.worker_id} running job {job_id} for paper {paper_id} (attempt {attempt})")
+            task = asyncio.create_task(self._execute(job_id, paper_id))
+            self.tasks[job_id] = task
+            task.add_done_callback(lambda _, job_id=job_id: self._done(job_id))
+
+    def _done(self, job_id: str) -> None:
+        self.tasks.pop(job_id, None)
+        self._lost.discard(job_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _execute(self, job_id: str, paper_id: int) -> None:
+        # Runs in its own task, so the binding is this job's alone
+        bind_progress(job_queue.JobProgress(job_id, self.session_factory))
+        db = self.session_factory()
+        try:
+            result = await self.run_job(paper_id, db)
+        except asyncio.CancelledError:
+            if job_id not in self._lost:
+                self._with_session(job_queue.release, job_id, self.worker_id)
+            raise
+        except HTTPException as exc:
+            if exc.status_code == 409:
+                # The paper's run is held, possibly by this job's own previous
+                # attempt: wait until it is released or stale, attempt not counted
+                self._with_session(
+                    job_queue.postpone, job_id, self.worker_id, str(exc.detail), settings.GENERATION_RUN_STALE_AFTER
+                )
+            else:
+                # Rejected request (finalized paper, no syllabus): retrying won't help
+                self._with_session(job_queue.fail, job_id, self.worker_id, str(exc.detail), False)
+        except Exception as exc:
+            logger.exception(f"Job {job_id} for paper {paper_id} failed")
+            self._with_session(job_queue.fail, job_id, self.worker_id, str(exc) or type(exc).__name__)
+        else:
+            self._with_session(job_queue.complete, job_id, self.worker_id, result)
+        finally:
+            db.close()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                lost = self._with_session(job_queue.renew_leases, self.worker_id, list(self.tasks), self.lease)
+            except Exception:
+                logger.exception("Could not renew job leases")
+                continue
+            for job_id in lost:
+                task = self.tasks.get(job_id)
+                if task is not None:
+                    logger.warning(f"Worker {self.worker_id} lost the lease on job {job_id}; cancelling it")
+                    self._lost.add(job_id)
+                    task.cancel()
+
+    async def _drain(self) -> None:
+        if not self.tasks:
+            return
+        tasks = list(self.tasks.values())
+        _, pending = await asyncio.wait(tasks, timeout=self.shutdown_grace)
+        if pending:
+            logger.warning(f"Re-queueing {len(pending)} unfinished jobs")
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _load_semantic_index() -> None:
+    db = SessionLocal()
+    try:
+        semantic_index.load(db, persist=False)
+    finally:
+        db.close()
+
+
+async def _main(args) -> None:
+    await asyncio.to_thread(_load_semantic_index)
+    worker = GenerationWorker(worker_id=args.worker_id, concurrency=args.concurrency)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await close_shared_client()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker-id", help="name in job leases (default: host:pid)")
+    parser.add_argument("--concurrency", type=int, help="jobs run at once (default: GENERATION_WORKER_CONCURRENCY)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(_main(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
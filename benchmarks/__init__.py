@@ -0,0 +1,8 @@
+"""
+Benchmarks for the question bank generator.
+
+    python -m benchmarks.micro       CPU hot paths (parsers, validators, scoring, PDF export)
+
+Each runner writes a JSON report (benchmarks/results/ by default) that can be
+diffed against a previous release with --compare.
+"""
@@ -0,0 +1,261 @@
+"""
+Deterministic fixtures at realistic sizes for the benchmark runners.
+
+Everything is generated from a seeded random.Random so two runs (and two
+releases) benchmark exactly the same inputs.
+"""
+
+import json
+import random
+from itertools import count
+from types import SimpleNamespace
+
+BLOOM_LEVELS = ["Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create"]
+
+SYLLABUS_TOPICS = [
+    "Graphs", "Trees", "Spanning Trees", "Shortest Paths", "Eulerian Circuits",
+    "Hamiltonian Paths", "Graph Coloring", "Planar Graphs", "Network Flows",
+    "Matchings", "Propositional Logic", "Predicate Logic", "Set Theory",
+    "Relations", "Functions", "Combinatorics", "Recurrence Relations",
+    "Generating Functions", "Pigeonhole Principle", "Mathematical Induction",
+    "Boolean Algebra", "Lattices", "Group Theory", "Finite State Machines",
+]
+
+_STEMS = {
+    "Remember": ["Define {t}.", "List the properties of {t}.", "State the main theorem on {t}."],
+    "Understand": [
+        "Explain how {t} relate to {u} with a suitable example.",
+        "Describe the role of {t} in solving problems on {u}.",
+    ],
+    "Apply": [
+        "Apply {t} to solve the following problem on {u} and show every step of the computation.",
+        "Using {t}, determine the result for a graph of {n} vertices and justify each step.",
+        "Given a network of {n} nodes, compute the answer using {t} and explain how {u} is used.",
+    ],
+    "Analyze": [
+        "Analyze why {t} fails for {u} when the input has {n} elements, based on a worked example.",
+        "Compare {t} and {u} for an instance of size {n} and examine the trade-offs.",
+    ],
+    "Evaluate": ["Evaluate whether {t} is preferable to {u} for {n} inputs and justify your answer."],
+    "Create": ["Design an algorithm that combines {t} and {u} for {n} inputs and discuss its complexity."],
+}
+
+# Phrases that trip the subject guards and forbidden-topic checks
+_DRIFT = ["normalization", "SQL joins", "process scheduling", "TCP handshakes", "quantum tunnelling"]
+
+
+def question_text(rng: random.Random, bloom: str | None = None) -> str:
+    bloom = bloom or rng.choice(BLOOM_LEVELS)
+    topic, other = rng.sample(SYLLABUS_TOPICS, 2)
+    text = rng.choice(_STEMS[bloom]).format(t=topic, u=other, n=rng.randint(5, 500))
+    if rng.random() < 0.05:
+        text += f" Relate your answer to {rng.choice(_DRIFT)}."
+    return text
+
+
+# Mutually dissimilar Apply questions (similarity() < 0.7 pairwise), for
+# tests that must not trip the near-duplicate check
+_APPLY_SCENARIOS = [
+    "Dijkstra's algorithm to find the shortest routes in a city road map",
+    "a hash table with linear probing to store student roll numbers",
+    "merge sort to order ten thousand examination scores",
+    "a binary search tree to index library books by ISBN",
+    "breadth-first search to list friends within two hops in a social graph",
+    "a priority queue to schedule patients in a hospital emergency ward",
+    "dynamic programming to solve the 0/1 knapsack problem for cargo loading",
+    "Kruskal's algorithm to design a minimum cost campus network",
+    "a stack to evaluate postfix arithmetic expressions",
+    "topological sorting to order university course prerequisites",
+    "quick sort to rank online store products by price",
+    "a circular queue to buffer packets inside a network router",
+]
+
+
+def apply_question(n: int) -> str:
+    return f"Apply {_APPLY_SCENARIOS[n]} and show every step."
+
+
+def question_texts(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [question_text(rng) for _ in range(count)]
+
+
+def question_rows(count: int, seed: int = 0) -> list[SimpleNamespace]:
+    """Stand-ins for Question rows (the attributes analytics and PDF export read)."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        bloom = rng.choice(BLOOM_LEVELS)
+        rows.append(SimpleNamespace(
+            id=i + 1,
+            question_text=question_text(rng, bloom),
+            bloom_level=bloom if rng.random() < 0.9 else bloom.lower(),
+            difficulty=rng.choice(["Easy", "Medium", "Hard"]),
+            marks=rng.choice([2, 13, 15]),
+            topics_used=rng.sample(SYLLABUS_TOPICS, rng.randint(0, 3)),
+        ))
+    return rows
+
+
+def messy_topic_list(count: int, seed: int = 0) -> list:
+    """Raw topic list as it comes out of syllabus parsing: unit headers, codes, duplicates, blanks."""
+    rng = random.Random(seed)
+    noise = ["UNIT I", "CO2", "Module 3", "[9 Hours]", "", "  ", "Chapter 4", "Total: 45 MARKS"]
+    topics = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.25:
+            topics.append(rng.choice(noise))
+        elif roll < 0.45:
+            topics.append(rng.choice(SYLLABUS_TOPICS).upper())
+        else:
+            topics.append(rng.choice(SYLLABUS_TOPICS))
+    return topics
+
+
+def llm_batch_response(questions: int, seed: int = 0, messy: bool = True) -> str:
+    """A batch-generation response; messy adds prose, a markdown fence and raw newlines in strings."""
+    rng = random.Random(seed)
+    items = [
+        {
+            "question": question_text(rng, "Apply"),
+            "bloom_level": "Apply",
+            "difficulty": rng.choice(["Easy", "Medium", "Hard"]),
+            "marks": 13,
+            "topics_used": rng.sample(SYLLABUS_TOPICS, 2),
+        }
+        for _ in range(questions)
+    ]
+    body = json.dumps({"questions": items})
+    if not messy:
+        return body
+    # Raw newlines inside string values, as models emit for multi-part questions
+    body = body.replace(" and show every step", "\n(a) and show every step")
+    return (
+        "Sure! Here are the questions you asked for, following every rule.\n\n"
+        f"```json\n{body}\n```\n\nLet me know if you need more questions."
+    )
+
+
+class FakeQuery:
+    """Just enough of sqlalchemy.orm.Query for the export routes."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def filter(self, *args):
+        return self
+
+    def join(self, *args):
+        return self
+
+    def order_by(self, *args):
+        return self
+
+    def with_for_update(self, *args, **kwargs):
+        return self
+
+    def populate_existing(self):
+        return self
+
+    def update(self, values, **kwargs):
+        for row in self.rows:
+            for name, value in values.items():
+                setattr(row, name, value)
+        return len(self.rows)
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+    def get(self, ident):
+        return next((row for row in self.rows if row.id == ident), None)
+
+    def all(self):
+        return list(self.rows)
+
+
+class FakeSession:
+    """Session returning canned rows per queried entity (keyed by the first entity's name)."""
+
+    def __init__(self, rows_by_entity: dict):
+        self.rows_by_entity = rows_by_entity
+
+    def query(self, *entities):
+        return FakeQuery(self.rows_by_entity.get(entities[0].__name__, []))
+
+
+class MemorySession(FakeSession):
+    """
+    Session that keeps added objects in memory, enough to run a whole
+    generate_question_paper call without a database. add() assigns ids;
+    execute() runs the bulk INSERTs (and upserts) of app/db/bulk.py;
+    commit/flush/refresh/rollback do nothing. Use one session per paper,
+    since queries ignore their filters.
+    """
+
+    def __init__(self):
+        super().__init__({})
+        self._ids = count(1)
+
+    def add(self, obj) -> None:
+        if getattr(obj, "id", None) is None:
+            obj.id = next(self._ids)
+        self.rows_by_entity.setdefault(type(obj).__name__, []).append(obj)
+
+    def execute(self, statement, params=None):
+        """
+        An insert(Model) with a list of row dicts; returns the ids as
+        .scalars(). An upsert (ON CONFLICT) resolves rows whose
+        content_hash, marks, bloom_level and difficulty are already stored
+        to the existing object's id.
+        """
+        model = statement.entity_description["entity"]
+        rows = params if isinstance(params, list) else [params or {}]
+        upsert = getattr(statement, "_post_values_clause", None) is not None
+        key = ("content_hash", "marks", "bloom_level", "difficulty")
+        ids = []
+        for row in rows:
+            existing = upsert and row.get("content_hash") is not None and next(
+                (obj for obj in self.rows_by_entity.get(model.__name__, [])
+                 if all(getattr(obj, column) == row.get(column) for column in key)),
+                None,
+            )
+            if existing:
+                if not existing.topics_used:
+                    existing.topics_used = row.get("topics_used")
+                ids.append(existing.id)
+                continue
+            obj = model(**row)
+            self.add(obj)
+            ids.append(obj.id)
+        return SimpleNamespace(scalars=lambda: iter(ids))
+
+    def flush(self) -> None:
+        pass
+
+    def commit(self) -> None:
+        pass
+
+    def refresh(self, obj) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def paper_session(sections: int = 3, per_section: int = 10, seed: int = 0) -> FakeSession:
+    """Session holding one paper with `sections` sections of `per_section` questions each."""
+    paper = SimpleNamespace(
+        id=1, title="Discrete Mathematics and Graph Theory", total_marks=100,
+        paper_metadata={"institution_name": "Benchmark College", "exam_duration": "3 Hours"},
+    )
+    section_rows = [
+        SimpleNamespace(id=s + 1, name=f"Part {'ABC'[s % 3]}", marks_per_question=13, number_of_questions=per_section)
+        for s in range(sections)
+    ]
+    # FakeQuery ignores filters, so every section renders these same pairs
+    pairs = [(SimpleNamespace(question_order=i + 1), q) for i, q in enumerate(question_rows(per_section, seed))]
+    return FakeSession({"QuestionPaper": [paper], "PaperSection": section_rows, "PaperQuestion": pairs})
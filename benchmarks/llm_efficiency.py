@@ -0,0 +1,236 @@
+"""
+LLM-efficiency benchmark: provider calls, tokens and time per accepted question.
+
+    python -m benchmarks.llm_efficiency                         # simulated responses
+    python -m benchmarks.llm_efficiency --batch-sizes 0,5       # per-question vs batched
+    python -m benchmarks.llm_efficiency --transcripts rec.jsonl # replay recorded responses
+    python -m benchmarks.llm_efficiency --compare OLD.json      # tokens per accepted question vs OLD
+
+Each paper configuration in the corpus (benchmarks/corpus/papers.json:
+title, syllabus and sections) is run through generate_question_paper
+against the LLM simulator, once per batch size. Responses come from
+the simulator, or from transcripts recorded with LLM_SIM_MODE=record
+against the real provider; prompts missing from the transcripts fall back
+to simulated answers. Papers live in an in-memory session, so no database
+is needed.
+
+Everything is read from the metrics registry (app/core/metrics.py) before
+and after each run, so the numbers are what production would count:
+
+- provider calls, stage attempts, retries, prompt/completion tokens, and
+  each of those per accepted question (an LLM-written question placed in
+  the paper; Part A templates and template fallbacks are not accepted);
+- template fallback rate (fallbacks / LLM-filled slots);
+- wall time per pipeline stage, plus the whole call.
+
+Configurations run one after another with the response cache disabled, so
+every run pays for all of its calls. The scheduler's rate limits are
+raised unless set in the environment, so stage times are not inflated by
+queueing for the provider quota.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.report import compare_reports, new_report, print_comparison, write_report
+
+CORPUS = Path(__file__).parent / "corpus" / "papers.json"
+
+
+def _configure_environment(args) -> None:
+    # Settings are read at import time, so this must run before importing app
+    os.environ.pop("LLM_MOCK", None)
+    os.environ["LLM_PROVIDER"] = "simulator"
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    # Client-side rate limits would only add queueing to the stage times
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "100000000")
+    os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_bench")
+    if args.sim_latency:
+        os.environ["LLM_SIM_LATENCY"] = args.sim_latency
+    if args.seed is not None:
+        os.environ["LLM_SIM_SEED"] = str(args.seed)
+    if args.transcripts:
+        os.environ["LLM_SIM_MODE"] = "replay"
+        os.environ["LLM_SIM_TRANSCRIPTS"] = args.transcripts
+
+
+def _total(snapshot: dict) -> float:
+    return sum(snapshot.values())
+
+
+def _by_label(before: dict, after: dict, index: int = 0, kind: str | None = None) -> dict:
+    """Per-label-value increase between two counter snapshots (optionally only where label 1 == kind)."""
+    out: dict = {}
+    for key, value in after.items():
+        if kind is not None and key[1] != kind:
+            continue
+        delta = value - before.get(key, 0)
+        if delta:
+            out[key[index]] = out.get(key[index], 0) + delta
+    return out
+
+
+def _per(value, accepted: int):
+    return value / accepted if accepted else None
+
+
+async def run_config(entry: dict, batch_size: int) -> dict:
+    from app.api import papers
+    from app.core import generation_runs, metrics
+    from app.core.config import settings
+    from app.db.models import PaperSection, QuestionPaper
+    from benchmarks.fixtures import MemorySession
+
+    tracked = {
+        "provider_calls": metrics.LLM_PROVIDER_CALLS,
+        "stage_calls": metrics.LLM_STAGE_CALLS,
+        "retries": metrics.LLM_STAGE_RETRIES,
+        "tokens": metrics.LLM_TOKENS,
+        "stage_seconds": metrics.LLM_STAGE_SECONDS,
+        "fallbacks": metrics.TEMPLATE_FALLBACKS,
+    }
+
+    db = MemorySession()
+    paper = QuestionPaper(title=entry["title"], total_marks=0, syllabus=entry["syllabus"], status="DRAFT")
+    db.add(paper)
+    for name, marks, number in entry["sections"]:
+        db.add(PaperSection(
+            paper_id=paper.id, name=name, marks_per_question=marks,
+            number_of_questions=number, total_marks=marks * number,
+        ))
+        paper.total_marks += marks * number
+
+    # Fresh in-memory batch cache, so every run pays for its calls
+    papers.question_agent._cache.clear()
+    previous_batch_size = settings.PAPER_BATCH_SIZE
+    settings.PAPER_BATCH_SIZE = batch_size
+    # Checkpoints go to the in-memory session too
+    checkpoint_sessions = generation_runs.SessionLocal
+    generation_runs.SessionLocal = lambda: db
+    before = {name: metric.snapshot() for name, metric in tracked.items()}
+    started = time.perf_counter()
+    try:
+        response = await papers.generate_question_paper(paper_id=paper.id, db=db)
+    finally:
+        settings.PAPER_BATCH_SIZE = previous_batch_size
+        generation_runs.SessionLocal = checkpoint_sessions
+    wall = time.perf_counter() - started
+    after = {name: metric.snapshot() for name, metric in tracked.items()}
+
+    def delta(name):
+        return _total(after[name]) - _total(before[name])
+
+    llm_slots = sum(number for _, marks, number in entry["sections"] if marks > 2)
+    fallbacks = int(delta("fallbacks"))
+    accepted = llm_slots - fallbacks
+    prompt_tokens = int(sum(_by_label(before["tokens"], after["tokens"], kind="prompt").values()))
+    completion_tokens = int(sum(_by_label(before["tokens"], after["tokens"], kind="completion").values()))
+    provider_calls = int(delta("provider_calls"))
+    stage_calls = int(delta("stage_calls"))
+    retries = int(delta("retries"))
+
+    return {
+        "corpus_entry": entry["name"],
+        "batch_size": batch_size,
+        "status": response.get("status") or response.get("error"),
+        "questions": sum(number for _, _, number in entry["sections"]),
+        "llm_slots": llm_slots,
+        "accepted": accepted,
+        "template_fallbacks": fallbacks,
+        "template_fallback_rate": fallbacks / llm_slots if llm_slots else 0.0,
+        "provider_calls": provider_calls,
+        "stage_calls": stage_calls,
+        "retries": retries,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "provider_calls_per_accepted": _per(provider_calls, accepted),
+        "retries_per_accepted": _per(retries, accepted),
+        "prompt_tokens_per_accepted": _per(prompt_tokens, accepted),
+        "completion_tokens_per_accepted": _per(completion_tokens, accepted),
+        "tokens_per_accepted": _per(prompt_tokens + completion_tokens, accepted),
+        "tokens_by_stage": _by_label(before["tokens"], after["tokens"]),
+        "stage_seconds": {
+            stage: round(seconds, 4)
+            for stage, seconds in _by_label(before["stage_seconds"], after["stage_seconds"]).items()
+        },
+        "wall_seconds": wall,
+    }
+
+
+async def run(corpus: list[dict], batch_sizes: list[int], verbose: bool = True) -> dict:
+    results = {}
+    for entry in corpus:
+        for batch_size in batch_sizes:
+            name = f"{entry['name']}[batch={batch_size}]"
+            result = await run_config(entry, batch_size)
+            results[name] = result
+            if verbose:
+                tokens = result["tokens_per_accepted"]
+                print(
+                    f"{name:<40} accepted {result['accepted']:>3}/{result['llm_slots']:<3}"
+                    f" calls {result['provider_calls']:>4}  retries {result['retries']:>3}"
+                    f"  tokens/q {'-' if tokens is None else round(tokens):>7}"
+                    f"  fallback {result['template_fallback_rate'] * 100:5.1f}%"
+                    f"  {result['wall_seconds']:6.2f}s"
+                )
+    return results
+
+
+def load_corpus(path: str | None, names: list[str] | None) -> list[dict]:
+    with open(path or CORPUS) as fh:
+        corpus = json.load(fh)
+    if names:
+        corpus = [entry for entry in corpus if entry["name"] in names]
+    return corpus
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help=f"paper configurations (default: {CORPUS})")
+    parser.add_argument("--only", help="comma-separated corpus entry names to run")
+    parser.add_argument("--batch-sizes", default="5", help="comma-separated PAPER_BATCH_SIZE values (0 = per question)")
+    parser.add_argument("--transcripts", help="replay recorded responses from this transcript file")
+    parser.add_argument("--sim-latency", help="LLM_SIM_LATENCY for this run, e.g. fixed:0.05")
+    parser.add_argument("--seed", type=int, help="LLM_SIM_SEED for this run")
+    parser.add_argument("--output", "-o", help="report path (default: benchmarks/results/llm_efficiency-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="older report to compare tokens per accepted question against")
+    parser.add_argument("--threshold", type=float, default=1.05, help="ratio flagged as a regression")
+    args = parser.parse_args(argv)
+
+    _configure_environment(args)
+    logging.basicConfig(level=logging.WARNING)
+
+    corpus = load_corpus(args.corpus, args.only.split(",") if args.only else None)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    report = new_report(
+        "llm_efficiency",
+        corpus=args.corpus or str(CORPUS.relative_to(Path(__file__).parent.parent)),
+        batch_sizes=batch_sizes,
+        transcripts=args.transcripts,
+        sim_latency=os.environ.get("LLM_SIM_LATENCY"),
+        seed=os.environ.get("LLM_SIM_SEED"),
+    )
+    report["results"] = asyncio.run(run(corpus, batch_sizes))
+    path = write_report(report, args.output)
+    print(f"\nReport written to {path}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        print()
+        print_comparison(
+            compare_reports(baseline, report, key="tokens_per_accepted", threshold=args.threshold), unit=""
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
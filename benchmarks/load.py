@@ -0,0 +1,409 @@
+"""
+HTTP load test: drives the API end to end and reports latency per route.
+
+    # In-process: app.main on this event loop, LLM simulator, DATABASE_URL database
+    python -m benchmarks.load --duration 120 --authors 4 --pollers 8
+
+    # Against a running server (start it with LLM_PROVIDER=simulator)
+    LLM_PROVIDER=simulator uvicorn app.main:app --workers 4 &
+    python -m benchmarks.load --url http://127.0.0.1:8000 --label workers=4
+
+Two kinds of virtual user run concurrently until --duration expires:
+
+- authors walk the paper flow: create paper -> add sections -> generate ->
+  replace one question (regenerate) -> export PDF, then start over;
+- pollers hit the dashboard, question bank, paper list and analytics
+  every --poll-interval seconds, as open dashboards do.
+
+The report (JSON, same layout as benchmarks.micro) has per route: request
+count, throughput, error rate, p50/p95/p99/max latency, and the server's
+event-loop lag while those requests ran. The lag figures come from the
+qb_request_loop_lag_seconds histogram, read from /metrics before and after
+the run. With several workers, /metrics is answered by one worker, so they
+describe that worker only. The harness also measures its own loop lag. If
+that is high, the client was the bottleneck and the latencies are suspect.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+import httpx
+
+from benchmarks.report import compare_reports, new_report, percentile, print_comparison, write_report
+
+SYLLABUS = (
+    "Unit I: Graphs - definitions, paths, cycles, connectivity, Eulerian and Hamiltonian graphs. "
+    "Unit II: Trees - spanning trees, minimum spanning trees, Kruskal and Prim algorithms. "
+    "Unit III: Shortest paths - Dijkstra, Bellman-Ford, Floyd-Warshall. "
+    "Unit IV: Graph coloring, planar graphs, chromatic number. "
+    "Unit V: Network flows, max-flow min-cut, bipartite matching."
+)
+
+# (name, marks per question, number of questions)
+DEFAULT_SECTIONS = [("Part A", 2, 5), ("Part B", 13, 2)]
+
+POLL_ROUTES = [
+    ("GET /dashboard/stats", "/dashboard/stats"),
+    ("GET /dashboard/recent-papers", "/dashboard/recent-papers"),
+    ("GET /questions", "/questions?limit=50"),
+    ("GET /papers/", "/papers/"),
+    ("GET /analytics/summary", "/analytics/summary"),
+]
+
+
+@dataclass
+class RouteStats:
+    latencies: list = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.routes: dict[str, RouteStats] = defaultdict(RouteStats)
+        self.error_samples: dict[str, str] = {}
+
+    def record(self, route: str, seconds: float, status: int | str, error: str | None = None) -> None:
+        stats = self.routes[route]
+        stats.latencies.append(seconds)
+        stats.statuses[str(status)] += 1
+        if error:
+            stats.errors += 1
+            self.error_samples.setdefault(route, error[:300])
+
+    def summary(self, elapsed: float) -> dict:
+        results = {}
+        for route, stats in sorted(self.routes.items()):
+            count = len(stats.latencies)
+            results[route] = {
+                "requests": count,
+                "throughput_rps": count / elapsed if elapsed else None,
+                "error_rate": stats.errors / count if count else 0.0,
+                "statuses": dict(stats.statuses),
+                "p50": percentile(stats.latencies, 50),
+                "p95": percentile(stats.latencies, 95),
+                "p99": percentile(stats.latencies, 99),
+                "max": max(stats.latencies) if stats.latencies else None,
+                "mean": sum(stats.latencies) / count if count else None,
+            }
+        return results
+
+
+async def call(client: httpx.AsyncClient, recorder: LoadRecorder, route: str, method: str, url: str, **kwargs):
+    """Send one request and record it under `route`; returns the parsed JSON body or None."""
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as exc:
+        recorder.record(route, time.perf_counter() - started, type(exc).__name__, f"{type(exc).__name__}: {exc}")
+        return None
+    elapsed = time.perf_counter() - started
+
+    body = None
+    if response.headers.get("content-type", "").startswith("application/json"):
+        body = response.json()
+    error = None
+    if response.status_code >= 400:
+        error = f"HTTP {response.status_code}: {response.text}"
+    elif isinstance(body, dict) and body.get("error"):
+        # Several routes report failures as 200 {"error": ...}
+        error = f"error body: {body['error']}"
+    recorder.record(route, elapsed, response.status_code, error)
+    return body if error is None else None
+
+
+def _replace_payload(paper_id: int, paper: dict, grounding: dict) -> tuple[int, dict] | None:
+    for section in paper.get("sections", []):
+        for question in section["questions"]:
+            return question["question_id"], {
+                "replaceContext": {
+                    "paperId": str(paper_id),
+                    "questionId": str(question["question_id"]),
+                    "subject": grounding["subject"],
+                    "syllabusTopics": grounding["core_topics"][:3],
+                    # replace_question compares against the first letter of the section name
+                    "part": section["section"].strip().upper()[:1],
+                    "bloomLevel": question["bloom"],
+                    "difficulty": question["difficulty"],
+                    "marks": section["marks_per_question"],
+                },
+                "regenerate": True,
+            }
+    return None
+
+
+async def author(client, recorder: LoadRecorder, deadline: float, sections, user: int) -> None:
+    flow = 0
+    while time.perf_counter() < deadline:
+        flow += 1
+        created = await call(client, recorder, "POST /papers/", "POST", "/papers/", json={
+            "title": f"Load test paper {user}-{flow}",
+            "total_marks": sum(marks * count for _, marks, count in sections),
+            "syllabus": SYLLABUS,
+        })
+        if not created:
+            # Don't spin on a server that is refusing requests
+            await asyncio.sleep(1.0)
+            continue
+        paper_id = created["paper_id"]
+
+        for name, marks, count in sections:
+            await call(
+                client, recorder, "POST /papers/{paper_id}/sections", "POST", f"/papers/{paper_id}/sections",
+                json={"name": name, "marks_per_question": marks, "number_of_questions": count},
+            )
+
+        generated = await call(client, recorder, "POST /papers/{paper_id}/generate", "POST", f"/papers/{paper_id}/generate")
+        if not generated:
+            continue
+
+        paper = await call(client, recorder, "GET /papers/{paper_id}", "GET", f"/papers/{paper_id}")
+        grounding = await call(client, recorder, "GET /papers/{paper_id}/grounding", "GET", f"/papers/{paper_id}/grounding")
+        if paper and grounding and grounding.get("grounded"):
+            target = _replace_payload(paper_id, paper, grounding["grounding"])
+            if target:
+                question_id, payload = target
+                await call(
+                    client, recorder, "POST /papers/{paper_id}/questions/{question_id}/replace", "POST",
+                    f"/papers/{paper_id}/questions/{question_id}/replace", json=payload,
+                )
+
+        await call(client, recorder, "GET /papers/{paper_id}/export/pdf", "GET", f"/papers/{paper_id}/export/pdf")
+
+
+async def poller(client, recorder: LoadRecorder, deadline: float, interval: float, seed: int) -> None:
+    rng = random.Random(seed)
+    # Spread pollers out so they don't all fire on the same tick
+    await asyncio.sleep(rng.uniform(0, interval))
+    while time.perf_counter() < deadline:
+        for route, url in POLL_ROUTES:
+            await call(client, recorder, route, "GET", url)
+        await asyncio.sleep(interval * rng.uniform(0.5, 1.5))
+
+
+async def client_loop_lag(deadline: float, samples: list, interval: float = 0.05) -> None:
+    while time.perf_counter() < deadline:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - expected))
+
+
+# ----------------------------------------------------------------------
+# Server-side loop lag from /metrics
+# ----------------------------------------------------------------------
+
+_HISTOGRAM_LINE = re.compile(r'^qb_request_loop_lag_seconds_(bucket|sum|count)\{endpoint="((?:[^"\\]|\\.)*)"(?:,le="([^"]+)")?\} (\S+)$')
+
+
+def parse_loop_lag(text: str) -> dict:
+    """{endpoint: {"buckets": {le: count}, "sum": s, "count": n}} from a /metrics scrape."""
+    parsed: dict = defaultdict(lambda: {"buckets": {}, "sum": 0.0, "count": 0})
+    for line in text.splitlines():
+        match = _HISTOGRAM_LINE.match(line)
+        if not match:
+            continue
+        kind, endpoint, le, value = match.groups()
+        endpoint = endpoint.replace('\\"', '"').replace("\\\\", "\\")
+        if kind == "bucket":
+            parsed[endpoint]["buckets"][float(le)] = float(value)
+        else:
+            parsed[endpoint][kind] = float(value)
+    return dict(parsed)
+
+
+def _bucket_quantile(buckets: dict, count: float, q: float) -> float | None:
+    """Upper bound of the bucket holding the q-quantile (the usual histogram estimate)."""
+    if count <= 0:
+        return None
+    target = q * count
+    for bound in sorted(buckets):
+        if buckets[bound] >= target:
+            return bound
+    return None
+
+
+def loop_lag_delta(before: dict, after: dict) -> dict:
+    """Per-endpoint lag over the run: mean and bucketed p95/p99 of the scrape difference."""
+    results = {}
+    for endpoint, end in after.items():
+        start = before.get(endpoint, {"buckets": {}, "sum": 0.0, "count": 0})
+        count = end["count"] - start["count"]
+        if count <= 0:
+            continue
+        buckets = {le: n - start["buckets"].get(le, 0) for le, n in end["buckets"].items()}
+        results[endpoint] = {
+            "requests": int(count),
+            "mean": (end["sum"] - start["sum"]) / count,
+            "p95_bucket": _bucket_quantile(buckets, count, 0.95),
+            "p99_bucket": _bucket_quantile(buckets, count, 0.99),
+        }
+    return results
+
+
+async def scrape_loop_lag(client: httpx.AsyncClient) -> dict | None:
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    return parse_loop_lag(response.text)
+
+
+# ----------------------------------------------------------------------
+# Runner
+# ----------------------------------------------------------------------
+
+async def run_load(
+    client: httpx.AsyncClient,
+    duration: float,
+    authors: int,
+    pollers: int,
+    poll_interval: float = 2.0,
+    sections=DEFAULT_SECTIONS,
+    seed: int = 0,
+) -> tuple[LoadRecorder, dict]:
+    recorder = LoadRecorder()
+    before = await scrape_loop_lag(client)
+    client_lag: list[float] = []
+
+    started = time.perf_counter()
+    deadline = started + duration
+    tasks = [author(client, recorder, deadline, sections, user) for user in range(authors)]
+    tasks += [poller(client, recorder, deadline, poll_interval, seed + i) for i in range(pollers)]
+    tasks.append(client_loop_lag(deadline, client_lag))
+    await asyncio.gather(*tasks)
+    # Authors finish the request they were in, so the run can overshoot the deadline
+    elapsed = time.perf_counter() - started
+
+    after = await scrape_loop_lag(client)
+    extra = {
+        "elapsed": elapsed,
+        "server_loop_lag": loop_lag_delta(before, after) if before is not None and after is not None else None,
+        "client_loop_lag": {
+            "p50": percentile(client_lag, 50),
+            "p99": percentile(client_lag, 99),
+            "max": max(client_lag) if client_lag else None,
+        },
+    }
+    return recorder, extra
+
+
+def build_report(recorder: LoadRecorder, extra: dict, **settings) -> dict:
+    report = new_report("load", **settings)
+    results = recorder.summary(extra["elapsed"])
+    for route, lag in (extra["server_loop_lag"] or {}).items():
+        if route in results:
+            results[route]["server_loop_lag"] = lag
+    report["results"] = results
+    report["elapsed"] = extra["elapsed"]
+    report["client_loop_lag"] = extra["client_loop_lag"]
+    report["error_samples"] = recorder.error_samples
+    return report
+
+
+def _ms(value) -> str:
+    return f"{value * 1000:7.0f}ms" if value is not None else f"{'-':>9}"
+
+
+def print_summary(report: dict) -> None:
+    print(f"{'route':<56} {'reqs':>6} {'rps':>7} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'lag':>8}")
+    for route, row in report["results"].items():
+        lag = row.get("server_loop_lag", {}).get("mean")
+        print(
+            f"{route:<56} {row['requests']:>6} {row['throughput_rps']:>7.2f} {row['error_rate'] * 100:>5.1f}%"
+            f"{_ms(row['p50'])}{_ms(row['p95'])}{_ms(row['p99'])}{_ms(lag)}"
+        )
+    client = report["client_loop_lag"]
+    if client["p99"] is not None:
+        print(f"\nClient loop lag p99: {client['p99'] * 1000:.1f}ms (max {client['max'] * 1000:.1f}ms)")
+    for route, sample in report["error_samples"].items():
+        print(f"First error on {route}: {sample}")
+
+
+def _in_process_client(timeout: float) -> httpx.AsyncClient:
+    os.environ.setdefault("LLM_PROVIDER", "simulator")
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout)
+
+
+async def _main(args) -> dict:
+    sections = DEFAULT_SECTIONS
+    if args.sections:
+        sections = json.loads(args.sections)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        monitor = None
+    else:
+        client = _in_process_client(args.timeout)
+        # ASGITransport does not run startup events, so start the lag monitor here
+        from app.core.loop_monitor import get_loop_monitor
+        monitor = get_loop_monitor()
+        monitor.start()
+
+    async with client:
+        try:
+            recorder, extra = await run_load(
+                client, args.duration, args.authors, args.pollers, args.poll_interval, sections, args.seed
+            )
+        finally:
+            if monitor is not None:
+                await monitor.stop()
+
+    return build_report(
+        recorder, extra,
+        target=args.url or "in-process",
+        label=args.label,
+        duration=args.duration,
+        authors=args.authors,
+        pollers=args.pollers,
+        poll_interval=args.poll_interval,
+        sections=sections,
+        seed=args.seed,
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server (default: run app.main in-process)")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to keep starting new work")
+    parser.add_argument("--authors", type=int, default=2, help="concurrent paper-flow users")
+    parser.add_argument("--pollers", type=int, default=4, help="concurrent dashboard/question-bank pollers")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="seconds between a poller's rounds")
+    parser.add_argument("--sections", help='JSON list of [name, marks, count], e.g. \'[["Part A", 2, 10]]\'')
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", help="free-form tag stored in the report, e.g. workers=4")
+    parser.add_argument("--output", "-o", help="report path (default: benchmarks/results/load-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="older report to compare p95 latencies against")
+    parser.add_argument("--threshold", type=float, default=1.10, help="ratio flagged as a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(_main(args))
+    print_summary(report)
+    path = write_report(report, args.output)
+    print(f"\nReport written to {path}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        print()
+        print_comparison(compare_reports(baseline, report, key="p95", threshold=args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
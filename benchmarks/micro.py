@@ -0,0 +1,292 @@
+"""
+Micro-benchmarks for the CPU hot paths of question generation.
+
+    python -m benchmarks.micro                      # full run, report in benchmarks/results/
+    python -m benchmarks.micro --quick              # smaller banks, fewer repeats
+    python -m benchmarks.micro -k similarity        # only benchmarks whose name contains "similarity"
+    python -m benchmarks.micro --compare OLD.json   # print median ratios against an older report
+
+Each benchmark is timed with time.perf_counter: the call count per repeat is
+calibrated so a repeat lasts at least --min-time seconds, and the report
+keeps per-call min/median/mean/stdev over the repeats. Inputs come from
+benchmarks/fixtures.py and are identical between runs.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+os.environ.setdefault("LLM_MOCK", "1")
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_bench")
+
+from benchmarks import fixtures
+from benchmarks.report import compare_reports, new_report, print_comparison, write_report
+
+
+@dataclass
+class Benchmark:
+    name: str
+    group: str
+    func: Callable[[], object]
+    params: dict = field(default_factory=dict)
+    # Expensive cases (e.g. a pass over 100k questions) skip the warm-up
+    # and calibration and run once per repeat, at most three repeats
+    single_shot: bool = False
+
+
+def _time_calls(func: Callable[[], object], number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - started
+
+
+def run_benchmark(bench: Benchmark, repeat: int, min_time: float) -> dict:
+    func = bench.func
+    number = 1
+    if bench.single_shot:
+        repeat = min(repeat, 3)
+    else:
+        func()  # warm-up: imports, regex/font caches
+        while True:
+            elapsed = _time_calls(func, number)
+            if elapsed >= min_time or number >= 1_000_000:
+                break
+            number *= 10 if elapsed < min_time / 10 else 2
+
+    per_call = [_time_calls(func, number) / number for _ in range(repeat)]
+    median = statistics.median(per_call)
+    return {
+        "group": bench.group,
+        "params": bench.params,
+        "number": number,
+        "repeat": repeat,
+        "min": min(per_call),
+        "median": median,
+        "mean": statistics.fmean(per_call),
+        "stdev": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "ops_per_sec": 1.0 / median if median else None,
+    }
+
+
+# ----------------------------------------------------------------------
+# Benchmark definitions
+# ----------------------------------------------------------------------
+
+def json_parse_benchmarks(quick: bool) -> list[Benchmark]:
+    from app.core.json_utils import safe_llm_json_parse
+
+    def parse_or_fail(raw):
+        try:
+            return safe_llm_json_parse(raw)
+        except ValueError:
+            return None
+
+    benches = []
+    for size in (5, 50) if quick else (5, 50, 500):
+        clean = fixtures.llm_batch_response(size, seed=size, messy=False)
+        messy = fixtures.llm_batch_response(size, seed=size)
+        # Cut off mid-item, as a response that hit max_tokens is
+        truncated = messy[: int(len(messy) * 0.8)]
+        for kind, raw in (("clean", clean), ("messy", messy), ("truncated", truncated)):
+            benches.append(Benchmark(
+                f"safe_llm_json_parse[{kind}-{size}q]",
+                "json_parse",
+                lambda raw=raw: parse_or_fail(raw),
+                {"questions": size, "kind": kind, "bytes": len(raw)},
+            ))
+    return benches
+
+
+def validator_benchmarks(quick: bool) -> list[Benchmark]:
+    from app.agents.question_generator import QuestionGeneratorAgent, subject_guard
+    from app.core.bloom_rules import check_forbidden_topics, is_verb_allowed
+    from app.core.context_aware_regenerator import subject_guard as regen_subject_guard
+    from app.core.quality_scorer import score_question, score_questions
+
+    agent = QuestionGeneratorAgent()
+    rows = fixtures.question_rows(200 if quick else 1000, seed=1)
+    texts = [(q.question_text, q.bloom_level.capitalize()) for q in rows]
+    params = {"questions": len(texts)}
+
+    def each(check):
+        return lambda: [check(text, bloom) for text, bloom in texts]
+
+    return [
+        Benchmark("subject_guard[agent]", "validators", each(lambda t, b: subject_guard(t)), params),
+        Benchmark(
+            "subject_guard[regenerator]", "validators",
+            each(lambda t, b: regen_subject_guard(t, "Python")), params,
+        ),
+        Benchmark("check_forbidden_topics", "validators", each(lambda t, b: check_forbidden_topics(t)), params),
+        Benchmark("is_verb_allowed", "validators", each(lambda t, b: is_verb_allowed(b, t)), params),
+        Benchmark("score_question", "validators", each(score_question), params),
+        Benchmark(
+            "score_questions[batch]", "validators",
+            lambda: score_questions([text for text, _ in texts], "Apply"), params,
+        ),
+        Benchmark("_compute_bloom_score", "validators", each(agent._compute_bloom_score), params),
+    ]
+
+
+def similarity_benchmarks(quick: bool) -> list[Benchmark]:
+    from app.core.dedup_index import NearDuplicateIndex
+    from app.core.semantic_index import SemanticIndex
+    from app.core.duplicate_checker import similarity
+
+    # /generate compares one candidate against every stored question
+    candidate = fixtures.question_texts(1, seed=99)[0]
+    benches = []
+    for size in (1_000,) if quick else (1_000, 10_000, 100_000):
+        bank = fixtures.question_texts(size, seed=size)
+        benches.append(Benchmark(
+            f"similarity[bank={size}]",
+            "duplicates",
+            lambda bank=bank: max(similarity(existing, candidate) for existing in bank),
+            {"bank_size": size},
+            single_shot=size >= 10_000,
+        ))
+        index = NearDuplicateIndex()
+        for question_id, text in enumerate(bank, 1):
+            index.add(question_id, text)
+        benches.append(Benchmark(
+            f"dedup_index[bank={size}]",
+            "duplicates",
+            lambda index=index: index.find(candidate, 0.85),
+            {"bank_size": size},
+        ))
+        # A generated section (5 questions) against the bank's vectors
+        vectors = SemanticIndex(dim=1024)
+        vectors.add(list(range(1, size + 1)), bank)
+        section = fixtures.question_texts(5, seed=98)
+        benches.append(Benchmark(
+            f"semantic_index[bank={size},batch=5]",
+            "duplicates",
+            lambda vectors=vectors: vectors.duplicates(vectors.encode(section), 0.75),
+            {"bank_size": size, "batch": 5},
+        ))
+    return benches
+
+
+def analytics_benchmarks(quick: bool) -> list[Benchmark]:
+    from app.core.analytics import calculate_bloom_distribution, calculate_syllabus_coverage
+
+    benches = []
+    for size in (100, 1_000) if quick else (100, 1_000, 10_000):
+        rows = fixtures.question_rows(size, seed=size)
+        params = {"questions": size, "topics": len(fixtures.SYLLABUS_TOPICS)}
+        benches.append(Benchmark(
+            f"calculate_syllabus_coverage[{size}q]", "analytics",
+            lambda rows=rows: calculate_syllabus_coverage(fixtures.SYLLABUS_TOPICS, rows), params,
+        ))
+        benches.append(Benchmark(
+            f"calculate_bloom_distribution[{size}q]", "analytics",
+            lambda rows=rows: calculate_bloom_distribution(rows), params,
+        ))
+    return benches
+
+
+def topic_benchmarks(quick: bool) -> list[Benchmark]:
+    from app.agents.question_generator import QuestionGeneratorAgent
+
+    agent = QuestionGeneratorAgent()
+    benches = []
+    for size in (40, 400):
+        topics = fixtures.messy_topic_list(size, seed=size)
+        benches.append(Benchmark(
+            f"extract_clean_topics[{size}]", "topics",
+            lambda topics=topics: agent.extract_clean_topics(topics), {"raw_topics": size},
+        ))
+    return benches
+
+
+def pdf_benchmarks(quick: bool) -> list[Benchmark]:
+    from app.api.export_pdf import export_questions_pdf
+    from app.api.papers import export_paper_pdf
+
+    paper_db = fixtures.paper_session(sections=3, per_section=10)
+    benches = [Benchmark(
+        "export_paper_pdf[3x10q]", "pdf",
+        lambda: export_paper_pdf(paper_id=1, db=paper_db), {"sections": 3, "questions": 30},
+    )]
+    for size in (100,) if quick else (100, 1_000):
+        bank_db = fixtures.FakeSession({"Question": fixtures.question_rows(size, seed=size)})
+        benches.append(Benchmark(
+            f"export_questions_pdf[{size}q]", "pdf",
+            lambda bank_db=bank_db: export_questions_pdf(db=bank_db), {"questions": size},
+        ))
+    return benches
+
+
+BENCHMARK_GROUPS = [
+    json_parse_benchmarks,
+    validator_benchmarks,
+    similarity_benchmarks,
+    analytics_benchmarks,
+    topic_benchmarks,
+    pdf_benchmarks,
+]
+
+
+def collect(quick: bool, pattern: str | None = None) -> list[Benchmark]:
+    benches = [bench for group in BENCHMARK_GROUPS for bench in group(quick)]
+    if pattern:
+        benches = [bench for bench in benches if pattern in bench.name]
+    return benches
+
+
+def run(quick: bool = False, pattern: str | None = None, repeat: int | None = None,
+        min_time: float | None = None, verbose: bool = True) -> dict:
+    repeat = repeat or (3 if quick else 7)
+    min_time = min_time if min_time is not None else (0.01 if quick else 0.1)
+    report = new_report("micro", quick=quick, repeat=repeat, min_time=min_time, filter=pattern)
+
+    for bench in collect(quick, pattern):
+        result = run_benchmark(bench, repeat, min_time)
+        report["results"][bench.name] = result
+        if verbose:
+            print(
+                f"{bench.name:<48} median {result['median'] * 1e6:>12.2f} µs"
+                f"  (±{result['stdev'] * 1e6:.2f}, {result['number']}x{result['repeat']})"
+            )
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller fixtures and fewer repeats")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, help="timed repeats per benchmark")
+    parser.add_argument("--min-time", type=float, help="minimum seconds per repeat")
+    parser.add_argument("--output", "-o", help="report path (default: benchmarks/results/micro-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="older report to compare medians against")
+    parser.add_argument("--threshold", type=float, default=1.10, help="ratio flagged as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any benchmark regressed")
+    args = parser.parse_args(argv)
+
+    # Route handlers log through the app loggers; keep the table readable
+    logging.disable(logging.WARNING)
+
+    report = run(args.quick, args.pattern, args.repeat, args.min_time)
+    path = write_report(report, args.output)
+    print(f"\nReport written to {path}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        rows = compare_reports(baseline, report, threshold=args.threshold)
+        print()
+        print_comparison(rows)
+        if args.fail_on_regression and any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
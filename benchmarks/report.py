@@ -0,0 +1,95 @@
+"""
+JSON benchmark reports shared by the runners: environment header, writing,
+and a median-vs-median comparison against a previous report.
+"""
+
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=10, cwd=Path(__file__).parent,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile of `values` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def new_report(suite: str, **settings) -> dict:
+    return {
+        "suite": suite,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": settings,
+        "results": {},
+    }
+
+
+def write_report(report: dict, output: str | None) -> Path:
+    if output:
+        path = Path(output)
+    else:
+        stamp = report["created_at"].replace(":", "").replace("-", "")[:15]
+        path = RESULTS_DIR / f"{report['suite']}-{report['git_commit'] or 'local'}-{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    return path
+
+
+def compare_reports(baseline: dict, current: dict, key: str = "median", threshold: float = 1.10) -> list[dict]:
+    """
+    Compare `key` of every result present in both reports.
+
+    Lower is better; a ratio above `threshold` is flagged as a regression.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before.get(key) or result.get(key) is None:
+            continue
+        ratio = result[key] / before[key]
+        rows.append({
+            "name": name,
+            "baseline": before[key],
+            "current": result[key],
+            "ratio": ratio,
+            "regression": ratio > threshold,
+        })
+    return rows
+
+
+def print_comparison(rows: list[dict], unit: str = "s") -> None:
+    if not rows:
+        print("No benchmarks in common with the baseline.")
+        return
+    width = max(len(row["name"]) for row in rows)
+    print(f"{'benchmark':<{width}}  {'baseline':>12}  {'current':>12}  {'ratio':>7}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['name']:<{width}}  {row['baseline']:>11.6g}{unit}  "
+            f"{row['current']:>11.6g}{unit}  {row['ratio']:>6.2f}x{flag}"
+        )
@@ -68,6 +68,8 @@ export interface GenerationProgressItem {
   section: string;
   status: string;
   questions_generated?: number;
+  template_fallbacks?: number;
+  llm_calls?: number;
   bloom_level?: string;
   note?: string;
 }
@@ -80,6 +82,28 @@ export interface GenerationResponse {
   total_llm_calls: number;
 }
 
+// Progress event of a background generation job (GET /papers/{id}/jobs/{job_id}/events)
+export interface GenerationEvent {
+  event: string; // grounding, generation_started, question_accepted, fallback_used, section_completed, persisted, completed, failed
+  data: {
+    section?: string;
+    order?: number;
+    source?: string;
+    done?: number;
+    total?: number | null;
+    error?: string | null;
+    [key: string]: unknown;
+  };
+}
+
+export interface GenerationJob {
+  job_id: string;
+  paper_id: number;
+  status: string; // queued, running, succeeded, failed
+  result?: GenerationResponse | null;
+  error?: string | null;
+}
+
 // --- API Functions ---
 
 export async function fetchPaper(paperId: number): Promise<Paper> {
@@ -134,6 +158,49 @@ export async function generatePaper(paperId: number): Promise<GenerationResponse
   return response.json();
 }
 
+// Runs generation as a background job and reports its progress events as
+// they happen; resolves with the same response as generatePaper().
+export async function generatePaperWithProgress(
+  paperId: number,
+  onEvent: (event: GenerationEvent) => void
+): Promise<GenerationResponse> {
+  const response = await fetch(`${API_URL}/papers/${paperId}/generate?background=true`, {
+    method: "POST",
+  });
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({ detail: "Generation failed" }));
+    throw new Error(errorData.detail || "Failed to generate paper");
+  }
+  const job: { job_id: string; status_url: string; events_url: string } = await response.json();
+
+  await new Promise<void>((resolve, reject) => {
+    const source = new EventSource(`${API_URL}${job.events_url}`);
+    const kinds = [
+      "grounding", "generation_started", "question_accepted", "fallback_used",
+      "section_completed", "persisted", "generation_error", "completed", "failed",
+    ];
+    for (const kind of kinds) {
+      source.addEventListener(kind, (message) => {
+        onEvent({ event: kind, data: JSON.parse((message as MessageEvent).data) });
+        if (kind === "completed" || kind === "failed") {
+          source.close();
+          resolve();
+        }
+      });
+    }
+    // EventSource reconnects on its own (with Last-Event-ID); give up only once closed
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) reject(new Error("Lost the generation progress stream"));
+    };
+  });
+
+  const status: GenerationJob = await (await fetch(`${API_URL}${job.status_url}`)).json();
+  if (status.status !== "succeeded" || !status.result) {
+    throw new Error(status.error || "Failed to generate paper");
+  }
+  return status.result;
+}
+
 export async function regenerateQuestion(
   paperId: number,
   questionId: number
@@ -0,0 +1,46 @@
+-- Migration: Durable generation job queue (GENERATION_JOB_BACKEND=queue)
+-- The API inserts jobs; worker processes (python -m app.worker) claim them
+-- with SELECT ... FOR UPDATE SKIP LOCKED and write progress events.
+
+CREATE TABLE IF NOT EXISTS generation_jobs (
+    id VARCHAR(32) PRIMARY KEY,
+    paper_id INTEGER NOT NULL REFERENCES question_papers(id),
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+    worker_id VARCHAR(255),
+    lease_expires_at TIMESTAMP,
+    questions_total INTEGER,
+    questions_done INTEGER NOT NULL DEFAULT 0,
+    last_event_id INTEGER NOT NULL DEFAULT 0,
+    result JSON,
+    error TEXT,
+    created_at TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS generation_job_events (
+    id SERIAL PRIMARY KEY,
+    job_id VARCHAR(32) NOT NULL REFERENCES generation_jobs(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    kind VARCHAR(40) NOT NULL,
+    data JSON,
+    created_at TIMESTAMP
+);
+
+-- Add comments for documentation
+COMMENT ON COLUMN generation_jobs.status IS 'queued | running | succeeded | failed';
+COMMENT ON COLUMN generation_jobs.run_after IS 'Earliest time (UTC) a worker may claim the job; pushed back on retries';
+COMMENT ON COLUMN generation_jobs.lease_expires_at IS 'Renewed by the running worker; once past, another worker reclaims the job';
+COMMENT ON COLUMN generation_job_events.seq IS 'Per-job event number, used as the SSE event id';
+
+-- Workers poll queued jobs by run_after, and expired leases of running ones
+CREATE INDEX IF NOT EXISTS idx_generation_jobs_status_run_after ON generation_jobs(status, run_after);
+
+-- At most one queued or running job per paper
+CREATE UNIQUE INDEX IF NOT EXISTS uq_generation_jobs_active_paper
+    ON generation_jobs(paper_id) WHERE status IN ('queued', 'running');
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_generation_job_events_job_seq ON generation_job_events(job_id, seq);
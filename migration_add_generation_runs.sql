@@ -0,0 +1,38 @@
+-- Migration: Checkpointed, resumable paper generation
+-- Every question accepted during a generate_question_paper run is saved
+-- straight away; a re-run of a failed run only generates the missing slots.
+
+CREATE TABLE IF NOT EXISTS generation_runs (
+    id SERIAL PRIMARY KEY,
+    paper_id INTEGER NOT NULL REFERENCES question_papers(id),
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    attempts INTEGER NOT NULL DEFAULT 1,
+    llm_calls INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP,
+    updated_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS generation_checkpoints (
+    id SERIAL PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES generation_runs(id) ON DELETE CASCADE,
+    section_id INTEGER NOT NULL REFERENCES paper_sections(id) ON DELETE CASCADE,
+    question_order INTEGER NOT NULL,
+    source VARCHAR(20) NOT NULL,
+    question JSON NOT NULL,
+    created_at TIMESTAMP
+);
+
+-- Add comments for documentation
+COMMENT ON COLUMN generation_runs.status IS 'running | failed | completed; the latest unfinished run of a paper is resumed';
+COMMENT ON COLUMN generation_runs.attempts IS 'Times the run was started (1 + resumes)';
+COMMENT ON COLUMN generation_checkpoints.question IS 'Accepted question: text, bloom_level, difficulty, marks, quality_score';
+
+CREATE INDEX IF NOT EXISTS ix_generation_runs_paper_id ON generation_runs(paper_id);
+
+-- At most one running run per paper
+CREATE UNIQUE INDEX IF NOT EXISTS uq_generation_runs_running_paper
+    ON generation_runs(paper_id) WHERE status = 'running';
+CREATE UNIQUE INDEX IF NOT EXISTS uq_generation_checkpoints_slot
+    ON generation_checkpoints(run_id, section_id, question_order);
@@ -0,0 +1,19 @@
+-- Adds content_hash to questions: sha256 of the canonical question text
+-- (app/core/duplicate_checker.content_hash), found by index for exact
+-- duplicates. It is unique together with marks, bloom_level and
+-- difficulty, so INSERT ... ON CONFLICT reuses an existing question only
+-- when all four match. Safe to run multiple times using IF NOT EXISTS.
+--
+-- Existing rows start NULL; fill them in afterwards with
+--     python -m app.db.backfill content-hash
+
+ALTER TABLE IF EXISTS questions
+ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+-- Replaces the unique index on content_hash alone
+DROP INDEX IF EXISTS ix_questions_content_hash;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_questions_content
+    ON questions(content_hash, marks, bloom_level, difficulty);
+
+COMMENT ON COLUMN questions.content_hash IS 'sha256 hex of the NFKC-normalised, casefolded question text without punctuation or whitespace; NULL for unhashed rows and for duplicates left by the backfill';
@@ -0,0 +1,67 @@
+import json
+import os
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from benchmarks import fixtures, micro
+from benchmarks.report import compare_reports, write_report
+
+
+def test_fixtures_are_deterministic():
+    print("=" * 70)
+    print("TEST: Benchmark fixtures")
+    print("=" * 70)
+
+    assert fixtures.question_texts(50, seed=3) == fixtures.question_texts(50, seed=3)
+    assert fixtures.llm_batch_response(10, seed=1) == fixtures.llm_batch_response(10, seed=1)
+    rows = fixtures.question_rows(20, seed=2)
+    assert [q.question_text for q in rows] == [q.question_text for q in fixtures.question_rows(20, seed=2)]
+    print("✅ PASS")
+
+
+def test_quick_run_writes_comparable_report(tmp_path):
+    print("\n🔹 Quick run produces a JSON report that compares against itself")
+
+    report = micro.run(quick=True, pattern="calculate_", repeat=2, min_time=0.001, verbose=False)
+    names = sorted(report["results"])
+    print(f"Benchmarks: {names}")
+    assert names == [
+        "calculate_bloom_distribution[1000q]",
+        "calculate_bloom_distribution[100q]",
+        "calculate_syllabus_coverage[1000q]",
+        "calculate_syllabus_coverage[100q]",
+    ]
+    result = report["results"]["calculate_bloom_distribution[100q]"]
+    assert result["median"] > 0 and result["repeat"] == 2
+    assert result["params"]["questions"] == 100
+
+    path = write_report(report, str(tmp_path / "micro.json"))
+    loaded = json.loads(path.read_text())
+    rows = compare_reports(loaded, report)
+    assert len(rows) == 4
+    assert all(row["ratio"] == 1.0 and not row["regression"] for row in rows)
+    print("✅ PASS")
+
+
+def test_pdf_exports_render_from_fixtures():
+    print("\n🔹 PDF benchmarks render real PDFs")
+
+    from app.api.papers import export_paper_pdf
+
+    response = export_paper_pdf(paper_id=1, db=fixtures.paper_session(sections=2, per_section=4))
+    assert response.body.startswith(b"%PDF")
+
+    report = micro.run(quick=True, pattern="pdf", repeat=1, min_time=0.0, verbose=False)
+    assert set(report["results"]) == {"export_paper_pdf[3x10q]", "export_questions_pdf[100q]"}
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_fixtures_are_deterministic()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_quick_run_writes_comparable_report(Path(tmp))
+    test_pdf_exports_render_from_fixtures()
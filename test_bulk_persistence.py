@@ -0,0 +1,139 @@
+import asyncio
+import os
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from sqlalchemy.dialects import postgresql
+
+from app.api import generate as generate_api
+from app.api import papers
+from app.api.schemas import GenerateQuestionRequest
+from app.core.duplicate_checker import content_hash
+from app.db.bulk import insert_questions
+from benchmarks.fixtures import MemorySession
+from test_generation_jobs import batch_generate, make_session
+
+
+class CountingSession(MemorySession):
+    """MemorySession that counts the calls that would be DB round trips."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = {"execute": 0, "flush": 0, "refresh": 0, "commit": 0}
+
+    def execute(self, statement, params=None):
+        self.calls["execute"] += 1
+        return super().execute(statement, params)
+
+    def flush(self):
+        self.calls["flush"] += 1
+
+    def refresh(self, obj):
+        self.calls["refresh"] += 1
+
+    def commit(self):
+        self.calls["commit"] += 1
+
+
+def test_paper_save_is_two_statements():
+    print("=" * 70)
+    print("TEST: Bulk persistence of generated questions")
+    print("=" * 70)
+
+    db, paper = make_session()
+    counting = CountingSession()
+    counting.rows_by_entity = db.rows_by_entity
+    counting._ids = db._ids
+    papers.question_agent._cache.clear()
+
+    # Checkpoints are written on their own sessions: not counted
+    with patch("app.core.llm_client.LLMClient.generate", side_effect=batch_generate), \
+            patch("app.core.generation_runs.SessionLocal", return_value=db), \
+            patch("app.api.papers.update_analytics_for_paper"):
+        result = asyncio.run(papers.generate_question_paper(paper_id=paper.id, db=counting))
+
+    print(result["status"], counting.calls)
+    assert result["status"] == "SUCCESS"
+    # Questions, then links: one statement each, whatever the question count
+    assert counting.calls["execute"] == 2
+    assert counting.calls["flush"] == counting.calls["refresh"] == 0
+
+    links = counting.rows_by_entity["PaperQuestion"]
+    questions = {q.id: q for q in counting.rows_by_entity["Question"]}
+    assert len(links) == 5
+    assert sorted((link.section_id, link.question_order) for link in links) == [
+        (2, 1), (2, 2), (3, 1), (3, 2), (3, 3)
+    ]
+    assert all(questions[link.question_id].marks in (2, 13) for link in links)
+    print("✅ PASS")
+
+
+def test_insert_uses_returning():
+    print("\n🔹 Question ids come back from the upsert itself")
+
+    captured = {}
+
+    class Capture:
+        def execute(self, statement, params):
+            captured["sql"] = str(statement.compile(dialect=postgresql.dialect()))
+            captured["rows"] = params
+            return type("Result", (), {"scalars": lambda self: iter([11, 12])})()
+
+    rows = [{"question_text": f"Q{n}", "bloom_level": "Apply", "difficulty": "Medium", "marks": 13} for n in (1, 2)]
+    assert insert_questions(Capture(), rows) == [11, 12]
+    print(captured["sql"])
+    assert "ON CONFLICT (content_hash, marks, bloom_level, difficulty) DO UPDATE" in captured["sql"]
+    assert "RETURNING questions.id" in captured["sql"]
+    assert [row["content_hash"] for row in captured["rows"]] == [content_hash("Q1"), content_hash("Q2")]
+
+    # The same text for a 2-mark slot is another question; a repeat of a row is not
+    rows = [rows[0], {**rows[0], "marks": 2}, {**rows[0], "question_text": "q1."}]
+    assert insert_questions(Capture(), rows) == [11, 12, 11]
+    assert [row["marks"] for row in captured["rows"]] == [13, 2]
+    assert insert_questions(Capture(), []) == []
+    print("✅ PASS")
+
+
+def test_generate_endpoint_single_commit():
+    print("\n🔹 /generate: outcome, question and audit log in one transaction")
+
+    db = CountingSession()
+    accepted = {
+        "status": "ACCEPTED",
+        "question": {"question": "Explain dynamic dispatch with an example.", "code": "", "bloom_level": "Understand",
+                     "difficulty": "Medium", "marks": 10, "rationale": "ok"},
+        "raw_response": "{}",
+        "attempts": 1,
+    }
+    req = GenerateQuestionRequest(code="CS102", topic="Polymorphism", bloom_level=["Understand", "Apply"],
+                                  keywords=["dispatch"], marks=10, difficulty="Medium")
+
+    async def run(result):
+        with patch.object(generate_api.pipeline, "run", return_value=result), \
+                patch("app.api.generate.SessionLocal", return_value=db), \
+                patch("app.core.dedup_index.sync", return_value=0):
+            return await generate_api.generate_question(req)
+
+    response = asyncio.run(run(accepted))
+    print(response["status"], db.calls)
+    assert response["status"] == "success"
+    assert db.calls["commit"] == 1 and db.calls["refresh"] == 0
+
+    outcome = db.rows_by_entity["CourseOutcome"][0]
+    question = db.rows_by_entity["Question"][0]
+    audit = db.rows_by_entity["AuditLogDB"][0]
+    assert outcome.bloom_level == "Understand, Apply"
+    assert question.outcome_id == outcome.id
+    assert audit.question_id == question.id
+
+    rejected = asyncio.run(run({"status": "REJECTED", "reason": "invalid_json", "error": "bad", "raw_response": "x"}))
+    assert rejected["status"] == "error" and rejected["error"] == "bad"
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_paper_save_is_two_statements()
+    test_insert_uses_returning()
+    test_generate_endpoint_single_commit()
@@ -0,0 +1,278 @@
+import asyncio
+import os
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from sqlalchemy import select
+
+from app.api import papers
+from app.core.duplicate_checker import canonical_text, content_hash
+from app.core.semantic_index import SemanticIndex
+from app.db.bulk import find_question
+from app.db.backfill import backfill_content_hashes
+from app.db.models import PaperQuestion, PaperSection, Question, QuestionPaper
+from benchmarks.fixtures import MemorySession, apply_question
+from test_generation_jobs import batch_generate, make_session
+
+
+def test_canonical_text():
+    print("=" * 70)
+    print("TEST: Content hash of the canonical question text")
+    print("=" * 70)
+
+    text = "Explain Dijkstra's algorithm, with an example."
+    variants = [
+        "explain  dijkstra's algorithm with an example",
+        "EXPLAIN DIJKSTRA’S ALGORITHM — WITH AN EXAMPLE!",
+        "Ｅxplain Dijkstra's algorithm,\nwith an example.",  # fullwidth E (NFKC)
+    ]
+    print(canonical_text(text))
+    assert canonical_text(text) == "explaindijkstrasalgorithmwithanexample"
+    assert all(content_hash(variant) == content_hash(text) for variant in variants)
+    assert content_hash("Explain Prim's algorithm, with an example.") != content_hash(text)
+    assert len(content_hash(text)) == 64
+    print("✅ PASS")
+
+
+def test_paper_reuses_bank_question():
+    print("\n🔹 Without the bank's vectors, a question stored for the same kind of slot links to the stored row")
+
+    db, paper = make_session()
+    stored_text = apply_question(0).upper()
+    stored = Question(question_text=stored_text, bloom_level="Apply", difficulty="Medium", marks=13,
+                      content_hash=content_hash(stored_text))
+    # The same text as another generated question, but stored for a 2-mark slot
+    other_slot = Question(question_text=apply_question(1), bloom_level="Remember", difficulty="Easy", marks=2,
+                          content_hash=content_hash(apply_question(1)))
+    db.add(stored)
+    db.add(other_slot)
+    papers.question_agent._cache.clear()
+
+    with patch("app.core.llm_client.LLMClient.generate", side_effect=batch_generate), \
+            patch("app.core.generation_runs.SessionLocal", return_value=db), \
+            patch("app.api.papers.update_analytics_for_paper"):
+        result = asyncio.run(papers.generate_question_paper(paper_id=paper.id, db=db))
+
+    assert result["status"] == "SUCCESS"
+    links = db.rows_by_entity["PaperQuestion"]
+    questions = {q.id: q for q in db.rows_by_entity["Question"]}
+    print(f"Links to the stored question: {sum(link.question_id == stored.id for link in links)}")
+    assert len(links) == 5
+    assert any(link.question_id == stored.id for link in links)
+    assert all(link.question_id != other_slot.id for link in links)
+    copy = next(q for q in questions.values() if q.id != other_slot.id and q.content_hash == other_slot.content_hash)
+    assert (copy.marks, copy.bloom_level) == (13, "Apply")
+    keys = [(q.content_hash, q.marks, q.bloom_level, q.difficulty) for q in questions.values()]
+    assert len(keys) == len(set(keys))
+    print("✅ PASS")
+
+
+def test_paper_rejects_bank_repeats_but_reuses_templates():
+    print("\n🔹 With the bank's vectors loaded, LLM repeats of bank questions are rejected; templates are reused")
+
+    db, paper = make_session()
+    stored = Question(question_text=apply_question(0), bloom_level="Apply", difficulty="Medium", marks=13,
+                      content_hash=content_hash(apply_question(0)))
+    db.add(stored)
+    # Every Part A template the paper can pick, stored for 2-mark Remember/Easy slots
+    templates = [
+        text
+        for topic in paper.core_topics
+        for text in (f"Define {topic}.", f"What is {topic}?", f"State two key properties of {topic}.",
+                     f"Explain {topic} briefly with one example.")
+    ]
+    template_rows = [
+        Question(question_text=text, bloom_level="Remember", difficulty="Easy", marks=2, content_hash=content_hash(text))
+        for text in templates
+    ]
+    for row in template_rows:
+        db.add(row)
+    bank = SemanticIndex(dim=256)
+    bank.add([stored.id], [stored.question_text])
+    papers.question_agent._cache.clear()
+
+    with patch("app.core.llm_client.LLMClient.generate", side_effect=batch_generate), \
+            patch("app.core.semantic_index._bank_index", bank), \
+            patch("app.core.generation_runs.SessionLocal", return_value=db), \
+            patch("app.api.papers.update_analytics_for_paper"):
+        result = asyncio.run(papers.generate_question_paper(paper_id=paper.id, db=db))
+
+    assert result["status"] == "SUCCESS"
+    links = db.rows_by_entity["PaperQuestion"]
+    questions = {q.id: q for q in db.rows_by_entity["Question"]}
+    linked = [questions[link.question_id] for link in links]
+    print([q.question_text for q in linked])
+    assert len(links) == 5
+    assert all(link.question_id != stored.id for link in links)
+    assert apply_question(0) not in [q.question_text for q in linked]
+    part_a = [q for q in linked if q.marks == 2]
+    assert len(part_a) == 2
+    assert all(any(q is row for row in template_rows) for q in part_a)
+    assert [q.question_text for q in questions.values()].count(apply_question(0)) == 1
+    print("✅ PASS")
+
+
+class KeySession(MemorySession):
+    """MemorySession whose Question lookups apply their equality filters."""
+
+    def query(self, *entities):
+        rows = self.rows_by_entity.get(entities[0].__name__, [])
+
+        class Query:
+            def filter(self, *clauses):
+                self.clauses = clauses
+                return self
+
+            def first(self):
+                return next((
+                    row for row in rows
+                    if all(getattr(row, clause.left.key) == clause.right.value for clause in self.clauses)
+                ), None)
+
+        return Query()
+
+
+def test_find_question_matches_the_whole_content_key():
+    print("\n🔹 The exact-duplicate lookup only finds the same text stored for the same kind of slot")
+
+    db = KeySession()
+    stored = Question(question_text=apply_question(0), bloom_level="Apply", difficulty="Medium", marks=13,
+                      content_hash=content_hash(apply_question(0)))
+    db.add(stored)
+
+    assert find_question(db, apply_question(0).upper(), 13, "Apply", "Medium") is stored
+    assert find_question(db, apply_question(0), 2, "Apply", "Medium") is None
+    assert find_question(db, apply_question(0), 13, "Analyze", "Medium") is None
+    assert find_question(db, apply_question(0), 13, "Apply", "Hard") is None
+    assert find_question(db, apply_question(1), 13, "Apply", "Medium") is None
+    print("✅ PASS")
+
+
+class LinkSession(MemorySession):
+    """MemorySession whose column queries are real SELECTs (regenerate only uses one as a subquery)."""
+
+    def query(self, *entities):
+        if not hasattr(entities[0], "__name__"):
+            return select(*entities)
+        return super().query(*entities)
+
+
+def test_regenerate_leaves_shared_question_alone():
+    print("\n🔹 Regenerating a question shared with another paper stores a new row for this paper only")
+
+    db = LinkSession()
+    paper = QuestionPaper(title="Graph Theory", total_marks=13, status="DRAFT", subject="Graph Theory",
+                          core_topics=["Graphs", "Trees"], forbidden_topics=[])
+    db.add(paper)
+    section = PaperSection(paper_id=paper.id, name="Part B", marks_per_question=13, number_of_questions=1)
+    db.add(section)
+    shared = Question(question_text=apply_question(0), bloom_level="Apply", difficulty="Medium", marks=13,
+                      content_hash=content_hash(apply_question(0)), topics_used=["Graphs"])
+    db.add(shared)
+    link = PaperQuestion(section_id=section.id, question_id=shared.id, question_order=1)
+    db.add(link)
+    # A finalized paper's slot holds the same bank row
+    db.add(PaperQuestion(section_id=section.id + 100, question_id=shared.id, question_order=1))
+
+    new_text = "Apply Kruskal's algorithm to find a minimum spanning tree of the given graph of trees."
+    regenerated = {"success": True, "question": new_text}
+    with patch.object(papers.regenerator, "regenerate_with_context", return_value=regenerated), \
+            patch("app.api.papers.find_question", return_value=None), \
+            patch("app.api.papers._duplicate_in_paper", return_value=None), \
+            patch("app.api.papers.update_analytics_for_paper"):
+        result = asyncio.run(papers.regenerate_question(paper_id=paper.id, question_id=shared.id, db=db))
+
+    print(result)
+    new_question = next(q for q in db.rows_by_entity["Question"] if q.id == result["new_question"]["id"])
+    assert result["success"] and result["old_question_id"] == shared.id
+    assert (shared.question_text, shared.content_hash) == (apply_question(0), content_hash(apply_question(0)))
+    assert link.question_id == new_question.id != shared.id
+    assert db.rows_by_entity["PaperQuestion"][1].question_id == shared.id
+    assert (new_question.question_text, new_question.marks, new_question.bloom_level) == (new_text, 13, "Apply")
+    assert new_question.content_hash == content_hash(new_text)
+    assert new_question.topics_used == ["Graphs", "Trees"]
+    print("✅ PASS")
+
+
+class BackfillSession:
+    """Answers backfill_content_hashes()'s queries from a dict of id -> [text, content_hash, marks]."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.commits = 0
+
+    def query(self, *columns):
+        session = self
+
+        class Query:
+            min_id = 0
+            hashes = None
+
+            def filter(self, *clauses):
+                for clause in clauses:
+                    if clause.operator.__name__ == "in_op":
+                        self.hashes = set(clause.right.value)
+                    elif clause.operator.__name__ == "gt":
+                        self.min_id = clause.right.value
+                return self
+
+            def order_by(self, *args):
+                return self
+
+            def limit(self, n):
+                self.n = n
+                return self
+
+            def all(self):
+                if self.hashes is not None:
+                    return [(h, marks, "Apply", "Medium") for _, h, marks in session.rows.values() if h in self.hashes]
+                return [
+                    (question_id, text, marks, "Apply", "Medium")
+                    for question_id, (text, h, marks) in sorted(session.rows.items())
+                    if h is None and question_id > self.min_id
+                ][:self.n]
+
+        return Query()
+
+    def execute(self, statement, params):
+        for row in params:
+            self.rows[row["id"]][1] = row["content_hash"]
+
+    def commit(self):
+        self.commits += 1
+
+
+def test_backfill_skips_duplicates():
+    print("\n🔹 Backfill hashes old rows in batches, leaving exact duplicates unhashed")
+
+    texts = [apply_question(n) for n in range(10)]
+    rows = {n + 1: [text, None, 13] for n, text in enumerate(texts)}
+    rows[11] = [texts[2].upper(), None, 13]        # duplicate of id 3, other batch
+    rows[12] = [texts[4] + "  ", None, 13]         # duplicate of id 5
+    rows[13] = [texts[7].lower(), None, 13]        # duplicate of id 14
+    rows[14] = [texts[7] + "!", content_hash(texts[7]), 13]   # hashed before the backfill
+    rows[15] = [texts[0], None, 2]                 # same text as id 1, for 2 marks: not a duplicate
+    db = BackfillSession(rows)
+
+    counts = backfill_content_hashes(db, batch_size=4)
+    print(counts)
+    assert counts == {"hashed": 10, "duplicates": 4}
+    assert db.commits == 4
+    assert all(rows[n][1] == content_hash(texts[n - 1]) for n in range(1, 11) if n != 8)
+    assert all(rows[n][1] is None for n in (8, 11, 12, 13))
+    assert rows[15][1] == content_hash(texts[0])
+
+    # Nothing left to do on a re-run
+    assert backfill_content_hashes(db, batch_size=4) == {"hashed": 0, "duplicates": 4}
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_canonical_text()
+    test_paper_reuses_bank_question()
+    test_paper_rejects_bank_repeats_but_reuses_templates()
+    test_find_question_matches_the_whole_content_key()
+    test_regenerate_leaves_shared_question_alone()
+    test_backfill_skips_duplicates()
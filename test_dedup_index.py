@@ -0,0 +1,166 @@
+import os
+import random
+import tempfile
+from types import SimpleNamespace
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from sqlalchemy import select
+
+from app.api.papers import _duplicate_in_paper
+from app.core import dedup_index
+from app.core.dedup_index import NearDuplicateIndex
+from app.core.duplicate_checker import similarity
+from app.db.models import PaperQuestion, PaperSection
+from benchmarks import fixtures
+from test_paper_batching import q, run_section
+
+
+def perturb(text: str, rng: random.Random) -> str:
+    """Swap one or two words, the kind of rewording a model produces."""
+    words = text.split()
+    for _ in range(rng.randint(1, 2)):
+        words[rng.randrange(len(words))] = rng.choice(["explain", "the", "graph", "given", "using", "tree"])
+    return " ".join(words)
+
+
+def test_finds_near_duplicates_among_candidates():
+    print("=" * 70)
+    print("TEST: MinHash LSH near-duplicate index")
+    print("=" * 70)
+
+    bank = fixtures.question_texts(2000, seed=3)
+    index = NearDuplicateIndex()
+    for question_id, text in enumerate(bank, 1):
+        index.add(question_id, text, bloom_level="Apply" if question_id % 2 else "Analyze")
+
+    rng = random.Random(5)
+    duplicates = found = 0
+    for question_id in rng.sample(range(1, len(bank) + 1), 300):
+        variant = perturb(bank[question_id - 1], rng)
+        if similarity(bank[question_id - 1], variant) < 0.85:
+            continue
+        duplicates += 1
+        match = index.find(variant, 0.85)
+        found += match is not None
+        assert match is None or similarity(bank[match[0] - 1], variant) == match[1] >= 0.85
+
+    print(f"Near-duplicates found: {found}/{duplicates}")
+    assert duplicates > 200 and found / duplicates >= 0.98
+
+    # Candidates are a small part of the bank; an unrelated question has no match
+    assert len(index.candidates(bank[0])) < len(bank) / 10
+    assert index.find("Design a relational schema for a hospital billing system.", 0.85) is None
+
+    # Tags filter the candidates
+    assert index.find(bank[0], 0.85, bloom_level="Apply")[0] == 1
+    assert all(doc_id != 1 for doc_id, _ in index.matches(bank[0], 0.85, bloom_level="Analyze"))
+    print("✅ PASS")
+
+
+class BankSession:
+    """Answers sync()'s id > max_id query from a list of question rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def query(self, *columns):
+        session = self
+
+        class Query:
+            min_id = 0
+
+            def filter(self, clause):
+                self.min_id = clause.right.value
+                return self
+
+            def order_by(self, *args):
+                return self
+
+            def limit(self, n):
+                self.n = n
+                return self
+
+            def all(self):
+                return [
+                    (row.id, row.question_text, row.bloom_level, row.difficulty)
+                    for row in session.rows if row.id > self.min_id
+                ][:self.n]
+
+        return Query()
+
+
+def test_snapshot_and_catch_up():
+    print("\n🔹 Snapshot at shutdown, catch up with the database at startup")
+
+    rows = fixtures.question_rows(30, seed=1)
+    path = os.path.join(tempfile.mkdtemp(), "index.json")
+
+    dedup_index._question_index = None
+    assert dedup_index.sync(BankSession(rows[:20]), batch_size=7) == 20
+    dedup_index.save(path)
+
+    # Restart: snapshot restored, the 10 questions inserted meanwhile indexed
+    dedup_index._question_index = None
+    index = dedup_index.load(BankSession(rows), path=path)
+    assert len(index) == 30 and index.max_id == 30
+    assert index.find(rows[24].question_text, 0.99,
+                      bloom_level=rows[24].bloom_level, difficulty=rows[24].difficulty)[0] == 25
+
+    # A snapshot built with other parameters is ignored
+    assert not NearDuplicateIndex(num_perm=32, bands=8).load(path)
+    dedup_index._question_index = None
+    print("✅ PASS")
+
+
+def test_paper_rejects_reworded_duplicates():
+    print("\n🔹 In-paper dedup catches rewordings, not just identical text")
+
+    reworded = q(1).replace("show every step", "show all the steps")
+    assert similarity(q(1), reworded) >= 0.85
+    result, calls = run_section(3, [[q(1), reworded, q(2)], [q(3)]])
+
+    print(f"Requested counts: {calls}")
+    assert calls == [3, 1]
+    assert [data["text"] for data, _ in result["questions"]] == [q(1), q(2), q(3)]
+    print("✅ PASS")
+
+
+class PaperBankSession(BankSession):
+    """BankSession that also answers _duplicate_in_paper()'s query for the paper's question ids."""
+
+    def __init__(self, rows, paper_question_ids):
+        super().__init__(rows)
+        self.paper_question_ids = paper_question_ids
+
+    def query(self, *columns):
+        if columns[0] is PaperSection.id:
+            return select(*columns)  # only used as a subquery
+        if columns[0] is PaperQuestion.question_id:
+            ids = [(question_id,) for question_id in self.paper_question_ids]
+            return SimpleNamespace(filter=lambda *clauses: ids)
+        return super().query(*columns)
+
+
+def test_paper_check_sees_questions_of_other_processes():
+    print("\n🔹 Replace/regenerate checks catch up with questions other workers inserted")
+
+    rows = fixtures.question_rows(10, seed=6)
+    dedup_index._question_index = None
+    dedup_index.sync(BankSession(rows[:5]))
+
+    # Question 8 was stored by another worker since this process last synced
+    db = PaperBankSession(rows, paper_question_ids=[2, 8])
+    reworded = rows[7].question_text + " Justify each step."
+    assert _duplicate_in_paper(db, 1, reworded, exclude_id=2) == 8
+    assert _duplicate_in_paper(db, 1, reworded, exclude_id=8) is None
+    dedup_index._question_index = None
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_finds_near_duplicates_among_candidates()
+    test_snapshot_and_catch_up()
+    test_paper_rejects_reworded_duplicates()
+    test_paper_check_sees_questions_of_other_processes()
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import re
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+import httpx
+from fastapi import FastAPI
+
+from app.api import papers
+from app.core import generation_jobs
+from app.core.generation_jobs import GenerationJobs, report_progress
+from app.db.models import PaperSection, QuestionPaper
+from app.db.session import get_db
+from benchmarks.fixtures import MemorySession, apply_question
+
+
+def make_session():
+    db = MemorySession()
+    paper = QuestionPaper(
+        title="Graph Theory", total_marks=0, status="DRAFT",
+        syllabus="Unit I: Graphs, trees, shortest paths, spanning trees",
+        subject="Graph Theory", domain="Computer Science",
+        core_topics=["Graphs", "Trees", "Shortest Paths"], forbidden_topics=[],
+    )
+    db.add(paper)
+    db.add(PaperSection(paper_id=paper.id, name="Part A", marks_per_question=2, number_of_questions=2, total_marks=4))
+    db.add(PaperSection(paper_id=paper.id, name="Part B", marks_per_question=13, number_of_questions=3, total_marks=39))
+    return db, paper
+
+
+async def batch_generate(system_prompt, user_prompt):
+    """Two of the three requested questions usable: the third slot falls back to a template."""
+    await asyncio.sleep(0.05)
+    count = int(re.search(r"Generate EXACTLY (\d+) questions", user_prompt).group(1))
+    questions = [
+        {"question": apply_question(n),
+         "bloom_level": "Apply", "difficulty": "Medium", "marks": 13}
+        for n in range(count - 1)
+    ]
+    return json.dumps({"questions": questions})
+
+
+def make_app(db) -> FastAPI:
+    app = FastAPI()
+    app.include_router(papers.router)
+    app.dependency_overrides[get_db] = lambda: db
+    return app
+
+
+def parse_sse(text: str) -> list[dict]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append({"id": int(fields["id"]), "event": fields["event"], "data": json.loads(fields["data"])})
+    return events
+
+
+def test_background_generation_streams_progress():
+    print("=" * 70)
+    print("TEST: Background paper generation with an SSE progress stream")
+    print("=" * 70)
+
+    db, paper = make_session()
+    generation_jobs._jobs = GenerationJobs(ttl=60)
+    papers.question_agent._cache.clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=make_app(db))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = await client.post(f"/papers/{paper.id}/generate", params={"background": "true"})
+            # The same paper again while it runs: same job
+            again = await client.post(f"/papers/{paper.id}/generate", params={"background": "true"})
+            job = started.json()
+            async with client.stream("GET", job["events_url"]) as stream:
+                body = "".join([chunk async for chunk in stream.aiter_text()])
+            status = (await client.get(job["status_url"])).json()
+            replay = await client.get(job["events_url"], headers={"Last-Event-ID": "3"})
+            missing = await client.get(f"/papers/{paper.id}/jobs/nope")
+        return started, again, body, status, replay, missing
+
+    with patch("app.api.papers.SessionLocal", return_value=db), \
+            patch("app.core.generation_runs.SessionLocal", return_value=db), \
+            patch("app.core.llm_client.LLMClient.generate", side_effect=batch_generate):
+        started, again, body, status, replay, missing = asyncio.run(run())
+
+    assert started.status_code == 202
+    assert again.json()["job_id"] == started.json()["job_id"]
+
+    events = parse_sse(body)
+    kinds = [event["event"] for event in events]
+    print(kinds)
+    assert kinds[:2] == ["grounding", "generation_started"]
+    assert kinds[-2:] == ["persisted", "completed"]
+    assert [event["id"] for event in events] == list(range(1, len(events) + 1))
+
+    slots = [event["data"] for event in events if event["event"] in ("question_accepted", "fallback_used")]
+    assert [slot["done"] for slot in slots] == [1, 2, 3, 4, 5]
+    assert all(slot["total"] == 5 for slot in slots)
+    assert sum(1 for event in events if event["event"] == "fallback_used") == 1
+    part_b = next(e["data"] for e in events if e["event"] == "section_completed" and e["data"]["section"] == "Part B")
+    assert part_b["template_fallbacks"] == 1
+
+    assert status["status"] == "succeeded"
+    assert status["progress"] == {"questions_done": 5, "questions_total": 5}
+    assert status["result"]["status"] == "SUCCESS"
+    assert parse_sse(replay.text)[0]["id"] == 4
+    assert missing.status_code == 404
+    print("✅ PASS")
+
+
+def test_failed_job_and_progress_outside_jobs():
+    print("\n🔹 A job that raises ends with a failed event; report_progress is a no-op outside jobs")
+
+    report_progress("question_accepted", section="Part A", order=1)  # no job: nothing happens
+
+    async def boom():
+        report_progress("generation_started", total_questions=1)
+        raise RuntimeError("database went away")
+
+    async def run():
+        jobs = GenerationJobs(ttl=60)
+        job = jobs.start(7, boom)
+        events = [event async for event in job.follow()]
+        return job, events
+
+    job, events = asyncio.run(run())
+    assert job.status == "failed"
+    assert job.error == "database went away"
+    assert [event["event"] for event in events] == ["generation_started", "failed"]
+    print("✅ PASS")
+
+
+def test_interrupted_generation_fails_the_job():
+    print("\n🔹 A generation that stops part way (DRAFT, resumable) ends the job as failed")
+
+    db, paper = make_session()
+    papers.question_agent._cache.clear()
+
+    async def run():
+        jobs = GenerationJobs(ttl=60)
+        job = jobs.start(paper.id, lambda: papers.generate_question_paper(paper_id=paper.id, db=db))
+        events = [event async for event in job.follow()]
+        return job, events
+
+    with patch("app.core.llm_client.LLMClient.generate", side_effect=batch_generate), \
+            patch("app.core.generation_runs.SessionLocal", return_value=db), \
+            patch("app.api.papers.generation_runs.complete_run", side_effect=RuntimeError("server closed the connection")):
+        job, events = asyncio.run(run())
+
+    print(job.status, job.error, events[-1])
+    assert job.result["status"] == "DRAFT" and job.result["resumable"]
+    assert (job.status, job.error) == ("failed", "server closed the connection")
+    assert [event["event"] for event in events][-2:] == ["generation_error", "failed"]
+    assert events[-1]["data"]["error"] == "server closed the connection"
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_background_generation_streams_progress()
+    test_failed_job_and_progress_outside_jobs()
+    test_interrupted_generation_fails_the_job()
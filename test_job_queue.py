@@ -0,0 +1,380 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api import papers
+from app.core import job_queue
+from app.core.config import settings
+from app.core import generation_runs
+from app.core.generation_jobs import report_progress
+from app.db.models import GenerationJobEvent, GenerationJobRecord
+from app.db.session import Base, get_db
+from app.worker import GenerationWorker
+from test_generation_jobs import batch_generate, make_session, parse_sse
+
+
+def make_sessions():
+    """Sessions on a throwaway SQLite file holding just the queue tables."""
+    path = os.path.join(tempfile.mkdtemp(), "queue.sqlite3")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[GenerationJobRecord.__table__, GenerationJobEvent.__table__])
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+def job_row(Session, job_id):
+    db = Session()
+    try:
+        return db.query(GenerationJobRecord).filter(GenerationJobRecord.id == job_id).one()
+    finally:
+        db.close()
+
+
+def event_kinds(Session, job_id):
+    db = Session()
+    try:
+        events = db.query(GenerationJobEvent).filter(GenerationJobEvent.job_id == job_id).order_by(GenerationJobEvent.seq)
+        return [event.kind for event in events]
+    finally:
+        db.close()
+
+
+def test_claim_lease_and_retry():
+    print("=" * 70)
+    print("TEST: Durable generation job queue")
+    print("=" * 70)
+
+    Session = make_sessions()
+    db = Session()
+    job = job_queue.enqueue(db, 1)
+    assert job_queue.enqueue(db, 1).id == job.id  # one active job per paper
+    other = job_queue.enqueue(db, 2)
+
+    claimed = job_queue.claim(db, "w1", limit=1, lease=30)
+    assert [j.id for j in claimed] == [job.id]
+    assert job_queue.claim(db, "w2", limit=5, lease=30)[0].id == other.id
+    assert job_queue.claim(db, "w2", limit=5, lease=30) == []
+
+    # w1 dies: once its lease runs out, w2 takes the job over and w1 has lost it
+    row = db.query(GenerationJobRecord).filter(GenerationJobRecord.id == job.id).one()
+    row.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+    assert [j.id for j in job_queue.claim(db, "w2", limit=5, lease=30)] == [job.id]
+    assert job_queue.renew_leases(db, "w1", [job.id]) == {job.id}
+    assert job_queue.renew_leases(db, "w2", [job.id, other.id]) == set()
+    job_queue.complete(db, job.id, "w1", {"status": "SUCCESS"})  # stale worker: ignored
+    assert job_row(Session, job.id).status == "running"
+
+    # A failure goes back in the queue with a backoff, until the attempts run out
+    with patch.object(settings, "GENERATION_JOB_RETRY_BACKOFF", 10):
+        job_queue.fail(db, job.id, "w2", "provider down")
+    row = job_row(Session, job.id)
+    assert (row.status, row.attempts) == ("queued", 2)
+    assert row.run_after > datetime.utcnow() + timedelta(seconds=15)
+    assert job_queue.claim(db, "w2", limit=5) == []
+
+    db.query(GenerationJobRecord).filter(GenerationJobRecord.id == job.id).update({"run_after": datetime.utcnow()})
+    db.commit()
+    job_queue.claim(db, "w3", limit=5)
+    job_queue.fail(db, job.id, "w3", "provider down")
+    row = job_row(Session, job.id)
+    print(event_kinds(Session, job.id))
+    assert (row.status, row.attempts, row.error) == ("failed", 3, "provider down")
+    assert event_kinds(Session, job.id) == ["lease_expired", "retrying", "failed"]
+    assert job_queue.enqueue(db, 1).id != job.id  # finished: the paper can be queued again
+
+    with patch.object(settings, "GENERATION_JOB_RETRY_BACKOFF", 30), \
+            patch.object(settings, "GENERATION_JOB_RETRY_BACKOFF_MAX", 100):
+        assert [job_queue.retry_delay(n) for n in (1, 2, 3, 4)] == [30, 60, 100, 100]
+    db.close()
+    print("✅ PASS")
+
+
+def test_worker_runs_retries_and_requeues_on_shutdown():
+    print("\n🔹 Workers: concurrency limit, retry after an error, re-queue on shutdown")
+
+    Session = make_sessions()
+    db = Session()
+    flaky, slow, rejected = (job_queue.enqueue(db, paper_id).id for paper_id in (1, 2, 3))
+    db.close()
+    attempts = {}
+    running = []
+
+    async def run_job(paper_id, session):
+        attempts[paper_id] = attempts.get(paper_id, 0) + 1
+        running.append(paper_id)
+        try:
+            if paper_id == 3:
+                raise HTTPException(status_code=400, detail="This paper is finalized")
+            report_progress("generation_started", total_questions=2)
+            report_progress("question_accepted", section="Part A", order=1)
+            if paper_id == 1 and attempts[1] == 1:
+                raise RuntimeError("database went away")
+            if paper_id == 2:
+                await asyncio.sleep(60)
+            report_progress("question_accepted", section="Part A", order=2)
+            return {"status": "SUCCESS", "total_llm_calls": 1}
+        finally:
+            running.remove(paper_id)
+
+    async def run():
+        worker = GenerationWorker(
+            worker_id="w1", concurrency=2, poll_interval=0.01, lease=30, shutdown_grace=0.05,
+            session_factory=Session, run=run_job,
+        )
+        peak = 0
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, len(running))
+                await asyncio.sleep(0.005)
+
+        watcher = asyncio.create_task(watch())
+        serving = asyncio.create_task(worker.run())
+        while job_row(Session, flaky).status != "succeeded" or job_row(Session, rejected).status != "failed":
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await serving
+        watcher.cancel()
+        return peak
+
+    with patch.object(settings, "GENERATION_JOB_RETRY_BACKOFF", 0):
+        peak = asyncio.run(run())
+
+    print(attempts, peak)
+    assert peak <= 2
+    assert attempts[1] == 2 and attempts[3] == 1
+    row = job_row(Session, flaky)
+    assert (row.questions_done, row.questions_total, row.result["status"]) == (2, 2, "SUCCESS")
+    assert event_kinds(Session, flaky) == [
+        "generation_started", "question_accepted", "retrying",
+        "generation_started", "question_accepted", "question_accepted", "completed",
+    ]
+    assert job_row(Session, rejected).error == "This paper is finalized"
+
+    # The slow job was cut off by the shutdown: queued again, attempt not counted
+    row = job_row(Session, slow)
+    assert (row.status, row.attempts, row.worker_id) == ("queued", 0, None)
+    assert event_kinds(Session, slow)[-1] == "requeued"
+    print("✅ PASS")
+
+
+def test_interrupted_generation_is_retried():
+    print("\n🔹 A generation that stops part way (DRAFT, resumable) is retried, resuming its run")
+
+    Session = make_sessions()
+    memory, paper = make_session()
+    db = Session()
+    job_id = job_queue.enqueue(db, paper.id).id
+    db.close()
+    complete_run = generation_runs.complete_run
+    failures = [RuntimeError("server closed the connection")]
+
+    def flaky_complete_run(*args):
+        if failures:
+            raise failures.pop()
+        return complete_run(*args)
+
+    async def run_job(paper_id, session):
+        # The real pipeline, on the in-memory paper
+        return await papers.generate_question_paper(paper_id=paper_id, db=memory)
+
+    async def run():
+        worker = GenerationWorker(
+            worker_id="w1", concurrency=1, poll_interval=0.01, lease=30, session_factory=Session, run=run_job,
+        )
+        serving = asyncio.create_task(worker.run())
+        while job_row(Session, job_id).status not in ("succeeded", "failed"):
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await serving
+
+    papers.question_agent._cache.clear()
+    with patch.object(settings, "GENERATION_JOB_RETRY_BACKOFF", 0), \
+            patch("app.core.llm_client.LLMClient.generate", side_effect=batch_generate), \
+            patch("app.core.generation_runs.SessionLocal", return_value=memory), \
+            patch("app.api.papers.generation_runs.complete_run", side_effect=flaky_complete_run):
+        asyncio.run(run())
+
+    row = job_row(Session, job_id)
+    kinds = event_kinds(Session, job_id)
+    print(row.status, row.attempts, kinds)
+    assert (row.status, row.attempts, row.result["status"]) == ("succeeded", 2, "SUCCESS")
+    assert row.result["restored_questions"] > 0  # resumed from the checkpoints
+    assert kinds.count("generation_error") == 1
+    assert kinds.index("generation_error") + 1 == kinds.index("retrying")
+    assert kinds[-1] == "completed"
+    print("✅ PASS")
+
+
+def slow_first_call(delay: float):
+    """batch_generate, but the first call hangs for `delay` seconds."""
+    calls = []
+
+    async def generate(system_prompt, user_prompt):
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(delay)
+        return await batch_generate(system_prompt, user_prompt)
+    return generate
+
+
+def test_cancelled_job_is_reclaimed_and_resumes():
+    print("\n🔹 A job cancelled by a worker shutdown is claimed again and resumes its run")
+
+    Session = make_sessions()
+    memory, paper = make_session()
+    db = Session()
+    job_id = job_queue.enqueue(db, paper.id).id
+    db.close()
+
+    async def run_job(paper_id, session):
+        return await papers.generate_question_paper(paper_id=paper_id, db=memory)
+
+    async def run():
+        first = GenerationWorker(
+            worker_id="w1", concurrency=1, poll_interval=0.01, lease=30, shutdown_grace=0.05,
+            session_factory=Session, run=run_job,
+        )
+        serving = asyncio.create_task(first.run())
+        while "GenerationCheckpoint" not in memory.rows_by_entity:
+            await asyncio.sleep(0.01)
+        first.stop()
+        await serving
+        assert job_row(Session, job_id).status == "queued"
+        assert memory.rows_by_entity["GenerationRun"][0].status == "failed"
+
+        second = GenerationWorker(
+            worker_id="w2", concurrency=1, poll_interval=0.01, lease=30, session_factory=Session, run=run_job,
+        )
+        serving = asyncio.create_task(second.run())
+        while job_row(Session, job_id).status not in ("succeeded", "failed"):
+            await asyncio.sleep(0.01)
+        second.stop()
+        await serving
+
+    papers.question_agent._cache.clear()
+    with patch("app.core.llm_client.LLMClient.generate", side_effect=slow_first_call(30)), \
+            patch("app.core.generation_runs.SessionLocal", return_value=memory):
+        asyncio.run(run())
+
+    row = job_row(Session, job_id)
+    kinds = event_kinds(Session, job_id)
+    print(row.status, row.attempts, kinds)
+    assert (row.status, row.attempts, row.result["status"]) == ("succeeded", 1, "SUCCESS")
+    assert row.result["restored_questions"] > 0
+    assert "requeued" in kinds and "postponed" not in kinds
+    print("✅ PASS")
+
+
+def test_job_waits_for_the_run_of_its_lost_lease():
+    print("\n🔹 A reclaimed job whose old attempt still holds the run waits for it, without using up attempts")
+
+    Session = make_sessions()
+    memory, paper = make_session()
+    db = Session()
+    job_id = job_queue.enqueue(db, paper.id).id
+    db.close()
+
+    async def run_job(paper_id, session):
+        return await papers.generate_question_paper(paper_id=paper_id, db=memory)
+
+    async def run():
+        # w1 renews its lease only every 0.5s, so w2 can reclaim the job first
+        first = GenerationWorker(
+            worker_id="w1", concurrency=1, poll_interval=0.01, lease=1.5, session_factory=Session, run=run_job,
+        )
+        serving_first = asyncio.create_task(first.run())
+        while "GenerationCheckpoint" not in memory.rows_by_entity:
+            await asyncio.sleep(0.01)
+
+        second = GenerationWorker(
+            worker_id="w2", concurrency=1, poll_interval=0.01, lease=30, session_factory=Session, run=run_job,
+        )
+        db = Session()
+        db.query(GenerationJobRecord).filter(GenerationJobRecord.id == job_id).update(
+            {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+        )
+        db.commit()
+        db.close()
+        second._claim()
+        serving_second = asyncio.create_task(second.run())
+
+        while job_row(Session, job_id).status not in ("succeeded", "failed"):
+            await asyncio.sleep(0.01)
+        first.stop()
+        second.stop()
+        await asyncio.gather(serving_first, serving_second)
+
+    papers.question_agent._cache.clear()
+    with patch.object(settings, "GENERATION_RUN_HEARTBEAT", 0.05), \
+            patch.object(settings, "GENERATION_RUN_STALE_AFTER", 0.2), \
+            patch("app.core.llm_client.LLMClient.generate", side_effect=slow_first_call(30)), \
+            patch("app.core.generation_runs.SessionLocal", return_value=memory):
+        asyncio.run(run())
+
+    row = job_row(Session, job_id)
+    kinds = event_kinds(Session, job_id)
+    print(row.status, row.attempts, kinds)
+    assert (row.status, row.result["status"]) == ("succeeded", "SUCCESS")
+    assert row.attempts == 2  # w1's attempt and w2's; the waits are not counted
+    assert kinds.count("postponed") >= 1 and "retrying" not in kinds
+    assert row.result["restored_questions"] > 0
+    print("✅ PASS")
+
+
+def test_api_reads_queued_job_status_and_events():
+    print("\n🔹 The API serves a queued job's status and event stream from the database")
+
+    Session = make_sessions()
+    db = Session()
+    job = job_queue.enqueue(db, 5)
+    job_queue.claim(db, "w1", limit=1)
+    progress = job_queue.JobProgress(job.id, Session)
+    progress.emit("generation_started", total_questions=1)
+    progress.emit("question_accepted", section="Part A", order=1)
+    job_queue.complete(db, job.id, "w1", {"status": "SUCCESS", "total_llm_calls": 3})
+
+    app = FastAPI()
+    app.include_router(papers.router)
+    app.dependency_overrides[get_db] = lambda: db
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            status = (await client.get(f"/papers/5/jobs/{job.id}")).json()
+            events = await client.get(f"/papers/5/jobs/{job.id}/events", headers={"Last-Event-ID": "1"})
+            wrong_paper = await client.get(f"/papers/6/jobs/{job.id}")
+        return status, events, wrong_paper
+
+    with patch("app.core.job_queue.SessionLocal", Session):
+        status, events, wrong_paper = asyncio.run(run())
+    db.close()
+
+    assert status["status"] == "succeeded"
+    assert status["progress"] == {"questions_done": 1, "questions_total": 1}
+    assert status["last_event"]["event"] == "completed"
+    events = parse_sse(events.text)
+    assert [(e["id"], e["event"]) for e in events] == [(2, "question_accepted"), (3, "completed")]
+    assert events[0]["data"]["done"] == 1
+    assert wrong_paper.status_code == 404
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_claim_lease_and_retry()
+    test_worker_runs_retries_and_requeues_on_shutdown()
+    test_interrupted_generation_is_retried()
+    test_cancelled_job_is_reclaimed_and_resumes()
+    test_job_waits_for_the_run_of_its_lost_lease()
+    test_api_reads_queued_job_status_and_events()
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+os.environ["LLM_MOCK"] = "1"
+
+from app.core.json_utils import parse_llm_json, safe_llm_json_parse
+from app.core.llm_safe import SafeLLM
+from app.core.metrics import LLM_JSON_REPAIRS
+from app.core.pipeline_config import PipelineConfig
+
+
+def test_well_formed_json_is_not_repaired():
+    print("=" * 70)
+    print("TEST: Tolerant JSON parsing of LLM responses")
+    print("=" * 70)
+
+    pretty = json.dumps({"topics": ["Graphs", "Trees"], "subject": "DM"}, indent=2)
+    assert parse_llm_json(pretty) == ({"topics": ["Graphs", "Trees"], "subject": "DM"}, False)
+    assert parse_llm_json('Sure!\n```json\n{"a": "line one\nline two"}\n```') == ({"a": "line one\nline two"}, False)
+    assert parse_llm_json('[{"q": 1}, {"q": 2}]') == ([{"q": 1}, {"q": 2}], False)
+    print("✅ PASS")
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ('{"topics": ["A", "B",],}', {"topics": ["A", "B"]}),
+    ("{“question”: “Define a tree”, “marks”: 2}", {"question": "Define a tree", "marks": 2}),
+    ('{"q": "Explain the "ACID" properties", "marks": 13}', {"q": 'Explain the "ACID" properties', "marks": 13}),
+    ('{"a": "x" "b": 1}', {"a": "x", "b": 1}),
+    ('{topics: ["x"], ok: True, note: None}', {"topics": ["x"], "ok": True, "note": None}),
+    ('{"topics": ["A", "B"]', {"topics": ["A", "B"]}),
+    ('{"questions": [{"q": "one"}, {"q": "two"}, {"q": "thr', {"questions": [{"q": "one"}, {"q": "two"}]}),
+    ('{"questions": [{"q": "one"}], "subject": "Gra', {"questions": [{"q": "one"}]}),
+    ('{"topics": ["A"]}\nAnd more:\n{"topics": ["B"], "subject": "S"}', {"topics": ["A", "B"], "subject": "S"}),
+    ('Use {braces} carefully. [1, 2] [3]', [1, 2, 3]),
+    ('{"path": "C:\\qb", "n": 1.5e2', {"path": "C:\\qb"}),
+])
+def test_repairs(raw, expected):
+    print(f"\n🔹 {raw!r}")
+    parsed, repaired = parse_llm_json(raw)
+    print(parsed)
+    assert parsed == expected
+    assert repaired
+    print("✅ PASS")
+
+
+def test_nothing_usable_raises():
+    print("\n🔹 Empty and JSON-less responses")
+    for raw in ("", "   ", "I cannot help with that.", '{"subject": "Gra'):
+        with pytest.raises(ValueError):
+            safe_llm_json_parse(raw)
+    print("✅ PASS")
+
+
+def test_safe_llm_repairs_without_retry():
+    print("\n🔹 SafeLLM: local repair, then a fix call, before any retry")
+
+    cfg = PipelineConfig(stage_name="repair_test", max_retries=1, timeout=5)
+    calls = []
+
+    async def truncated(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        return '{"topics": ["Graphs", "Trees", "Shortest pa'
+
+    async def garbled_then_fixed(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        if len(calls) == 1:
+            return '{"topics": {"Graphs"'
+        return '{"topics": ["Graphs"]}'
+
+    async def run(side_effect, prompt):
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=side_effect):
+            return await SafeLLM().generate_json("sys", prompt, config=cfg)
+
+    before = LLM_JSON_REPAIRS.snapshot()
+    assert asyncio.run(run(truncated, "local")) == {"topics": ["Graphs", "Trees"]}
+    assert len(calls) == 1
+
+    calls.clear()
+    assert asyncio.run(run(garbled_then_fixed, "fix")) == {"topics": ["Graphs"]}
+    # The fix call carries only the broken output, not the original prompt
+    assert calls == ["fix", '{"topics": {"Graphs"']
+
+    after = LLM_JSON_REPAIRS.snapshot()
+    assert after[("repair_test", "local")] - before.get(("repair_test", "local"), 0) == 1
+    assert after[("repair_test", "fix_call")] - before.get(("repair_test", "fix_call"), 0) == 1
+    print("✅ PASS")
+
+
+def test_failed_fix_call_falls_back_to_retry():
+    print("\n🔹 Fix call fails too: the normal retry runs")
+
+    cfg = PipelineConfig(stage_name="repair_retry", max_retries=1, timeout=5)
+    calls = []
+
+    async def generate(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        if len(calls) < 3:
+            return "no JSON here {"
+        return '{"ok": true}'
+
+    async def run():
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=generate):
+            return await SafeLLM().generate_json("sys", "prompt", config=cfg)
+
+    assert asyncio.run(run()) == {"ok": True}
+    assert calls[1] == "no JSON here {"
+    assert calls[2].startswith("prompt") and "Invalid JSON" in calls[2]
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_well_formed_json_is_not_repaired()
+    for case in test_repairs.pytestmark[0].args[1]:
+        test_repairs(*case)
+    test_nothing_usable_raises()
+    test_safe_llm_repairs_without_retry()
+    test_failed_fix_call_falls_back_to_retry()
@@ -0,0 +1,216 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+os.environ.setdefault("LLM_API_KEY", "test-key")
+
+from app.core import llm_client
+from app.core.llm_client import LLMClient
+from app.core.llm_scheduler import LLMScheduler
+
+
+class FakeCompletions:
+    """Stands in for the provider SDK: every call takes `delay` seconds."""
+
+    def __init__(self, delay: float, content: str | None = '{"question": "ok"}'):
+        self.delay = delay
+        self.content = content
+        self.active = 0
+        self.peak = 0
+        self.cancelled = 0
+
+    async def create(self, **kwargs):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.active -= 1
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class FakeStream:
+    """Async iterator of delta chunks, like the SDK's stream=True response."""
+
+    def __init__(self, chunks: list[str]):
+        self.chunks = list(chunks)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        await asyncio.sleep(0)
+        delta = SimpleNamespace(content=self.chunks.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeStreamingCompletions:
+    def __init__(self, chunks: list[str]):
+        self.stream = FakeStream(chunks)
+
+    async def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        return self.stream
+
+
+def install_fake(completions: FakeCompletions, max_in_flight: int):
+    loop = asyncio.get_running_loop()
+    llm_client._shared.update(
+        loop=loop,
+        client=SimpleNamespace(chat=SimpleNamespace(completions=completions)),
+        scheduler=LLMScheduler(
+            requests_per_minute=6000, tokens_per_minute=10_000_000, max_concurrency=max_in_flight
+        ),
+    )
+
+
+def make_client() -> LLMClient:
+    client = LLMClient()
+    client.mock_mode = False
+    return client
+
+
+def test_concurrent_calls_do_not_block_event_loop():
+    print("=" * 70)
+    print("TEST: Concurrent LLM calls share one pool without blocking")
+    print("=" * 70)
+
+    async def run():
+        fake = FakeCompletions(delay=0.2)
+        install_fake(fake, max_in_flight=5)
+        client = make_client()
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*[client.generate("sys", f"user {i}") for i in range(5)])
+        elapsed = time.perf_counter() - start
+
+        print(f"5 calls finished in {elapsed:.2f}s (peak in-flight: {fake.peak})")
+        assert len(results) == 5
+        assert elapsed < 0.6, "calls ran serially"
+        assert fake.peak == 5
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_max_in_flight_is_enforced():
+    print("\n🔹 Max in-flight limit")
+
+    async def run():
+        fake = FakeCompletions(delay=0.05)
+        install_fake(fake, max_in_flight=2)
+        client = make_client()
+
+        await asyncio.gather(*[client.generate("sys", "user") for _ in range(6)])
+
+        print(f"Peak in-flight: {fake.peak}")
+        assert fake.peak == 2
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_wait_for_cancels_provider_call():
+    print("\n🔹 Timeout cancels the in-flight request")
+
+    async def run():
+        fake = FakeCompletions(delay=5)
+        install_fake(fake, max_in_flight=2)
+        client = make_client()
+
+        try:
+            await asyncio.wait_for(client.generate("sys", "user"), timeout=0.1)
+            assert False, "expected timeout"
+        except asyncio.TimeoutError:
+            pass
+
+        print(f"Cancelled provider calls: {fake.cancelled}")
+        assert fake.cancelled == 1
+        assert fake.active == 0
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_empty_message_content():
+    print("\n🔹 A reply without message content (tool call, refusal) does not break logging")
+
+    async def run():
+        install_fake(FakeCompletions(delay=0, content=None), max_in_flight=1)
+        logger = llm_client.logger
+        level = logger.level
+        logger.setLevel("DEBUG")
+        try:
+            assert await make_client().generate("sys", "user") is None
+        finally:
+            logger.setLevel(level)
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_closing_stream_early_frees_slot():
+    print("\n🔹 Closing a stream early stops it and frees the slot")
+
+    async def run():
+        fake = FakeStreamingCompletions(['{"top', 'ics": [', '"A"', ", ", '"B"]}'])
+        install_fake(fake, max_in_flight=1)
+        scheduler = llm_client._shared["scheduler"]
+
+        chunks = make_client().generate_stream("sys", "user")
+        received = [await chunks.__anext__(), await chunks.__anext__()]
+        assert scheduler.active == 1
+        await chunks.aclose()
+
+        print(f"Received {received} before closing")
+        assert fake.stream.closed
+        assert scheduler.active == 0
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_client_of_previous_loop_is_closed():
+    print("\n🔹 A new event loop closes the previous loop's connection pool")
+
+    closed = []
+
+    async def close():
+        closed.append(True)
+
+    async def first():
+        install_fake(FakeCompletions(delay=0), max_in_flight=1)
+        llm_client._shared["client"].close = close
+
+    async def second():
+        client, _ = llm_client.get_shared_client()
+        await asyncio.sleep(0)
+        assert closed == [True]
+        assert client is llm_client._shared["client"]
+        await llm_client.close_shared_client()
+
+    asyncio.run(first())
+    with patch.object(llm_client.settings, "LLM_PROVIDER", "simulator"):
+        asyncio.run(second())
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_do_not_block_event_loop()
+    test_max_in_flight_is_enforced()
+    test_wait_for_cancels_provider_call()
+    test_empty_message_content()
+    test_closing_stream_early_frees_slot()
+    test_client_of_previous_loop_is_closed()
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+
+from app.core.llm_safe import SafeLLM, _in_flight
+from app.core.pipeline_config import PipelineConfig
+
+CONFIG = PipelineConfig(stage_name="coalesce_test", max_retries=0, timeout=5)
+
+
+def slow_generate(calls: list, delay: float = 0.1, payload: dict | None = None):
+    async def generate(system_prompt, user_prompt):
+        calls.append(user_prompt)
+        await asyncio.sleep(delay)
+        return json.dumps(payload or {"question": "Apply Dijkstra's algorithm."})
+    return generate
+
+
+def test_identical_calls_share_one_provider_call():
+    print("=" * 70)
+    print("TEST: Single-flight coalescing in SafeLLM")
+    print("=" * 70)
+
+    async def run():
+        calls = []
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=slow_generate(calls)):
+            results = await asyncio.gather(*[
+                SafeLLM().generate_json("sys", "same prompt", config=CONFIG) for _ in range(4)
+            ])
+            different = await SafeLLM().generate_json("sys", "other prompt", config=CONFIG)
+
+        print(f"Provider calls: {len(calls)}")
+        assert len(calls) == 2
+        assert all(r == different for r in results)
+
+        # Each caller gets its own copy
+        results[0]["is_valid"] = False
+        assert "is_valid" not in results[1]
+        assert not _in_flight
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_failure_is_shared():
+    print("\n🔹 Failures propagate to every waiter")
+
+    async def run():
+        async def broken(system_prompt, user_prompt):
+            await asyncio.sleep(0.05)
+            return "not json at all"
+
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=broken) as mock_generate:
+            results = await asyncio.gather(
+                *[SafeLLM().generate_json("sys", "bad prompt", config=CONFIG) for _ in range(3)],
+                return_exceptions=True,
+            )
+
+        assert mock_generate.call_count == 1
+        assert all(isinstance(r, ValueError) for r in results)
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_cancelled_waiter_does_not_kill_shared_call():
+    print("\n🔹 Cancelling one waiter keeps the shared call alive")
+
+    async def run():
+        calls = []
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=slow_generate(calls, delay=0.2)):
+            first = asyncio.ensure_future(SafeLLM().generate_json("sys", "shared", config=CONFIG))
+            second = asyncio.ensure_future(SafeLLM().generate_json("sys", "shared", config=CONFIG))
+            await asyncio.sleep(0.05)
+
+            first.cancel()
+            result = await second
+
+        assert first.cancelled()
+        assert result["question"].startswith("Apply")
+        assert len(calls) == 1
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_last_waiter_cancelling_stops_call():
+    print("\n🔹 Cancelling every waiter cancels the shared call")
+
+    async def run():
+        calls = []
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=slow_generate(calls, delay=5)):
+            waiter = asyncio.ensure_future(SafeLLM().generate_json("sys", "abandoned", config=CONFIG))
+            await asyncio.sleep(0.05)
+            waiter.cancel()
+            await asyncio.sleep(0.05)
+
+        assert waiter.cancelled()
+        assert not _in_flight
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_identical_calls_share_one_provider_call()
+    test_failure_is_shared()
+    test_cancelled_waiter_does_not_kill_shared_call()
+    test_last_waiter_cancelling_stops_call()
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from app.core.llm_client import _record_tokens, llm_stage
+from app.core.metrics import LLM_TOKENS
+from benchmarks.llm_efficiency import _by_label, load_corpus
+
+
+def test_tokens_recorded_per_stage():
+    print("=" * 70)
+    print("TEST: Token usage labelled by stage")
+    print("=" * 70)
+
+    class Usage:
+        prompt_tokens = 120
+        completion_tokens = 30
+        total_tokens = 150
+
+    before = LLM_TOKENS.snapshot()
+    token = llm_stage.set("topic_extraction")
+    try:
+        assert _record_tokens(Usage(), "sys", "user", "out") == 150
+        # No usage reported: estimated at ~4 characters per token
+        assert _record_tokens(None, "s" * 40, "u" * 40, "c" * 80) == 40
+    finally:
+        llm_stage.reset(token)
+
+    prompt = _by_label(before, LLM_TOKENS.snapshot(), kind="prompt")
+    completion = _by_label(before, LLM_TOKENS.snapshot(), kind="completion")
+    print(prompt, completion)
+    assert prompt == {"topic_extraction": 140}
+    assert completion == {"topic_extraction": 50}
+    print("✅ PASS")
+
+
+def test_benchmark_run_on_simulator(tmp_path):
+    print("\n🔹 One corpus entry through generate_question_paper on the simulator")
+
+    output = tmp_path / "efficiency.json"
+    # Own process: the benchmark configures the provider before app settings load
+    env = {k: v for k, v in os.environ.items() if k != "LLM_MOCK"}
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.llm_efficiency", "--only", "python-programming",
+         "--batch-sizes", "0,5", "--sim-latency", "fixed:0.001", "-o", str(output)],
+        check=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, timeout=120,
+    )
+    report = json.loads(output.read_text())
+    per_question = report["results"]["python-programming[batch=0]"]
+    batched = report["results"]["python-programming[batch=5]"]
+    print({k: per_question[k] for k in ("accepted", "provider_calls", "tokens_per_accepted")})
+    print({k: batched[k] for k in ("accepted", "provider_calls", "tokens_per_accepted")})
+
+    assert per_question["llm_slots"] == batched["llm_slots"] == 4
+    assert per_question["accepted"] + per_question["template_fallbacks"] == 4
+    # Grounding plus one call per question, against grounding plus one batch
+    assert per_question["provider_calls"] >= 5
+    assert batched["provider_calls"] < per_question["provider_calls"]
+    assert batched["prompt_tokens"] > 0 and batched["completion_tokens"] > 0
+    assert "subject_grounding" in batched["stage_seconds"]
+    assert "question_pipeline" in per_question["tokens_by_stage"]
+    print("✅ PASS")
+
+
+def test_corpus_entries_are_well_formed():
+    print("\n🔹 Corpus entries")
+
+    corpus = load_corpus(None, None)
+    assert len({entry["name"] for entry in corpus}) == len(corpus)
+    for entry in corpus:
+        assert len(entry["syllabus"]) >= 10
+        assert all(len(section) == 3 for section in entry["sections"])
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+
+    test_tokens_recorded_per_stage()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_benchmark_run_on_simulator(Path(tmp))
+    test_corpus_entries_are_well_formed()
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import time
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+
+from app.core import llm_hedging
+from app.core import stage_latency
+from app.core.llm_hedging import HedgeBudget
+from app.core.stage_latency import StageLatencyTracker
+from app.core.llm_safe import SafeLLM
+from app.core.pipeline_config import PipelineConfig
+
+CONFIG = PipelineConfig(stage_name="hedge_test", max_retries=0, timeout=2, hedge_percentile=95)
+
+
+def delayed_generate(delays: list[float], calls: list):
+    """The n-th provider call takes delays[n] seconds and answers with its index."""
+    async def generate(system_prompt, user_prompt):
+        n = len(calls)
+        calls.append(n)
+        try:
+            await asyncio.sleep(delays[n])
+        except asyncio.CancelledError:
+            calls[n] = "cancelled"
+            raise
+        return json.dumps({"question": f"answer from call {n}"})
+    return generate
+
+
+def install(budget: HedgeBudget, p95: float = 0.1):
+    tracker = StageLatencyTracker(window=10_000, min_samples=1)
+    for _ in range(1000):
+        tracker.record(CONFIG.stage_name, p95)
+    stage_latency._tracker = tracker
+    llm_hedging._budget = budget
+
+
+def test_slow_call_is_hedged():
+    print("=" * 70)
+    print("TEST: Hedged requests in SafeLLM")
+    print("=" * 70)
+
+    budget = HedgeBudget(ratio=1.0)
+    install(budget)
+    calls = []
+
+    async def run():
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=delayed_generate([1.5, 0.05], calls)):
+            start = time.perf_counter()
+            result = await SafeLLM().generate_json("sys", "user", config=CONFIG)
+            await asyncio.sleep(0)
+            return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(run())
+    print(f"Answered in {elapsed:.2f}s: {result['question']}")
+    assert result["question"] == "answer from call 1"
+    assert elapsed < 0.5
+    assert calls[0] == "cancelled"
+    assert budget.hedges == 1 and budget.hedge_wins == 1
+    print("✅ PASS")
+
+
+def test_fast_call_is_not_hedged():
+    print("\n🔹 Calls faster than the percentile never hedge")
+
+    budget = HedgeBudget(ratio=1.0)
+    install(budget, p95=0.5)
+    calls = []
+
+    async def run():
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=delayed_generate([0.05], calls)):
+            return await SafeLLM().generate_json("sys", "user", config=CONFIG)
+
+    asyncio.run(run())
+    assert calls == [0]
+    assert budget.hedges == 0
+    print("✅ PASS")
+
+
+def test_budget_caps_hedge_rate():
+    print("\n🔹 Hedge budget caps extra provider calls")
+
+    budget = HedgeBudget(ratio=0.25)
+    install(budget)
+    calls = []
+
+    async def run():
+        # Every call is slower than the stage's p95
+        delays = [0.3] * 20
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=delayed_generate(delays, calls)):
+            for i in range(8):
+                await SafeLLM().generate_json("sys", f"user {i}", config=CONFIG)
+
+    asyncio.run(run())
+    print(f"Primary calls: {budget.primaries}, hedges: {budget.hedges}")
+    assert budget.primaries == 8
+    assert budget.hedges == 2
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_slow_call_is_hedged()
+    test_fast_call_is_not_hedged()
+    test_budget_caps_hedge_rate()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+from app.core.llm_scheduler import (
+    BULK,
+    INTERACTIVE,
+    LLMScheduler,
+    llm_request_context,
+)
+
+
+def make_scheduler(**overrides) -> LLMScheduler:
+    options = dict(requests_per_minute=60_000, tokens_per_minute=10_000_000, max_concurrency=1)
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+
+async def queued_call(scheduler, order, name, lane, paper_id):
+    with llm_request_context(lane, paper_id):
+        ticket = await scheduler.acquire(100)
+    order.append(name)
+    await asyncio.sleep(0)
+    scheduler.release(ticket, latency=0.01)
+
+
+def test_interactive_lane_first_and_fair_share():
+    print("=" * 70)
+    print("TEST: Priority lanes and per-paper fair sharing")
+    print("=" * 70)
+
+    async def run():
+        scheduler = make_scheduler()
+        order = []
+
+        # Occupy the only slot so everything below queues up
+        blocker = await scheduler.acquire(100)
+        tasks = [
+            asyncio.create_task(queued_call(scheduler, order, "p1-a", BULK, 1)),
+            asyncio.create_task(queued_call(scheduler, order, "p1-b", BULK, 1)),
+            asyncio.create_task(queued_call(scheduler, order, "p1-c", BULK, 1)),
+            asyncio.create_task(queued_call(scheduler, order, "p2-a", BULK, 2)),
+            asyncio.create_task(queued_call(scheduler, order, "replace", INTERACTIVE, 3)),
+        ]
+        await asyncio.sleep(0)
+        scheduler.release(blocker, latency=0.01)
+        await asyncio.gather(*tasks)
+
+        print(f"Dispatch order: {order}")
+        assert order[0] == "replace"
+        assert order[1:] == ["p1-a", "p2-a", "p1-b", "p1-c"]
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_aimd_on_rate_limit_and_latency():
+    print("\n🔹 AIMD concurrency adjustment")
+
+    async def run():
+        scheduler = make_scheduler(max_concurrency=8, target_latency=1.0)
+        assert scheduler.limit == 8
+
+        ticket = await scheduler.acquire(100)
+        scheduler.release(ticket, latency=0.1, rate_limited=True, retry_after=0)
+        assert scheduler.limit == 4
+
+        ticket = await scheduler.acquire(100)
+        scheduler.release(ticket, latency=5.0)
+        assert scheduler.limit < 4
+
+        before = scheduler.limit
+        for _ in range(10):
+            ticket = await scheduler.acquire(100)
+            scheduler.release(ticket, latency=0.1)
+        print(f"Limit after recovery: {scheduler.limit:.2f}")
+        assert scheduler.limit > before
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_request_bucket_throttles():
+    print("\n🔹 Requests-per-minute token bucket")
+
+    async def run():
+        # 600 RPM = 10 req/s with a burst of 100
+        scheduler = make_scheduler(requests_per_minute=600, max_concurrency=500)
+        scheduler.request_bucket.level = 0
+
+        start = time.monotonic()
+        ticket = await scheduler.acquire(100)
+        waited = time.monotonic() - start
+        scheduler.release(ticket, latency=0.01)
+
+        print(f"Waited {waited:.3f}s for a request token")
+        assert waited >= 0.08
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+def test_cancelled_waiter_is_skipped():
+    print("\n🔹 Cancelled waiters never take a slot")
+
+    async def run():
+        scheduler = make_scheduler()
+        blocker = await scheduler.acquire(100)
+        waiting = asyncio.create_task(scheduler.acquire(100))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.sleep(0)
+
+        scheduler.release(blocker, latency=0.01)
+        assert scheduler.active == 0
+        assert scheduler.snapshot()["queued"] == {INTERACTIVE: 0, BULK: 0}
+
+    asyncio.run(run())
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_interactive_lane_first_and_fair_share()
+    test_aimd_on_rate_limit_and_latency()
+    test_request_bucket_throttles()
+    test_cancelled_waiter_is_skipped()
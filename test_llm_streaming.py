@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+import time
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+
+from app.core.json_stream import IncrementalJSONParser
+from app.core.llm_safe import SafeLLM
+from app.core.pipeline_config import PipelineConfig, PipelineStageError
+
+
+def feed_all(text: str, size: int = 3) -> IncrementalJSONParser:
+    parser = IncrementalJSONParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser
+
+
+def test_partial_objects():
+    print("=" * 70)
+    print("TEST: Incremental JSON parser")
+    print("=" * 70)
+
+    parser = IncrementalJSONParser()
+    parser.feed('```json\n{"topics": ["Graphs", "Tre')
+    assert parser.partial() == {"topics": ["Graphs"]}
+    assert parser.partial() is None  # nothing new
+
+    parser = IncrementalJSONParser()
+    parser.feed('{"question": "Define a gr')
+    assert parser.partial() == {"question": None}
+
+    parser = feed_all('{"a": {"b": [1, 2], "c": "x, y"}, "d": true} trailing {prose}')
+    assert parser.done
+    assert parser.partial() == {"a": {"b": [1, 2], "c": "x, y"}, "d": True}
+    print("✅ PASS")
+
+
+def test_items_close_one_by_one():
+    print("\n🔹 Item-array elements are emitted as they close")
+
+    parser = IncrementalJSONParser()
+    parser.feed('{"questions": [{"question": "Q1 [a]", "marks": 13}, {"question": "Q')
+    assert parser.take_items() == [{"question": "Q1 [a]", "marks": 13}]
+    parser.feed('2"}]}')
+    assert parser.take_items() == [{"question": "Q2"}]
+
+    parser = feed_all('["Graphs", "Trees", 3]', size=2)
+    assert parser.take_items() == ["Graphs", "Trees", 3]
+    print("✅ PASS")
+
+
+def test_drift_aborts_stream_early():
+    print("\n🔹 Fail-fast checks abort a drifting stream")
+
+    def no_questions(parsed):
+        return not (isinstance(parsed, dict) and "question" in parsed)
+
+    config = PipelineConfig(
+        stage_name="stream_test", max_retries=0, timeout=5,
+        fail_fast_checks=[no_questions], stream=True,
+    )
+    sent = []
+
+    async def drifting_stream(system_prompt, user_prompt):
+        for chunk in ['{"que', 'stion": "Explain', " normalization " * 200, '"}']:
+            sent.append(chunk)
+            await asyncio.sleep(0.2 if len(sent) > 2 else 0)
+            yield chunk
+
+    async def run():
+        with patch("app.core.llm_client.LLMClient.generate_stream", side_effect=drifting_stream):
+            start = time.perf_counter()
+            try:
+                await SafeLLM().generate_json("sys", "topics please", config=config)
+                assert False, "expected fail-fast abort"
+            except PipelineStageError:
+                pass
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(run())
+    print(f"Aborted after {len(sent)} chunks in {elapsed:.2f}s")
+    assert len(sent) == 2
+    assert elapsed < 0.2
+    print("✅ PASS")
+
+
+def test_on_item_sees_questions_before_completion():
+    print("\n🔹 Completed question objects are handed downstream early")
+
+    body = json.dumps({"questions": [{"question": f"Q{i}"} for i in range(3)]})
+    seen = []
+
+    async def run():
+        # Mock-mode streaming replays the (patched) generate() payload in chunks
+        with patch("app.core.llm_client.LLMClient.generate", return_value=body):
+            result = await SafeLLM().generate_json(
+                "sys", "batch", on_item=lambda item: seen.append((item["question"], len(seen)))
+            )
+        return result
+
+    result = asyncio.run(run())
+    assert [q for q, _ in seen] == ["Q0", "Q1", "Q2"]
+    assert result == json.loads(body)
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_partial_objects()
+    test_items_close_one_by_one()
+    test_drift_aborts_stream_early()
+    test_on_item_sees_questions_before_completion()
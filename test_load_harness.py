@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.metrics import router as metrics_router
+from app.core.loop_monitor import LoopLagMonitor, record_loop_lag
+from app.core import loop_monitor
+from app.core.metrics import REQUEST_LOOP_LAG, REGISTRY, record_db_time
+from benchmarks import load
+
+
+def make_app() -> FastAPI:
+    # The poller routes plus /metrics, wired like app.main
+    app = FastAPI()
+    app.include_router(metrics_router)
+
+    @app.get("/dashboard/stats")
+    async def stats():
+        time.sleep(0.06)  # sync work on the loop shows up as lag
+        return {"total_papers": 1}
+
+    @app.get("/dashboard/recent-papers")
+    async def recent():
+        return []
+
+    @app.get("/questions")
+    async def questions(limit: int = 10):
+        return {"questions": []}
+
+    @app.get("/papers/")
+    async def papers():
+        return {"error": "Paper not found"}
+
+    @app.get("/analytics/summary")
+    async def summary():
+        return {"total_questions": 0}
+
+    app.middleware("http")(record_db_time)
+    app.middleware("http")(record_loop_lag)
+    return app
+
+
+def test_recorder_percentiles():
+    print("=" * 70)
+    print("TEST: Load recorder summary")
+    print("=" * 70)
+
+    recorder = load.LoadRecorder()
+    for ms in range(1, 101):
+        recorder.record("GET /x", ms / 1000, 200)
+    recorder.record("GET /y", 0.5, 500, "HTTP 500: boom")
+    recorder.record("GET /y", 0.1, 200)
+
+    summary = recorder.summary(elapsed=10.0)
+    print(summary["GET /x"])
+    assert summary["GET /x"]["p50"] == 0.05
+    assert summary["GET /x"]["p95"] == 0.095
+    assert summary["GET /x"]["p99"] == 0.099
+    assert summary["GET /x"]["throughput_rps"] == 10.0
+    assert summary["GET /y"]["error_rate"] == 0.5
+    assert recorder.error_samples == {"GET /y": "HTTP 500: boom"}
+    print("✅ PASS")
+
+
+def test_loop_lag_histogram_round_trip():
+    print("\n🔹 /metrics loop-lag histogram parses back into per-route deltas")
+
+    before = load.parse_loop_lag(REGISTRY.render())
+    REQUEST_LOOP_LAG.observe(0.003, endpoint='GET /papers/{paper_id}')
+    REQUEST_LOOP_LAG.observe(0.2, endpoint='GET /papers/{paper_id}')
+    after = load.parse_loop_lag(REGISTRY.render())
+
+    delta = load.loop_lag_delta(before, after)["GET /papers/{paper_id}"]
+    print(delta)
+    assert delta["requests"] == 2
+    assert abs(delta["mean"] - 0.1015) < 1e-9
+    assert delta["p95_bucket"] == 0.25
+    print("✅ PASS")
+
+
+def test_pollers_against_app():
+    print("\n🔹 Pollers drive the app; blocking route is charged the loop lag")
+
+    app = make_app()
+
+    async def run():
+        monitor = LoopLagMonitor(interval=0.01)
+        previous, loop_monitor._monitor = loop_monitor._monitor, monitor
+        monitor.start()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+                return await load.run_load(client, duration=0.5, authors=0, pollers=2, poll_interval=0.05)
+        finally:
+            await monitor.stop()
+            loop_monitor._monitor = previous
+
+    recorder, extra = asyncio.run(run())
+    report = load.build_report(recorder, extra, target="test")
+    results = report["results"]
+    load.print_summary(report)
+
+    assert set(results) == {route for route, _ in load.POLL_ROUTES}
+    assert results["GET /papers/"]["error_rate"] == 1.0  # 200 with an "error" body
+    assert results["GET /questions"]["error_rate"] == 0.0
+    stats_lag = results["GET /dashboard/stats"]["server_loop_lag"]
+    assert stats_lag["mean"] >= 0.04
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_recorder_percentiles()
+    test_loop_lag_histogram_round_trip()
+    test_pollers_against_app()
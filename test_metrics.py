@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.health import router as health_router
+from app.api.metrics import router as metrics_router
+from app.core.llm_safe import SafeLLM
+from app.core.metrics import (
+    LLM_JSON_PARSE_FAILURES,
+    LLM_STAGE_CALLS,
+    LLM_STAGE_RETRIES,
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    instrument_engine,
+    measure_db_time,
+    record_db_time,
+)
+from app.core.pipeline_config import PipelineConfig
+
+
+def make_app() -> FastAPI:
+    # Same wiring as app.main, without the routers that need optional extras
+    app = FastAPI()
+    app.include_router(health_router)
+    app.include_router(metrics_router)
+    app.middleware("http")(record_db_time)
+    return app
+
+
+def test_exposition_format():
+    print("=" * 70)
+    print("TEST: Prometheus text exposition")
+    print("=" * 70)
+
+    registry = MetricsRegistry()
+    calls = registry.register(Counter("demo_calls_total", "Demo calls.", ["stage"]))
+    latency = registry.register(Histogram("demo_latency_seconds", "Demo latency.", ["stage"], buckets=(1, 5)))
+    calls.inc(stage='say "hi"')
+    latency.observe(0.5, stage="a")
+    latency.observe(3, stage="a")
+
+    text = registry.render()
+    print(text)
+    assert "# TYPE demo_calls_total counter" in text
+    assert 'demo_calls_total{stage="say \\"hi\\""} 1' in text
+    assert 'demo_latency_seconds_bucket{stage="a",le="1"} 1' in text
+    assert 'demo_latency_seconds_bucket{stage="a",le="5"} 2' in text
+    assert 'demo_latency_seconds_bucket{stage="a",le="+Inf"} 2' in text
+    assert 'demo_latency_seconds_sum{stage="a"} 3.5' in text
+    print("✅ PASS")
+
+
+def test_safe_llm_outcomes_are_counted():
+    print("\n🔹 SafeLLM parse failures and retries are counted")
+
+    config = PipelineConfig(stage_name="metrics_test", max_retries=1, timeout=5)
+    responses = iter(["not json", json.dumps({"ok": True})])
+
+    async def generate(system_prompt, user_prompt):
+        return next(responses)
+
+    async def run():
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=generate):
+            return await SafeLLM().generate_json("sys", "user", config=config)
+
+    assert asyncio.run(run()) == {"ok": True}
+    assert LLM_JSON_PARSE_FAILURES.value(stage="metrics_test") == 1
+    assert LLM_STAGE_RETRIES.value(stage="metrics_test") == 1
+    assert LLM_STAGE_CALLS.value(stage="metrics_test", outcome="parse_error") == 1
+    assert LLM_STAGE_CALLS.value(stage="metrics_test", outcome="success") == 1
+    print("✅ PASS")
+
+
+def test_metrics_route():
+    print("\n🔹 /metrics route")
+
+    client = TestClient(make_app())
+    client.get("/health")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'qb_db_time_seconds_count{endpoint="GET /health"} 1' in response.text
+    assert 'qb_cache_entries{cache="question_batch"}' in response.text
+    print("✅ PASS")
+
+
+def test_db_time_is_attributed_to_request():
+    print("\n🔹 Query time is collected per request")
+
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    with engine.connect() as conn:
+        conn.execute(text("select 1"))  # outside a request: ignored
+        with measure_db_time() as db_seconds:
+            conn.execute(text("select 1"))
+            conn.execute(text("select 2"))
+
+    print(f"DB time: {db_seconds[0] * 1000:.3f} ms")
+    assert db_seconds[0] > 0
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_exposition_format()
+    test_safe_llm_outcomes_are_counted()
+    test_metrics_route()
+    test_db_time_is_attributed_to_request()
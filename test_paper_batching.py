@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import re
+from types import SimpleNamespace
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from app.api.papers import generate_section_batched, generate_section_questions, question_agent
+from benchmarks.fixtures import apply_question as q
+
+
+def make_paper():
+    return SimpleNamespace(
+        id=1,
+        syllabus="Graphs, trees, shortest paths",
+        subject="Graph Theory",
+        domain="Computer Science",
+        core_topics=["Graphs", "Trees", "Shortest Paths"],
+        forbidden_topics=["Normalization"],
+    )
+
+
+def batch_responder(batches: list[list[str]], calls: list):
+    """Serve one prepared list of question texts per LLM call."""
+    async def generate(system_prompt, user_prompt):
+        count = int(re.search(r"Generate EXACTLY (\d+) questions", user_prompt).group(1))
+        calls.append(count)
+        texts = batches[len(calls) - 1] if len(calls) <= len(batches) else []
+        return json.dumps({
+            "questions": [
+                {"question": t, "bloom_level": "Apply", "difficulty": "Medium", "marks": 13}
+                for t in texts
+            ]
+        })
+    return generate
+
+
+def run_section(number_of_questions, batches, batch_size=5, max_topups=2, used=None):
+    question_agent._cache.clear()
+    calls = []
+    section = SimpleNamespace(id=7, name="Part B", marks_per_question=13, number_of_questions=number_of_questions)
+    used_questions = used if used is not None else set()
+
+    async def run():
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=batch_responder(batches, calls)):
+            return await generate_section_questions(
+                section=section,
+                section_topics=make_paper().core_topics,
+                section_bloom="Apply",
+                all_topics=make_paper().core_topics,
+                paper=make_paper(),
+                used_questions_global=used_questions,
+                batch_size=batch_size,
+                max_topups=max_topups,
+            )
+
+    return asyncio.run(run()), calls
+
+
+def test_one_call_per_section():
+    print("=" * 70)
+    print("TEST: Batched section generation")
+    print("=" * 70)
+
+    result, calls = run_section(5, [[q(i) for i in range(5)]])
+
+    print(f"LLM calls: {result['llm_calls']} (requested counts: {calls})")
+    assert calls == [5]
+    assert result["llm_calls"] == 1
+    assert [order for _, order in result["questions"]] == [1, 2, 3, 4, 5]
+    assert all(data["marks"] == 13 for data, _ in result["questions"])
+    print("✅ PASS")
+
+
+def test_topup_requests_only_shortfall():
+    print("\n🔹 Top-up calls request only the shortfall")
+
+    used = {q(11)}
+    first = [q(1), q(2), q(11), "Normalization of graphs into 3NF tables for a course.", "Too short"]
+    result, calls = run_section(5, [first, [q(3), q(4), q(5)]], used=used)
+
+    print(f"Requested counts: {calls}")
+    assert calls == [5, 3]
+    texts = [data["text"] for data, _ in result["questions"]]
+    assert texts == [q(1), q(2), q(3), q(4), q(5)]
+    print("✅ PASS")
+
+
+def test_chunks_and_template_fallback():
+    print("\n🔹 Chunking by K and template fallback when top-ups run out")
+
+    result, calls = run_section(7, [[q(1), q(2), q(3)], [q(4), q(5), q(6)], [], []], batch_size=3, max_topups=1)
+
+    print(f"Requested counts: {calls}")
+    assert calls == [3, 3, 1, 1]
+    assert len(result["questions"]) == 7
+    assert result["questions"][-1][0]["quality_score"] == 75.0  # template fallback
+    print("✅ PASS")
+
+
+def test_streamed_questions_are_accepted_before_the_call_ends():
+    print("\n🔹 Each streamed question is validated and accepted as soon as its object closes")
+
+    question_agent._cache.clear()
+    section = SimpleNamespace(id=7, name="Part B", marks_per_question=13, number_of_questions=3)
+    texts = [q(1), "Too short", q(1).upper(), q(2)]
+    body = json.dumps({"questions": [
+        {"question": t, "bloom_level": "Apply", "difficulty": "Medium", "marks": 13} for t in texts
+    ]})
+    log = []
+
+    async def generate_stream(self, system_prompt, user_prompt):
+        # One question object per chunk, then the rest of the document
+        head, *objects = body.split("}, ")
+        for chunk in [head + "}, "] + [obj + "}, " for obj in objects[:-1]] + [objects[-1]]:
+            log.append("chunk")
+            await asyncio.sleep(0)
+            yield chunk
+
+    def on_accept(question_data):
+        log.append(question_data["text"])
+
+    async def run():
+        with patch("app.core.llm_client.LLMClient.generate_stream", generate_stream):
+            return await generate_section_batched(
+                section=section,
+                section_bloom="Apply",
+                paper=make_paper(),
+                used_questions_global=set(),
+                batch_size=3,
+                max_topups=0,
+                on_accept=on_accept,
+            )
+
+    accepted, llm_calls = asyncio.run(run())
+    print(log)
+    assert [data["text"] for data in accepted] == [q(1), q(2)]
+    assert llm_calls == 1
+    # q(1) was accepted while the later objects were still streaming
+    assert log[:2] == ["chunk", q(1)]
+    assert log.count("chunk") == len(texts)
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_one_call_per_section()
+    test_topup_requests_only_shortfall()
+    test_chunks_and_template_fallback()
+    test_streamed_questions_are_accepted_before_the_call_ends()
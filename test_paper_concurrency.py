@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from app.api.papers import generate_section_questions
+from benchmarks.fixtures import apply_question as q
+
+
+def make_paper():
+    return SimpleNamespace(
+        id=1,
+        syllabus="Graphs, trees, shortest paths",
+        subject="Graph Theory",
+        domain="Computer Science",
+        core_topics=["Graphs", "Trees", "Shortest Paths"],
+        forbidden_topics=[],
+    )
+
+
+def pipeline_responder(texts: list[str], delays: list[float], stats: dict):
+    """Serve prepared question texts in call order, each call taking its own delay."""
+    async def run_pipeline(**kwargs):
+        n = stats["calls"]
+        stats["calls"] += 1
+        stats["active"] += 1
+        stats["peak"] = max(stats["peak"], stats["active"])
+        try:
+            await asyncio.sleep(delays[n] if n < len(delays) else 0.01)
+        finally:
+            stats["active"] -= 1
+        return {
+            "status": "ACCEPTED",
+            "question": {"question": texts[n], "bloom_level": "Apply", "difficulty": "Medium"},
+        }
+    return run_pipeline
+
+
+def make_section(section_id, marks, count):
+    return SimpleNamespace(id=section_id, name=f"Part {section_id}", marks_per_question=marks, number_of_questions=count)
+
+
+async def generate(section, used, slots, **kwargs):
+    return await generate_section_questions(
+        section=section,
+        section_topics=make_paper().core_topics,
+        section_bloom="Apply",
+        all_topics=make_paper().core_topics,
+        paper=make_paper(),
+        used_questions_global=used,
+        question_slots=slots,
+        **kwargs,
+    )
+
+
+def test_fan_out_under_shared_limit():
+    print("=" * 70)
+    print("TEST: Per-question calls fan out under a shared semaphore")
+    print("=" * 70)
+
+    stats = {"calls": 0, "active": 0, "peak": 0}
+    texts = [q(i) for i in range(8)]
+
+    async def run():
+        slots = asyncio.Semaphore(4)
+        used = set()
+        with patch("app.api.papers.run_pipeline", side_effect=pipeline_responder(texts, [0.1] * 8, stats)):
+            start = time.perf_counter()
+            part_a, part_b = await asyncio.gather(
+                generate(make_section(1, 2, 10), used, slots),
+                generate(make_section(2, 13, 8), used, slots),
+            )
+            return part_a, part_b, time.perf_counter() - start
+
+    part_a, part_b, elapsed = asyncio.run(run())
+
+    print(f"8 calls in {elapsed:.2f}s (peak in-flight: {stats['peak']})")
+    assert stats["peak"] == 4  # Part A templates left every slot to Part B
+    assert elapsed < 0.5, "calls ran serially"
+    assert len(part_a["questions"]) == 10
+    assert part_b["llm_calls"] == 8
+    assert [order for _, order in part_b["questions"]] == list(range(1, 9))
+    print("✅ PASS")
+
+
+def test_order_follows_slot_not_completion():
+    print("\n🔹 question_order is stable when later slots finish first")
+
+    stats = {"calls": 0, "active": 0, "peak": 0}
+    texts = [q(i) for i in range(3)]
+
+    async def run():
+        with patch("app.api.papers.run_pipeline", side_effect=pipeline_responder(texts, [0.15, 0.1, 0.01], stats)):
+            return await generate(make_section(2, 13, 3), set(), asyncio.Semaphore(3))
+
+    result = asyncio.run(run())
+    assert [(data["text"], order) for data, order in result["questions"]] == [
+        (q(0), 1), (q(1), 2), (q(2), 3)
+    ]
+    print("✅ PASS")
+
+
+def test_duplicate_gets_targeted_retry():
+    print("\n🔹 Duplicates found after the fact are retried for that slot only")
+
+    stats = {"calls": 0, "active": 0, "peak": 0}
+    # Both concurrent calls return the same text; the loser's retry is fresh
+    texts = [q(1), q(1), q(2)]
+
+    async def run():
+        with patch("app.api.papers.run_pipeline", side_effect=pipeline_responder(texts, [0.05, 0.05, 0.01], stats)):
+            return await generate(make_section(2, 13, 2), set(), asyncio.Semaphore(2))
+
+    result = asyncio.run(run())
+    print(f"LLM calls: {result['llm_calls']}")
+    assert result["llm_calls"] == 3
+    assert sorted(data["text"] for data, _ in result["questions"]) == [q(1), q(2)]
+    assert all(data["quality_score"] != 75.0 for data, _ in result["questions"])
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_fan_out_under_shared_limit()
+    test_order_follows_slot_not_completion()
+    test_duplicate_gets_targeted_retry()
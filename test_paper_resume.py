@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from app.api import papers
+from app.core.config import settings
+from app.db.models import GenerationCheckpoint, GenerationRun
+from benchmarks.fixtures import MemorySession, apply_question
+from test_generation_jobs import make_session
+
+
+def batch_responder(calls: list):
+    """First call: one usable question out of those requested; later calls: all of them."""
+    async def generate(system_prompt, user_prompt):
+        count = int(re.search(r"Generate EXACTLY (\d+) questions", user_prompt).group(1))
+        calls.append(count)
+        usable = 1 if len(calls) == 1 else count
+        served = sum(calls) - count
+        return json.dumps({"questions": [
+            {"question": apply_question(served + n),
+             "bloom_level": "Apply", "difficulty": "Medium", "marks": 13}
+            for n in range(usable)
+        ]})
+    return generate
+
+
+def generate(db, paper, responder, checkpoint_db=None, **patches):
+    papers.question_agent._cache.clear()
+    with patch("app.core.llm_client.LLMClient.generate", side_effect=responder), \
+            patch("app.core.generation_runs.SessionLocal", return_value=checkpoint_db or db), \
+            patch.object(settings, "PAPER_BATCH_TOPUPS", 0):
+        if patches:
+            with patch("app.api.papers.generation_runs.complete_run", **patches):
+                return asyncio.run(papers.generate_question_paper(paper_id=paper.id, db=db))
+        return asyncio.run(papers.generate_question_paper(paper_id=paper.id, db=db))
+
+
+def test_failed_run_resumes_missing_slots_only():
+    print("=" * 70)
+    print("TEST: Checkpointed, resumable paper generation")
+    print("=" * 70)
+
+    db, paper = make_session()
+    calls = []
+    responder = batch_responder(calls)
+
+    # Run 1: Part A from templates, 1 of 3 Part B questions, then the final save fails
+    first = generate(db, paper, responder, side_effect=RuntimeError("server closed the connection"))
+    run = db.rows_by_entity["GenerationRun"][0]
+    checkpoints = db.rows_by_entity["GenerationCheckpoint"]
+    print(first["status"], run.status, [(c.source, c.question_order) for c in checkpoints])
+
+    assert first["status"] == "DRAFT" and first["resumable"]
+    assert first["checkpointed_questions"] == 3
+    assert (run.status, run.error) == ("failed", "server closed the connection")
+    assert sorted((c.source, c.question_order) for c in checkpoints) == [("batch", 1), ("template", 1), ("template", 2)]
+    kept = next(c.question["text"] for c in checkpoints if c.source == "batch")
+
+    # Run 2 resumes: one call, for the two Part B slots the first run had to fill with templates
+    second = generate(db, paper, responder)
+    print(second["status"], second["restored_questions"], calls)
+
+    assert second["status"] == "SUCCESS"
+    assert second["run_id"] == first["run_id"]
+    assert second["restored_questions"] == 3
+    assert calls == [3, 2]
+    assert (run.status, run.attempts) == ("completed", 2)
+    assert len(db.rows_by_entity["GenerationRun"]) == 1
+
+    saved = {(pq.section_id, pq.question_order): pq for pq in db.rows_by_entity["PaperQuestion"][-5:]}
+    questions = {q.id: q for q in db.rows_by_entity["Question"]}
+    part_b_id = db.rows_by_entity["PaperSection"][1].id
+    part_b = [questions[saved[(part_b_id, order)].question_id].question_text for order in (1, 2, 3)]
+    print(part_b)
+    assert part_b[0] == kept
+    assert set(part_b) <= {apply_question(n) for n in range(5)}
+    assert len(set(part_b)) == 3
+    print("✅ PASS")
+
+
+def test_changed_section_ignores_its_checkpoints():
+    print("\n🔹 Checkpoints of a section whose marks changed are not restored")
+
+    db, paper = make_session()
+    part_b = db.rows_by_entity["PaperSection"][1]
+    run = GenerationRun(paper_id=paper.id, status="failed", attempts=1, llm_calls=4)
+    db.add(run)
+    db.add(GenerationCheckpoint(
+        run_id=run.id, section_id=part_b.id, question_order=1, source="batch",
+        question={"text": "Old 15-mark question", "bloom_level": "Analyze", "difficulty": "Hard",
+                  "marks": 15, "quality_score": 80},
+    ))
+
+    calls = []
+    result = generate(db, paper, batch_responder(calls))
+    assert result["restored_questions"] == 0
+    assert calls == [3] and result["status"] == "SUCCESS"
+    assert run.llm_calls == 5
+    print("✅ PASS")
+
+
+def test_running_run_is_claimed_once():
+    print("\n🔹 A run another generate is running is not resumed again; a stalled one is taken over")
+
+    db, paper = make_session()
+    run = GenerationRun(paper_id=paper.id, status="running", attempts=1, llm_calls=0, updated_at=datetime.utcnow())
+    db.add(run)
+
+    calls = []
+    try:
+        generate(db, paper, batch_responder(calls))
+        assert False, "expected a 409"
+    except HTTPException as exc:
+        assert exc.status_code == 409
+    assert calls == [] and run.attempts == 1
+
+    # No checkpoint for GENERATION_RUN_STALE_AFTER seconds: its process died
+    run.updated_at = datetime.utcnow() - timedelta(seconds=settings.GENERATION_RUN_STALE_AFTER + 1)
+    result = generate(db, paper, batch_responder(calls))
+    assert result["status"] == "SUCCESS" and result["run_id"] == run.id
+    assert (run.status, run.attempts) == ("completed", 2)
+    print("✅ PASS")
+
+
+class ThreadSession(MemorySession):
+    """Records the threads that commit on it."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def commit(self):
+        self.threads.add(threading.get_ident())
+
+
+class BrokenSession(MemorySession):
+    def commit(self):
+        raise OperationalError("INSERT INTO generation_checkpoints", {}, Exception("connection lost"))
+
+
+def test_checkpoints_use_their_own_session():
+    print("\n🔹 Checkpoints are written on their own sessions; a failed one leaves the generation's session alone")
+
+    db, paper = make_session()
+    writer = ThreadSession()
+    result = generate(db, paper, batch_responder([]), checkpoint_db=writer)
+    assert result["status"] == "SUCCESS"
+    assert "GenerationCheckpoint" not in db.rows_by_entity
+    assert len(writer.rows_by_entity["GenerationCheckpoint"]) == 3  # Part A's two templates, one batch question
+    # Written off the event loop's thread
+    assert writer.threads and threading.get_ident() not in writer.threads
+
+    db, paper = make_session()
+    with patch.object(db, "rollback") as rollback:
+        result = generate(db, paper, batch_responder([]), checkpoint_db=BrokenSession())
+    assert result["status"] == "SUCCESS"
+    assert not rollback.called
+    print("✅ PASS")
+
+
+def test_cancelled_generation_releases_its_run():
+    print("\n🔹 A cancelled generation releases its run; the next generate resumes it at once")
+
+    db, paper = make_session()
+    calls = []
+    responder = batch_responder(calls)
+
+    async def slow(system_prompt, user_prompt):
+        await asyncio.sleep(0.2)
+        return await responder(system_prompt, user_prompt)
+
+    async def cancel_mid_run():
+        task = asyncio.create_task(papers.generate_question_paper(paper_id=paper.id, db=db))
+        await asyncio.sleep(0.1)  # Part A checkpointed, Part B waiting on the LLM
+        task.cancel()
+        try:
+            await task
+            assert False, "expected the generation to be cancelled"
+        except asyncio.CancelledError:
+            pass
+
+    papers.question_agent._cache.clear()
+    with patch("app.core.llm_client.LLMClient.generate", side_effect=slow), \
+            patch("app.core.generation_runs.SessionLocal", return_value=db), \
+            patch.object(settings, "GENERATION_RUN_HEARTBEAT", 0.02):
+        asyncio.run(cancel_mid_run())
+
+    run = db.rows_by_entity["GenerationRun"][0]
+    print(run.status, run.error, len(db.rows_by_entity["GenerationCheckpoint"]))
+    assert (run.status, run.error) == ("failed", "Generation cancelled")
+    assert "PaperQuestion" not in db.rows_by_entity
+
+    # No wait for GENERATION_RUN_STALE_AFTER: the run is resumed straight away
+    result = generate(db, paper, responder)
+    assert result["status"] == "SUCCESS" and result["run_id"] == run.id
+    assert result["restored_questions"] == 2
+    assert (run.status, run.attempts) == ("completed", 2)
+    print("✅ PASS")
+
+
+def test_heartbeat_keeps_a_slow_run_claimed():
+    print("\n🔹 A running generation's heartbeat keeps its run fresh between checkpoints")
+
+    db, paper = make_session()
+    beats = []
+
+    async def slow(system_prompt, user_prompt):
+        run = db.rows_by_entity["GenerationRun"][0]
+        started = run.updated_at
+        await asyncio.sleep(0.2)
+        beats.append(run.updated_at > started)
+        return await batch_responder([])(system_prompt, user_prompt)
+
+    with patch.object(settings, "GENERATION_RUN_HEARTBEAT", 0.02):
+        result = generate(db, paper, slow)
+    assert result["status"] == "SUCCESS"
+    assert beats and all(beats)
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_failed_run_resumes_missing_slots_only()
+    test_changed_section_ignores_its_checkpoints()
+    test_running_run_is_claimed_once()
+    test_checkpoints_use_their_own_session()
+    test_cancelled_generation_releases_its_run()
+    test_heartbeat_keeps_a_slow_run_claimed()
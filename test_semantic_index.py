@@ -0,0 +1,76 @@
+import os
+import tempfile
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+import numpy as np
+
+from app.core.duplicate_checker import similarity
+from app.core.semantic_index import SemanticIndex
+from benchmarks import fixtures
+from test_paper_batching import q, run_section
+
+# q(1) reworded: same content, different order; difflib sees a new question
+PARAPHRASE = "Using linear probing in a hash table, store the roll numbers of students, showing every step."
+
+
+def test_catches_paraphrases_difflib_misses():
+    print("=" * 70)
+    print("TEST: Hashed TF-IDF vectors for paraphrase detection")
+    print("=" * 70)
+
+    index = SemanticIndex(dim=1024)
+    bank = [q(n) for n in range(12)] + fixtures.question_texts(500, seed=4)
+    index.add(list(range(1, len(bank) + 1)), bank)
+
+    unrelated = "Design a relational schema for a hospital billing system."
+    matches = index.duplicates(index.encode([PARAPHRASE, unrelated, q(3)]), 0.75)
+    print(f"similarity(): {similarity(q(1), PARAPHRASE):.2f}, matches: {matches}")
+
+    assert similarity(q(1), PARAPHRASE) < 0.85
+    assert matches[0][0] == 2 and matches[0][1] >= 0.75
+    assert matches[1] is None
+    assert matches[2][0] == 4 and matches[2][1] > 0.99
+    print("✅ PASS")
+
+
+def test_saved_matrix_is_mapped_back():
+    print("\n🔹 The bank matrix is saved, then memory-mapped with new rows in a tail")
+
+    path = tempfile.mkdtemp()
+    texts = fixtures.question_texts(300, seed=8)
+    index = SemanticIndex(dim=256, path=path, capacity=16)
+    index.add(list(range(1, 201)), texts[:200])
+    index.save()
+
+    reopened = SemanticIndex(dim=256, path=path)
+    assert reopened.open()
+    assert isinstance(reopened._mapped, np.memmap)
+    assert (reopened.count, reopened.max_id, reopened.documents) == (200, 200, 200)
+
+    reopened.add(list(range(201, 301)), texts[200:])
+    reopened.append(np.zeros((0, 256), dtype=np.float32), ids=[])  # an empty batch is a no-op
+    ids, scores = reopened.best_matches(reopened.encode([texts[10], texts[250]]))
+    assert ids.tolist() == [11, 251] and scores.min() > 0.99
+
+    # Other dims rebuild instead of misreading the file
+    assert not SemanticIndex(dim=512, path=path).open()
+    print("✅ PASS")
+
+
+def test_section_batch_rejects_paraphrases():
+    print("\n🔹 Batched section generation rejects a paraphrase within the batch")
+
+    result, calls = run_section(3, [[q(1), PARAPHRASE, q(2)], [q(3)]])
+
+    print(f"Requested counts: {calls}")
+    assert calls == [3, 1]
+    assert [data["text"] for data, _ in result["questions"]] == [q(1), q(2), q(3)]
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_catches_paraphrases_difflib_misses()
+    test_saved_matrix_is_mapped_back()
+    test_section_batch_rejects_paraphrases()
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+
+from app.core import stage_latency
+from app.core.llm_safe import SafeLLM
+from app.core.pipeline_config import PipelineConfig
+from app.core.stage_latency import StageLatencyTracker, effective_timeout
+
+
+def fresh_tracker(min_samples: int = 5) -> StageLatencyTracker:
+    tracker = StageLatencyTracker(window=50, min_samples=min_samples)
+    stage_latency._tracker = tracker
+    return tracker
+
+
+def test_timeout_follows_percentile_within_bounds():
+    print("=" * 70)
+    print("TEST: Adaptive stage timeouts")
+    print("=" * 70)
+
+    cfg = PipelineConfig(stage_name="adaptive", max_retries=0, timeout=8, min_timeout=2, max_timeout=20)
+    tracker = fresh_tracker()
+
+    # Cold start: configured value
+    assert effective_timeout(cfg) == 8
+
+    for _ in range(20):
+        tracker.record("adaptive", 3.0)
+    print(f"p99=3.0s -> timeout {effective_timeout(cfg)}s")
+    assert effective_timeout(cfg) == 4.5  # 3.0 x 1.5 margin
+
+    for _ in range(50):
+        tracker.record("adaptive", 0.2)
+    assert effective_timeout(cfg) == 2  # floor
+
+    for _ in range(50):
+        tracker.record("adaptive", 30.0)
+    assert effective_timeout(cfg) == 20  # ceiling
+    print("✅ PASS")
+
+
+def test_timeouts_are_recorded_and_loosen_the_limit():
+    print("\n🔹 Timed-out calls count as samples at the limit")
+
+    cfg = PipelineConfig(stage_name="too_tight", max_retries=0, timeout=0.1, max_timeout=1)
+    tracker = fresh_tracker(min_samples=3)
+
+    async def slow(system_prompt, user_prompt):
+        await asyncio.sleep(0.12)
+        return json.dumps({"ok": True})
+
+    async def run():
+        outcomes = []
+        with patch("app.core.llm_client.LLMClient.generate", side_effect=slow):
+            for i in range(6):
+                try:
+                    await SafeLLM().generate_json("sys", f"user {i}", config=cfg)
+                    outcomes.append("ok")
+                except asyncio.TimeoutError:
+                    outcomes.append("timeout")
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    print(f"Outcomes: {outcomes}")
+    assert outcomes[:3] == ["timeout"] * 3
+    assert outcomes[-1] == "ok"
+    assert tracker.histogram("too_tight")["timeouts"] == 3
+    print("✅ PASS")
+
+
+def test_histogram_is_cumulative():
+    print("\n🔹 Cumulative latency histogram")
+
+    tracker = fresh_tracker()
+    for latency in (0.1, 0.3, 3.0, 100.0):
+        tracker.record("hist", latency)
+
+    histogram = tracker.histogram("hist")
+    assert histogram["buckets"]["0.25"] == 1
+    assert histogram["buckets"]["0.5"] == 2
+    assert histogram["buckets"]["4.0"] == 3
+    assert histogram["buckets"]["+Inf"] == 4
+    assert histogram["count"] == 4
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_timeout_follows_percentile_within_bounds()
+    test_timeouts_are_recorded_and_loosen_the_limit()
+    test_histogram_is_cumulative()
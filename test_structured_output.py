@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+
+from app.core import llm_client, structured_output
+from app.core.config import settings
+from app.core.llm_client import LLMClient, llm_output_schema
+from app.core.llm_scheduler import LLMScheduler
+from app.core.llm_simulator import LLMSimulator, SimulatedProviderError, SimulatorConfig
+from app.core.metrics import LLM_STRUCTURED_CALLS
+from app.core.llm_safe import SafeLLM
+from app.core.pipeline_config import QUESTION_BATCH_OUTPUT, QUESTION_OUTPUT, PipelineConfig
+
+BATCH_PROMPT = "Generate EXACTLY 3 questions for:\nMarks per question: 13\nTopic: Graphs, Trees\nReturn JSON"
+
+
+def install_simulator(**config) -> LLMSimulator:
+    simulator = LLMSimulator(SimulatorConfig(latency="fixed:0", **config))
+    sent = []
+    create = simulator.create
+
+    async def recording_create(**kwargs):
+        sent.append(kwargs)
+        return await create(**kwargs)
+
+    simulator.chat = SimpleNamespace(completions=SimpleNamespace(create=recording_create))
+    simulator.sent = sent
+    llm_client._shared.update(
+        loop=asyncio.get_running_loop(),
+        client=simulator,
+        scheduler=LLMScheduler(requests_per_minute=6000, tokens_per_minute=10_000_000, max_concurrency=4),
+    )
+    structured_output._capabilities.clear()
+    return simulator
+
+
+def live_safe_llm() -> SafeLLM:
+    safe = SafeLLM()
+    safe.llm.mock_mode = False
+    return safe
+
+
+def test_schema_mode_drops_prompt_boilerplate():
+    print("=" * 70)
+    print("TEST: Provider-side structured output")
+    print("=" * 70)
+
+    cfg = PipelineConfig(stage_name="structured_schema", max_retries=0, timeout=5, output_schema=QUESTION_BATCH_OUTPUT)
+    system_prompt = "You are an examiner.\n\nCRITICAL:\n- Return ONLY valid JSON\n- No markdown, no explanations\n"
+
+    async def run():
+        simulator = install_simulator(structured_output="json_schema")
+        result = await live_safe_llm().generate_json(system_prompt, BATCH_PROMPT, config=cfg)
+        return simulator, result
+
+    before = LLM_STRUCTURED_CALLS.value(mode="json_schema")
+    simulator, result = asyncio.run(run())
+    request = simulator.sent[0]
+    print(request["response_format"]["type"], repr(request["messages"][0]["content"]))
+
+    assert len(result["questions"]) == 3
+    assert request["response_format"]["json_schema"]["name"] == "question_batch"
+    assert request["messages"][0]["content"] == "You are an examiner.\n\nCRITICAL:"
+    assert LLM_STRUCTURED_CALLS.value(mode="json_schema") == before + 1
+    print("✅ PASS")
+
+
+def test_unsupported_mode_is_downgraded_once():
+    print("\n🔹 A model without json_schema falls back to json_object, then stays there")
+
+    async def run():
+        simulator = install_simulator(structured_output="json_object")
+        client = LLMClient()
+        client.mock_mode = False
+        token = llm_output_schema.set(QUESTION_OUTPUT)
+        try:
+            first = await client.generate("Return ONLY valid JSON.", "Topic: Graphs")
+            second = await client.generate("Return ONLY valid JSON.", "Topic: Trees")
+        finally:
+            llm_output_schema.reset(token)
+        return simulator, first, second
+
+    simulator, first, second = asyncio.run(run())
+    modes = [request.get("response_format", {}).get("type") for request in simulator.sent]
+    print(modes)
+    assert modes == ["json_schema", "json_object", "json_object"]
+    assert simulator.stats["rejected_format"] == 1
+    # json_object keeps the prompt as written (the provider wants "JSON" in it)
+    assert simulator.sent[1]["messages"][0]["content"] == "Return ONLY valid JSON."
+    assert "question" in json.loads(first) and "question" in json.loads(second)
+    print("✅ PASS")
+
+
+def test_plain_path_without_support_or_schema():
+    print("\n🔹 No support, no schema, or switched off: the plain request, as before")
+
+    async def run(structured, schema):
+        simulator = install_simulator(structured_output=structured, malformed_rate=1.0)
+        client = LLMClient()
+        client.mock_mode = False
+        token = llm_output_schema.set(schema)
+        try:
+            text = await client.generate("sys", "Topic: Graphs")
+        finally:
+            llm_output_schema.reset(token)
+        return simulator, text
+
+    # Constrained output is never malformed, even at a 100% corruption rate
+    simulator, text = asyncio.run(run("json_schema", QUESTION_OUTPUT))
+    assert json.loads(text)["question"]
+
+    simulator, _ = asyncio.run(run("none", QUESTION_OUTPUT))
+    assert [r.get("response_format") for r in simulator.sent] == [{"type": "json_schema", "json_schema": {
+        "name": "question", "schema": QUESTION_OUTPUT.schema}}, {"type": "json_object"}, None]
+
+    simulator, _ = asyncio.run(run("json_schema", None))
+    assert "response_format" not in simulator.sent[0]
+    assert simulator.stats["malformed"] == 1
+
+    with patch.object(settings, "LLM_STRUCTURED_OUTPUT", "off"):
+        simulator, _ = asyncio.run(run("json_schema", QUESTION_OUTPUT))
+    assert "response_format" not in simulator.sent[0]
+    structured_output._capabilities.clear()
+    print("✅ PASS")
+
+
+def test_unsupported_error_detection():
+    print("\n🔹 Only a 400 about response_format itself counts as unsupported")
+
+    is_unsupported = structured_output.is_unsupported_error
+    assert is_unsupported(SimulatedProviderError(400, message="response_format json_schema is not supported by this model"))
+    assert not is_unsupported(SimulatedProviderError(400, message="json_validate_failed: Failed to generate JSON"))
+    assert not is_unsupported(SimulatedProviderError(500))
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_schema_mode_drops_prompt_boilerplate()
+    test_unsupported_mode_is_downgraded_once()
+    test_plain_path_without_support_or_schema()
+    test_unsupported_error_detection()
@@ -0,0 +1,86 @@
+import os
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from app.agents.question_generator import QuestionGeneratorAgent, subject_guard
+from app.api.papers import _validate_batch_question
+from app.core.bloom_rules import check_forbidden_topics
+from app.core.context_aware_regenerator import subject_guard as regen_subject_guard
+from app.core.quality_scorer import score_question, score_questions
+from app.core.text_rules import INFLECTIONS, TermMatcher, matcher
+from benchmarks import fixtures
+
+
+def test_matches_whole_words_only():
+    print("=" * 70)
+    print("TEST: Compiled word-boundary term matching")
+    print("=" * 70)
+
+    rules = TermMatcher(["ip", "operating system", "3nf", "index", "c++"])
+    assert rules.find("Explain the relationship between trees and forests.") is None
+    assert rules.find("Describe the TCP/IP stack.") == "ip"
+    assert rules.find("Compare two Operating\n Systems.") == "operating system"
+    assert rules.find("Decompose R into 3NF.") == "3nf"
+    assert rules.find("Build indexes for the table.") == "index"
+    assert rules.find("Write a C++ program.") == "c++"
+    assert rules.terms("IP over an operating system with an IP address") == ["ip", "operating system"]
+
+    # The agent's guard no longer rejects "ip" inside a word
+    assert subject_guard("Explain the relationship between a graph and its spanning tree.")
+    assert not subject_guard("Describe TCP congestion control.")
+    assert check_forbidden_topics("Find the correlation between the degrees of a graph.")
+    assert not check_forbidden_topics("Normalize the relation to BCNF.")
+    assert not regen_subject_guard("Write SQL to list students.", "Python")
+    assert regen_subject_guard("Write SQL to list students.", "Unknown subject")
+    print("✅ PASS")
+
+
+def test_rules_and_prefixes():
+    print("\n🔹 Named rules report every list hit, overlapping phrases included")
+
+    rules = TermMatcher({"vague": ["briefly explain", "discuss"], "verb": ["explain", "use"]}, INFLECTIONS)
+    assert rules.rules("Briefly explain hashing.") == {"vague", "verb"}
+    assert rules.rules("Discussed because of it") == {"vague"}
+    assert rules.rules_many(["Briefly explain hashing.", "Nothing here", None, "Uses a heap"]) == [
+        {"vague", "verb"}, set(), set(), {"verb"}
+    ]
+
+    starters = TermMatcher(["what is", "state", "define"], ())
+    assert starters.starts("  What is a spanning tree?") == "what is"
+    assert starters.starts("Statement of the theorem") is None
+    assert starters.starts("Then define a graph") is None
+
+    # One compiled matcher per list, e.g. per paper
+    assert matcher(["Thermodynamics", "Quantum"]) is matcher(["Thermodynamics", "Quantum"])
+    assert _validate_batch_question(
+        {"question": "Explain the laws of thermodynamics for a closed system."}, ["Thermodynamics"]
+    ) == "forbidden_topic:Thermodynamics"
+    assert _validate_batch_question({"question": "Explain graph colouring with a suitable example."}, []) is None
+    print("✅ PASS")
+
+
+def test_batch_scoring_matches_single():
+    print("\n🔹 Batch scoring gives the same scores as scoring one by one")
+
+    texts = fixtures.question_texts(300, seed=2) + [
+        "Briefly explain how a heap is used, given an array of 10 integers to sort.",
+        "Discuss trees.",
+    ]
+    for bloom in ("Apply", "Analyze", "Understand"):
+        assert score_questions(texts, bloom) == [score_question(text, bloom) for text in texts]
+
+    agent = QuestionGeneratorAgent()
+    questions = [{"question": text} for text in texts[:50]] + [{"question": "Describe TCP flow control."}]
+    batch = agent._score_batch_questions([dict(q) for q in questions], "Apply", ["Spanning Trees"])
+    single = [agent._score_batch_question(dict(q), "Apply", ["Spanning Trees"]) for q in questions]
+    assert batch == single
+    assert batch[-1] is None
+    print(f"Scored {len(texts)} questions per level")
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_matches_whole_words_only()
+    test_rules_and_prefixes()
+    test_batch_scoring_matches_single()
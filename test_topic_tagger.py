@@ -0,0 +1,159 @@
+import asyncio
+import os
+from unittest.mock import patch
+
+os.environ["LLM_MOCK"] = "1"
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg2://localhost/qb_test")
+
+from app.api import papers
+from app.core.analytics import calculate_syllabus_coverage
+from app.core.topic_tagger import TopicTagger, lemma, tag_questions, tagger
+from app.db.backfill import backfill_topics
+from test_generation_jobs import batch_generate, make_session
+
+TOPICS = [
+    "Graphs", "Trees", "Shortest Paths", "Graph Colouring",
+    "Depth First Search (DFS)", "Minimum Spanning Trees", "Propositional Logic",
+]
+
+
+def test_tags_phrases_lemmas_and_spellings():
+    print("=" * 70)
+    print("TEST: Local topic tagging against a paper's core topics")
+    print("=" * 70)
+
+    texts = [
+        "Explain Dijkstra's algorithm for the shortest path in a weighted graph.",
+        "Apply the coloring of a graph to schedule examinations.",
+        "Trace DFS on the given adjacency list.",
+        "Find the spanning tree of minimum weight using Kruskal's algorithm.",
+        "Define a tautology in propositional logic.",
+        "Explain the paths of a river.",
+        "Discuss hashing with chaining.",
+    ]
+    tags = tag_questions(TOPICS, texts)
+    for text, topics in zip(texts, tags):
+        print(f"{topics} <- {text}")
+
+    assert tags == [
+        ["Graphs", "Shortest Paths"],
+        ["Graphs", "Graph Colouring"],                # "coloring" is a close spelling
+        ["Depth First Search (DFS)"],                 # the acronym in parentheses
+        ["Trees", "Minimum Spanning Trees"],          # lemmas, in any order
+        ["Propositional Logic"],
+        [],                                           # one of two words is not enough
+        [],
+    ]
+    assert [lemma(word) for word in ["paths", "trees", "classes", "queries", "searching"]] == [
+        "path", "tree", "class", "query", "search"
+    ]
+    # Compiled once per topic list
+    assert tagger(TOPICS) is tagger(list(TOPICS))
+    assert TopicTagger([]).tag("Explain graphs.") == []
+    print("✅ PASS")
+
+
+def test_paper_questions_are_tagged():
+    print("\n🔹 generate_question_paper stores topics_used, so coverage is no longer 0")
+
+    db, paper = make_session()
+    papers.question_agent._cache.clear()
+    with patch("app.core.llm_client.LLMClient.generate", side_effect=batch_generate), \
+            patch("app.core.generation_runs.SessionLocal", return_value=db), \
+            patch("app.api.papers.update_analytics_for_paper"):
+        result = asyncio.run(papers.generate_question_paper(paper_id=paper.id, db=db))
+
+    assert result["status"] == "SUCCESS"
+    questions = db.rows_by_entity["Question"]
+    for question in questions:
+        assert question.topics_used == tagger(paper.core_topics).tag(question.question_text)
+    coverage = calculate_syllabus_coverage(paper.core_topics, questions)
+    print(f"Coverage: {coverage}%")
+    assert coverage > 0
+    print("✅ PASS")
+
+
+class BackfillSession:
+    """Answers backfill_topics()'s queries: one page of papers, then each paper's questions."""
+
+    def __init__(self, papers, questions):
+        self.papers = papers          # id -> (core_topics, analytics)
+        self.questions = questions    # paper id -> {question id: [text, topics_used]}
+        self.analytics = {}
+
+    def query(self, *columns):
+        session = self
+
+        class Query:
+            paper_id = None
+            min_id = 0
+
+            def join(self, *args):
+                return self
+
+            def filter(self, clause):
+                if clause.operator.__name__ == "gt":
+                    self.min_id = clause.right.value
+                else:
+                    self.paper_id = clause.right.value
+                return self
+
+            def order_by(self, *args):
+                return self
+
+            def limit(self, n):
+                return self
+
+            def all(self):
+                if self.paper_id is None:
+                    return [(paper_id, *paper) for paper_id, paper in session.papers.items() if paper_id > self.min_id]
+                return [
+                    (question_id, text, topics_used)
+                    for question_id, (text, topics_used) in session.questions.get(self.paper_id, {}).items()
+                ]
+
+        return Query()
+
+    def execute(self, statement, params=None):
+        if params is None:
+            values = statement.compile().params
+            self.analytics[values["id_1"]] = values["analytics"]
+            return
+        for row in params:
+            for questions in self.questions.values():
+                if row["id"] in questions:
+                    questions[row["id"]][1] = row["topics_used"]
+
+    def commit(self):
+        pass
+
+
+def test_backfill_tags_existing_bank():
+    print("\n🔹 Backfill tags stored questions with the topics of their papers")
+
+    shared = ["Explain Prim's algorithm for minimum spanning trees.", None]
+    db = BackfillSession(
+        {1: (["Trees", "Minimum Spanning Trees"], {"bloom_distribution": {}}), 2: (["Graphs"], None), 3: ([], None)},
+        {
+            1: {10: shared, 11: ["Define a rooted tree.", []]},
+            2: {10: shared, 12: ["Explain Euler paths in a graph.", ["Graphs"]]},
+        },
+    )
+
+    counts = backfill_topics(db)
+    print(counts, db.analytics)
+    assert counts == {"papers": 2, "tagged": 2}
+    assert shared[1] == ["Trees", "Minimum Spanning Trees"]   # no graph word: paper 2 adds nothing
+    assert db.questions[1][11][1] == ["Trees"]
+    assert db.analytics[1] == {"bloom_distribution": {}, "coverage_percent": 100}
+    assert 2 not in db.analytics
+
+    # Idempotent
+    assert backfill_topics(db) == {"papers": 2, "tagged": 0}
+    print("✅ PASS")
+
+
+if __name__ == "__main__":
+    test_tags_phrases_lemmas_and_spellings()
+    test_paper_questions_are_tagged()
+    test_backfill_tags_existing_bank()